@@ -0,0 +1,82 @@
+"""
+Bulk ingestion: replaying a batch of 10M events with one incr call per event
+against incr_many and record_many. NumPy inputs are measured when NumPy is
+installed.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_bulk.py [events]
+"""
+import random
+import sys
+import time
+
+from prostata import Stats, CompactStats
+
+EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+NAMES = [f"event_{i}" for i in range(100)]
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def new_stats(stats_class):
+    stats = stats_class()
+    for name in NAMES:
+        stats.set_counter(name)
+    stats.set_timer("handler")
+    return stats
+
+
+def measure(label, function):
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    print(f"  {label:<36} {seconds:7.2f} s  {seconds / EVENTS * 1e9:7.1f} ns/event")
+
+
+def per_call_counters(stats, events):
+    incr = stats.incr
+    for name in events:
+        incr(name)
+
+
+def per_call_timer(stats, durations):
+    # One segment at a time, as record_many would otherwise be emulated
+    record_many = stats.record_many
+    for duration in durations:
+        record_many("handler", (duration,))
+
+
+def main():
+    rng = random.Random(0)
+    events = rng.choices(NAMES, k=EVENTS)
+    durations = [rng.expovariate(1000) for _ in range(EVENTS)]
+    for stats_class in (Stats, CompactStats):
+        print(f"{stats_class.__name__}, {EVENTS:,} events over {len(NAMES)} counters")
+        stats = new_stats(stats_class)
+        measure("incr() per event", lambda: per_call_counters(stats, events))
+        expected = stats.get_counters()
+        stats = new_stats(stats_class)
+        measure("incr_many(list of names)", lambda: stats.incr_many(events))
+        assert stats.get_counters() == expected
+        if numpy is not None:
+            array = numpy.array(events)
+            measure("incr_many(numpy array of names)", lambda: stats.incr_many(array))
+            codes = numpy.random.default_rng(0).integers(0, len(NAMES), EVENTS)
+            measure("incr_many(bincount of numpy codes)",
+                    lambda: stats.incr_many(dict(zip(NAMES, numpy.bincount(codes, minlength=len(NAMES))))))
+
+        print(f"{stats_class.__name__}, {EVENTS:,} timer segments")
+        stats = new_stats(stats_class)
+        measure("record_many() per segment", lambda: per_call_timer(stats, durations))
+        stats = new_stats(stats_class)
+        measure("record_many(list)", lambda: stats.record_many("handler", durations))
+        if numpy is not None:
+            array = numpy.array(durations)
+            measure("record_many(numpy array)", lambda: stats.record_many("handler", array))
+        print()
+
+
+if __name__ == "__main__":
+    main()
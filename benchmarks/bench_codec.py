@@ -0,0 +1,74 @@
+"""
+Size and speed of Stats.to_bytes()/from_bytes() against JSON built from the
+get_*() dictionaries and against pickle.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_codec.py
+"""
+import json
+import pickle
+import timeit
+
+from prostata import Stats
+
+METRICS = 20_000
+REPEAT = 5
+
+
+def populate():
+    stats = Stats()
+    for i in range(METRICS // 2):
+        stats.set_counter(f"requests_{i}", i * 7, unit="requests", label=f"Requests of route {i}")
+        stats.set_timer(f"handler_{i}", label=f"Handler time of route {i}")
+        stats.start_timer(f"handler_{i}")
+        stats.stop_timer(f"handler_{i}")
+    for i in range(100):
+        stats.set_ratio(f"rate_{i}", f"requests_{i}", f"requests_{i + 1}")
+        stats.set_attribute(f"setting_{i}", f"value {i}")
+    return stats
+
+
+def to_json(stats):
+    return json.dumps({
+        'timers': stats.get_timers(),
+        'counters': stats.get_counters(),
+        'ratios': stats.get_ratios(),
+        'attributes': stats.get_attributes(),
+    }).encode()
+
+
+def from_json(data):
+    state = json.loads(data)
+    stats = Stats()
+    for name, counter in state['counters'].items():
+        stats.set_counter(name, counter['value'], counter['unit'], counter['label'])
+    for name, timer in state['timers'].items():
+        stats.set_timer(name, timer['label'])
+        stats._timers[name].update(timer)
+    for name, ratio in state['ratios'].items():
+        stats.set_ratio(name, ratio['numerator'], ratio['denominator'], ratio['label'])
+    for name, attribute in state['attributes'].items():
+        stats.set_attribute(name, attribute['value'], attribute['label'])
+    return stats
+
+
+def measure(function):
+    return min(timeit.repeat(function, number=1, repeat=REPEAT)) * 1e3
+
+
+def main():
+    stats = populate()
+    print(f"{METRICS:,} counters and timers")
+    print(f"  {'format':<8} {'size':>10} {'encode':>10} {'decode':>10}")
+    for label, encode, decode in (
+        ("binary", Stats.to_bytes, Stats.from_bytes),
+        ("json", to_json, from_json),
+        ("pickle", pickle.dumps, pickle.loads),
+    ):
+        data = encode(stats)
+        encode_ms = measure(lambda: encode(stats))
+        decode_ms = measure(lambda: decode(data))
+        print(f"  {label:<8} {len(data) / 1e3:8.0f} kB {encode_ms:7.1f} ms {decode_ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
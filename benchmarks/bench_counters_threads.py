@@ -0,0 +1,49 @@
+"""
+Counter throughput with several threads incrementing the same counters, for
+each concurrency mode. None (unsynchronized) is shown for reference only: it
+loses increments.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_counters_threads.py
+"""
+import threading
+import time
+
+from prostata import Stats
+
+THREADS = 8
+INCREMENTS = 100_000
+
+
+def run(mode):
+    stats = Stats(concurrency=mode)
+    stats.set_counter("requests")
+    barrier = threading.Barrier(THREADS + 1)
+
+    def worker():
+        incr = stats.incr
+        barrier.wait()
+        for _ in range(INCREMENTS):
+            incr("requests")
+
+    workers = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for worker_thread in workers:
+        worker_thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.join()
+    elapsed = time.perf_counter() - start
+    return elapsed, stats.get_counter("requests")
+
+
+def main():
+    expected = THREADS * INCREMENTS
+    print(f"{THREADS} threads x {INCREMENTS} increments")
+    for mode in Stats.CONCURRENCY_MODES:
+        elapsed, total = min(run(mode) for _ in range(3))
+        lost = expected - total
+        print(f"{str(mode):<8} {expected / elapsed / 1e6:6.2f} M incr/s   lost increments: {lost}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Cost of reading a derived metric compiled by set_derived, against evaluating
+the same expression with the get_*() methods and against eval() of the text.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_derived.py
+"""
+import timeit
+
+from prostata import Stats
+
+NUMBER = 200_000
+EXPRESSION = "(errors + timeouts) / requests"
+
+
+def main():
+    stats = Stats()
+    stats.set_counter("errors", 2)
+    stats.set_counter("timeouts", 1)
+    stats.set_counter("requests", 100)
+    stats.set_derived("failure_rate", EXPRESSION)
+    function = stats._derived["failure_rate"]['function']
+    cases = (
+        ("compiled closure", function),
+        ("get_derived()", lambda: stats.get_derived("failure_rate")),
+        ("get_counter() by hand", lambda: (stats.get_counter("errors") + stats.get_counter("timeouts"))
+         / stats.get_counter("requests")),
+        ("eval() of the text", lambda: eval(EXPRESSION, {}, {name: stats.get_counter(name)
+                                                             for name in ("errors", "timeouts", "requests")})),
+    )
+    print(f"Reading {EXPRESSION!r}")
+    for label, case in cases:
+        ns = min(timeit.repeat(case, number=NUMBER, repeat=5)) / NUMBER * 1e9
+        print(f"  {label:<24} {ns:8.1f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Call path overhead for counters and timers: by name, through the dynamic
+methods, and through pre-resolved handles.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_handles.py
+"""
+import timeit
+
+from prostata import Stats, CompactStats
+
+N = 500_000
+
+
+def report(label, statement, namespace):
+    seconds = min(timeit.repeat(statement, globals=namespace, number=N, repeat=5))
+    print(f"  {label:<28} {seconds / N * 1e9:7.1f} ns/call")
+
+
+def main():
+    for factory in (Stats, CompactStats):
+        stats = factory()
+        requests = stats.set_counter("requests", handle=True)
+        load_time = stats.set_timer("load_time", handle=True)
+        namespace = {'stats': stats, 'requests': requests, 'load_time': load_time}
+        print(f"{factory.__name__}, {N} calls")
+        report("incr('requests')", "stats.incr('requests')", namespace)
+        report("incr_requests()", "stats.incr_requests()", namespace)
+        report("handle.incr()", "requests.incr()", namespace)
+        report("start_timer+stop_timer", "stats.start_timer('load_time'); stats.stop_timer('load_time')", namespace)
+        report("start_/stop_load_time()", "stats.start_load_time(); stats.stop_load_time()", namespace)
+        report("handle.start()+stop()", "load_time.start(); load_time.stop()", namespace)
+
+
+if __name__ == "__main__":
+    main()
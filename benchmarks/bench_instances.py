@@ -0,0 +1,105 @@
+"""
+Creating many short-lived Stats instances: 10k instances with 50 metrics
+each, with dynamic methods stored as per-instance closures (the previous
+behavior) and installed on the class.
+
+"left after del" is the memory still held when the instances are dropped
+with the cyclic garbage collector disabled: closures referencing the
+instance keep it alive until a collection runs.
+
+The per-call times compare the dynamic methods with the named methods they
+stand for, on one instance.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_instances.py
+"""
+import gc
+import time
+import timeit
+import tracemalloc
+
+from prostata import Stats
+
+INSTANCES = 10_000
+CALLS = 200_000
+TIMERS, COUNTERS, ATTRIBUTES = 10, 30, 10
+NAMES = {
+    'timer': [f"timer_{i}" for i in range(TIMERS)],
+    'counter': [f"counter_{i}" for i in range(COUNTERS)],
+    'attribute': [f"attribute_{i}" for i in range(ATTRIBUTES)],
+}
+
+
+class ClosureStats(Stats):
+    """Stats with the per-instance closures used before class-level dispatch."""
+
+    def _register(self, name, kind):
+        super()._register(name, kind)
+        if kind == 'timer':
+            setattr(self, f'get_{name}', lambda: self.get_timer(name))
+            setattr(self, f'start_{name}', lambda: self.start_timer(name))
+            setattr(self, f'stop_{name}', lambda: self.stop_timer(name))
+        elif kind == 'counter':
+            setattr(self, f'get_{name}', lambda: self.get_counter(name))
+            setattr(self, f'incr_{name}', lambda amount=1: self.incr(name, amount))
+            setattr(self, f'decr_{name}', lambda amount=1: self.decr(name, amount))
+            setattr(self, f'reset_{name}', lambda value=0: self.reset_counter(name, value))
+        elif kind == 'attribute':
+            setattr(self, f'get_{name}', lambda: self.get_attribute(name))
+            setattr(self, f'set_{name}', lambda value: self.set_attribute_value(name, value))
+
+
+def build(cls):
+    stats = cls()
+    for name in NAMES['timer']:
+        stats.set_timer(name)
+    for name in NAMES['counter']:
+        stats.set_counter(name)
+    for name in NAMES['attribute']:
+        stats.set_attribute(name, "")
+    return stats
+
+
+def run(cls):
+    gc.collect()
+    gc.disable()
+    try:
+        tracemalloc.start()
+        start = time.perf_counter()
+        instances = [build(cls) for _ in range(INSTANCES)]
+        elapsed = time.perf_counter() - start
+        held = tracemalloc.get_traced_memory()[0]
+        del instances
+        left = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    finally:
+        gc.enable()
+        gc.collect()
+    return elapsed, held, left
+
+
+def per_call(cls):
+    stats = build(cls)
+    calls = {
+        'incr_counter_0()': lambda: stats.incr_counter_0(),
+        "incr('counter_0')": lambda: stats.incr('counter_0'),
+        'get_counter_0()': lambda: stats.get_counter_0(),
+        "get_counter('counter_0')": lambda: stats.get_counter('counter_0'),
+    }
+    return {call: min(timeit.repeat(function, number=CALLS, repeat=5)) / CALLS for call, function in calls.items()}
+
+
+def main():
+    print(f"{INSTANCES} instances x {TIMERS + COUNTERS + ATTRIBUTES} metrics")
+    for cls in (ClosureStats, Stats):
+        elapsed, held, left = run(cls)
+        print(f"{cls.__name__:<13} build {elapsed:6.2f} s   held {held / 2**20:7.1f} MiB"
+              f"   left after del {left / 2**20:7.1f} MiB")
+    print()
+    print("per call")
+    for cls in (ClosureStats, Stats):
+        for call, seconds in per_call(cls).items():
+            print(f"{cls.__name__:<13} {call:<26} {seconds * 1e9:6.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Memory used by 100k counters and 100k timers with dict storage (Stats) and
+array column storage (CompactStats). "storage" excludes the per-instance
+dynamic methods, which are the same for both.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_memory.py
+"""
+import gc
+import tracemalloc
+
+from prostata import Stats, CompactStats
+
+METRICS = 100_000
+
+
+def measure(factory, dynamic_methods=True):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    stats = factory()
+    if not dynamic_methods:
+        stats._register = lambda name, kind: stats._names_used.add(name)
+    for i in range(METRICS):
+        stats.set_counter(f"counter_{i}", unit="requests", label="Requests")
+        stats.set_timer(f"timer_{i}")
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used
+
+
+def main():
+    print(f"{METRICS} counters + {METRICS} timers")
+    for factory in (Stats, CompactStats):
+        total = measure(factory)
+        storage = measure(factory, dynamic_methods=False)
+        print(f"{factory.__name__:<14} total {total / 2**20:7.1f} MiB ({total / (2 * METRICS):5.0f} B/metric)"
+              f"   storage {storage / 2**20:7.1f} MiB ({storage / (2 * METRICS):5.0f} B/metric)")
+
+
+if __name__ == "__main__":
+    main()
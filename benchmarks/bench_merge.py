@@ -0,0 +1,67 @@
+"""
+Speed and peak memory of Stats.reduce() over many worker instances, against
+summing the get_counters()/get_timers() dictionaries by hand.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_merge.py [instances]
+"""
+import sys
+import time
+import tracemalloc
+
+from prostata import Stats, CompactStats
+
+INSTANCES = 2_000
+COUNTERS = 50
+TIMERS = 20
+
+
+def worker(stats_class, seed):
+    stats = stats_class()
+    for i in range(COUNTERS):
+        stats.set_counter(f"requests_{i}", seed + i)
+    for i in range(TIMERS):
+        stats.set_timer(f"handler_{i}")
+        stats.start_timer(f"handler_{i}")
+        stats.stop_timer(f"handler_{i}")
+    stats.set_ratio("rate", "requests_0", "requests_1")
+    return stats
+
+
+def by_hand(instances):
+    counters, timers = {}, {}
+    for stats in instances:
+        for name, counter in stats.get_counters().items():
+            counters[name] = counters.get(name, 0) + counter['value']
+        for name, timer in stats.get_timers().items():
+            elapsed, segments = timers.get(name, (0.0, 0))
+            timers[name] = (elapsed + timer['elapsed'], segments + timer['segments'])
+    return counters, timers
+
+
+def measure(function, instances):
+    start = time.perf_counter()
+    function(instances)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()  # Measured on a second run, tracing slows the first one down
+    function(instances)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1e3, peak / 1e3
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else INSTANCES
+    print(f"{count:,} instances of {COUNTERS} counters and {TIMERS} timers")
+    print(f"  {'source':<14} {'method':<14} {'time':>10} {'peak':>12}")
+    for stats_class in (Stats, CompactStats):
+        instances = [worker(stats_class, seed) for seed in range(count)]
+        for label, function in (
+            ("reduce", lambda items: stats_class.reduce(items)),
+            ("by hand", by_hand),
+        ):
+            elapsed, peak = measure(function, instances)
+            print(f"  {stats_class.__name__:<14} {label:<14} {elapsed:7.1f} ms {peak:9.0f} kB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Scrape latency of the Prometheus exporter at 50k metrics: a full render, as
+rebuilding the text from the get_*() methods on every scrape would do, against
+incremental renders where 0% and 1% of the metrics changed since the last scrape.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_prometheus.py
+"""
+import random
+import time
+
+from prostata import Stats, CompactStats, PrometheusExporter
+
+METRICS = 50_000
+SCRAPES = 10
+
+
+def populate(stats):
+    for i in range(METRICS // 2):
+        stats.set_counter(f"requests_{i}", unit="requests", label=f"Requests of route {i}")
+        stats.set_timer(f"handler_{i}", label=f"Handler time of route {i}")
+    return stats
+
+
+def scrape(exporter, stats, dirty, rng):
+    total = 0.0
+    for _ in range(SCRAPES):
+        for i in rng.sample(range(METRICS // 2), dirty):
+            stats.incr(f"requests_{i}")
+        start = time.perf_counter()
+        exporter.render()
+        total += time.perf_counter() - start
+    return total / SCRAPES
+
+
+def main():
+    rng = random.Random(0)
+    for stats_class in (Stats, CompactStats):
+        stats = populate(stats_class())
+        exporter = PrometheusExporter(stats)
+        size = len(exporter.render())
+
+        full = 0.0
+        for _ in range(SCRAPES):
+            exporter.invalidate()
+            start = time.perf_counter()
+            exporter.render()
+            full += time.perf_counter() - start
+        full /= SCRAPES
+
+        print(f"{stats_class.__name__}, {METRICS:,} metrics, {size / 1e6:.1f} MB of text")
+        print(f"  full render          {full * 1e3:7.1f} ms")
+        for dirty in (0, METRICS // 100):
+            seconds = scrape(exporter, stats, dirty, rng)
+            print(f"  {dirty / METRICS:4.0%} changed         {seconds * 1e3:7.1f} ms  ({exporter.rendered} re-rendered)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Reading many ratios defined over a few hot counters: get_ratio_values(), which
+recomputes only the ratios of the counters written since the previous read,
+and the cached get_ratio() for every ratio, against the get_ratio() without a
+cache, which read both counters on every call.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_ratios.py
+"""
+import timeit
+
+from prostata import Stats, CompactStats
+
+RATIOS = 5_000
+COUNTERS = 20
+REPEAT = 5
+
+
+def populate(stats_class):
+    stats = stats_class()
+    for i in range(COUNTERS):
+        stats.set_counter(f"hot_{i}", i + 1)
+    for i in range(RATIOS):
+        stats.set_ratio(f"ratio_{i}", f"hot_{i % COUNTERS}", f"hot_{(i * 7 + 1) % COUNTERS}")
+    return stats
+
+
+def uncached_get_ratio(stats, name):
+    """get_ratio() before ratio values were cached."""
+    ratio = stats._ratios[name]
+    num_value = stats._ratio_operand(ratio['numerator'])
+    den_value = stats._ratio_operand(ratio['denominator'])
+    if den_value == 0:
+        return 0.0
+    return num_value / den_value
+
+
+def uncached(stats):
+    return {name: uncached_get_ratio(stats, name) for name in stats.ratio_names()}
+
+
+def one_by_one(stats):
+    get_ratio = stats.get_ratio
+    return {name: get_ratio(name) for name in stats.ratio_names()}
+
+
+def measure(function):
+    return min(timeit.repeat(function, number=10, repeat=REPEAT)) / 10 * 1e3
+
+
+def main():
+    print(f"{RATIOS:,} ratios over {COUNTERS} counters, time per read of all ratios")
+    for stats_class in (Stats, CompactStats):
+        stats = populate(stats_class)
+        assert stats.get_ratio_values() == one_by_one(stats) == uncached(stats)
+        print(f"  {stats_class.__name__}")
+        print(f"    uncached get_ratio() per ratio  {measure(lambda: uncached(stats)):7.2f} ms")
+        print(f"    get_ratio() per ratio           {measure(lambda: one_by_one(stats)):7.2f} ms")
+        print(f"    get_ratio_values(), unchanged   {measure(stats.get_ratio_values):7.2f} ms")
+
+        def one_counter_changed():
+            stats.incr("hot_0")
+            return stats.get_ratio_values()
+
+        print(f"    get_ratio_values(), 1 changed   {measure(one_counter_changed):7.2f} ms")
+
+        def all_changed():
+            for i in range(COUNTERS):
+                stats.incr(f"hot_{i}")
+            return stats.get_ratio_values()
+
+        print(f"    get_ratio_values(), all changed {measure(all_changed):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Overhead of sampled counters and timers at several sample rates, and the relative
+error of the estimates, against recording every event.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_sampling.py
+"""
+import timeit
+
+from prostata import Stats
+
+N = 500_000
+RATES = (1.0, 0.1, 0.01, 0.001)
+
+
+def report(label, statement, namespace):
+    seconds = min(timeit.repeat(statement, globals=namespace, number=N, repeat=5))
+    print(f"  {label:<28} {seconds / N * 1e9:7.1f} ns/call")
+
+
+def relative_error(stats, name):
+    estimate = stats.get_estimate(name)
+    return f"{estimate.error / estimate.value:.2%}" if estimate.value else "-"
+
+
+def main():
+    for rate in RATES:
+        stats = Stats()
+        requests = stats.set_counter("requests", handle=True, sample_rate=rate)
+        stats.set_timer("parse", sample_rate=rate)
+        block = stats.time("parse")
+        function = stats.timed("parse")(lambda: None)
+        namespace = {'stats': stats, 'requests': requests, 'block': block, 'function': function}
+        print(f"sample_rate={rate}, {N} calls")
+        report("incr_requests()", "stats.incr_requests()", namespace)
+        report("handle.incr()", "requests.incr()", namespace)
+        report("start_/stop_parse()", "stats.start_parse(); stats.stop_parse()", namespace)
+        report("with time('parse')", "with block: pass", namespace)
+        report("timed function", "function()", namespace)
+        print(f"  95% error after {stats.get_requests():,} increments: {relative_error(stats, 'requests')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Quantile sketches: accuracy against exact quantiles, and the throughput of
+merging the sketches of many workers in a tree, as a fleet-wide reduction does.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_sketch.py
+"""
+import pickle
+import random
+import time
+
+from prostata import DDSketch
+
+VALUES = 200_000
+WORKERS = 4096
+VALUES_PER_WORKER = 200
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def exact_quantile(values, q):
+    return values[int(q * (len(values) - 1))]
+
+
+def accuracy():
+    rng = random.Random(1)
+    values = [rng.lognormvariate(-5, 1.2) for _ in range(VALUES)]
+    ordered = sorted(values)
+    print(f"Accuracy over {VALUES:,} log-normal latencies (relative error per quantile)")
+    for relative_accuracy in (0.05, 0.01, 0.005):
+        sketch = DDSketch(relative_accuracy)
+        start = time.perf_counter()
+        sketch.add_many(values)
+        add_ns = (time.perf_counter() - start) / VALUES * 1e9
+        errors = [abs(sketch.quantile(q) - exact_quantile(ordered, q)) / exact_quantile(ordered, q) for q in QUANTILES]
+        print(f"  alpha={relative_accuracy:<6} bins={sketch.bins:<5} add={add_ns:6.1f} ns  "
+              + "  ".join(f"p{q * 100:g}={error:.4f}" for q, error in zip(QUANTILES, errors)))
+    # Averaging the percentiles of 64 workers, which sketches replace
+    exact = exact_quantile(ordered, 0.999)
+    workers = [sorted(rng.sample(values, 1000)) for _ in range(64)]
+    average = sum(exact_quantile(worker, 0.999) for worker in workers) / len(workers)
+    print(f"  averaged per-worker p99.9: relative error {abs(average - exact) / exact:.4f}")
+
+
+def merge_throughput():
+    rng = random.Random(2)
+    workers = []
+    for _ in range(WORKERS):
+        sketch = DDSketch(0.01)
+        sketch.add_many(rng.lognormvariate(-5, 1.2) for _ in range(VALUES_PER_WORKER))
+        workers.append(sketch)
+    size = sum(len(pickle.dumps(sketch)) for sketch in workers) / WORKERS
+
+    start = time.perf_counter()
+    level = [sketch.copy() for sketch in workers]
+    copy_s = time.perf_counter() - start
+    merges = 0
+    start = time.perf_counter()
+    while len(level) > 1:
+        for left, right in zip(level[::2], level[1::2]):
+            left.merge(right)
+            merges += 1
+        level = level[::2]
+    tree_s = time.perf_counter() - start
+
+    flat = DDSketch(0.01)
+    start = time.perf_counter()
+    for sketch in workers:
+        flat.merge(sketch)
+    flat_s = time.perf_counter() - start
+
+    assert level[0].count == flat.count == WORKERS * VALUES_PER_WORKER
+    assert level[0].quantile(0.99) == flat.quantile(0.99)
+    print(f"Merging {WORKERS:,} worker sketches ({size:,.0f} pickled bytes each, copies took {copy_s * 1e3:.0f} ms)")
+    print(f"  tree reduction: {merges:,} merges in {tree_s * 1e3:7.1f} ms  {tree_s / merges * 1e6:6.1f} us/merge")
+    print(f"  flat reduction: {WORKERS:,} merges in {flat_s * 1e3:7.1f} ms  {flat_s / WORKERS * 1e6:6.1f} us/merge")
+
+
+def main():
+    accuracy()
+    print()
+    merge_throughput()
+
+
+if __name__ == "__main__":
+    main()
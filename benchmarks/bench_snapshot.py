@@ -0,0 +1,43 @@
+"""
+Cost of reading every value of an instance with 50k metrics: snapshot()
+against the get_*() collection methods.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_snapshot.py
+"""
+import timeit
+
+from prostata import Stats, CompactStats
+
+METRICS = 50_000
+REPEAT = 20
+
+
+def populate(stats):
+    for i in range(METRICS // 2):
+        stats.set_counter(f"requests_{i}", i)
+        stats.set_timer(f"handler_{i}")
+    for i in range(0, METRICS // 2, 10):
+        stats.start_timer(f"handler_{i}")
+    for i in range(1000):
+        stats.set_ratio(f"rate_{i}", f"requests_{i}", f"requests_{i + 1}")
+    return stats
+
+
+def read_collections(stats):
+    return stats.get_timers(), stats.get_counters(), stats.get_ratios(), stats.get_attributes()
+
+
+def main():
+    for label, stats in (
+        ("Stats", populate(Stats())),
+        ("Stats lock", populate(Stats(concurrency="lock"))),
+        ("CompactStats", populate(CompactStats())),
+    ):
+        seconds = min(timeit.repeat(stats.snapshot, number=1, repeat=REPEAT))
+        collections = min(timeit.repeat(lambda: read_collections(stats), number=1, repeat=REPEAT))
+        print(f"{label:<14} snapshot() {seconds * 1e3:6.1f} ms   get_*() {collections * 1e3:6.1f} ms"
+              f"   ({METRICS:,} metrics)")
+
+
+if __name__ == "__main__":
+    main()
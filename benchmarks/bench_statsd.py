@@ -0,0 +1,66 @@
+"""
+Packets and CPU cost of sending StatsD metrics: one datagram per event, as a plain StatsD
+client does, against Stats aggregating the events and StatsdEmitter flushing them.
+
+The collector is a local UDP socket that is never read, so the kernel drops what does not
+fit in its buffer and only the sending side is measured.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_statsd.py [events]
+"""
+import socket
+import sys
+import time
+
+from prostata import Stats, StatsdEmitter
+
+EVENTS = 1_000_000
+COUNTERS = 100
+FLUSHES = 10  # Flushes during the run, as an interval would trigger them
+
+
+def per_event(address, events):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    names = [f"requests_{i}:1|c".encode() for i in range(COUNTERS)]
+    packets = 0
+    for i in range(events):
+        try:
+            sock.sendto(names[i % COUNTERS], address)
+        except BlockingIOError:
+            pass
+        packets += 1
+    sock.close()
+    return packets
+
+
+def aggregated(address, events):
+    stats = Stats()
+    handles = [stats.set_counter(f"requests_{i}", handle=True) for i in range(COUNTERS)]
+    emitter = StatsdEmitter(stats, *address)
+    every = events // FLUSHES
+    for i in range(events):
+        handles[i % COUNTERS].incr()
+        if i % every == every - 1:
+            emitter.flush()
+    emitter.stop()
+    return emitter.packets
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else EVENTS
+    collector = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    collector.bind(('127.0.0.1', 0))
+    address = collector.getsockname()
+    print(f"{events:,} increments over {COUNTERS} counters, {FLUSHES} flushes")
+    print(f"  {'method':<12} {'packets':>10} {'packets/s':>12} {'wall':>10} {'cpu':>10} {'cpu/event':>10}")
+    for label, function in (("per event", per_event), ("aggregated", aggregated)):
+        wall, cpu = time.perf_counter(), time.process_time()
+        packets = function(address, events)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        print(f"  {label:<12} {packets:>10,} {packets / wall:>12,.0f} {wall:8.2f} s {cpu:8.2f} s "
+              f"{cpu / events * 1e9:7.0f} ns")
+    collector.close()
+
+
+if __name__ == "__main__":
+    main()
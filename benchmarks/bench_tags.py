@@ -0,0 +1,46 @@
+"""
+Cost of tagged counter increments: a tags dictionary on each call, a handle bound to
+the tag set, and one counter per tag value, the way dimensions were emulated before.
+Also shows the memory bound of a tag with unbounded values, such as a user id.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_tags.py
+"""
+import timeit
+
+from prostata import Stats, CompactStats
+
+N = 500_000
+
+
+def report(label, statement, namespace):
+    seconds = min(timeit.repeat(statement, globals=namespace, number=N, repeat=5))
+    print(f"  {label:<36} {seconds / N * 1e9:7.1f} ns/call")
+
+
+def main():
+    for storage in (Stats, CompactStats):
+        stats = storage()
+        stats.set_counter("requests")
+        stats.set_counter("requests_200")
+        ok = stats.bind_tags("requests", {"status": "200"})
+        tags = {"status": "200"}
+        namespace = {'stats': stats, 'ok': ok, 'tags': tags}
+        print(f"{storage.__name__}, {N} calls")
+        report("incr_requests()", "stats.incr_requests()", namespace)
+        report("incr_requests_200()", "stats.incr_requests_200()", namespace)
+        report("incr_requests(tags=tags)", "stats.incr_requests(tags=tags)", namespace)
+        report("incr('requests', tags={...})", "stats.incr('requests', tags={'status': '200', 'method': 'GET'})",
+               namespace)
+        report("bound handle ok.incr()", "ok.incr()", namespace)
+
+    stats = Stats()
+    stats.set_counter("requests")
+    for user in range(100_000):
+        stats.incr_requests(tags={"user": str(user)})
+    series = stats.get_series("requests")
+    print(f"100,000 user ids: {len(series)} series kept, "
+          f"{series[(('overflow', 'true'),)]:,} increments in the overflow series")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Per-call overhead of timing a block with stats.time() and @stats.timed()
+against a bare perf_counter_ns pair and against start_<name>/stop_<name>.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_timed.py
+"""
+import time
+import timeit
+
+from prostata import Stats, CompactStats
+
+NUMBER = 200_000
+
+
+def per_call_ns(statement, namespace):
+    return min(timeit.repeat(statement, globals=namespace, number=NUMBER, repeat=5)) / NUMBER * 1e9
+
+
+def main():
+    clock = time.perf_counter_ns
+    bare = per_call_ns("start = clock(); elapsed = clock() - start", {'clock': clock})
+    print(f"  {'bare perf_counter_ns pair':<34} {bare:7.1f} ns")
+    for stats_class in (Stats, CompactStats):
+        stats = stats_class()
+        stats.set_timer("query")
+        handle = stats.set_timer("handled", handle=True)
+
+        @stats.timed("query")
+        def work():
+            pass
+
+        namespace = {'stats': stats, 'handle': handle, 'work': work, 'query_time': stats.time("query"),
+                     'nothing': lambda: None}
+        print(f"  {stats_class.__name__}")
+        for label, statement in (
+            ("start_query() / stop_query()", "stats.start_query(); stats.stop_query()"),
+            ("handle.start() / handle.stop()", "handle.start(); handle.stop()"),
+            ("with stats.time('query')", "with stats.time('query'): pass"),
+            ("with query_time (reused)", "with query_time: pass"),
+            ("@stats.timed call", "work()"),
+            ("undecorated call", "nothing()"),
+        ):
+            print(f"    {label:<32} {per_call_ns(statement, namespace):7.1f} ns")
+
+
+if __name__ == "__main__":
+    main()
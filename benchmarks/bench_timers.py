@@ -0,0 +1,72 @@
+"""
+Timer start/stop overhead: the previous datetime based engine against the
+integer nanosecond clock engine.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_timers.py
+"""
+from datetime import datetime
+import timeit
+
+from prostata import Stats
+
+N = 200_000
+
+
+class DatetimeTimer:
+    """The timer engine used before the switch to integer clock ticks."""
+
+    def __init__(self):
+        self.timer = {'start': None, 'stop': None, 'segments': 0, 'elapsed': 0.0}
+
+    def start(self):
+        timer = self.timer
+        if timer['start'] is None:
+            timer['start'] = datetime.now()
+            timer['segments'] += 1
+
+    def stop(self):
+        timer = self.timer
+        if timer['start'] is not None:
+            now = datetime.now()
+            timer['elapsed'] += (now - timer['start']).total_seconds()
+            timer['stop'] = now
+            timer['start'] = None
+
+    def get(self):
+        timer = self.timer
+        elapsed = timer['elapsed']
+        if timer['start'] is not None:
+            elapsed += (datetime.now() - timer['start']).total_seconds()
+        return elapsed
+
+
+def report(label, seconds):
+    print(f"{label:<32} {seconds / N * 1e9:8.1f} ns/op")
+
+
+def main():
+    before = DatetimeTimer()
+    stats = Stats()
+    stats.set_timer("bench")
+
+    def before_cycle():
+        before.start()
+        before.stop()
+
+    def after_cycle():
+        stats.start_timer("bench")
+        stats.stop_timer("bench")
+
+    print(f"start/stop pairs, {N} iterations")
+    report("datetime engine start+stop", min(timeit.repeat(before_cycle, number=N, repeat=5)))
+    report("ns clock engine start+stop", min(timeit.repeat(after_cycle, number=N, repeat=5)))
+
+    before.start()
+    stats.start_timer("bench")
+    report("datetime engine get (running)", min(timeit.repeat(before.get, number=N, repeat=5)))
+    report("ns clock engine get (running)",
+           min(timeit.repeat(lambda: stats.get_timer("bench"), number=N, repeat=5)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Cost and memory of a top-K metric against one counter per key, for a skewed stream
+of keys, and the error of the counts it reports.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_topk.py
+"""
+import random
+import sys
+import time
+from collections import Counter
+
+from prostata import Stats, TopK
+
+N = 500_000
+KEYS = 100_000
+
+
+def zipf_stream():
+    rng = random.Random(42)
+    weights = [1 / rank for rank in range(1, KEYS + 1)]
+    return rng.choices([f"tenant{rank}" for rank in range(KEYS)], weights, k=N)
+
+
+def main():
+    stream = zipf_stream()
+    truth = Counter(stream)
+    print(f"{N} observations of {len(truth):,} distinct keys")
+
+    for capacity in (100, 1000):
+        stats = Stats()
+        stats.set_topk("tenants", capacity=capacity)
+        observe = stats.observe_tenants
+        start = time.perf_counter()
+        for key in stream:
+            observe(key)
+        seconds = time.perf_counter() - start
+        top = stats.get_tenants(10)
+        recall = len({hitter.key for hitter in top} & {key for key, _ in truth.most_common(10)})
+        worst = max((hitter.count - truth[hitter.key]) / truth[hitter.key] for hitter in top)
+        summary = stats.get_topk("tenants")
+        print(f"  capacity={capacity:<5} {seconds / N * 1e9:6.0f} ns/observe, "
+              f"top 10 recall {recall}/10, worst overestimate {worst:.2%}, "
+              f"{len(summary)} keys kept")
+
+    counters = {}
+    start = time.perf_counter()
+    for key in stream:
+        counters[key] = counters.get(key, 0) + 1
+    seconds = time.perf_counter() - start
+    print(f"  one counter per key  {seconds / N * 1e9:6.0f} ns/observe, "
+          f"{len(counters):,} keys kept, {sys.getsizeof(counters) / 1024:,.0f} KiB for the dictionary alone")
+
+    top = TopK(1000)
+    start = time.perf_counter()
+    for key in stream:
+        top.observe(key)
+    print(f"  TopK.observe directly {(time.perf_counter() - start) / N * 1e9:5.0f} ns/observe")
+
+
+if __name__ == "__main__":
+    main()
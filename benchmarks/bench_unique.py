@@ -0,0 +1,46 @@
+"""
+Cost, memory and error of distinct counts at several precisions, against a Python set
+of the values.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_unique.py
+"""
+import sys
+import time
+
+from prostata import Stats
+
+N = 300_000
+DISTINCT = 100_000
+
+
+def main():
+    addresses = [f"10.{i >> 16}.{(i >> 8) & 255}.{i & 255}" for i in range(DISTINCT)]
+    values = [addresses[i % DISTINCT] for i in range(N)]
+    print(f"{N} values, {DISTINCT:,} distinct")
+
+    for precision in (10, 12, 14, 16):
+        stats = Stats()
+        stats.set_unique("users", precision=precision)
+        add = stats.add_users
+        start = time.perf_counter()
+        for value in values:
+            add(value)
+        seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        stats.record_many("users", values)
+        bulk = time.perf_counter() - start
+        estimate = stats.get_users()
+        print(f"  precision={precision:<3} {seconds / N * 1e9:6.0f} ns/add, {bulk / N * 1e9:5.0f} ns/value in record_many, "
+              f"{2 ** precision // 1024:3} KiB, error {estimate / DISTINCT - 1:+.2%}")
+
+    seen = set()
+    start = time.perf_counter()
+    for value in values:
+        seen.add(value)
+    seconds = time.perf_counter() - start
+    size = sys.getsizeof(seen) + sum(map(sys.getsizeof, seen))
+    print(f"  set()         {seconds / N * 1e9:6.0f} ns/add, {size // 1024:,} KiB, exact")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Cost of incrementing a window counter against a plain counter, for windows of
+different sizes, and of reading its sum.
+
+Run from the repository root with: PYTHONPATH=. python benchmarks/bench_window.py
+"""
+import timeit
+
+from prostata import Stats
+
+NUMBER = 200_000
+
+
+def per_call_ns(statement, stats):
+    return min(timeit.repeat(statement, globals={'stats': stats}, number=NUMBER, repeat=5)) / NUMBER * 1e9
+
+
+def main():
+    stats = Stats()
+    stats.set_counter("requests")
+    print(f"  {'counter':<28} incr {per_call_ns('stats.incr_requests()', stats):6.1f} ns")
+    for window, buckets in ((1, 10), (60, 60), (3600, 3600)):
+        stats = Stats()
+        stats.set_window_counter("recent", window=window, buckets=buckets)
+        incr_ns = per_call_ns('stats.incr_recent()', stats)
+        get_ns = per_call_ns('stats.get_recent()', stats)
+        label = f"window {window} s, {buckets} buckets"
+        print(f"  {label:<28} incr {incr_ns:6.1f} ns   get {get_ns:6.1f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import time
+
+
+# Default clock used by timers: integer nanoseconds from the highest
+# resolution monotonic clock available. Unaffected by wall clock changes.
+default_clock = time.perf_counter_ns
+
+# Alternative monotonic clock. Coarser than perf_counter_ns on some platforms
+# but guaranteed to keep ticking while the system is suspended on others.
+monotonic_clock = time.monotonic_ns
+
+
+class FakeClock:
+    """
+    A manually driven clock for tests.
+
+    A clock is any callable that returns the current time as an integer
+    number of nanoseconds. FakeClock only moves when told to, which makes
+    timer values deterministic.
+
+    Args:
+        start_ns (int): The initial time in nanoseconds. Defaults to 0.
+
+    Examples:
+        >>> clock = FakeClock()
+        >>> stats = Stats(clock=clock)
+        >>> stats.set_timer("load_time")
+        >>> stats.start_load_time()
+        >>> clock.advance(1.5)
+        >>> stats.get_load_time()
+        1.5
+    """
+
+    def __init__(self, start_ns: int = 0):
+        self.now_ns = start_ns
+
+    def __call__(self) -> int:
+        return self.now_ns
+
+    def advance(self, seconds: float = 0.0, ns: int = 0):
+        """
+        Move the clock forward.
+
+        Args:
+            seconds (float): Seconds to advance. Defaults to 0.
+            ns (int): Additional nanoseconds to advance. Defaults to 0.
+
+        Raises:
+            ValueError: If the resulting step is negative.
+        """
+        step = round(seconds * 1_000_000_000) + ns
+        if step < 0:
+            raise ValueError("A clock cannot move backwards.")
+        self.now_ns += step
@@ -0,0 +1,520 @@
+from array import array
+from typing import Callable, Mapping, Optional
+
+from .Handle import CounterHandle, TimerHandle, ArrayCounterHandle, SampledCounterHandle
+from .Histogram import Histogram
+from .Snapshot import TimerSnapshot
+from .Stats import Stats, NameNotExists, _buckets_in_seconds, _count_and_sum
+
+SAME_AS_NAME = 0  # Label id of items whose label is their name
+
+
+class CompactStats(Stats):
+    """
+    Stats that keeps counter and timer values in contiguous array columns.
+
+    Each counter and timer gets a slot number from a name to slot map. Its
+    numeric values are stored at that slot in `array` columns, and its label
+    and unit are stored as ids into a table of interned strings. This takes a
+    fraction of the memory of one dict per metric when there are tens of
+    thousands of metrics. Ratios and attributes are stored as in Stats.
+
+    Counter values are 64-bit signed integers.
+
+    The API is the same as Stats. get_counters() and get_timers() return
+    dictionaries of the same shape, built when called.
+
+    Args:
+        clock (Callable[[], int], optional): Clock for timers. Defaults to time.perf_counter_ns.
+
+    Examples:
+        >>> stats = CompactStats()
+        >>> for i in range(100_000):
+        ...     stats.set_counter(f"requests_{i}", unit="requests")
+        >>> stats.incr_requests_42()
+        >>> stats.get_counters()["requests_42"]
+        {'value': 1, 'unit': 'requests', 'label': 'requests_42'}
+    """
+
+    RUNNING = 1
+    STOPPED = 2
+
+    def __init__(self, clock: Callable[[], int] = None):
+        super().__init__(clock=clock)
+        self._counters = {}  # {name: slot}
+        self._timers = {}  # {name: slot}
+        self._strings = [None]  # Interned labels and units, by id
+        self._string_ids = {}  # {string: id}
+        self._counter_values = array('q')
+        self._counter_units = array('I')
+        self._counter_labels = array('I')
+        self._timer_start = array('q')
+        self._timer_stop = array('q')
+        self._timer_segments = array('q')
+        self._timer_elapsed = array('q')  # Nanoseconds
+        self._timer_labels = array('I')
+        self._timer_flags = bytearray()  # RUNNING | STOPPED
+        self._histograms = {}  # {slot: Histogram} Timers created with histogram=True
+
+    def _intern(self, string: str) -> int:
+        """
+        Get the id of a string in the string table, adding it if needed.
+
+        Args:
+            string (str): The label or unit.
+
+        Returns:
+            int: The string id.
+        """
+        string_id = self._string_ids.get(string)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(string)
+            self._string_ids[string] = string_id
+        return string_id
+
+    def _label_id(self, name: str, label: str) -> int:
+        return SAME_AS_NAME if label is None or label == name else self._intern(label)
+
+    def _label(self, name: str, label_id: int) -> str:
+        return name if label_id == SAME_AS_NAME else self._strings[label_id]
+
+    def set_timer(self, name: str, label: str = None, handle: bool = False,
+                  histogram: bool = False, sample_rate: float = 1.0) -> Optional[TimerHandle]:
+        """
+        Create a new timer with the given name.
+
+        Args:
+            name (str): The name of the timer.
+            label (str, optional): The label for the timer. Defaults to the name if not provided.
+            handle (bool): If True, return a TimerHandle bound to the new timer. Defaults to False.
+            histogram (bool): If True, record the duration of every segment in a histogram. Defaults to False.
+            sample_rate (float): Fraction of the segments to measure, in (0, 1]. See Stats.set_timer.
+
+        Returns:
+            TimerHandle: The handle, if requested. Otherwise None.
+
+        Raises:
+            NameNotAllowed: If the name is a reserved word or has invalid format.
+            NameExists: If the name is already used.
+            ValueError: If sample_rate is not in (0, 1].
+        """
+        self._check_name_allowed(name, 'timer')
+        self._check_name_unique(name)
+        sampler = self._sampler(sample_rate)
+        self._timers[name] = len(self._timer_elapsed)
+        self._timer_start.append(0)
+        self._timer_stop.append(0)
+        self._timer_segments.append(0)
+        self._timer_elapsed.append(0)
+        self._timer_labels.append(self._label_id(name, label))
+        self._timer_flags.append(0)
+        if histogram:
+            self._histograms[self._timers[name]] = Histogram()
+        self._register_sampler(name, sampler)
+        self._register(name, 'timer')
+        if handle:
+            return self._timer_handle(name) if sampler is None else TimerHandle(self, name)
+
+    def set_counter(self, name: str, value: int = 0, unit: str = "item", label: str = None,
+                    handle: bool = False, sample_rate: float = 1.0) -> Optional[CounterHandle]:
+        """
+        Create a new counter with the given name, initial value, and unit.
+
+        Args:
+            name (str): The name of the counter.
+            value (int): The initial value. Defaults to 0.
+            unit (str): The unit of the counter. Defaults to "item".
+            label (str, optional): The label for the counter. Defaults to the name if not provided.
+            handle (bool): If True, return a CounterHandle bound to the new counter. Defaults to False.
+
+        Returns:
+            CounterHandle: The handle, if requested. Otherwise None.
+
+        Raises:
+            NameNotAllowed: If the name is a reserved word or has invalid format.
+            NameExists: If the name is already used.
+            ValueError: If sample_rate is not in (0, 1].
+        """
+        self._check_name_allowed(name, 'counter')
+        self._check_name_unique(name)
+        sampler = self._sampler(sample_rate)
+        self._counters[name] = len(self._counter_values)
+        self._counter_values.append(value)
+        self._counter_units.append(self._intern(unit))
+        self._counter_labels.append(self._label_id(name, label))
+        self._register_sampler(name, sampler)
+        self._register(name, 'counter')
+        if handle:
+            return self._counter_handle(name) if sampler is None else SampledCounterHandle(self, name, sampler)
+
+    def _timer_handle(self, name: str) -> TimerHandle:
+        return ArrayTimerHandle(self, name)
+
+    def _counter_handle(self, name: str) -> CounterHandle:
+        return ArrayCounterHandle(self, name)
+
+    def _timer_recorder(self, name: str):
+        slot = self._timer_slot(name)
+        segments, elapsed, stops, flags = self._timer_segments, self._timer_elapsed, self._timer_stop, self._timer_flags
+        histogram = self._histograms.get(slot)
+        stopped = self.STOPPED
+
+        def record(start: int, stop: int):
+            segments[slot] += 1
+            elapsed[slot] += stop - start
+            stops[slot] = stop
+            flags[slot] |= stopped
+            if histogram is not None:
+                histogram.record(stop - start)
+        return record
+
+    def _timer_slot(self, name: str) -> int:
+        slot = self._timers.get(name)
+        if slot is None:
+            raise NameNotExists(f"Timer '{name}' does not exist.")
+        return slot
+
+    def _counter_slot(self, name: str) -> int:
+        slot = self._counters.get(name)
+        if slot is None:
+            raise NameNotExists(f"Counter '{name}' does not exist.")
+        return slot
+
+    def _elapsed_ns(self, slot: int) -> int:
+        elapsed = self._timer_elapsed[slot]
+        if self._timer_flags[slot] & self.RUNNING:
+            elapsed += self._clock() - self._timer_start[slot]
+        return elapsed
+
+    def get_timer(self, name: str) -> float:
+        """
+        Get the elapsed time in seconds for the timer.
+
+        Args:
+            name (str): The name of the timer.
+
+        Returns:
+            float: The elapsed time in seconds. Returns 0 if never started.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+        """
+        return self._elapsed_ns(self._timer_slot(name)) / 1e9
+
+    def _timer_running(self, name: str) -> bool:
+        return bool(self._timer_flags[self._timer_slot(name)] & self.RUNNING)
+
+    def _start_primary(self, name: str) -> Optional[int]:
+        slot = self._timer_slot(name)
+        if self._timer_flags[slot] & self.RUNNING:
+            return None
+        self._start_slot(slot)
+        return self._timer_start[slot]
+
+    def _start_slot(self, slot: int):
+        flags = self._timer_flags[slot]
+        if not flags & self.RUNNING:
+            self._timer_start[slot] = self._clock()
+            self._timer_segments[slot] += 1
+            self._timer_flags[slot] = flags | self.RUNNING
+
+    def _stop_primary(self, name: str):
+        self._stop_slot(self._timer_slot(name))
+
+    def _stop_slot(self, slot: int):
+        if self._timer_flags[slot] & self.RUNNING:
+            now = self._clock()
+            elapsed = now - self._timer_start[slot]
+            self._timer_elapsed[slot] += elapsed
+            self._timer_stop[slot] = now
+            self._timer_flags[slot] = self.STOPPED
+            histogram = self._histograms.get(slot)
+            if histogram is not None:
+                histogram.record(elapsed)
+
+    def _timer_histogram(self, name: str) -> Histogram:
+        histogram = self._histograms.get(self._timer_slot(name))
+        if histogram is None:
+            raise ValueError(f"Timer '{name}' was not created with histogram=True.")
+        return histogram
+
+    def _timer_histograms(self) -> dict:
+        return {name: self._histograms[slot] for name, slot in self._timers.items() if slot in self._histograms}
+
+    def get_counter(self, name: str) -> int:
+        """
+        Get the value of the counter.
+
+        Args:
+            name (str): The name of the counter.
+
+        Returns:
+            int: The value of the counter.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+        """
+        return self._counter_values[self._counter_slot(name)]
+
+    def incr(self, name: str, amount: int = 1, tags: Mapping = None):
+        """
+        Increment the counter by the given amount.
+
+        Args:
+            name (str): The name of the counter.
+            amount (int): The amount to increment. Defaults to 1.
+            tags (Mapping[str, str], optional): Dimensions of the increment. See Stats.incr.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+            NameNotAllowed: If a tag name is not valid.
+        """
+        if tags is not None:
+            return self._add_tagged(name, amount, tags)
+        if self._samplers and name in self._samplers:
+            return self._add_sampled(name, amount)
+        self._counter_values[self._counter_slot(name)] += amount
+        ratios = self._ratio_index.get(name)
+        if ratios:
+            self._stale_ratios.update(ratios)
+
+    def decr(self, name: str, amount: int = 1, tags: Mapping = None):
+        """
+        Decrement the counter by the given amount.
+
+        Args:
+            name (str): The name of the counter.
+            amount (int): The amount to decrement. Defaults to 1.
+            tags (Mapping[str, str], optional): Dimensions of the decrement. See Stats.incr.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+            NameNotAllowed: If a tag name is not valid.
+        """
+        if tags is not None:
+            return self._add_tagged(name, -amount, tags)
+        if self._samplers and name in self._samplers:
+            return self._add_sampled(name, -amount)
+        self._counter_values[self._counter_slot(name)] -= amount
+        ratios = self._ratio_index.get(name)
+        if ratios:
+            self._stale_ratios.update(ratios)
+
+    def reset_counter(self, name: str, value: int = 0):
+        """
+        Reset the counter to the given value.
+
+        Args:
+            name (str): The name of the counter.
+            value (int): The value to reset to. Defaults to 0.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+        """
+        self._counter_values[self._counter_slot(name)] = value
+        self._counters_written((name,))
+        if name in self._samplers:
+            self._samplers[name].reset()
+        if name in self._series:
+            self._series[name].reset()
+
+    def _add_many(self, amounts: dict):
+        slots = [(self._counter_slot(name), amount) for name, amount in amounts.items()]
+        values = self._counter_values
+        for slot, amount in slots:
+            values[slot] += amount
+        self._counters_written(amounts)
+
+    def _add_segments(self, name: str, durations):
+        slot = self._timer_slot(name)
+        count, total = _count_and_sum(durations)
+        self._timer_segments[slot] += count
+        self._timer_elapsed[slot] += round(total * 1e9)
+        histogram = self._histograms.get(slot)
+        if histogram is not None:
+            record = histogram.record
+            for duration in durations:
+                record(int(duration * 1e9))
+
+    def _add_timer(self, name: str, segments: int, elapsed: float):
+        slot = self._timer_slot(name)
+        self._timer_segments[slot] += segments
+        self._timer_elapsed[slot] += round(elapsed * 1e9)
+
+    def set_counter_unit(self, name: str, unit: str):
+        """
+        Set the unit of the counter.
+
+        Args:
+            name (str): The name of the counter.
+            unit (str): The new unit.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+        """
+        self._counter_units[self._counter_slot(name)] = self._intern(unit)
+
+    def get_counter_units(self) -> dict:
+        """
+        Get the units of all counters.
+
+        Returns:
+            dict: A dictionary mapping counter names to their units.
+        """
+        strings, units = self._strings, self._counter_units
+        return {name: strings[units[slot]] for name, slot in self._counters.items()}
+
+    def get_timers(self) -> dict:
+        """
+        Get all timers.
+
+        Returns:
+            dict: {name: {'start', 'stop', 'segments', 'elapsed', 'label'}}, with elapsed in seconds.
+            Timers with a histogram also have 'histogram': [(upper bound in seconds, count), ...].
+        """
+        timers = {}
+        for name, slot in self._timers.items():
+            flags = self._timer_flags[slot]
+            timers[name] = {
+                'start': self._timer_start[slot] if flags & self.RUNNING else None,
+                'stop': self._timer_stop[slot] if flags & self.STOPPED else None,
+                'segments': self._timer_segments[slot],
+                'elapsed': self._timer_elapsed[slot] / 1e9,
+                'label': self._label(name, self._timer_labels[slot]),
+            }
+            if slot in self._histograms:
+                timers[name]['histogram'] = _buckets_in_seconds(self._histograms[slot])
+        return timers
+
+    def get_counters(self) -> dict:
+        """
+        Get all counters.
+
+        Returns:
+            dict: {name: {'value', 'unit', 'label'}}
+        """
+        strings = self._strings
+        return {
+            name: {
+                'value': self._counter_values[slot],
+                'unit': strings[self._counter_units[slot]],
+                'label': self._label(name, self._counter_labels[slot]),
+            }
+            for name, slot in self._counters.items()
+        }
+
+    def _restore_timer(self, name: str, start, stop, segments: int, elapsed_ns: int):
+        slot = self._timers[name]
+        self._timer_start[slot] = start or 0
+        self._timer_stop[slot] = stop or 0
+        self._timer_segments[slot] = segments
+        self._timer_elapsed[slot] = elapsed_ns
+        self._timer_flags[slot] = (self.RUNNING if start is not None else 0) | (self.STOPPED if stop is not None else 0)
+
+    def _timer_elapsed_ns(self, name: str) -> int:
+        return self._timer_elapsed[self._timers[name]]
+
+    def _snapshot_timers(self, now: int) -> dict:
+        timers = {}
+        for name, slot in self._timers.items():
+            elapsed = self._timer_elapsed[slot]
+            running = bool(self._timer_flags[slot] & self.RUNNING)
+            if running:
+                elapsed += now - self._timer_start[slot]
+            timers[name] = TimerSnapshot(elapsed / 1e9, self._timer_segments[slot], running)
+        return timers
+
+    def _snapshot_counters(self) -> dict:
+        values = self._counter_values
+        return {name: values[slot] for name, slot in self._counters.items()}
+
+    def set_label(self, name: str, new_label: str):
+        """
+        Set a new label for an existing timer, counter, ratio, or attribute.
+
+        Args:
+            name (str): The name of the item to update.
+            new_label (str): The new label to set.
+
+        Raises:
+            NameNotExists: If the name does not exist.
+        """
+        if name in self._timers:
+            self._timer_labels[self._timers[name]] = self._label_id(name, new_label)
+        elif name in self._counters:
+            self._counter_labels[self._counters[name]] = self._label_id(name, new_label)
+        else:
+            super().set_label(name, new_label)
+
+    def get_labels(self) -> dict:
+        """
+        Get all name/label pairs for all items.
+
+        Returns:
+            dict: A dictionary mapping names to their labels.
+        """
+        labels = self.get_labels_for_timers()
+        labels.update(self.get_labels_for_counters())
+        labels.update(self.get_labels_for_ratios())
+        labels.update(self.get_labels_for_attributes())
+        labels.update(self.get_labels_for_sketches())
+        labels.update(self.get_labels_for_window_counters())
+        labels.update(self.get_labels_for_topks())
+        labels.update(self.get_labels_for_uniques())
+        labels.update(self.get_labels_for_derived())
+        return labels
+
+    def get_labels_for_timers(self) -> dict:
+        """
+        Get all name/label pairs for timers.
+
+        Returns:
+            dict: A dictionary mapping timer names to their labels.
+        """
+        return {name: self._label(name, self._timer_labels[slot]) for name, slot in self._timers.items()}
+
+    def get_labels_for_counters(self) -> dict:
+        """
+        Get all name/label pairs for counters.
+
+        Returns:
+            dict: A dictionary mapping counter names to their labels.
+        """
+        return {name: self._label(name, self._counter_labels[slot]) for name, slot in self._counters.items()}
+
+
+class ArrayTimerHandle(TimerHandle):
+    """
+    TimerHandle bound to the column slot of a CompactStats timer.
+
+    Like DictTimerHandle, it only goes through start_timer and stop_timer for concurrent segments.
+    """
+
+    __slots__ = ('_slot',)
+
+    def __init__(self, stats: CompactStats, name: str):
+        super().__init__(stats, name)
+        self._slot = stats._timers[name]
+
+    def get(self) -> float:
+        return self._stats._elapsed_ns(self._slot) / 1e9
+
+    def start(self):
+        stats = self._stats
+        slot = self._slot
+        if stats._timer_flags[slot] & stats.RUNNING:
+            stats.start_timer(self.name)  # Opens a concurrent segment
+            return
+        stats._start_slot(slot)
+        stats._primary_started(self.name, stats._timer_start[slot])
+
+    def stop(self):
+        stats = self._stats
+        if stats._in_flight.get(self.name):
+            stats.stop_timer(self.name)  # Stops the concurrent segment of this thread or task first
+            return
+        stats._stop_slot(self._slot)
+        primary = stats._primary_segments.get(self.name)
+        if primary is not None:
+            primary.closed = True
@@ -0,0 +1,117 @@
+import ast
+from typing import Callable, Dict
+
+# Operators allowed in expressions. Division, floor division and modulo by zero give 0.0, as ratios do.
+_BINARY = {
+    ast.Add: None, ast.Sub: None, ast.Mult: None, ast.Pow: None,
+    ast.Div: '_div', ast.FloorDiv: '_floordiv', ast.Mod: '_mod',
+}
+_UNARY = (ast.UAdd, ast.USub)
+
+
+def _div(a, b):
+    return a / b if b else 0.0
+
+
+def _floordiv(a, b):
+    return a // b if b else 0.0
+
+
+def _mod(a, b):
+    return a % b if b else 0.0
+
+
+class Expression:
+    """
+    Arithmetic expression over the names of Stats items, parsed and compiled once.
+
+    The expression may use names, int and float constants, parentheses, the binary
+    operators + - * / // % ** and unary + and -. Anything else, such as function calls
+    or attribute access, is rejected, so evaluating an expression cannot run other code.
+
+    bind() turns the expression into a function without arguments: each name becomes a
+    call to a getter bound to the item, and the whole expression is compiled to Python
+    bytecode, so evaluating it does no parsing and no name lookups.
+
+    Args:
+        text (str): The expression, for example "(errors + timeouts) / requests".
+
+    Raises:
+        ValueError: If the expression is not valid Python or uses anything but the elements above.
+
+    Examples:
+        >>> expression = Expression("(errors + timeouts) / requests")
+        >>> expression.names
+        ('errors', 'timeouts', 'requests')
+        >>> evaluate = expression.bind({'errors': lambda: 1, 'timeouts': lambda: 2, 'requests': lambda: 10})
+        >>> evaluate()
+        0.3
+    """
+
+    __slots__ = ('text', 'names', '_code')
+
+    def __init__(self, text: str):
+        try:
+            tree = ast.parse(text.strip(), mode='eval')
+        except SyntaxError as error:
+            raise ValueError(f"Invalid expression '{text}': {error.msg}.") from None
+        names = {}  # {name: variable}, in order of appearance
+        body = _Compiler(text, names).visit(tree.body)
+        arguments = ast.arguments(posonlyargs=[], args=[], vararg=None, kwonlyargs=[],
+                                  kw_defaults=[], kwarg=None, defaults=[])
+        function = ast.Expression(body=ast.Lambda(args=arguments, body=body))
+        self.text = text
+        self.names = tuple(names)
+        self._code = compile(ast.fix_missing_locations(function), f"<expression {text!r}>", 'eval')
+
+    def __repr__(self) -> str:
+        return f"Expression({self.text!r})"
+
+    def bind(self, getters: Dict[str, Callable[[], float]]) -> Callable[[], float]:
+        """
+        Compile the expression to a function that reads its names with the given getters.
+
+        Args:
+            getters (dict): {name: function without arguments returning the value}, for every name.
+
+        Returns:
+            Callable[[], float]: The compiled expression.
+        """
+        namespace = {'__builtins__': {}, '_div': _div, '_floordiv': _floordiv, '_mod': _mod}
+        for i, name in enumerate(self.names):
+            namespace[f'_v{i}'] = getters[name]
+        return eval(self._code, namespace)
+
+
+class _Compiler(ast.NodeTransformer):
+    """Check the nodes of an expression and rewrite names as getter calls and divisions as safe calls."""
+
+    def __init__(self, text: str, names: dict):
+        self.text = text
+        self.names = names
+
+    def generic_visit(self, node):
+        raise ValueError(f"Invalid expression '{self.text}': {type(node).__name__} is not allowed.")
+
+    def visit_Constant(self, node):
+        if type(node.value) not in (int, float):
+            raise ValueError(f"Invalid expression '{self.text}': only int and float constants are allowed.")
+        return node
+
+    def visit_Name(self, node):
+        variable = self.names.setdefault(node.id, f'_v{len(self.names)}')
+        return ast.Call(func=ast.Name(id=variable, ctx=ast.Load()), args=[], keywords=[])
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, _UNARY):
+            raise ValueError(f"Invalid expression '{self.text}': {type(node.op).__name__} is not allowed.")
+        return ast.UnaryOp(op=node.op, operand=self.visit(node.operand))
+
+    def visit_BinOp(self, node):
+        if type(node.op) not in _BINARY:
+            raise ValueError(f"Invalid expression '{self.text}': {type(node.op).__name__} is not allowed.")
+        left, right = self.visit(node.left), self.visit(node.right)
+        safe = _BINARY[type(node.op)]
+        if safe is None:
+            return ast.BinOp(left=left, op=node.op, right=right)
+        return ast.Call(func=ast.Name(id=safe, ctx=ast.Load()), args=[left, right], keywords=[])
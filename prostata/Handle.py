@@ -0,0 +1,428 @@
+from asyncio import current_task, get_running_loop
+from threading import get_ident
+
+
+def _current_owner():
+    """Identify the running asyncio task, or the thread outside of asyncio: the owner of the segments and blocks it starts."""
+    try:
+        loop = get_running_loop()
+    except RuntimeError:
+        return get_ident()
+    return current_task(loop)
+
+
+class CounterHandle:
+    """
+    A counter resolved once, for use in hot code paths.
+
+    Returned by set_counter(..., handle=True). This generic handle calls into
+    the Stats instance; storage engines return subclasses bound directly to
+    the counter's value slot, so no name lookup happens on each call.
+
+    Args:
+        stats (Stats): The Stats instance owning the counter.
+        name (str): The name of the counter.
+
+    Examples:
+        >>> requests = stats.set_counter("requests", handle=True)
+        >>> for _ in range(1000):
+        ...     requests.incr()
+        >>> requests.get()
+        1000
+    """
+
+    __slots__ = ('name', '_stats')
+
+    def __init__(self, stats, name: str):
+        self.name = name
+        self._stats = stats
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+    def get(self) -> int:
+        """Get the value of the counter."""
+        return self._stats.get_counter(self.name)
+
+    def incr(self, amount: int = 1):
+        """Increment the counter by the given amount. Defaults to 1."""
+        self._stats.incr(self.name, amount)
+
+    def decr(self, amount: int = 1):
+        """Decrement the counter by the given amount. Defaults to 1."""
+        self._stats.decr(self.name, amount)
+
+    def reset(self, value: int = 0):
+        """Reset the counter to the given value. Defaults to 0."""
+        self._stats.reset_counter(self.name, value)
+
+
+class TimerHandle:
+    """
+    A timer resolved once, for use in hot code paths.
+
+    Returned by set_timer(..., handle=True). This generic handle calls into
+    the Stats instance; storage engines return subclasses bound directly to
+    the timer's slot.
+
+    Args:
+        stats (Stats): The Stats instance owning the timer.
+        name (str): The name of the timer.
+
+    Examples:
+        >>> load_time = stats.set_timer("load_time", handle=True)
+        >>> load_time.start()
+        >>> # ... some code ...
+        >>> load_time.stop()
+        >>> load_time.get()
+    """
+
+    __slots__ = ('name', '_stats')
+
+    def __init__(self, stats, name: str):
+        self.name = name
+        self._stats = stats
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+    def get(self) -> float:
+        """Get the elapsed time in seconds."""
+        return self._stats.get_timer(self.name)
+
+    def start(self):
+        """Start the timer."""
+        self._stats.start_timer(self.name)
+
+    def stop(self):
+        """Stop the timer and accumulate elapsed time."""
+        self._stats.stop_timer(self.name)
+
+
+class DictCounterHandle(CounterHandle):
+    """CounterHandle bound to the value dictionary of a Stats counter. Writes mark the ratios of the counter stale."""
+
+    __slots__ = ('_counter', '_ratios', '_stale')
+
+    def __init__(self, stats, name: str):
+        super().__init__(stats, name)
+        self._counter = stats._counters[name]
+        self._ratios = stats._ratios_of(name)
+        self._stale = stats._stale_ratios
+
+    def get(self) -> int:
+        return self._counter['value']
+
+    def incr(self, amount: int = 1):
+        self._counter['value'] += amount
+        if self._ratios:
+            self._stale.update(self._ratios)
+
+    def decr(self, amount: int = 1):
+        self._counter['value'] -= amount
+        if self._ratios:
+            self._stale.update(self._ratios)
+
+    def reset(self, value: int = 0):
+        self._counter['value'] = value
+        self._stale.update(self._ratios)
+
+
+class DictTimerHandle(TimerHandle):
+    """
+    TimerHandle bound to the dictionary of a Stats timer.
+
+    Starting the timer while it is not running, and stopping it while no concurrent segment
+    is open, only touch the dictionary and the primary segment token. Other starts and stops
+    go through start_timer and stop_timer, so the handle opens and stops concurrent segments
+    like start_<name> and stop_<name> do.
+    """
+
+    __slots__ = ('_timer', '_clock', '_in_flight', '_primary_segments')
+
+    def __init__(self, stats, name: str):
+        super().__init__(stats, name)
+        self._timer = stats._timers[name]
+        self._clock = stats._clock
+        self._in_flight = stats._in_flight
+        self._primary_segments = stats._primary_segments
+
+    def get(self) -> float:
+        timer = self._timer
+        start = timer['start']
+        if start is None:
+            return timer['elapsed_ns'] / 1e9
+        return (timer['elapsed_ns'] + self._clock() - start) / 1e9
+
+    def start(self):
+        timer = self._timer
+        if timer['start'] is not None:
+            self._stats.start_timer(self.name)  # Opens a concurrent segment
+            return
+        now = timer['start'] = self._clock()
+        timer['segments'] += 1
+        self._stats._primary_started(self.name, now)
+
+    def stop(self):
+        if self._in_flight.get(self.name):
+            self._stats.stop_timer(self.name)  # Stops the concurrent segment of this thread or task first
+            return
+        timer = self._timer
+        start = timer['start']
+        if start is not None:
+            now = self._clock()
+            timer['elapsed_ns'] += now - start
+            timer['stop'] = now
+            timer['start'] = None
+            histogram = timer.get('histogram')
+            if histogram is not None:
+                histogram.record(now - start)
+        primary = self._primary_segments.get(self.name)
+        if primary is not None:
+            primary.closed = True
+
+
+class ArrayCounterHandle(CounterHandle):
+    """CounterHandle bound to the value column slot of a CompactStats counter. Writes mark the ratios of the counter stale."""
+
+    __slots__ = ('_values', '_slot', '_ratios', '_stale')
+
+    def __init__(self, stats, name: str):
+        super().__init__(stats, name)
+        self._values = stats._counter_values
+        self._slot = stats._counters[name]
+        self._ratios = stats._ratios_of(name)
+        self._stale = stats._stale_ratios
+
+    def get(self) -> int:
+        return self._values[self._slot]
+
+    def incr(self, amount: int = 1):
+        self._values[self._slot] += amount
+        if self._ratios:
+            self._stale.update(self._ratios)
+
+    def decr(self, amount: int = 1):
+        self._values[self._slot] -= amount
+        if self._ratios:
+            self._stale.update(self._ratios)
+
+    def reset(self, value: int = 0):
+        self._values[self._slot] = value
+        self._stale.update(self._ratios)
+
+
+class SampledCounterHandle(CounterHandle):
+    """
+    CounterHandle of a counter created with a sample_rate below 1.
+
+    An increment skipped by the sampler only decrements the countdown of the sampler.
+    A kept one is scaled by 1 / sample_rate and added through the Stats instance.
+    """
+
+    __slots__ = ('_sampler',)
+
+    def __init__(self, stats, name: str, sampler):
+        super().__init__(stats, name)
+        self._sampler = sampler
+
+    def incr(self, amount: int = 1):
+        amount = self._sampler.sample_amount(amount)
+        if amount:
+            self._stats._add_many({self.name: amount})
+
+    def decr(self, amount: int = 1):
+        self.incr(-amount)
+
+
+class TaggedCounterHandle(CounterHandle):
+    """
+    CounterHandle of one tag set of a counter, returned by Stats.bind_tags().
+
+    The tag set is resolved to its slot in the series of the counter once, so incr adds
+    the amount to the slot and to the counter without looking anything up. Series are not
+    sharded: in "lock" and "sharded" concurrency modes, incr holds the lock of the instance.
+
+    Attributes:
+        tags (Tags): The interned tag set, or the overflow tag set if the series was full.
+    """
+
+    __slots__ = ('tags', '_values', '_slot', '_total', '_sampler', '_lock')
+
+    def __init__(self, stats, name: str, tags, series, slot: int, total, sampler=None, lock=None):
+        super().__init__(stats, name)
+        self.tags = tags
+        self._values = series.values
+        self._slot = slot
+        self._total = total  # Adds an amount to the counter, without sampling
+        self._sampler = sampler
+        self._lock = lock
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r}, {self.tags!r})"
+
+    def get(self) -> int:
+        """Get the value of the series of the tag set."""
+        return self._values[self._slot]
+
+    def incr(self, amount: int = 1):
+        sampler = self._sampler
+        if sampler is not None:
+            amount = sampler.sample_amount(amount)
+            if not amount:
+                return
+        if self._lock is None:
+            self._values[self._slot] += amount
+        else:
+            with self._lock:
+                self._values[self._slot] += amount
+        self._total(amount)
+
+    def decr(self, amount: int = 1):
+        self.incr(-amount)
+
+    def reset(self, value: int = 0):
+        """Set the value of the series of the tag set, changing the counter by the difference."""
+        delta = value - self._values[self._slot]
+        self._values[self._slot] = value
+        self._total(delta)
+
+
+class TimerContext:
+    """
+    Context manager that adds the time spent in its block to a timer, as one segment.
+
+    Returned by Stats.time(). The timer is resolved when the context manager is created,
+    so entering and leaving the block only reads the clock twice and adds the duration
+    to the timer's storage. The duration is added even if the block raises. Blocks are
+    measured independently of start_timer/stop_timer, so they can nest and overlap.
+
+    A context manager can be reused, nested, and shared by threads and asyncio tasks running
+    the block at the same time: the start of each block is kept per thread or task, so each
+    stop is paired with the start of the same block.
+
+    Args:
+        name (str): The name of the timer.
+        record (Callable[[int, int], None]): Adds a segment given its start and stop times in ns.
+        clock (Callable[[], int]): The clock of the Stats instance.
+
+    Examples:
+        >>> with stats.time("db_query"):
+        ...     run_query()
+        >>> query_time = stats.time("db_query")  # Or resolve once and reuse
+        >>> for query in queries:
+        ...     with query_time:
+        ...         run_query(query)
+    """
+
+    __slots__ = ('name', '_record', '_clock', '_starts')
+
+    def __init__(self, name: str, record, clock):
+        self.name = name
+        self._record = record
+        self._clock = clock
+        self._starts = {}  # {thread id or asyncio task: start, or [start] of nested blocks} of the blocks being run
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+    def _push(self, start):
+        owner = _current_owner()
+        starts = self._starts
+        if owner not in starts:
+            starts[owner] = start
+        elif type(starts[owner]) is list:
+            starts[owner].append(start)  # Nested blocks
+        else:
+            starts[owner] = [starts[owner], start]
+
+    def _pop(self):
+        owner = _current_owner()
+        start = self._starts.pop(owner)
+        if type(start) is list:
+            nested = start
+            start = nested.pop()
+            self._starts[owner] = nested if len(nested) > 1 else nested[0]
+        return start
+
+    def __enter__(self):
+        # Fast path of _push() for a block that is not nested, since it runs for every block
+        owner = _current_owner()
+        starts = self._starts
+        if owner not in starts:
+            starts[owner] = self._clock()
+        else:
+            self._push(self._clock())
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        now = self._clock()
+        # Fast path of _pop()
+        owner = _current_owner()
+        start = self._starts.pop(owner)
+        if type(start) is list:
+            self._starts[owner] = start
+            start = self._pop()
+        self._record(start, now)
+
+
+class TimerToken:
+    """
+    One segment of a timer, returned by Stats.start_timer() and closed by Stats.stop_timer(token).
+
+    The first segment started while a timer is not running is its primary segment, the
+    one that start_<name> and stop_<name> always used. Segments started while the timer
+    is already running, from other threads or asyncio tasks, are concurrent segments:
+    they are measured on their own and added to the timer when they stop.
+
+    The token of the primary segment is reused by the next primary segment of the timer,
+    so it only stands for its segment until the segment stops.
+
+    Attributes:
+        name (str): The name of the timer.
+        start (int): The start time in nanoseconds, from the clock of the Stats instance.
+        primary (bool): Whether the token is the primary segment of the timer.
+        closed (bool): Whether the segment was stopped.
+
+    Examples:
+        >>> token = stats.start_timer("db_query")
+        >>> # ... the same timer can be started again by other tasks meanwhile ...
+        >>> stats.stop_timer(token)
+    """
+
+    __slots__ = ('name', 'start', 'primary', 'closed', '_owner')
+
+    def __init__(self, name: str, start: int, primary: bool):
+        self.name = name
+        self.start = start
+        self.primary = primary
+        self.closed = False
+        self._owner = None  # Thread id that started a primary segment
+
+    def __repr__(self) -> str:
+        state = "closed" if self.closed else "open"
+        return f"{type(self).__name__}({self.name!r}, {'primary' if self.primary else 'concurrent'}, {state})"
+
+
+class SampledTimerContext(TimerContext):
+    """
+    TimerContext of a timer created with a sample_rate below 1.
+
+    Blocks skipped by the sampler do not read the clock. The duration of a kept block is
+    scaled by 1 / sample_rate by the record function.
+    """
+
+    __slots__ = ('_sampler',)
+
+    def __init__(self, name: str, record, clock, sampler):
+        super().__init__(name, record, clock)
+        self._sampler = sampler
+
+    def __enter__(self):
+        self._push(self._clock() if self._sampler.sample() else None)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        start = self._pop()
+        if start is not None:
+            self._record(start, self._clock())
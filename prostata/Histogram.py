@@ -0,0 +1,195 @@
+from array import array
+from typing import List, Sequence, Tuple
+
+
+class Histogram:
+    """
+    Fixed-memory histogram of non-negative integers with log-scaled buckets.
+
+    Values below 2**precision get one bucket each. Above that, every power of
+    two is split into 2**(precision - 1) linear sub-buckets (HDR histogram
+    style), so a recorded value is known within a relative error of
+    2**-(precision - 1) whatever its magnitude. Finding the bucket of a value
+    takes a few integer operations, so recording is O(1). Values above
+    max_value are counted in the last bucket; the exact maximum is kept apart.
+
+    Args:
+        precision (int): Significant bits kept per value, between 2 and 16. Defaults to 6,
+            a relative error of at most 1/32 (about 3%).
+        max_value (int): Largest value with its own bucket. Defaults to 2**46, about 19.5 hours
+            in nanoseconds.
+
+    Examples:
+        >>> histogram = Histogram()
+        >>> for value in range(1, 1001):
+        ...     histogram.record(value)
+        >>> histogram.percentile(50)  # Within 3% of 500
+        499
+    """
+
+    __slots__ = ('precision', 'max_value', 'counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, precision: int = 6, max_value: int = 2 ** 46):
+        if not 2 <= precision <= 16:
+            raise ValueError("Histogram precision must be between 2 and 16 bits.")
+        self.precision = precision
+        self.max_value = max_value
+        self.counts = array('Q', bytes(8 * (self._index(max_value) + 1)))
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value: int) -> int:
+        precision = self.precision
+        if value < (1 << precision):
+            return value
+        shift = value.bit_length() - precision
+        return (shift << (precision - 1)) + (value >> shift)
+
+    def bounds(self, index: int) -> Tuple[int, int]:
+        """
+        Get the range of values counted in a bucket.
+
+        Args:
+            index (int): The bucket index.
+
+        Returns:
+            tuple: (lowest, highest) value of the bucket, inclusive.
+        """
+        if index < (1 << self.precision):
+            return index, index
+        shift = (index >> (self.precision - 1)) - 1
+        mantissa = index - (shift << (self.precision - 1))
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int):
+        """
+        Record a value. Negative values are recorded as 0.
+
+        Args:
+            value (int): The value to record.
+        """
+        if value < 0:
+            value = 0
+        index = self._index(value) if value <= self.max_value else len(self.counts) - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: 'Histogram'):
+        """
+        Add the values recorded by another histogram to this one.
+
+        Args:
+            other (Histogram): A histogram with the same precision and max_value.
+
+        Raises:
+            ValueError: If the histograms have different settings.
+        """
+        if (other.precision, other.max_value) != (self.precision, self.max_value):
+            raise ValueError("Histograms with different precision or max_value cannot be merged.")
+        if other.count == 0:
+            return
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+        if self.min is None or other.min < self.min:
+            self.min = other.min
+        if self.max is None or other.max > self.max:
+            self.max = other.max
+
+    def percentile(self, q: float) -> int:
+        """
+        Estimate the value below which q percent of the recorded values fall.
+
+        Args:
+            q (float): The percentile, between 0 and 100.
+
+        Returns:
+            int: The middle of the bucket holding the percentile, clamped to the recorded minimum and
+            maximum. The lowest and highest ranks return the exact minimum and maximum.
+            0 if nothing was recorded.
+
+        Raises:
+            ValueError: If q is not between 0 and 100.
+        """
+        if not 0 <= q <= 100:
+            raise ValueError("Percentile must be between 0 and 100.")
+        if self.count == 0:
+            return 0
+        rank = max(1, -(-self.count * q // 100))  # Ceiling without floats for integer q
+        if rank == 1:
+            return self.min
+        if rank >= self.count:
+            return self.max
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                lowest, highest = self.bounds(index)
+                return min(max((lowest + highest) // 2, self.min), self.max)
+        return self.max
+
+    def buckets(self) -> List[Tuple[int, int]]:
+        """
+        Get the non-empty buckets.
+
+        Returns:
+            list: [(highest value of the bucket, count), ...] in increasing order.
+        """
+        return [(self.bounds(index)[1], count) for index, count in enumerate(self.counts) if count]
+
+    def count_at_most(self, bounds: Sequence[int]) -> List[int]:
+        """
+        Count the recorded values at most each bound, for example for the cumulative buckets of Prometheus.
+
+        Only the buckets whose values are all at most a bound are counted, so the count of a bound
+        that falls inside a bucket can miss the values of that bucket, which are within the relative
+        error of the bound.
+
+        Args:
+            bounds (Sequence[int]): The bounds, in increasing order.
+
+        Returns:
+            list: The number of recorded values at most each bound.
+        """
+        counts = self.counts
+        last = len(counts) - 1
+        result = []
+        seen = 0
+        end = 0
+        for bound in bounds:
+            if bound < 0:
+                stop = 0
+            elif bound >= self.max_value:
+                # The last bucket also counts the values above max_value
+                stop = last + 1 if self.max is not None and self.max <= bound else last
+            else:
+                stop = self._index(bound)
+                if self.bounds(stop)[1] == bound:
+                    stop += 1
+            if stop > end:
+                seen += sum(counts[end:stop])
+                end = stop
+            result.append(seen)
+        return result
+
+    def copy(self) -> 'Histogram':
+        """
+        Get an independent copy.
+
+        Returns:
+            Histogram: The copy.
+        """
+        copy = Histogram(self.precision, self.max_value)
+        copy.counts[:] = self.counts
+        copy.count, copy.sum, copy.min, copy.max = self.count, self.sum, self.min, self.max
+        return copy
@@ -0,0 +1,293 @@
+from typing import Callable
+import mmap
+import os
+import threading
+
+from .SharedStats import SharedStats, SlotLayout, KIND_COUNTER, KIND_TIMER, _instances
+from .Stats import Stats, NameNotExists
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: the lock only works within one process
+    fcntl = None
+
+
+class FileLock:
+    """
+    Lock held by one thread of one process at a time, with a POSIX record lock on an open file.
+
+    Record locks belong to a process, so forked children and unrelated processes exclude each
+    other even when they share the file descriptor.
+
+    Args:
+        fd (int): A file descriptor open for writing.
+    """
+
+    def __init__(self, fd: int):
+        self._fd = fd
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+
+def _map(path: str, fd: int, access: int) -> tuple:
+    """
+    Map a metrics file.
+
+    Returns:
+        tuple: (mmap, memoryview of the map, (max_metrics, max_workers))
+
+    Raises:
+        ValueError: If the file is not a metrics file or is shorter than its header says.
+    """
+    mapped = mmap.mmap(fd, 0, access=access)
+    buf = memoryview(mapped)
+    try:
+        dimensions = SlotLayout.read_dimensions(buf)
+        if len(buf) < SlotLayout.size(*dimensions):
+            raise ValueError(f"Metrics file '{path}' is truncated.")
+    except ValueError:
+        buf.release()
+        mapped.close()
+        raise
+    return mapped, buf, dimensions
+
+
+class MappedStats(SharedStats):
+    """
+    Stats whose counter and timer values live in a memory-mapped file.
+
+    The file has the layout of a SharedStats block: a header, a name index and a
+    matrix of int64 values with one row per writing process. Values are written
+    in place, so they survive a crash or restart of the application: reopening
+    the file with MappedStats keeps counting from the stored totals, and
+    MappedStatsReader reads them from another process without calling into the
+    application.
+
+    Only the numeric values and the names are stored in the file. Labels,
+    units, ratios, attributes and sketches are kept in memory, as in SharedStats.
+    Declare the metrics with set_counter and set_timer after opening the file:
+    existing metrics keep their values, and the initial value of set_counter
+    only applies to new ones.
+
+    Forked workers share the file like SharedStats workers share their block.
+    Different processes opening the same path also share it; this relies on POSIX
+    record locks and is not supported on other platforms.
+
+    Args:
+        path (str): The metrics file. Created if it does not exist.
+        max_metrics (int): Number of counter and timer slots of a new file. Defaults to 256.
+        max_workers (int): Number of writing processes of a new file, including the processes
+            of previous runs, whose rows are reused. Defaults to 8.
+        clock (Callable[[], int], optional): Clock for timers. Defaults to time.perf_counter_ns.
+
+    Raises:
+        ValueError: If the file exists and is not a metrics file.
+
+    Examples:
+        >>> stats = MappedStats("/var/run/myapp/metrics.bin")
+        >>> stats.set_counter("requests")
+        >>> stats.incr_requests()  # Still counted after a restart
+        >>> stats.close()
+    """
+
+    def __init__(self, path: str, max_metrics: int = 256, max_workers: int = 8, clock: Callable[[], int] = None):
+        Stats.__init__(self, clock=clock)
+        buf = self._attach_block({'path': os.fspath(path), 'max_metrics': max_metrics, 'max_workers': max_workers})
+        self._layout = SlotLayout(buf, *SlotLayout.read_dimensions(buf))
+        self._row = None  # Offset of this process' row in the values matrix, claimed on first write
+        self._synced = 0  # Number of name index entries already known to this process
+        self._synced_only = set()  # Names registered by _sync, that a set_counter or set_timer call attaches to
+        _instances.add(self)
+
+    def _block_state(self) -> dict:
+        return {'path': self._path}
+
+    def _attach_block(self, state: dict) -> memoryview:
+        self._path = state['path']
+        self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._block_lock = FileLock(self._fd)
+        try:
+            with self._block_lock:
+                if os.fstat(self._fd).st_size == 0:
+                    max_metrics, max_workers = state['max_metrics'], state['max_workers']
+                    os.ftruncate(self._fd, SlotLayout.size(max_metrics, max_workers))
+                    with mmap.mmap(self._fd, 0) as mapped, memoryview(mapped) as buf:
+                        layout = SlotLayout(buf, max_metrics, max_workers)
+                        layout.initialize()
+                        layout.release()
+                self._mmap, self._buf, _ = _map(self._path, self._fd, mmap.ACCESS_WRITE)
+        except ValueError:
+            os.close(self._fd)
+            raise
+        return self._buf
+
+    @property
+    def name(self) -> str:
+        """The path of the metrics file."""
+        return self._path
+
+    @property
+    def path(self) -> str:
+        """The path of the metrics file."""
+        return self._path
+
+    def flush(self):
+        """Write the values to disk now, so they also survive a crash of the operating system."""
+        self._mmap.flush()
+
+    def close(self):
+        """Unmap and close the metrics file. The values stay in the file."""
+        self._layout.release()
+        self._buf.release()
+        self._mmap.close()
+        os.close(self._fd)
+
+    def unlink(self):
+        """Delete the metrics file, which loses the stored values. Call after closing."""
+        os.remove(self._path)
+
+
+class MappedStatsReader:
+    """
+    Read-only view of the metrics file of a MappedStats, for sidecar tools.
+
+    The file is mapped read-only and values are read in place, without copying the
+    file or calling into the application. Metrics added by the application after
+    the reader was opened are found on the next read.
+
+    Args:
+        path (str): The metrics file.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the file is not a metrics file.
+
+    Examples:
+        >>> with MappedStatsReader("/var/run/myapp/metrics.bin") as reader:
+        ...     reader.get_counter("requests")
+        1042
+    """
+
+    def __init__(self, path: str):
+        self.path = os.fspath(path)
+        self._fd = os.open(self.path, os.O_RDONLY)
+        try:
+            self._mmap, self._buf, dimensions = _map(self.path, self._fd, mmap.ACCESS_READ)
+        except ValueError:
+            os.close(self._fd)
+            raise
+        self._layout = SlotLayout(self._buf, *dimensions)
+        self._slots = {}  # {name: (kind, slot)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Unmap and close the metrics file."""
+        self._layout.release()
+        self._buf.release()
+        self._mmap.close()
+        os.close(self._fd)
+
+    def _refresh(self):
+        for slot in range(len(self._slots), self._layout.metric_count):
+            kind, name = self._layout.entry(slot)
+            self._slots[name] = (kind, slot)
+
+    def _slot(self, name: str, kind: int) -> int:
+        found = self._slots.get(name)
+        if found is None:
+            self._refresh()
+            found = self._slots.get(name)
+        if found is None or found[0] != kind:
+            label = "Counter" if kind == KIND_COUNTER else "Timer"
+            raise NameNotExists(f"{label} '{name}' does not exist.")
+        return found[1]
+
+    def counter_names(self) -> list:
+        """
+        Get the list of counter names.
+
+        Returns:
+            list: A list of counter names.
+        """
+        self._refresh()
+        return [name for name, (kind, _) in self._slots.items() if kind == KIND_COUNTER]
+
+    def timer_names(self) -> list:
+        """
+        Get the list of timer names.
+
+        Returns:
+            list: A list of timer names.
+        """
+        self._refresh()
+        return [name for name, (kind, _) in self._slots.items() if kind == KIND_TIMER]
+
+    def get_counter(self, name: str) -> int:
+        """
+        Get the value of the counter, summed across all processes.
+
+        Args:
+            name (str): The name of the counter.
+
+        Returns:
+            int: The value of the counter.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+        """
+        return self._layout.total(self._slot(name, KIND_COUNTER))
+
+    def get_timer(self, name: str) -> float:
+        """
+        Get the elapsed time of the completed segments of the timer, summed across all processes.
+
+        Args:
+            name (str): The name of the timer.
+
+        Returns:
+            float: The elapsed time in seconds.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+        """
+        return self._layout.total(self._slot(name, KIND_TIMER)) / 1e9
+
+    def get_counters(self) -> dict:
+        """
+        Get all counters.
+
+        Returns:
+            dict: {name: value}
+        """
+        self._refresh()
+        total = self._layout.total
+        return {name: total(slot) for name, (kind, slot) in self._slots.items() if kind == KIND_COUNTER}
+
+    def get_timers(self) -> dict:
+        """
+        Get all timers.
+
+        Returns:
+            dict: {name: {'elapsed': seconds, 'segments': int}}, for completed segments.
+        """
+        self._refresh()
+        total = self._layout.total
+        return {
+            name: {'elapsed': total(slot) / 1e9, 'segments': total(slot, 1)}
+            for name, (kind, slot) in self._slots.items() if kind == KIND_TIMER
+        }
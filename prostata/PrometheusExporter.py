@@ -0,0 +1,279 @@
+import math
+import re
+from typing import Sequence
+
+DEFAULT_UNIT = "item"  # Counters with the default unit get no UNIT metadata
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Those of the Prometheus clients
+_INVALID_CHARACTERS = re.compile(r'[^a-zA-Z0-9_]')
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(int(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', r'\\').replace('\n', r'\n')
+
+
+def _escape_label_value(text: str) -> str:
+    return text.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_tags(tags) -> str:
+    return ",".join(f'{tag}="{_escape_label_value(value)}"' for tag, value in tags)
+
+
+class PrometheusExporter:
+    """
+    Render the metrics of a Stats instance in the OpenMetrics text format, which Prometheus scrapes.
+
+    The rendered lines of each metric are cached with the values they were rendered from. On each
+    render, the values are read with one Stats.snapshot() and only the metrics whose value, label
+    or unit changed since the previous render are formatted again. Timer histograms and sketches
+    are compared by their count and sum, and only those that changed are copied. When nothing
+    changed, the previous output is returned as is.
+
+    Metrics are mapped as follows:
+
+    - Counters are counters. A unit other than the default "item" becomes UNIT metadata and is
+      appended to the metric name, as OpenMetrics requires, unless the name already ends with it.
+    - Timers are summaries in seconds (segments as _count, elapsed time as _sum), or histograms
+      if created with histogram=True. Histograms have a _bucket line for each of the buckets given
+      to the exporter, whether empty or not, so every scrape has the same series. The count of a
+      bucket is exact unless its bound falls inside a bucket of the timer histogram, whose values
+      are then only counted in the next bucket.
+    - Tags of counters and timers are labels: each tag set is a sample, and the updates without
+      tags a sample without labels, so the samples add up to the total. Histograms have no tags.
+    - Ratios and numeric attributes are gauges. Text attributes are info metrics.
+    - Sketches are summaries with the quantiles given to the exporter.
+    - Window counters are gauges of their sum over the window. Derived metrics are gauges.
+    - Top-K metrics are gauges with a sample per key, labeled key, for the top_keys keys.
+    - Distinct counts are gauges of their estimate.
+    - Labels are the HELP text.
+
+    Args:
+        stats (Stats): The Stats instance to export.
+        namespace (str, optional): Prefix added to every metric name, followed by an underscore.
+        quantiles (Sequence[float]): Quantiles exported for sketches. Defaults to (0.5, 0.9, 0.99).
+        top_keys (int): Number of keys exported for top-K metrics. Defaults to 10.
+        buckets (Sequence[float]): Upper bounds in seconds of the buckets exported for timer histograms,
+            in increasing order, without +Inf. Defaults to those of the Prometheus clients, 5 ms to 10 s.
+
+    Examples:
+        >>> exporter = PrometheusExporter(stats, namespace="myapp")
+        >>> body = exporter.render()  # Serve with Content-Type exporter.CONTENT_TYPE
+    """
+
+    CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+    def __init__(self, stats, namespace: str = None, quantiles: Sequence[float] = (0.5, 0.9, 0.99),
+                 top_keys: int = 10, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.stats = stats
+        self.namespace = namespace
+        self.quantiles = tuple(quantiles)
+        self.top_keys = top_keys
+        self.buckets = tuple(buckets)
+        self._bucket_bounds = [round(upper * 1e9) for upper in self.buckets]  # In the nanoseconds of the histograms
+        self._cache = {}  # {name: (key of the values rendered, text)}
+        self._output = None  # The last output, reused while no metric changes
+        self._blocks = 0  # Number of metrics in the last output
+        self.rendered = 0  # Metrics formatted by the last render, for monitoring the exporter
+
+    def invalidate(self):
+        """Drop the cached output, so the next render formats every metric."""
+        self._cache = {}
+        self._output = None
+
+    def _family(self, name: str, unit: str = None) -> str:
+        family = f"{self.namespace}_{name}" if self.namespace else name
+        if family[0].isdigit():
+            family = f"_{family}"
+        if unit and family != unit and not family.endswith(f"_{unit}"):
+            family = f"{family}_{unit}"
+        return family
+
+    def _header(self, family: str, kind: str, label: str, unit: str = None) -> str:
+        lines = f"# TYPE {family} {kind}\n"
+        if unit:
+            lines += f"# UNIT {family} {unit}\n"
+        return lines + f"# HELP {family} {_escape_help(label)}\n"
+
+    def render(self) -> str:
+        """
+        Render all metrics.
+
+        Returns:
+            str: The exposition text, ending with "# EOF".
+        """
+        stats = self.stats
+        snapshot = stats.snapshot()
+        labels = stats.get_labels()
+        units = stats.get_counter_units()
+        histograms = stats.get_timer_histogram_totals()
+        cache = self._cache
+        rendered = 0
+        blocks = []
+
+        tagged = set(stats.series_names())
+        for name, timer in snapshot.timers.items():
+            totals = histograms.get(name)
+            series = stats.get_series(name) if name in tagged and totals is None else None
+            key = (timer.elapsed, timer.segments, totals, labels[name],
+                   series and tuple((tags, value['segments'], value['elapsed']) for tags, value in series.items()))
+            cached = cache.get(name)
+            if cached is None or cached[0] != key:
+                histogram = stats.get_timer_histogram(name) if totals is not None else None
+                cached = cache[name] = (key, self._render_timer(name, timer, histogram, labels[name], series))
+                rendered += 1
+            blocks.append(cached[1])
+
+        for name, value in snapshot.counters.items():
+            series = stats.get_series(name) if name in tagged else None
+            key = (value, labels[name], units[name], series and tuple(series.items()))
+            cached = cache.get(name)
+            if cached is None or cached[0] != key:
+                cached = cache[name] = (key, self._render_counter(name, value, labels[name], units[name], series))
+                rendered += 1
+            blocks.append(cached[1])
+
+        for name, value in snapshot.ratios.items():
+            key = (value, labels[name])
+            cached = cache.get(name)
+            if cached is None or cached[0] != key:
+                family = self._family(name)
+                cached = cache[name] = (key, self._header(family, "gauge", labels[name])
+                                        + f"{family} {_format_value(value)}\n")
+                rendered += 1
+            blocks.append(cached[1])
+
+        for name, value in snapshot.attributes.items():
+            key = (type(value), value, labels[name])
+            cached = cache.get(name)
+            if cached is None or cached[0] != key:
+                cached = cache[name] = (key, self._render_attribute(name, value, labels[name]))
+                rendered += 1
+            blocks.append(cached[1])
+
+        for name, totals in stats.get_sketch_totals().items():
+            key = (totals, labels[name])
+            cached = cache.get(name)
+            if cached is None or cached[0] != key:
+                cached = cache[name] = (key, self._render_sketch(name, stats.get_sketch(name), labels[name]))
+                rendered += 1
+            blocks.append(cached[1])
+
+        for name in stats.window_counter_names():
+            value = stats.get_window_counter(name)
+            key = (value, labels[name])
+            cached = cache.get(name)
+            if cached is None or cached[0] != key:
+                family = self._family(name)
+                cached = cache[name] = (key, self._header(family, "gauge", labels[name])
+                                        + f"{family} {_format_value(value)}\n")
+                rendered += 1
+            blocks.append(cached[1])
+
+        for name in stats.topk_names():
+            top = stats.get_top_keys(name, self.top_keys)
+            key = (tuple(top), labels[name])
+            cached = cache.get(name)
+            if cached is None or cached[0] != key:
+                cached = cache[name] = (key, self._render_topk(name, top, labels[name]))
+                rendered += 1
+            blocks.append(cached[1])
+
+        for name in stats.unique_names():
+            value = stats.get_unique(name)
+            key = (value, labels[name])
+            cached = cache.get(name)
+            if cached is None or cached[0] != key:
+                family = self._family(name)
+                cached = cache[name] = (key, self._header(family, "gauge", labels[name])
+                                        + f"{family} {_format_value(value)}\n")
+                rendered += 1
+            blocks.append(cached[1])
+
+        for name, value in stats.get_derived_values().items():
+            key = (value, labels[name])
+            cached = cache.get(name)
+            if cached is None or cached[0] != key:
+                family = self._family(name)
+                cached = cache[name] = (key, self._header(family, "gauge", labels[name])
+                                        + f"{family} {_format_value(value)}\n")
+                rendered += 1
+            blocks.append(cached[1])
+
+        self.rendered = rendered
+        if rendered or self._output is None or len(blocks) != self._blocks:
+            self._output = "".join(blocks) + "# EOF\n"
+            self._blocks = len(blocks)
+        return self._output
+
+    def _render_counter(self, name: str, value: int, label: str, unit: str, series: dict = None) -> str:
+        unit = _INVALID_CHARACTERS.sub('_', unit) if unit != DEFAULT_UNIT else None
+        family = self._family(name, unit)
+        header = self._header(family, "counter", label, unit)
+        if not series:
+            return header + f"{family}_total {_format_value(value)}\n"
+        lines = [header]
+        for tags, amount in series.items():
+            lines.append(f"{family}_total{{{_format_tags(tags)}}} {_format_value(amount)}\n")
+        untagged = value - sum(series.values())
+        if untagged:
+            lines.append(f"{family}_total {_format_value(untagged)}\n")
+        return "".join(lines)
+
+    def _render_timer(self, name: str, timer, histogram, label: str, series: dict = None) -> str:
+        family = self._family(name, "seconds")
+        if histogram is None and series:
+            lines = [self._header(family, "summary", label, "seconds")]
+            segments, elapsed = timer.segments, timer.elapsed
+            for tags, value in series.items():
+                tag_labels = _format_tags(tags)
+                lines.append(f"{family}_count{{{tag_labels}}} {value['segments']}\n")
+                lines.append(f"{family}_sum{{{tag_labels}}} {_format_value(value['elapsed'])}\n")
+                segments -= value['segments']
+                elapsed -= value['elapsed']
+            if segments:
+                lines.append(f"{family}_count {segments}\n")
+                lines.append(f"{family}_sum {_format_value(max(elapsed, 0.0))}\n")
+            return "".join(lines)
+        if histogram is None:
+            return (self._header(family, "summary", label, "seconds")
+                    + f"{family}_count {timer.segments}\n"
+                    + f"{family}_sum {_format_value(timer.elapsed)}\n")
+        lines = [self._header(family, "histogram", label, "seconds")]
+        for upper, cumulative in zip(self.buckets, histogram.count_at_most(self._bucket_bounds)):
+            lines.append(f'{family}_bucket{{le="{_format_value(float(upper))}"}} {cumulative}\n')
+        lines.append(f'{family}_bucket{{le="+Inf"}} {histogram.count}\n')
+        lines.append(f"{family}_count {histogram.count}\n")
+        lines.append(f"{family}_sum {_format_value(histogram.sum / 1e9)}\n")
+        return "".join(lines)
+
+    def _render_attribute(self, name: str, value, label: str) -> str:
+        family = self._family(name)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return self._header(family, "gauge", label) + f"{family} {_format_value(value)}\n"
+        return self._header(family, "info", label) + f'{family}_info{{value="{_escape_label_value(str(value))}"}} 1\n'
+
+    def _render_topk(self, name: str, top: list, label: str) -> str:
+        family = self._family(name)
+        lines = [self._header(family, "gauge", label)]
+        for hitter in top:
+            lines.append(f'{family}{{key="{_escape_label_value(str(hitter.key))}"}} {hitter.count}\n')
+        return "".join(lines)
+
+    def _render_sketch(self, name: str, sketch, label: str) -> str:
+        family = self._family(name)
+        lines = [self._header(family, "summary", label)]
+        for q in self.quantiles:
+            lines.append(f'{family}{{quantile="{_format_value(float(q))}"}} {_format_value(float(sketch.quantile(q)))}\n')
+        lines.append(f"{family}_count {sketch.count}\n")
+        lines.append(f"{family}_sum {_format_value(float(sketch.sum))}\n")
+        return "".join(lines)
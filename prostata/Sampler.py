@@ -0,0 +1,170 @@
+from math import log, sqrt
+from typing import Callable, NamedTuple, Tuple
+import random
+
+
+class Estimate(NamedTuple):
+    """
+    The value of a timer or counter with the error bound due to sampling, returned by Stats.get_estimate().
+
+    Examples:
+        >>> estimate = stats.get_estimate("requests")
+        >>> print(f"{estimate.value} ± {estimate.error:.0f}")
+        >>> estimate.low <= true_value <= estimate.high  # With 95% confidence
+        True
+    """
+
+    value: float
+    """The estimated value: elapsed seconds of a timer, value of a counter."""
+    error: float
+    """Half-width of the confidence interval. 0 for metrics that are not sampled."""
+    rate: float
+    """The sample rate of the metric, 1.0 if it is not sampled."""
+    samples: int
+    """Number of events recorded since the metric was created or reset. 0 for metrics that are not sampled."""
+
+    @property
+    def low(self) -> float:
+        """Lower end of the confidence interval."""
+        return self.value - self.error
+
+    @property
+    def high(self) -> float:
+        """Upper end of the confidence interval."""
+        return self.value + self.error
+
+
+class Sampler:
+    """
+    Bernoulli sampling of the events of one timer or counter, with the state to scale and bound them.
+
+    Each event is kept with probability rate. Instead of drawing a random number per event,
+    the sampler draws the gap to the next kept event from a geometric distribution and
+    counts down, so a skipped event costs one decrement and one comparison.
+
+    Kept amounts are scaled by 1 / rate, which makes their sum an unbiased estimate of the
+    sum of all amounts. Scaled counter amounts are rounded to integers with a carried
+    remainder, so the rounding error never exceeds 1. The sum of the squares of the kept
+    amounts gives the variance of the estimate:
+
+        variance = sum(amount ** 2 for kept amounts) * (1 - rate) / rate ** 2
+
+    Args:
+        rate (float): Probability of keeping an event, in (0, 1].
+        uniform (Callable[[], float]): Source of uniform numbers in [0, 1). Defaults to random.random.
+
+    Raises:
+        ValueError: If rate is not in (0, 1].
+
+    Examples:
+        >>> sampler = Sampler(0.01)
+        >>> kept = sum(sampler.scale(1) for _ in range(1_000_000) if sampler.sample())
+        >>> abs(kept - 1_000_000) < 3 * sampler.stderr()
+        True
+    """
+
+    __slots__ = ('rate', '_random', '_log_skip', '_countdown', '_carry', '_segment_carry', 'samples', '_squares')
+
+    def __init__(self, rate: float, uniform: Callable[[], float] = random.random):
+        if not 0 < rate <= 1:
+            raise ValueError(f"The sample rate must be in (0, 1], not {rate}.")
+        self.rate = rate
+        self._random = uniform
+        self._log_skip = log(1 - rate) if rate < 1 else None
+        self._countdown = self._gap()
+        self._carry = 0.0
+        self._segment_carry = 0.0
+        self.samples = 0
+        self._squares = 0.0
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.rate})"
+
+    def _gap(self) -> int:
+        """Draw the number of events until the next kept one, at least 1."""
+        if self._log_skip is None:
+            return 1
+        return 1 + int(log(1.0 - self._random()) / self._log_skip)
+
+    def sample(self) -> bool:
+        """
+        Decide whether to keep the current event.
+
+        Returns:
+            bool: True if the event must be recorded, with scale() or scale_segment().
+        """
+        self._countdown -= 1
+        if self._countdown:
+            return False
+        self._countdown = self._gap()
+        return True
+
+    def sample_amount(self, amount: int) -> int:
+        """
+        Decide whether to keep a counter event and scale its amount if kept, in one call.
+
+        This is the fast path of sampled counters: a skipped event costs one decrement and
+        one comparison.
+
+        Args:
+            amount (int): The amount of the event.
+
+        Returns:
+            int: The amount to add to the counter, as scale() returns it, or 0 if the event is skipped.
+        """
+        self._countdown -= 1
+        if self._countdown:
+            return 0
+        self._countdown = self._gap()
+        return self.scale(amount)
+
+    def scale(self, amount: int) -> int:
+        """
+        Scale the amount of a kept counter event.
+
+        Args:
+            amount (int): The amount of the event.
+
+        Returns:
+            int: The amount to add to the counter, amount / rate rounded with the carried remainder.
+        """
+        self.samples += 1
+        self._squares += amount * amount
+        self._carry += amount / self.rate
+        whole = int(self._carry)
+        self._carry -= whole
+        return whole
+
+    def scale_segment(self, duration_ns: int) -> Tuple[int, float]:
+        """
+        Scale a kept timer segment.
+
+        Args:
+            duration_ns (int): The duration of the segment in nanoseconds.
+
+        Returns:
+            tuple: (segments, elapsed seconds) to add to the timer.
+        """
+        seconds = duration_ns / 1e9
+        self.samples += 1
+        self._squares += seconds * seconds
+        self._segment_carry += 1 / self.rate
+        segments = int(self._segment_carry)
+        self._segment_carry -= segments
+        return segments, seconds / self.rate
+
+    def stderr(self) -> float:
+        """
+        Get the estimated standard error of the scaled sum.
+
+        Returns:
+            float: The standard error, in the unit of the amounts. 0 if the rate is 1.
+        """
+        return sqrt(self._squares * (1 - self.rate)) / self.rate
+
+    def reset(self):
+        """Forget the kept events, when the metric is reset."""
+        self._carry = 0.0
+        self._segment_carry = 0.0
+        self.samples = 0
+        self._squares = 0.0
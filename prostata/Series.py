@@ -0,0 +1,116 @@
+from typing import Dict, Tuple
+
+Tags = Tuple[Tuple[str, str], ...]  # Tag set as sorted (name, value) pairs, the key of a series
+
+OVERFLOW = (('overflow', 'true'),)  # Tag set of the series collecting the tag sets beyond the limit
+
+
+class Series:
+    """
+    Values of one timer or counter broken down by tag set, for at most max_series tag sets.
+
+    Each tag set gets a slot the first time it is used, and its values are kept in lists
+    indexed by slot, so an update of a known tag set is a dictionary lookup and a list
+    update, and handles bound to a slot skip the lookup. Tag sets used after the limit is
+    reached share the OVERFLOW slot, which keeps the memory of a metric bounded whatever
+    the tags sent to it. The OVERFLOW slot does not count in the limit.
+
+    For a counter, values holds the amounts. For a timer, values holds the segments and
+    elapsed_ns the elapsed nanoseconds.
+
+    Args:
+        max_series (int): Maximum number of tag sets.
+        timer (bool): Whether the series belong to a timer. Defaults to False.
+
+    Examples:
+        >>> series = Series(max_series=2)
+        >>> series.values[series.slot((('status', '200'),))] += 1
+        >>> series.values[series.slot((('status', '500'),))] += 1
+        >>> series.values[series.slot((('status', '404'),))] += 1
+        >>> series.items()
+        {(('status', '200'),): 1, (('status', '500'),): 1, (('overflow', 'true'),): 1}
+    """
+
+    __slots__ = ('max_series', '_slots', 'values', 'elapsed_ns')
+
+    def __init__(self, max_series: int, timer: bool = False):
+        self.max_series = max_series
+        self._slots = {}  # {tags: slot}
+        self.values = []
+        self.elapsed_ns = [] if timer else None
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, tags: Tags) -> bool:
+        return tags in self._slots
+
+    @property
+    def full(self) -> bool:
+        """Whether new tag sets go to the OVERFLOW slot."""
+        return len(self._slots) - (OVERFLOW in self._slots) >= self.max_series
+
+    def slot(self, tags: Tags) -> int:
+        """
+        Get the slot of a tag set, adding it if there is room and the OVERFLOW slot otherwise.
+
+        Args:
+            tags (Tags): The tag set.
+
+        Returns:
+            int: The index of its values.
+        """
+        slot = self._slots.get(tags)
+        if slot is None:
+            if self.full:
+                tags = OVERFLOW
+                slot = self._slots.get(tags)
+            if slot is None:
+                slot = self._slots[tags] = len(self.values)
+                self.values.append(0)
+                if self.elapsed_ns is not None:
+                    self.elapsed_ns.append(0)
+        return slot
+
+    def tags(self, slot: int) -> Tags:
+        """
+        Get the tag set of a slot.
+
+        Args:
+            slot (int): The slot.
+
+        Returns:
+            Tags: The tag set.
+        """
+        return next(tags for tags, index in self._slots.items() if index == slot)
+
+    def items(self) -> Dict[Tags, object]:
+        """
+        Get the values of all tag sets.
+
+        Returns:
+            dict: {tags: amount} for a counter, {tags: {'elapsed': seconds, 'segments': count}} for a timer.
+        """
+        if self.elapsed_ns is None:
+            return {tags: self.values[slot] for tags, slot in self._slots.items()}
+        return {tags: {'elapsed': self.elapsed_ns[slot] / 1e9, 'segments': self.values[slot]}
+                for tags, slot in self._slots.items()}
+
+    def merge(self, other: 'Series'):
+        """
+        Add the values of another series of the same kind, tag set by tag set, within the limit of this one.
+
+        Args:
+            other (Series): The series to add.
+        """
+        for tags, source in other._slots.items():
+            slot = self.slot(tags)
+            self.values[slot] += other.values[source]
+            if self.elapsed_ns is not None:
+                self.elapsed_ns[slot] += other.elapsed_ns[source]
+
+    def reset(self):
+        """Set the values of all tag sets to 0. The tag sets keep their slots, so bound handles stay valid."""
+        self.values[:] = [0] * len(self.values)
+        if self.elapsed_ns is not None:
+            self.elapsed_ns[:] = [0] * len(self.elapsed_ns)
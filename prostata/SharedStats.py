@@ -0,0 +1,839 @@
+from multiprocessing import shared_memory
+from typing import Callable, Mapping, Optional
+import multiprocessing
+import os
+import weakref
+
+from .Handle import CounterHandle, TimerHandle, SampledCounterHandle
+from .Sampler import Sampler
+from .Snapshot import Snapshot, TimerSnapshot
+from .Stats import Stats, NameNotAllowed, NameExists, NameNotExists, _count_and_sum
+
+MAGIC = 0x53545350  # "PSTS"
+VERSION = 1
+
+HEADER_SIZE = 64  # 8 int64 fields: magic, version, max_metrics, max_workers, metric_count, reserved...
+ENTRY_SIZE = 64  # kind (1 byte), name length (1 byte), name (62 bytes)
+MAX_NAME_LENGTH = ENTRY_SIZE - 2
+FIELDS = 2  # int64 fields per metric slot: counter value, or timer elapsed ns and segments
+
+KIND_COUNTER = 1
+KIND_TIMER = 2
+
+PID_BITS = 22  # Worker table entries hold the pid in the low bits (pid_max is at most 2**22) and its start time above
+
+# Instances whose worker row must be dropped in forked children.
+_instances = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for stats in list(_instances):
+        stats._row = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _pid_alive(pid: int) -> bool:
+    """
+    Check whether a process is still running. Only reliable on POSIX; on other
+    platforms every process is assumed to be alive.
+    """
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _start_time(pid: int) -> int:
+    """
+    Get the start time of a process, in clock ticks since boot. Only available on Linux;
+    0 on other platforms or if the process is not running.
+    """
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as stat:
+            fields = stat.read().rsplit(b')', 1)[1].split()  # The command name may contain spaces
+    except OSError:
+        return 0
+    return int(fields[19])
+
+
+def _worker_entry(pid: int) -> int:
+    """Get the worker table entry of a process: its pid and its start time, which tells it from a later process with the same pid."""
+    return _start_time(pid) << PID_BITS | pid
+
+
+def _worker_alive(entry: int) -> bool:
+    """
+    Check whether the process of a worker table entry is still running. Entries without
+    a start time, written on other platforms or by earlier releases, only check the pid.
+    """
+    pid = entry & ((1 << PID_BITS) - 1)
+    start = entry >> PID_BITS
+    if not _pid_alive(pid):
+        return False
+    return start == 0 or _start_time(pid) == start
+
+
+class SlotLayout:
+    """
+    Layout of a fixed-size metrics block shared between processes.
+
+    The block has a header, a name index with one entry per metric slot, a
+    worker table with the pid and start time of the process owning each row, and a matrix of int64 values
+    with one row per worker and FIELDS values per metric slot. Every process
+    writes only to its own row, so updates need no locking; readers sum the
+    rows.
+
+    Args:
+        buf (memoryview): The block. Must be at least SlotLayout.size(...) bytes.
+        max_metrics (int): Number of metric slots.
+        max_workers (int): Number of worker rows.
+    """
+
+    def __init__(self, buf: memoryview, max_metrics: int, max_workers: int):
+        self.buf = buf
+        self.max_metrics = max_metrics
+        self.max_workers = max_workers
+        self.index_offset = HEADER_SIZE
+        self.workers_offset = self.index_offset + max_metrics * ENTRY_SIZE
+        self.values_offset = self.workers_offset + max_workers * 8
+        self.row_stride = max_metrics * FIELDS
+        self.header = buf[:HEADER_SIZE].cast('q')
+        self.workers = buf[self.workers_offset:self.values_offset].cast('q')
+        self.values = buf[self.values_offset:self.values_offset + max_workers * self.row_stride * 8].cast('q')
+
+    @staticmethod
+    def size(max_metrics: int, max_workers: int) -> int:
+        """
+        Get the number of bytes needed for a block.
+
+        Args:
+            max_metrics (int): Number of metric slots.
+            max_workers (int): Number of worker rows.
+
+        Returns:
+            int: The block size in bytes.
+        """
+        return HEADER_SIZE + max_metrics * ENTRY_SIZE + max_workers * 8 + max_workers * max_metrics * FIELDS * 8
+
+    @staticmethod
+    def read_dimensions(buf: memoryview) -> tuple:
+        """
+        Read max_metrics and max_workers from an initialized block.
+
+        Args:
+            buf (memoryview): The block.
+
+        Returns:
+            tuple: (max_metrics, max_workers)
+
+        Raises:
+            ValueError: If the block was not initialized by SlotLayout.
+        """
+        header = buf[:HEADER_SIZE].cast('q')
+        try:
+            if header[0] != MAGIC or header[1] != VERSION:
+                raise ValueError("Not a prostata metrics block or unsupported version.")
+            return header[2], header[3]
+        finally:
+            header.release()
+
+    def initialize(self):
+        """Write the header of a new, zero filled block."""
+        self.header[0] = MAGIC
+        self.header[1] = VERSION
+        self.header[2] = self.max_metrics
+        self.header[3] = self.max_workers
+
+    @property
+    def metric_count(self) -> int:
+        return self.header[4]
+
+    def entry(self, slot: int) -> tuple:
+        """
+        Read a name index entry.
+
+        Args:
+            slot (int): The metric slot.
+
+        Returns:
+            tuple: (kind, name)
+        """
+        offset = self.index_offset + slot * ENTRY_SIZE
+        kind = self.buf[offset]
+        length = self.buf[offset + 1]
+        return kind, bytes(self.buf[offset + 2:offset + 2 + length]).decode('ascii')
+
+    def find(self, name: str) -> tuple:
+        """
+        Find a metric in the name index.
+
+        Args:
+            name (str): The metric name.
+
+        Returns:
+            tuple: (slot, kind), or (None, None) if the name is not in the index.
+        """
+        for slot in range(self.metric_count):
+            kind, entry_name = self.entry(slot)
+            if entry_name == name:
+                return slot, kind
+        return None, None
+
+    def add(self, name: str, kind: int) -> int:
+        """
+        Append a metric to the name index. The caller must hold the block lock.
+
+        Args:
+            name (str): The metric name.
+            kind (int): KIND_COUNTER or KIND_TIMER.
+
+        Returns:
+            int: The new metric slot.
+
+        Raises:
+            MemoryError: If every metric slot is taken.
+        """
+        slot = self.metric_count
+        if slot >= self.max_metrics:
+            raise MemoryError(f"All {self.max_metrics} metric slots are in use.")
+        encoded = name.encode('ascii')
+        offset = self.index_offset + slot * ENTRY_SIZE
+        self.buf[offset + 2:offset + 2 + len(encoded)] = encoded
+        self.buf[offset + 1] = len(encoded)
+        self.buf[offset] = kind
+        self.header[4] = slot + 1
+        return slot
+
+    def claim_row(self, pid: int) -> int:
+        """
+        Claim a worker row for a process. The caller must hold the block lock.
+
+        Rows of processes that are no longer running are reused first, keeping the
+        values they hold, so restarts do not use up the free rows. A process that got
+        the pid of a previous one does not keep its row alive: rows store the start
+        time of their process with the pid.
+
+        Args:
+            pid (int): The process id.
+
+        Returns:
+            int: The claimed row.
+
+        Raises:
+            MemoryError: If every row belongs to a running process.
+        """
+        workers = self.workers
+        claimed = None
+        for row in range(self.max_workers):
+            if workers[row] == 0:
+                if claimed is None:
+                    claimed = row
+            elif not _worker_alive(workers[row]):
+                claimed = row
+                break
+        if claimed is None:
+            raise MemoryError(f"All {self.max_workers} worker rows are in use.")
+        workers[claimed] = _worker_entry(pid)
+        return claimed
+
+    def total(self, slot: int, field: int = 0) -> int:
+        """
+        Sum a metric field across all worker rows.
+
+        Args:
+            slot (int): The metric slot.
+            field (int): The field within the slot. Defaults to 0.
+
+        Returns:
+            int: The sum.
+        """
+        return sum(self.values[slot * FIELDS + field::self.row_stride])
+
+    def clear(self, slot: int):
+        """Zero a metric slot in every worker row."""
+        for index in range(slot * FIELDS, len(self.values), self.row_stride):
+            for field in range(FIELDS):
+                self.values[index + field] = 0
+
+    def release(self):
+        """Release the views on the block so that it can be closed."""
+        self.header.release()
+        self.workers.release()
+        self.values.release()
+
+
+class SharedStats(Stats):
+    """
+    Stats whose counters and timers live in a shared memory block, so that
+    every process of a preforked server updates and reads the same metrics.
+
+    Create the instance in the parent process before forking the workers, or
+    pass it as an argument to multiprocessing.Process. Each process claims a
+    row of the block the first time it writes and only ever writes to that row,
+    so increments need no locks or IPC round-trips. Reads sum all the rows.
+
+    Counters and accumulated timer values (elapsed time and segments) are
+    shared. A running timer belongs to the process that started it. Ratios,
+    attributes, sketches, window counters, top-K metrics, distinct counts, derived
+    metrics, labels and units are kept per process; merge the sketches of the
+    workers with merge_sketch, their top-K metrics with merge_topk and their
+    distinct counts with merge_hyperloglog.
+    Metrics created by another process become visible, with default labels and
+    units, the first time they are used.
+
+    A process must not update the same SharedStats from several threads.
+
+    Args:
+        max_metrics (int): Number of counter and timer slots. Defaults to 256.
+        max_workers (int): Number of processes that can write. Defaults to 64.
+        clock (Callable[[], int], optional): Clock for timers. Must be comparable across processes.
+            Defaults to time.perf_counter_ns.
+        mp_context (optional): The multiprocessing context used to start the workers.
+            Defaults to the default multiprocessing context.
+
+    Examples:
+        >>> stats = SharedStats()
+        >>> stats.set_counter("requests")
+        >>> # ... fork workers, each calling stats.incr_requests() ...
+        >>> stats.get_requests()  # Total across all workers
+        >>> stats.close()
+        >>> stats.unlink()
+    """
+
+    def __init__(self, max_metrics: int = 256, max_workers: int = 64, clock: Callable[[], int] = None,
+                 mp_context=None):
+        super().__init__(clock=clock)
+        size = SlotLayout.size(max_metrics, max_workers)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._block_lock = (mp_context or multiprocessing).Lock()
+        self._layout = SlotLayout(self._shm.buf, max_metrics, max_workers)
+        self._layout.initialize()
+        self._row = None  # Offset of this process' row in the values matrix, claimed on first write
+        self._synced = 0  # Number of name index entries already known to this process
+        self._synced_only = set()  # Names registered by _sync, that a set_counter or set_timer call attaches to
+        _instances.add(self)
+
+    @property
+    def name(self) -> str:
+        """The name of the shared memory block."""
+        return self._shm.name
+
+    def _block_state(self) -> dict:
+        """
+        Get what another process needs to attach to the block, for pickling.
+
+        Returns:
+            dict: The block name and lock.
+        """
+        return {'shm_name': self._shm.name, 'lock': self._block_lock}
+
+    def _attach_block(self, state: dict) -> memoryview:
+        """
+        Attach to the block described by _block_state() and set the block lock.
+
+        Args:
+            state (dict): The output of _block_state().
+
+        Returns:
+            memoryview: The block.
+        """
+        self._shm = shared_memory.SharedMemory(name=state['shm_name'])
+        self._block_lock = state['lock']
+        return self._shm.buf
+
+    def __getstate__(self) -> dict:
+        return {
+            **self._block_state(),
+            'clock': self._clock,
+            # Metrics only synced from the name index are synced again by the worker
+            'counters': {name: (c['unit'], c['label']) for name, c in self._counters.items()
+                         if name not in self._synced_only},
+            'timers': {name: t['label'] for name, t in self._timers.items() if name not in self._synced_only},
+            'ratios': {name: (r['numerator'], r['denominator'], r['label']) for name, r in self._ratios.items()},
+            'attributes': {name: (a['value'], a['label']) for name, a in self._attributes.items()},
+            # Sketches are kept per process. Workers get empty sketches with the same settings.
+            'sketches': {name: (s['sketch'].relative_accuracy, s['sketch'].max_bins, s['label'])
+                         for name, s in self._sketches.items()},
+            'windows': {name: (w['window'].window, w['window'].buckets, w['label'])
+                        for name, w in self._windows.items()},
+            # Top-K metrics and distinct counts are kept per process, like sketches
+            'topks': {name: (t['topk'].capacity, t['label']) for name, t in self._topks.items()},
+            'uniques': {name: (u['hll'].precision, u['label']) for name, u in self._uniques.items()},
+            'derived': {name: (d['expression'].text, d['label']) for name, d in self._derived.items()},
+            # Sampling is per process, each process scales what it records
+            'sample_rates': self.get_sample_rates(),
+            # Series by tag set are kept per process. Workers get the limits.
+            'max_series': dict(self._max_series),
+        }
+
+    def __setstate__(self, state: dict):
+        Stats.__init__(self, clock=state['clock'])
+        buf = self._attach_block(state)
+        self._layout = SlotLayout(buf, *SlotLayout.read_dimensions(buf))
+        self._row = None
+        self._synced = 0
+        self._synced_only = set()
+        _instances.add(self)
+        self._sync()
+        for name, (unit, label) in state['counters'].items():
+            self._counters[name].update(unit=unit, label=label)
+            self._synced_only.discard(name)
+        for name, label in state['timers'].items():
+            self._timers[name]['label'] = label
+            self._synced_only.discard(name)
+        for name, rate in state['sample_rates'].items():
+            self._samplers[name] = Sampler(rate)
+        self._max_series.update(state['max_series'])
+        for name, (value, label) in state['attributes'].items():
+            self.set_attribute(name, value, label)
+        for name, (relative_accuracy, max_bins, label) in state['sketches'].items():
+            self.set_sketch(name, relative_accuracy, max_bins, label)
+        for name, (window, buckets, label) in state['windows'].items():
+            self.set_window_counter(name, window, buckets, label)
+        for name, (capacity, label) in state['topks'].items():
+            self.set_topk(name, capacity, label)
+        for name, (precision, label) in state['uniques'].items():
+            self.set_unique(name, precision, label)
+        for name, (numerator, denominator, label) in state['ratios'].items():
+            self.set_ratio(name, numerator, denominator, label)
+        for name, (expression, label) in state['derived'].items():
+            self.set_derived(name, expression, label)
+
+    def __getattr__(self, attribute: str):
+        # Only called when normal lookup fails: the item may have been created by another process
+        if attribute.startswith('_') or '_layout' not in self.__dict__:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{attribute}'")
+        self._sync()
+        return object.__getattribute__(self, attribute)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Detach this process from the shared memory block."""
+        self._layout.release()
+        self._shm.close()
+
+    def unlink(self):
+        """Destroy the shared memory block. Call once, from the process that created it, after closing."""
+        self._shm.unlink()
+
+    def _row_offset(self) -> int:
+        """
+        Get the offset of this process' row in the values matrix, claiming a row on first use.
+
+        Returns:
+            int: The offset.
+        """
+        if self._row is None:
+            with self._block_lock:
+                self._row = self._layout.claim_row(os.getpid()) * self._layout.row_stride
+        return self._row
+
+    def _sync(self):
+        """
+        Register locally the metrics that other processes added to the name index.
+
+        Raises:
+            NameExists: If this process uses the name of a new metric for an item that is not shared,
+                such as a sketch. The other new metrics are registered, and the conflict is only reported once.
+        """
+        count = self._layout.metric_count
+        conflicts = []
+        for slot in range(self._synced, count):
+            kind, name = self._layout.entry(slot)
+            if name in self._counters or name in self._timers:
+                continue
+            if self.is_used(name):
+                conflicts.append(name)
+            elif kind == KIND_COUNTER:
+                self._counters[name] = {'slot': slot, 'unit': 'item', 'label': name}
+                self._register(name, 'counter')
+                self._synced_only.add(name)
+            elif kind == KIND_TIMER:
+                self._timers[name] = {'slot': slot, 'start': None, 'stop': None, 'label': name}
+                self._register(name, 'timer')
+                self._synced_only.add(name)
+        self._synced = count
+        if conflicts:
+            names = ', '.join(f"'{name}'" for name in conflicts)
+            raise NameExists(f"Names {names} are shared by another process but used here by items that are not shared.")
+
+    def _check_name_unique(self, name: str):
+        # Another process may have added the name to the shared block since the last sync
+        self._sync()
+        super()._check_name_unique(name)
+
+    def _check_name_attachable(self, name: str):
+        """
+        Check that set_counter or set_timer can create the metric, or attach to the one another process created.
+
+        Args:
+            name (str): The metric name.
+
+        Raises:
+            NameExists: If this process already set an item with the name.
+        """
+        self._sync()
+        if name not in self._synced_only:
+            self._check_name_unique(name)
+
+    def _counter(self, name: str) -> dict:
+        if name not in self._counters:
+            self._sync()
+            if name not in self._counters:
+                raise NameNotExists(f"Counter '{name}' does not exist.")
+        return self._counters[name]
+
+    def _timer(self, name: str) -> dict:
+        if name not in self._timers:
+            self._sync()
+            if name not in self._timers:
+                raise NameNotExists(f"Timer '{name}' does not exist.")
+        return self._timers[name]
+
+    def _add_slot(self, name: str, kind: int) -> tuple:
+        """
+        Find or create the shared slot of a metric.
+
+        Args:
+            name (str): The metric name.
+            kind (int): KIND_COUNTER or KIND_TIMER.
+
+        Returns:
+            tuple: (slot, created)
+
+        Raises:
+            NameNotAllowed: If the name does not fit in a name index entry.
+            NameExists: If another process registered the name as a different kind.
+        """
+        if len(name) > MAX_NAME_LENGTH:
+            raise NameNotAllowed(f"Name '{name}' is longer than {MAX_NAME_LENGTH} characters.")
+        with self._block_lock:
+            slot, existing_kind = self._layout.find(name)
+            if slot is None:
+                return self._layout.add(name, kind), True
+        if existing_kind != kind:
+            raise NameExists(f"Name '{name}' already exists in the shared block as a different kind.")
+        return slot, False
+
+    def set_timer(self, name: str, label: str = None, handle: bool = False,
+                  histogram: bool = False, sample_rate: float = 1.0) -> Optional[TimerHandle]:
+        """
+        Create a new timer, or attach to the shared timer of the same name created by another process.
+
+        Args:
+            name (str): The name of the timer.
+            label (str, optional): The label for the timer. Defaults to the name if not provided.
+            handle (bool): If True, return a TimerHandle bound to the timer. Defaults to False.
+            histogram (bool): Not supported, shared timers keep totals only. Must be False.
+            sample_rate (float): Fraction of the segments to measure in this process, in (0, 1].
+                See Stats.set_timer.
+
+        Returns:
+            TimerHandle: The handle, if requested. Otherwise None.
+
+        Raises:
+            ValueError: If histogram is True, or sample_rate is not in (0, 1].
+            NameNotAllowed: If the name is a reserved word, has invalid format or is too long.
+            NameExists: If the name is already used.
+            MemoryError: If the shared block has no free metric slot.
+        """
+        if histogram:
+            raise ValueError("SharedStats timers do not support histograms.")
+        self._check_name_allowed(name, 'timer')
+        self._check_name_attachable(name)
+        sampler = self._sampler(sample_rate)
+        slot, _ = self._add_slot(name, KIND_TIMER)
+        self._synced_only.discard(name)
+        self._timers[name] = {'slot': slot, 'start': None, 'stop': None, 'label': label if label is not None else name}
+        self._register_sampler(name, sampler)
+        self._register(name, 'timer')
+        if handle:
+            return self._timer_handle(name)
+
+    def set_counter(self, name: str, value: int = 0, unit: str = "item", label: str = None,
+                    handle: bool = False, sample_rate: float = 1.0) -> Optional[CounterHandle]:
+        """
+        Create a new counter, or attach to the shared counter of the same name created by another process.
+        The initial value is only applied when the counter is created.
+
+        Args:
+            name (str): The name of the counter.
+            value (int): The initial value. Defaults to 0.
+            unit (str): The unit of the counter. Defaults to "item".
+            label (str, optional): The label for the counter. Defaults to the name if not provided.
+            handle (bool): If True, return a CounterHandle bound to the counter. Defaults to False.
+            sample_rate (float): Fraction of the increments to record in this process, in (0, 1].
+                See Stats.set_counter.
+
+        Returns:
+            CounterHandle: The handle, if requested. Otherwise None.
+
+        Raises:
+            NameNotAllowed: If the name is a reserved word, has invalid format or is too long.
+            NameExists: If the name is already used.
+            MemoryError: If the shared block has no free metric slot.
+            ValueError: If sample_rate is not in (0, 1].
+        """
+        self._check_name_allowed(name, 'counter')
+        self._check_name_attachable(name)
+        sampler = self._sampler(sample_rate)
+        slot, created = self._add_slot(name, KIND_COUNTER)
+        self._synced_only.discard(name)
+        if created and value:
+            self._layout.values[self._row_offset() + slot * FIELDS] += value
+        self._counters[name] = {'slot': slot, 'unit': unit, 'label': label if label is not None else name}
+        self._register_sampler(name, sampler)
+        self._register(name, 'counter')
+        if handle:
+            return self._counter_handle(name) if sampler is None else SampledCounterHandle(self, name, sampler)
+
+    def _timer_handle(self, name: str) -> TimerHandle:
+        return TimerHandle(self, name)
+
+    def _counter_handle(self, name: str) -> CounterHandle:
+        return CounterHandle(self, name)
+
+    def _ratio_operand_polled(self, name: str) -> bool:
+        return True  # Other processes write the counters without marking the ratios of this one
+
+    def _timer_recorder(self, name: str):
+        timer = self._timer(name)
+        slot = timer['slot'] * FIELDS
+        values = self._layout.values
+
+        def record(start: int, stop: int):
+            offset = self._row_offset() + slot  # The row is claimed on first write, also after a fork
+            values[offset] += stop - start
+            values[offset + 1] += 1
+            timer['stop'] = stop
+        return record
+
+    def _series_of(self, name: str, kind: str):
+        if name not in self._kinds:
+            self._sync()  # The metric may have been created by another process
+        return super()._series_of(name, kind)
+
+    def get_timer(self, name: str) -> float:
+        """
+        Get the elapsed time in seconds of the timer, summed across all processes.
+
+        Args:
+            name (str): The name of the timer.
+
+        Returns:
+            float: The elapsed time in seconds, including the running segment of this process.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+        """
+        timer = self._timer(name)
+        elapsed = self._layout.total(timer['slot'])
+        if timer['start'] is not None:
+            elapsed += self._clock() - timer['start']
+        return elapsed / 1e9
+
+    def _timer_running(self, name: str) -> bool:
+        return self._timer(name)['start'] is not None
+
+    def _start_primary(self, name: str) -> Optional[int]:
+        # The primary segment runs in this process; the shared total is updated when it stops.
+        timer = self._timer(name)
+        if timer['start'] is not None:
+            return None
+        now = timer['start'] = self._clock()
+        self._layout.values[self._row_offset() + timer['slot'] * FIELDS + 1] += 1
+        return now
+
+    def _stop_primary(self, name: str):
+        timer = self._timer(name)
+        start = timer['start']
+        if start is not None:
+            now = self._clock()
+            self._layout.values[self._row_offset() + timer['slot'] * FIELDS] += now - start
+            timer['stop'] = now
+            timer['start'] = None
+
+    def get_counter(self, name: str) -> int:
+        """
+        Get the value of the counter, summed across all processes.
+
+        Args:
+            name (str): The name of the counter.
+
+        Returns:
+            int: The value of the counter.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+        """
+        return self._layout.total(self._counter(name)['slot'])
+
+    def incr(self, name: str, amount: int = 1, tags: Mapping = None):
+        """
+        Increment the counter by the given amount.
+
+        Args:
+            name (str): The name of the counter.
+            amount (int): The amount to increment. Defaults to 1.
+            tags (Mapping[str, str], optional): Dimensions of the increment. See Stats.incr.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+            NameNotAllowed: If a tag name is not valid.
+        """
+        if tags is not None:
+            return self._add_tagged(name, amount, tags)
+        if self._samplers and name in self._samplers:
+            return self._add_sampled(name, amount)
+        slot = self._counter(name)['slot']
+        self._layout.values[self._row_offset() + slot * FIELDS] += amount
+
+    def decr(self, name: str, amount: int = 1, tags: Mapping = None):
+        """
+        Decrement the counter by the given amount.
+
+        Args:
+            name (str): The name of the counter.
+            amount (int): The amount to decrement. Defaults to 1.
+            tags (Mapping[str, str], optional): Dimensions of the decrement. See Stats.incr.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+            NameNotAllowed: If a tag name is not valid.
+        """
+        if tags is not None:
+            return self._add_tagged(name, -amount, tags)
+        if self._samplers and name in self._samplers:
+            return self._add_sampled(name, -amount)
+        slot = self._counter(name)['slot']
+        self._layout.values[self._row_offset() + slot * FIELDS] -= amount
+
+    def _add_many(self, amounts: dict):
+        slots = [(self._counter(name)['slot'], amount) for name, amount in amounts.items()]
+        values = self._layout.values
+        row = self._row_offset()
+        for slot, amount in slots:
+            values[row + slot * FIELDS] += amount
+
+    def record_many(self, name: str, values):
+        """
+        Record a batch of values into a timer, sketch or counter in one call. See Stats.record_many.
+        Timer durations are added to the shared totals; shared timers have no histogram.
+        """
+        if name not in self._kinds:
+            self._sync()
+        super().record_many(name, values)
+
+    def _add_segments(self, name: str, durations):
+        slot = self._timer(name)['slot']
+        count, total = _count_and_sum(durations)
+        offset = self._row_offset() + slot * FIELDS
+        self._layout.values[offset] += round(total * 1e9)
+        self._layout.values[offset + 1] += count
+
+    def _add_timer(self, name: str, segments: int, elapsed: float):
+        offset = self._row_offset() + self._timer(name)['slot'] * FIELDS
+        self._layout.values[offset] += round(elapsed * 1e9)
+        self._layout.values[offset + 1] += segments
+
+    def reset_counter(self, name: str, value: int = 0):
+        """
+        Reset the counter to the given value in every process.
+        Increments made by other processes while resetting may be lost.
+
+        Args:
+            name (str): The name of the counter.
+            value (int): The value to reset to. Defaults to 0.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+        """
+        slot = self._counter(name)['slot']
+        row = self._row_offset()
+        with self._block_lock:
+            self._layout.clear(slot)
+            self._layout.values[row + slot * FIELDS] = value
+        if name in self._samplers:
+            self._samplers[name].reset()
+        if name in self._series:
+            self._series[name].reset()
+
+    def get_timers(self) -> dict:
+        """
+        Get all timers, including those created by other processes.
+
+        Returns:
+            dict: {name: {'start', 'stop', 'segments', 'elapsed', 'label'}}, with elapsed in seconds
+            and segments summed across all processes.
+        """
+        self._sync()
+        return {
+            name: {
+                'start': timer['start'],
+                'stop': timer['stop'],
+                'segments': self._layout.total(timer['slot'], 1),
+                'elapsed': self._layout.total(timer['slot']) / 1e9,
+                'label': timer['label'],
+            }
+            for name, timer in self._timers.items()
+        }
+
+    def snapshot(self) -> Snapshot:
+        """
+        Take an immutable snapshot of the values of all items, including those created by other
+        processes. See Stats.snapshot. Other processes keep writing while the shared block is
+        read, so the snapshot is not atomic across processes.
+        """
+        self._sync()
+        return super().snapshot()
+
+    def _restore_timer(self, name: str, start, stop, segments: int, elapsed_ns: int):
+        # Restored totals are added to this process' row, on top of what other processes recorded.
+        timer = self._timers[name]
+        timer.update(start=start, stop=stop)
+        offset = self._row_offset() + timer['slot'] * FIELDS
+        self._layout.values[offset] += elapsed_ns
+        self._layout.values[offset + 1] += segments
+
+    def _timer_elapsed_ns(self, name: str) -> int:
+        return self._layout.total(self._timers[name]['slot'])
+
+    def _snapshot_timers(self, now: int) -> dict:
+        timers = {}
+        for name, timer in self._timers.items():
+            slot = timer['slot']
+            elapsed = self._layout.total(slot)
+            start = timer['start']
+            if start is not None:
+                elapsed += now - start
+            timers[name] = TimerSnapshot(elapsed / 1e9, self._layout.total(slot, 1), start is not None)
+        return timers
+
+    def _snapshot_counters(self) -> dict:
+        return {name: self._layout.total(counter['slot']) for name, counter in self._counters.items()}
+
+    def get_counters(self) -> dict:
+        """
+        Get all counters, including those created by other processes.
+
+        Returns:
+            dict: {name: {'value', 'unit', 'label'}}, with values summed across all processes.
+        """
+        self._sync()
+        return {
+            name: {'value': self._layout.total(counter['slot']), 'unit': counter['unit'], 'label': counter['label']}
+            for name, counter in self._counters.items()
+        }
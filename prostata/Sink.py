@@ -0,0 +1,135 @@
+import asyncio
+import os
+
+
+class Sink:
+    """
+    Destination of the payloads written by a StatsFlusher.
+
+    Subclasses implement write(), which may wait, for example until a socket accepts
+    more data: the flusher then stops writing, which is how sinks apply backpressure.
+    Errors are raised as OSError; the flusher counts them and keeps going.
+
+    Examples:
+        >>> class ListSink(Sink):
+        ...     def __init__(self):
+        ...         self.payloads = []
+        ...     async def write(self, data):
+        ...         self.payloads.append(data)
+    """
+
+    async def write(self, data: bytes):
+        """
+        Write one payload.
+
+        Args:
+            data (bytes): The encoded snapshot.
+
+        Raises:
+            OSError: If the payload could not be written.
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """Release the resources of the sink. Called when the flusher stops."""
+
+
+class FileSink(Sink):
+    """
+    Append payloads to a file, from a worker thread so the event loop never waits for the disk.
+
+    Args:
+        path (str): The file. Created if it does not exist.
+
+    Examples:
+        >>> sink = FileSink("/var/log/myapp/metrics.jsonl")
+    """
+
+    def __init__(self, path: str):
+        self.path = os.fspath(path)
+        self._file = None
+
+    def _append(self, data: bytes):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write(data)
+        self._file.flush()
+
+    async def write(self, data: bytes):
+        await asyncio.get_running_loop().run_in_executor(None, self._append, data)
+
+    async def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class UDPSink(Sink):
+    """
+    Send each payload as one datagram to a UDP collector, such as a local agent.
+
+    Datagrams are never waited for: a collector that does not keep up loses payloads,
+    not the application. Payloads must fit in a datagram, 64 kB on most systems.
+
+    Args:
+        host (str): The host of the collector.
+        port (int): The port of the collector.
+
+    Examples:
+        >>> sink = UDPSink("127.0.0.1", 8125)
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._transport = None
+
+    async def write(self, data: bytes):
+        if self._transport is None:
+            self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=(self.host, self.port))
+        self._transport.sendto(data)
+
+    async def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+
+class UnixSink(Sink):
+    """
+    Write payloads to a Unix stream socket, such as the socket of a local collector.
+
+    write() waits until the socket accepts the data, so a slow collector slows down the
+    flusher instead of growing a buffer. The connection is opened on the first write and
+    opened again on the next write after an error. POSIX only.
+
+    Args:
+        path (str): The path of the socket.
+
+    Examples:
+        >>> sink = UnixSink("/run/collector.sock")
+    """
+
+    def __init__(self, path: str):
+        self.path = os.fspath(path)
+        self._writer = None
+
+    async def write(self, data: bytes):
+        try:
+            if self._writer is None:
+                _, self._writer = await asyncio.open_unix_connection(self.path)
+            self._writer.write(data)
+            await self._writer.drain()
+        except OSError:
+            await self.close()
+            raise
+
+    async def close(self):
+        if self._writer is not None:
+            writer, self._writer = self._writer, None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
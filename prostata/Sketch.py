@@ -0,0 +1,220 @@
+import math
+from typing import Iterable
+
+
+class DDSketch:
+    """
+    Quantile sketch with a relative error guarantee (DDSketch).
+
+    Values are counted in logarithmic bins so that every quantile is returned
+    within relative_accuracy of the exact one. Sketches with the same
+    relative_accuracy can be merged, and merging is associative and
+    commutative, so the sketches of thousands of workers can be reduced in any
+    order or tree shape to the sketch of all their values.
+
+    Memory is bounded by max_bins per sign. When a sketch needs more bins, the
+    lowest bins are collapsed together: only the lowest quantiles lose
+    accuracy, which keeps the high quantiles used for latency exact to the
+    guarantee.
+
+    Args:
+        relative_accuracy (float): Relative error of quantiles, between 0 and 1. Defaults to 0.01.
+        max_bins (int): Maximum number of bins for positive values, and again for negative values.
+            Defaults to 2048, which covers values from 1 ns to over a day at 1% accuracy.
+
+    Examples:
+        >>> sketch = DDSketch(relative_accuracy=0.01)
+        >>> for value in range(1, 1001):
+        ...     sketch.add(value)
+        >>> round(sketch.quantile(0.5))
+        500
+    """
+
+    __slots__ = ('relative_accuracy', 'max_bins', '_gamma', '_log_gamma', '_positive', '_negative',
+                 '_positive_floor', '_negative_floor', 'zero_count', 'count', 'sum', 'min', 'max')
+
+    # Values closer to zero than this are counted as zero.
+    MIN_VALUE = 1e-12
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("Relative accuracy must be between 0 and 1.")
+        if max_bins < 2:
+            raise ValueError("A sketch needs at least 2 bins.")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive = {}  # {bin key: count}
+        self._negative = {}  # {bin key of -value: count}
+        self._positive_floor = None  # Lowest key kept after collapsing
+        self._negative_floor = None
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def add(self, value: float, count: int = 1):
+        """
+        Add a value to the sketch.
+
+        Args:
+            value (float): The value.
+            count (int): How many times to add it. Defaults to 1.
+        """
+        if value > self.MIN_VALUE:
+            key = self._key(value)
+            if self._positive_floor is not None and key < self._positive_floor:
+                key = self._positive_floor
+            bins = self._positive
+            bins[key] = bins.get(key, 0) + count
+            if len(bins) > self.max_bins:
+                self._positive_floor = _collapse(bins, self.max_bins)
+        elif value < -self.MIN_VALUE:
+            key = self._key(-value)
+            if self._negative_floor is not None and key < self._negative_floor:
+                key = self._negative_floor
+            bins = self._negative
+            bins[key] = bins.get(key, 0) + count
+            if len(bins) > self.max_bins:
+                self._negative_floor = _collapse(bins, self.max_bins)
+        else:
+            self.zero_count += count
+        self.count += count
+        self.sum += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def add_many(self, values: Iterable[float]):
+        """
+        Add every value of an iterable to the sketch.
+
+        Args:
+            values (Iterable[float]): The values.
+        """
+        for value in values:
+            self.add(value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile of the values added.
+
+        Args:
+            q (float): The quantile, between 0 and 1. For example 0.99 for the p99.
+
+        Returns:
+            float: The estimate, within relative_accuracy of the exact quantile unless it falls in
+            collapsed bins. The quantiles 0 and 1 return the exact minimum and maximum.
+            0 if the sketch is empty.
+
+        Raises:
+            ValueError: If q is not between 0 and 1.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1.")
+        if self.count == 0:
+            return 0.0
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self._negative, reverse=True):
+            seen += self._negative[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self._positive):
+            seen += self._positive[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+    def merge(self, other: 'DDSketch'):
+        """
+        Add all the values of another sketch to this one.
+
+        Args:
+            other (DDSketch): A sketch with the same relative accuracy.
+
+        Raises:
+            ValueError: If the sketches have a different relative accuracy.
+        """
+        if other._gamma != self._gamma:
+            raise ValueError("Sketches with different relative accuracy cannot be merged.")
+        if other.count == 0:
+            return
+        self._positive_floor = _merge_bins(self._positive, self._positive_floor,
+                                           other._positive, other._positive_floor, self.max_bins)
+        self._negative_floor = _merge_bins(self._negative, self._negative_floor,
+                                           other._negative, other._negative_floor, self.max_bins)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        if self.min is None or other.min < self.min:
+            self.min = other.min
+        if self.max is None or other.max > self.max:
+            self.max = other.max
+
+    def copy(self) -> 'DDSketch':
+        """
+        Get an independent copy of the sketch.
+
+        Returns:
+            DDSketch: The copy.
+        """
+        sketch = DDSketch(self.relative_accuracy, self.max_bins)
+        sketch.merge(self)
+        return sketch
+
+    @property
+    def bins(self) -> int:
+        """The number of bins in use."""
+        return len(self._positive) + len(self._negative)
+
+
+def _collapse(bins: dict, max_bins: int) -> int:
+    """
+    Merge the lowest bins of a store into one until it has max_bins bins.
+
+    Returns:
+        int: The new lowest key. Values below it are counted in its bin from now on.
+    """
+    keys = sorted(bins)
+    excess = len(keys) - max_bins
+    floor = keys[excess]
+    bins[floor] += sum(bins.pop(key) for key in keys[:excess])
+    return floor
+
+
+def _merge_bins(bins: dict, floor, other_bins: dict, other_floor, max_bins: int):
+    """
+    Add the counts of other_bins into bins, respecting the collapsed floors of both stores.
+
+    Returns:
+        The lowest key of bins after merging, or None if nothing was collapsed.
+    """
+    if other_floor is not None and (floor is None or other_floor > floor):
+        floor = other_floor
+        below = [key for key in bins if key < floor]
+        if below:
+            bins[floor] = bins.get(floor, 0) + sum(bins.pop(key) for key in below)
+    for key, count in other_bins.items():
+        if floor is not None and key < floor:
+            key = floor
+        bins[key] = bins.get(key, 0) + count
+    if len(bins) > max_bins:
+        floor = _collapse(bins, max_bins)
+    return floor
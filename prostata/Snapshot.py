@@ -0,0 +1,39 @@
+from typing import Mapping, NamedTuple, Union
+
+
+class TimerSnapshot(NamedTuple):
+    """The value of a timer in a Snapshot."""
+
+    elapsed: float
+    """Elapsed time in seconds, including the running segment."""
+    segments: int
+    """Number of segments started."""
+    running: bool
+    """Whether the timer was running when the snapshot was taken."""
+
+
+class Snapshot(NamedTuple):
+    """
+    Immutable values of all the items of a Stats instance at one instant.
+
+    Returned by Stats.snapshot(). The mappings are read-only views of dictionaries
+    owned by the snapshot, so later updates to the Stats instance do not change it.
+
+    Examples:
+        >>> snapshot = stats.snapshot()
+        >>> snapshot.counters["requests"]
+        42
+        >>> snapshot.timers["load_time"].elapsed
+        1.5
+    """
+
+    time_ns: int
+    """Reading of the Stats clock when the snapshot was taken, in nanoseconds."""
+    timers: Mapping[str, TimerSnapshot]
+    """{name: TimerSnapshot}"""
+    counters: Mapping[str, int]
+    """{name: value}"""
+    ratios: Mapping[str, float]
+    """{name: value}, computed from the counters of the snapshot."""
+    attributes: Mapping[str, Union[str, int, float]]
+    """{name: value}"""
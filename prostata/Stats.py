@@ -1,6 +1,30 @@
-from datetime import datetime
-from typing import Union
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from contextvars import ContextVar
+from functools import partial, wraps
+from itertools import chain
+from types import MappingProxyType
+from typing import Callable, Hashable, Iterable, List, Optional, Union
+import inspect
+import operator
 import re
+import sys
+import threading
+from threading import get_ident
+
+from .Clock import default_clock
+from .Expression import Expression
+from .Handle import (CounterHandle, TimerHandle, TimerContext, TimerToken, DictCounterHandle, DictTimerHandle,
+                     SampledCounterHandle, SampledTimerContext, TaggedCounterHandle, _current_owner)
+from .Histogram import Histogram
+from .Sampler import Estimate, Sampler
+from .Series import Series, Tags, OVERFLOW
+from .Sketch import DDSketch
+from .Snapshot import Snapshot, TimerSnapshot
+from .WindowCounter import WindowCounter
+from .TopK import HeavyHitter, TopK
+from .HyperLogLog import HyperLogLog
+from . import StatsCodec
 
 
 class NameNotAllowed(Exception):
@@ -15,14 +39,221 @@ class NameNotExists(Exception):
     pass
 
 
+class MergeConflict(Exception):
+    pass
+
+
+# Dynamic methods of each kind of item: {kind: {prefix: method}}.
+# For example, a counter named "requests" gets incr_requests(amount), which calls incr("requests", amount).
+DYNAMIC_METHODS = {
+    'timer': {'get': 'get_timer', 'start': 'start_timer', 'stop': 'stop_timer'},
+    'counter': {'get': 'get_counter', 'incr': 'incr', 'decr': 'decr', 'reset': 'reset_counter'},
+    'ratio': {'get': 'get_ratio'},
+    'attribute': {'get': 'get_attribute', 'set': 'set_attribute_value'},
+    'sketch': {'get': 'get_sketch_quantile', 'observe': 'observe'},
+    'window': {'get': 'get_window_counter', 'incr': 'incr_window', 'rate': 'get_window_rate'},
+    'topk': {'get': 'get_top_keys', 'observe': 'observe_key'},
+    'unique': {'get': 'get_unique', 'add': 'add_unique'},
+    'derived': {'get': 'get_derived'},
+}
+
+
+def _dispatch_table(cls) -> dict:
+    """
+    Resolve DYNAMIC_METHODS against a class, once per class.
+
+    Returns:
+        dict: {prefix: {kind: function}}
+    """
+    table = {}
+    for kind, methods in DYNAMIC_METHODS.items():
+        for prefix, method in methods.items():
+            table.setdefault(prefix, {})[kind] = getattr(cls, method)
+    return table
+
+
+# Kind of the items of each name that has dynamic methods, in any class: {name: kind}, or None
+# once items of several kinds use the name. Names of a single kind get plain functions.
+_dynamic_kinds = {}
+
+
+def _named_method(prefix: str, name: str, kind: str, function) -> Callable:
+    """
+    Dynamic method, such as incr_requests, of a name used by a single kind of item on a class.
+
+    It is a plain function that calls the named method, bound by normal attribute lookup
+    without any Python code of its own. Calls without arguments, the most common ones, skip
+    unpacking arguments.
+
+    Returns:
+        Callable: The function, with the kind in its _dynamic_kind attribute.
+    """
+    if len(inspect.signature(function).parameters) == 2:  # Only self and name
+        def method(self):
+            return function(self, name)
+    else:
+        def method(self, *args, **kwargs):
+            if args or kwargs:
+                return function(self, name, *args, **kwargs)
+            return function(self, name)
+
+    method.__name__ = method.__qualname__ = f'{prefix}_{name}'
+    method._dynamic_kind = kind
+    return method
+
+
+def _is_dynamic(attribute) -> bool:
+    """Whether a class attribute is a dynamic method."""
+    return isinstance(attribute, _DynamicMethod) or hasattr(attribute, '_dynamic_kind')
+
+
+class _DynamicMethod:
+    """
+    Dynamic method, such as get_requests, of a name used by several kinds of items on a class.
+
+    As a non-data descriptor it is found by normal attribute lookup, and the class needs no
+    __getattr__, which would slow down every attribute lookup of its instances. Looking it up
+    runs Python code and a call goes through a partial, which makes it about three times as
+    slow as calling the named method. It binds the method for the kind of the instance's item
+    of that name, and raises AttributeError for instances without such an item.
+    """
+
+    __slots__ = ('prefix', 'name', 'attribute')
+
+    def __init__(self, prefix: str, name: str):
+        self.prefix = prefix
+        self.name = name
+        self.attribute = f'{prefix}_{name}'
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        function = type(instance)._dispatch[self.prefix].get(instance._kinds.get(self.name))
+        if function is None:
+            raise AttributeError(f"'{type(instance).__name__}' object has no attribute '{self.attribute}'")
+        return partial(function, instance, self.name)
+
+
+_UNSET = object()  # Default that differs from any value
+
+
+def _numeric(value) -> bool:
+    """Whether an attribute value can be used in an expression."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+_TAG_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
+_RESERVED_TAGS = ('overflow', 'le', 'quantile')  # Overflow series and Prometheus summary and histogram labels
+
+# Concurrent segments opened by start_timer in the current thread or asyncio task: {(Stats key, timer name): TimerToken}.
+# The dictionary is copied on every change, since tasks inherit it from the context that created them.
+_open_segments = ContextVar('prostata_open_segments', default={})
+
+# Token of every segment skipped by the sampler of a timer, closed so that stopping it does nothing.
+_SKIPPED_SEGMENT = TimerToken('<skipped>', 0, False)
+_SKIPPED_SEGMENT.closed = True
+
+
+def _buckets_in_seconds(histogram: Histogram) -> list:
+    return [(upper / 1e9, count) for upper, count in histogram.buckets()]
+
+
+def _aggregate(mapping) -> dict:
+    """
+    Sum the amounts of a batch of counter increments per name.
+
+    Args:
+        mapping: A mapping of names to amounts, an iterable of names (each counts 1)
+            or an iterable of (name, amount) pairs. NumPy arrays of names work as iterables.
+
+    Returns:
+        dict: {name: total amount}
+    """
+    if isinstance(mapping, Mapping):
+        amounts = mapping
+    else:
+        if hasattr(mapping, 'tolist'):  # NumPy array: iterate over Python strings, not array scalars
+            mapping = mapping.tolist()
+        items = iter(mapping)
+        first = next(items, None)
+        if first is None:
+            return {}
+        if isinstance(first, str):
+            amounts = Counter(chain((first,), items))
+        else:
+            amounts = defaultdict(int)
+            for name, amount in chain((first,), items):
+                amounts[name] += amount
+    return {str(name): operator.index(amount) for name, amount in amounts.items()}
+
+
+def _count_and_sum(values) -> tuple:
+    """
+    Count and sum a sized batch of values, with NumPy's own sum when values is an array.
+
+    Returns:
+        tuple: (number of values, sum)
+    """
+    if not callable(getattr(values, 'sum', None)):
+        return len(values), sum(values)
+    total = values.sum()
+    return len(values), total.item() if hasattr(total, 'item') else total
+
+
 class Stats:
 
-    def __init__(self):
-        self._timers = {}  # {name: {'start': datetime, 'stop': datetime, segments: int ,'elapsed': duration, 'label': str}}
+    CONCURRENCY_MODES = (None, "lock", "sharded")
+    MAX_SERIES = 100  # Default limit of tag sets per timer or counter, see set_max_series
+
+    def __init__(self, clock: Callable[[], int] = None, concurrency: str = None):
+        """
+        Create an empty Stats instance.
+
+        Args:
+            clock (Callable[[], int], optional): Callable returning the current time in integer nanoseconds,
+                used by timers. Defaults to time.perf_counter_ns. See prostata.Clock.FakeClock for tests.
+            concurrency (str, optional): How counters behave when updated from several threads.
+                None (default) does no synchronization. "lock" serializes counter updates with a lock.
+                "sharded" gives each thread its own counter shard, which are summed when read.
+
+        Raises:
+            ValueError: If concurrency is not one of None, "lock" or "sharded".
+
+        Examples:
+            >>> stats = Stats(concurrency="sharded")
+            >>> stats.set_counter("requests")
+            >>> stats.incr_requests()  # Safe to call from any thread
+        """
+        if concurrency not in self.CONCURRENCY_MODES:
+            raise ValueError(f"Unknown concurrency mode '{concurrency}'. Use None, 'lock' or 'sharded'.")
+        self._clock = clock if clock is not None else default_clock
+        self._concurrency = concurrency
+        self._lock = threading.Lock() if concurrency is not None else None
+        self._local = threading.local() if concurrency == "sharded" else None
+        self._shards = ()  # ((thread, {name: delta}), ...) one shard per writing thread, sharded mode only
+        self._timers = {}  # {name: {'start': ns, 'stop': ns, segments: int ,'elapsed_ns': int, 'label': str}}
         self._counters = {}  # {name: {'value': amount, 'unit': unit, 'label': str}}
         self._ratios = {}  # {name: {'numerator': name, 'denominator': name, 'value': ratio, 'label': str}}
         self._attributes = {}  # {name: {'value': value, 'label': str}}
+        self._sketches = {}  # {name: {'sketch': DDSketch, 'label': str}}
+        self._windows = {}  # {name: {'window': WindowCounter, 'label': str}}
+        self._topks = {}  # {name: {'topk': TopK, 'label': str}}
+        self._uniques = {}  # {name: {'hll': HyperLogLog, 'label': str}}
+        self._derived = {}  # {name: {'expression': Expression, 'function': compiled expression, 'label': str}}
+        self._recorders = {}  # {timer name: function adding a segment}, see time() and timed()
+        self._samplers = {}  # {timer or counter name: Sampler} of the metrics created with a sample_rate
+        self._series = {}  # {timer or counter name: Series} Values by tag set, created on the first tagged update
+        self._max_series = {}  # {timer or counter name: limit} Limits set with set_max_series
+        self._tag_sets = {}  # {sorted (name, value) pairs as given: Tags} Interned tag sets, shared by all metrics
+        self._context_key = object()  # Identifies this instance in _open_segments
+        self._primary_segments = {}  # {timer name: TimerToken} of the primary segments, reused by the next one
+        self._in_flight = {}  # {timer name: number} of open concurrent segments
+        self._sampled_in_flight = {}  # {timer name: number} of open kept segments of sampled timers
+        self._ratio_index = {}  # {operand name: [ratio name, ...]} Reverse index of ratio operands, used by writes
+        self._polled_operands = set()  # Ratio operands that change without a write, read to find changes
+        self._ratio_inputs = {}  # {polled operand name: value} Values the cached ratio values were computed from
+        self._stale_ratios = set()  # Ratios whose cached value must be recomputed
         self._names_used = set()  # Track all names to ensure uniqueness
+        self._kinds = {}  # {name: kind} Resolves dynamic methods, see DYNAMIC_METHODS
 
     def is_used(self, name: str) -> bool:
         """
@@ -44,14 +275,17 @@ class Stats:
         """
         return name in self._names_used
 
-    def _check_name_allowed(self, name: str):
+    def _check_name_allowed(self, name: str, kind: str = None):
         """
         Check if the name is allowed (not a reserved word and valid format).
         The name must consist of lowercase letters, digits, and underscores only.
-        The reserved words are: timer, counter, ratio, attribute (and their plural forms).
+        The reserved words are: timer, counter, ratio, attribute, sketch, window, topk, unique, derived (and their plural forms).
+        Names whose dynamic methods would be shadowed by a method of the class, such as a counter
+        named "many" (incr_many) or a timer named "timer_percentile" (get_timer_percentile), are not allowed either.
 
         Args:
             name (str): The name to check.
+            kind (str, optional): The kind of the new item, a key of DYNAMIC_METHODS. Defaults to checking the dynamic methods of every kind.
         
         Returns:
             None
@@ -64,11 +298,19 @@ class Stats:
             >>> stats._check_name_allowed("valid_name")  # No exception
             >>> stats._check_name_allowed("timer")
         """
-        forbidden = ["timer", "counter", "ratio", "attribute", "timers", "counters", "ratios", "attributes"]
+        forbidden = ["timer", "counter", "ratio", "attribute", "sketch", "window", "topk", "unique", "derived",
+                     "timers", "counters", "ratios", "attributes", "sketches", "windows", "topks", "uniques"]
         if name in forbidden:
-            raise NameNotAllowed(f"Name '{name}' is not allowed as it is a reserved word (timer, counter, ratio, attribute are reserved).")
+            raise NameNotAllowed(f"Name '{name}' is not allowed as it is a reserved word (timer, counter, ratio, attribute, sketch, window, topk, unique, derived are reserved).")
         if not re.match(r'^[a-z0-9_]+$', name):
             raise NameNotAllowed(f"Name '{name}' contains invalid characters. Only lowercase letters, digits, and underscores are allowed.")
+        cls = type(self)
+        kinds = [kind] if kind else DYNAMIC_METHODS
+        for prefix in {prefix for kind in kinds for prefix in DYNAMIC_METHODS[kind]}:
+            method = f'{prefix}_{name}'
+            attribute = getattr(cls, method, None)
+            if attribute is not None and not _is_dynamic(attribute):
+                raise NameNotAllowed(f"Name '{name}' is not allowed as its dynamic method {method}() would be shadowed by the method of {cls.__name__} with that name.")
 
     def _check_name_unique(self, name: str):
         """ 
@@ -88,17 +330,184 @@ class Stats:
         if self.is_used(name):
             raise NameExists(f"Name '{name}' already exists. Names cannot be repeated across timers, counters, ratios, and attributes.")
 
-    def set_timer(self, name: str, label: str = None):
+    def _register(self, name: str, kind: str):
+        """
+        Mark a name as used by an item of the given kind, which enables its dynamic methods.
+
+        The dynamic methods are installed on the class the first time the name is used, and
+        shared by all its instances. Nothing is stored on the instance. While all the instances
+        of the class use the name for the same kind of item, they are plain functions calling
+        the named method; once another kind uses it, they resolve the kind on every lookup.
+
+        Args:
+            name (str): The name of the new item.
+            kind (str): A key of DYNAMIC_METHODS, such as 'timer' or 'counter'.
+        """
+        self._names_used.add(name)
+        self._kinds[name] = kind
+        cls = type(self)
+        known = _dynamic_kinds.setdefault(name, kind)
+        if known == kind:
+            for prefix in DYNAMIC_METHODS[kind]:
+                attribute = f'{prefix}_{name}'
+                if attribute not in cls.__dict__:
+                    setattr(cls, attribute, _named_method(prefix, name, kind, cls._dispatch[prefix][kind]))
+            return
+        _dynamic_kinds[name] = None
+        prefixes = set(DYNAMIC_METHODS[kind])
+        if known is not None:
+            prefixes.update(DYNAMIC_METHODS[known])
+        classes = [Stats]
+        for klass in classes:
+            classes.extend(klass.__subclasses__())
+            for prefix in prefixes:
+                attribute = f'{prefix}_{name}'
+                if klass is cls or attribute in klass.__dict__:
+                    if not isinstance(klass.__dict__.get(attribute), _DynamicMethod):
+                        setattr(klass, attribute, _DynamicMethod(prefix, name))
+
+    def __dir__(self):
+        cls = type(self)
+        names = [name for name in super().__dir__() if not _is_dynamic(getattr(cls, name, None))]
+        for name, kind in self._kinds.items():
+            names.extend(f'{prefix}_{name}' for prefix in DYNAMIC_METHODS[kind])
+        return names
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = _dispatch_table(cls)
+
+    def _timer_handle(self, name: str) -> TimerHandle:
+        """
+        Create a handle for an existing timer, bound as directly as the storage allows.
+
+        Args:
+            name (str): The name of the timer.
+
+        Returns:
+            TimerHandle: The handle.
+        """
+        if self._concurrency is None:
+            return DictTimerHandle(self, name)
+        return TimerHandle(self, name)
+
+    def _counter_handle(self, name: str) -> CounterHandle:
+        """
+        Create a handle for an existing counter, bound as directly as the storage allows.
+
+        Args:
+            name (str): The name of the counter.
+
+        Returns:
+            CounterHandle: The handle.
+        """
+        if self._concurrency is None:
+            return DictCounterHandle(self, name)
+        return CounterHandle(self, name)
+
+    def _timer_recorder(self, name: str) -> Callable[[int, int], None]:
+        """
+        Create a function that adds a segment to an existing timer, bound as directly as the storage allows.
+
+        Args:
+            name (str): The name of the timer.
+
+        Returns:
+            Callable[[int, int], None]: Adds a segment given its start and stop times in nanoseconds.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+        """
+        if name not in self._timers:
+            raise NameNotExists(f"Timer '{name}' does not exist.")
+        timer = self._timers[name]
+        histogram = timer.get('histogram')
+
+        def record(start: int, stop: int):
+            timer['segments'] += 1
+            timer['elapsed_ns'] += stop - start
+            timer['stop'] = stop
+            if histogram is not None:
+                histogram.record(stop - start)
+        return record
+
+    def _recorder(self, name: str) -> Callable[[int, int], None]:
+        record = self._recorders.get(name)
+        if record is None:
+            sampler = self._samplers.get(name)
+            if sampler is None:
+                record = self._timer_recorder(name)
+            else:
+                record = self._sampled_recorder(name, sampler)
+            self._recorders[name] = record
+        return record
+
+    def _locked(self, record: Callable[[int, int], None]) -> Callable[[int, int], None]:
+        """Make a segment recorder hold the lock in "lock" and "sharded" concurrency modes."""
+        lock = self._lock
+        if lock is None:
+            return record
+
+        def locked_record(start: int, stop: int):
+            with lock:
+                record(start, stop)
+        return locked_record
+
+    def _sampled_recorder(self, name: str, sampler: Sampler) -> Callable[[int, int], None]:
+        """
+        Create a function that adds a kept segment to a sampled timer, scaled by the sample rate.
+
+        The histogram of the timer, if any, records the durations of the kept segments unscaled.
+        """
+        add_timer = self._add_timer
+        scale = sampler.scale_segment
+        histogram = self._timer_histograms().get(name)
+
+        def record(start: int, stop: int):
+            segments, elapsed = scale(stop - start)
+            add_timer(name, segments, elapsed)
+            if histogram is not None:
+                histogram.record(stop - start)
+        return record
+
+    def _sampler(self, sample_rate: float) -> Optional[Sampler]:
+        """
+        Create the sampler of a new timer or counter.
+
+        Returns:
+            Sampler: The sampler, or None if the sample rate is 1 and every event is recorded.
+
+        Raises:
+            ValueError: If the sample rate is not in (0, 1].
+        """
+        return Sampler(sample_rate) if sample_rate != 1 else None
+
+    def _register_sampler(self, name: str, sampler: Optional[Sampler]):
+        if sampler is not None:
+            self._samplers[name] = sampler
+
+    def set_timer(self, name: str, label: str = None, handle: bool = False,
+                  histogram: bool = False, sample_rate: float = 1.0) -> Optional[TimerHandle]:
         """
         Create a new timer with the given name.
 
         Args:
             name (str): The name of the timer.
             label (str, optional): The label for the timer. Defaults to the name if not provided.
+            handle (bool): If True, return a TimerHandle bound to the new timer. Defaults to False.
+            histogram (bool): If True, record the duration of every segment in a histogram,
+                so that percentiles can be read with get_timer_percentile. Defaults to False.
+            sample_rate (float): Fraction of the segments to measure, in (0, 1]. Below 1, each
+                segment is measured with that probability and counted 1 / sample_rate times;
+                see get_estimate for the error. Defaults to 1, every segment.
+
+        Returns:
+            TimerHandle: The handle, if requested. Otherwise None.
 
         Raises:
             NameNotAllowed: If the name is a reserved word or has invalid format.
             NameExists: If the name is already used.
+            ValueError: If sample_rate is not in (0, 1].
         
         Examples:
             >>> stats = Stats()
@@ -108,19 +517,25 @@ class Stats:
             >>> stats.stop_load_time()
             >>> elapsed = stats.get_load_time()
             >>> print(f"Elapsed time: {elapsed} seconds")
+            >>> stats.set_timer("db_query", histogram=True)
+            >>> p99 = stats.get_timer_percentile("db_query", 99)
+            >>> stats.set_timer("parse", sample_rate=0.01)  # Measure 1% of the segments
         """
-        self._check_name_allowed(name)
+        self._check_name_allowed(name, 'timer')
         self._check_name_unique(name)
+        sampler = self._sampler(sample_rate)
         if label is None:
             label = name
-        self._timers[name] = {'start': None, 'stop': None, 'segments': 0, 'elapsed': 0.0, 'label': label}
-        self._names_used.add(name)
-        # Add dynamic methods
-        setattr(self, f'get_{name}', lambda: self.get_timer(name))
-        setattr(self, f'start_{name}', lambda: self.start_timer(name))
-        setattr(self, f'stop_{name}', lambda: self.stop_timer(name))
+        self._timers[name] = {'start': None, 'stop': None, 'segments': 0, 'elapsed_ns': 0, 'label': label}
+        if histogram:
+            self._timers[name]['histogram'] = Histogram()
+        self._register_sampler(name, sampler)
+        self._register(name, 'timer')
+        if handle:
+            return self._timer_handle(name) if sampler is None else TimerHandle(self, name)
 
-    def set_counter(self, name: str, value: int = 0, unit: str = "item", label: str = None):
+    def set_counter(self, name: str, value: int = 0, unit: str = "item", label: str = None,
+                    handle: bool = False, sample_rate: float = 1.0) -> Optional[CounterHandle]:
         """
         Create a new counter with the given name, initial value, and unit.
 
@@ -129,10 +544,18 @@ class Stats:
             value (int): The initial value. Defaults to 0.
             unit (str): The unit of the counter. Defaults to "item".
             label (str, optional): The label for the counter. Defaults to the name if not provided.
+            handle (bool): If True, return a CounterHandle bound to the new counter. Defaults to False.
+            sample_rate (float): Fraction of the increments and decrements to record, in (0, 1].
+                Below 1, each one is recorded with that probability and scaled by 1 / sample_rate;
+                see get_estimate for the error. Defaults to 1, every increment.
+
+        Returns:
+            CounterHandle: The handle, if requested. Otherwise None.
 
         Raises:
             NameNotAllowed: If the name is a reserved word or has invalid format.
             NameExists: If the name is already used.
+            ValueError: If sample_rate is not in (0, 1].
         Example:
             >>> stats = Stats()
             >>> stats.set_counter("requests", value=10, unit="requests", label="Total Requests")
@@ -147,18 +570,22 @@ class Stats:
             >>> stats.reset_requests()
             >>> stats.get_requests()
             0
+            >>> errors = stats.set_counter("errors", handle=True)
+            >>> errors.incr()
+            >>> errors.get()
+            1
+            >>> hits = stats.set_counter("cache_hits", sample_rate=0.001, handle=True)
         """
-        self._check_name_allowed(name)
+        self._check_name_allowed(name, 'counter')
         self._check_name_unique(name)
+        sampler = self._sampler(sample_rate)
         if label is None:
             label = name
         self._counters[name] = {'value': value, 'unit': unit, 'label': label}
-        self._names_used.add(name)
-        # Add dynamic methods
-        setattr(self, f'get_{name}', lambda: self.get_counter(name))
-        setattr(self, f'incr_{name}', lambda amount=1: self.incr(name, amount))
-        setattr(self, f'decr_{name}', lambda amount=1: self.decr(name, amount))
-        setattr(self, f'reset_{name}', lambda value=0: self.reset_counter(name, value))
+        self._register_sampler(name, sampler)
+        self._register(name, 'counter')
+        if handle:
+            return self._counter_handle(name) if sampler is None else SampledCounterHandle(self, name, sampler)
 
     def set_ratio(self, name: str, numerator: str, denominator: str, label: str = None):
         """
@@ -166,8 +593,8 @@ class Stats:
 
         Args:
             name (str): The name of the ratio.
-            numerator (str): The name of the numerator counter.
-            denominator (str): The name of the denominator counter.
+            numerator (str): The name of the numerator counter or window counter.
+            denominator (str): The name of the denominator counter or window counter.
             label (str, optional): The label for the ratio. Defaults to the name if not provided.
 
         Raises:
@@ -185,7 +612,7 @@ class Stats:
             >>> rate = stats.get_success_rate()
             >>> print(f"Success Rate: {rate}")
         """
-        self._check_name_allowed(name)
+        self._check_name_allowed(name, 'ratio')
         self._check_name_unique(name)
         if not self.is_used(numerator):
             raise NameNotExists(f"Numerator '{numerator}' does not exist.")
@@ -194,9 +621,12 @@ class Stats:
         if label is None:
             label = name
         self._ratios[name] = {'numerator': numerator, 'denominator': denominator, 'value': 0.0, 'label': label}
-        self._names_used.add(name)
-        # Add dynamic method
-        setattr(self, f'get_{name}', lambda: self.get_ratio(name))
+        for operand in {numerator, denominator}:
+            self._ratios_of(operand).append(name)
+            if self._ratio_operand_polled(operand):
+                self._polled_operands.add(operand)
+        self._stale_ratios.add(name)
+        self._register(name, 'ratio')
 
     def set_attribute(self, name: str, value: Union[str, int, float] = "", label: str = None):
         """
@@ -225,248 +655,2145 @@ class Stats:
             >>> stats.get_pi_value()
             3.14159 
         """
-        self._check_name_allowed(name)
+        self._check_name_allowed(name, 'attribute')
         self._check_name_unique(name)
         if label is None:
             label = name
         self._attributes[name] = {'value': value, 'label': label}
-        self._names_used.add(name)
-        # Add dynamic method
-        setattr(self, f'get_{name}', lambda: self.get_attribute(name))
-        setattr(self, f'set_{name}', lambda value: self.set_attribute_value(name, value))
+        self._register(name, 'attribute')
 
-    def get_timer(self, name: str) -> float:
+    def set_sketch(self, name: str, relative_accuracy: float = 0.01, max_bins: int = 2048, label: str = None):
         """
-        Get the elapsed time in seconds for the timer.
+        Create a new quantile sketch with the given name.
 
-        Args:
-            name (str): The name of the timer.
+        A sketch summarizes the distribution of the observed values in bounded memory.
+        Unlike percentiles, sketches can be merged: the sketches of many Stats instances,
+        for example one per worker, merge into the sketch of all their values.
 
-        Returns:
-            float: The elapsed time in seconds. Returns 0 if never started.
+        Args:
+            name (str): The name of the sketch.
+            relative_accuracy (float): Relative error of the quantiles, between 0 and 1. Defaults to 0.01.
+            max_bins (int): Maximum number of bins kept, which bounds memory. Defaults to 2048.
+            label (str, optional): The label for the sketch. Defaults to the name if not provided.
 
         Raises:
-            NameNotExists: If the timer does not exist.
+            NameNotAllowed: If the name is a reserved word or has invalid format.
+            NameExists: If the name is already used.
+            ValueError: If relative_accuracy is not between 0 and 1.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_sketch("latency", relative_accuracy=0.01)
+            >>> stats.observe_latency(0.120)
+            >>> stats.observe_latency(0.080)
+            >>> p99 = stats.get_latency(0.99)
         """
-        if name not in self._timers:
-            raise NameNotExists(f"Timer '{name}' does not exist.")
-        timer = self._timers[name]
-        elapsed = timer['elapsed']
-        if timer['start'] is not None:
-            elapsed += (datetime.now() - timer['start']).total_seconds()
-        return elapsed
+        self._check_name_allowed(name, 'sketch')
+        self._check_name_unique(name)
+        if label is None:
+            label = name
+        self._sketches[name] = {'sketch': DDSketch(relative_accuracy, max_bins), 'label': label}
+        self._register(name, 'sketch')
 
-    def start_timer(self, name: str):
+    def set_window_counter(self, name: str, window: float = 60.0, buckets: int = 60, label: str = None):
         """
-        Start the timer.
+        Create a new window counter, which counts the amounts added during the last window of time.
+
+        Unlike a counter, which grows from its creation, a window counter forgets the amounts
+        added before the window, for example to count the requests of the last minute. The
+        window is a ring of time buckets that expire lazily on the next increment or read.
+        Window counters can be the numerator or denominator of a ratio, for windowed rates.
+
+        In "lock" and "sharded" concurrency modes increments of window counters take the lock.
 
         Args:
-            name (str): The name of the timer.
+            name (str): The name of the window counter.
+            window (float): Duration of the window in seconds. Defaults to 60.
+            buckets (int): Number of time buckets in the window. Defaults to 60. The window
+                moves by window / buckets seconds at a time.
+            label (str, optional): The label for the window counter. Defaults to the name if not provided.
 
         Raises:
-            NameNotExists: If the timer does not exist.
-        """
-        if name not in self._timers:
-            raise NameNotExists(f"Timer '{name}' does not exist.")
-        timer = self._timers[name]
-        if timer['start'] is None:
-            timer['start'] = datetime.now()
-            timer['segments'] += 1
+            NameNotAllowed: If the name is a reserved word or has invalid format.
+            NameExists: If the name is already used.
+            ValueError: If the window is not positive, or buckets is less than 1.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_window_counter("recent_requests", window=60)
+            >>> stats.set_window_counter("recent_errors", window=60)
+            >>> stats.set_ratio("recent_error_rate", "recent_errors", "recent_requests")
+            >>> stats.incr_recent_requests()
+            >>> stats.get_recent_requests()  # Requests in the last 60 seconds
+            1
+            >>> stats.rate_recent_requests()  # Requests per second in the last 60 seconds
+            0.016666666666666666
+        """
+        self._check_name_allowed(name, 'window')
+        self._check_name_unique(name)
+        if label is None:
+            label = name
+        self._windows[name] = {'window': WindowCounter(window, buckets), 'label': label}
+        self._register(name, 'window')
 
-    def stop_timer(self, name: str):
+    def set_topk(self, name: str, capacity: int = 100, label: str = None):
         """
-        Stop the timer and accumulate elapsed time.
+        Create a new top-K metric, which finds the keys observed most in bounded memory.
+
+        Unlike one counter per key, whose number grows with the keys, a top-K metric counts
+        at most capacity keys with the Space-Saving algorithm. The heavy hitters are kept and
+        their counts overestimated by at most total / capacity, where total is the number of
+        observations. Top-K metrics can be merged, like sketches.
+
+        In "lock" and "sharded" concurrency modes observations of top-K metrics take the lock.
 
         Args:
-            name (str): The name of the timer.
+            name (str): The name of the top-K metric.
+            capacity (int): Number of keys counted. Defaults to 100. A larger capacity gives
+                smaller errors and keeps rarer keys, at the cost of memory.
+            label (str, optional): The label for the top-K metric. Defaults to the name if not provided.
 
         Raises:
-            NameNotExists: If the timer does not exist.
+            NameNotAllowed: If the name is a reserved word or has invalid format.
+            NameExists: If the name is already used.
+            ValueError: If capacity is less than 1.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_topk("tenants", capacity=100)
+            >>> stats.observe_tenants("acme")
+            >>> stats.observe_tenants("globex", 5)
+            >>> stats.get_tenants(1)
+            [HeavyHitter(key='globex', count=5, error=0)]
         """
-        if name not in self._timers:
-            raise NameNotExists(f"Timer '{name}' does not exist.")
-        timer = self._timers[name]
-        if timer['start'] is not None:
-            now = datetime.now()
-            timer['elapsed'] += (now - timer['start']).total_seconds()
-            timer['stop'] = now
-            timer['start'] = None
+        self._check_name_allowed(name, 'topk')
+        self._check_name_unique(name)
+        if label is None:
+            label = name
+        self._topks[name] = {'topk': TopK(capacity), 'label': label}
+        self._register(name, 'topk')
 
-    def get_counter(self, name: str) -> int:
+    def set_unique(self, name: str, precision: int = 14, label: str = None):
         """
-        Get the value of the counter.
+        Create a new distinct count, which estimates the number of distinct values added in bounded memory.
 
-        Args:
-            name (str): The name of the counter.
+        Unlike a set of the values, whose memory grows with them, a distinct count is a
+        HyperLogLog of 2 ** precision one-byte registers. Its relative standard error is
+        about 1.04 / sqrt(2 ** precision): 0.81% with the default precision of 14, in 16 KiB.
+        Distinct counts can be merged, like sketches, and can be used in derived metrics.
 
-        Returns:
-            int: The value of the counter.
+        In "lock" and "sharded" concurrency modes additions to distinct counts take the lock.
+
+        Args:
+            name (str): The name of the distinct count.
+            precision (int): Number of bits selecting a register, from 4 to 18. Defaults to 14.
+                Each extra bit doubles the memory and divides the error by sqrt(2).
+            label (str, optional): The label for the distinct count. Defaults to the name if not provided.
 
         Raises:
-            NameNotExists: If the counter does not exist.
-        """
-        if name not in self._counters:
-            raise NameNotExists(f"Counter '{name}' does not exist.")
-        return self._counters[name]['value']
+            NameNotAllowed: If the name is a reserved word or has invalid format.
+            NameExists: If the name is already used.
+            ValueError: If the precision is not between 4 and 18.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_unique("users", precision=14)
+            >>> stats.add_users("ana")
+            >>> stats.add_users("bo")
+            >>> stats.add_users("ana")
+            >>> stats.get_users()
+            2
+        """
+        self._check_name_allowed(name, 'unique')
+        self._check_name_unique(name)
+        if label is None:
+            label = name
+        self._uniques[name] = {'hll': HyperLogLog(precision), 'label': label}
+        self._register(name, 'unique')
 
-    def incr(self, name: str, amount: int = 1):
+    def set_derived(self, name: str, expression: str, label: str = None):
         """
-        Increment the counter by the given amount.
+        Create a new derived metric, computed from other items with an arithmetic expression.
+
+        The expression can use the names of counters, timers (elapsed seconds), ratios,
+        attributes with numeric values, window counters and other derived metrics, int and
+        float constants, parentheses and the operators + - * / // % **. Division by zero
+        gives 0.0, as in ratios. The expression is parsed, checked and compiled once, with
+        each name bound to its item, so reading the value does no parsing or name lookups.
 
         Args:
-            name (str): The name of the counter.
-            amount (int): The amount to increment. Defaults to 1.
+            name (str): The name of the derived metric.
+            expression (str): The expression, for example "(errors + timeouts) / requests".
+            label (str, optional): The label for the derived metric. Defaults to the name if not provided.
 
         Raises:
-            NameNotExists: If the counter does not exist.
-        """
-        if name not in self._counters:
-            raise NameNotExists(f"Counter '{name}' does not exist.")
-        self._counters[name]['value'] += amount
+            NameNotAllowed: If the name is a reserved word or has invalid format.
+            NameExists: If the name is already used.
+            NameNotExists: If the expression uses a name that does not exist.
+            ValueError: If the expression is invalid, or uses a sketch or a text attribute.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_counter("errors", 2)
+            >>> stats.set_counter("timeouts", 1)
+            >>> stats.set_counter("requests", 100)
+            >>> stats.set_derived("failure_rate", "(errors + timeouts) / requests")
+            >>> stats.get_failure_rate()
+            0.03
+            >>> stats.set_counter("bytes", unit="bytes")
+            >>> stats.set_timer("transfer")
+            >>> stats.set_derived("throughput", "bytes / transfer", label="Bytes per second")
+        """
+        self._check_name_allowed(name, 'derived')
+        self._check_name_unique(name)
+        parsed = Expression(expression)
+        for operand in parsed.names:
+            if not self.is_used(operand):
+                raise NameNotExists(f"Name '{operand}' of expression '{expression}' does not exist.")
+        function = parsed.bind({operand: self._value_getter(operand) for operand in parsed.names})
+        if label is None:
+            label = name
+        self._derived[name] = {'expression': parsed, 'function': function, 'label': label}
+        self._register(name, 'derived')
 
-    def decr(self, name: str, amount: int = 1):
+    def _value_getter(self, name: str) -> Callable[[], float]:
         """
-        Decrement the counter by the given amount.
+        Get a function without arguments that reads the numeric value of an item, bound as directly as the storage allows.
+
+        Raises:
+            ValueError: If the item has no single numeric value.
+        """
+        kind = self._kinds[name]
+        if kind == 'counter':
+            return self._counter_handle(name).get
+        if kind == 'timer':
+            return self._timer_handle(name).get
+        if kind == 'ratio':
+            return partial(self.get_ratio, name)
+        if kind == 'window':
+            return partial(self.get_window_counter, name)
+        if kind == 'unique':
+            return partial(self.get_unique, name)
+        if kind == 'derived':
+            return self._derived[name]['function']
+        if kind == 'attribute':
+            attribute = self._attributes[name]
+            if _numeric(attribute['value']):
+                return partial(attribute.__getitem__, 'value')
+        raise ValueError(f"'{name}' has no numeric value to use in an expression.")
+
+    def get_derived(self, name: str) -> float:
+        """
+        Get the value of the derived metric.
 
         Args:
-            name (str): The name of the counter.
-            amount (int): The amount to decrement. Defaults to 1.
+            name (str): The name of the derived metric.
+
+        Returns:
+            float: The value of the expression.
 
         Raises:
-            NameNotExists: If the counter does not exist.
+            NameNotExists: If the derived metric does not exist.
         """
-        if name not in self._counters:
-            raise NameNotExists(f"Counter '{name}' does not exist.")
-        self._counters[name]['value'] -= amount
+        if name not in self._derived:
+            raise NameNotExists(f"Derived metric '{name}' does not exist.")
+        return self._derived[name]['function']()
 
-    def reset_counter(self, name: str, value: int = 0):
+    def get_derived_values(self) -> dict:
         """
-        Reset the counter to the given value.
+        Get the values of all derived metrics.
 
-        Args:
-            name (str): The name of the counter.
-            value (int): The value to reset to. Defaults to 0.
+        Returns:
+            dict: {name: value}
+        """
+        return {name: derived['function']() for name, derived in self._derived.items()}
 
-        Raises:
-            NameNotExists: If the counter does not exist.
+    def get_derived_expressions(self) -> dict:
         """
-        if name not in self._counters:
-            raise NameNotExists(f"Counter '{name}' does not exist.")
-        self._counters[name]['value'] = value
+        Get the expressions of all derived metrics.
 
-    def set_counter_unit(self, name: str, unit: str):
+        Returns:
+            dict: {name: expression}
         """
-        Set the unit of the counter.
+        return {name: derived['expression'].text for name, derived in self._derived.items()}
+
+    def _window(self, name: str) -> WindowCounter:
+        if name not in self._windows:
+            raise NameNotExists(f"Window counter '{name}' does not exist.")
+        return self._windows[name]['window']
+
+    def incr_window(self, name: str, amount: int = 1):
+        """
+        Add an amount to the window counter, at the current time.
 
         Args:
-            name (str): The name of the counter.
-            unit (str): The new unit.
+            name (str): The name of the window counter.
+            amount (int): The amount. Defaults to 1.
 
         Raises:
-            NameNotExists: If the counter does not exist.
+            NameNotExists: If the window counter does not exist.
         """
-        if name not in self._counters:
-            raise NameNotExists(f"Counter '{name}' does not exist.")
-        self._counters[name]['unit'] = unit
+        window = self._window(name)
+        if self._lock is None:
+            window.incr(self._clock(), amount)
+        else:
+            with self._lock:
+                window.incr(self._clock(), amount)
 
-    def get_ratio(self, name: str) -> float:
+    def get_window_counter(self, name: str) -> int:
         """
-        Get the value of the ratio.
+        Get the sum of the amounts added to the window counter during the last window.
 
         Args:
-            name (str): The name of the ratio.
+            name (str): The name of the window counter.
 
         Returns:
-            float: The ratio value. Returns 0 if denominator is 0.
+            int: The sum.
 
         Raises:
-            NameNotExists: If the ratio does not exist.
+            NameNotExists: If the window counter does not exist.
         """
-        if name not in self._ratios:
-            raise NameNotExists(f"Ratio '{name}' does not exist.")
-        ratio = self._ratios[name]
-        num_value = self.get_counter(ratio['numerator'])
-        den_value = self.get_counter(ratio['denominator'])
-        if den_value == 0:
-            return 0.0
-        return num_value / den_value
+        window = self._window(name)
+        if self._lock is None:
+            return window.sum(self._clock())
+        with self._lock:
+            return window.sum(self._clock())
 
-    def get_attribute(self, name: str) -> Union[str, int, float]:
+    def get_window_rate(self, name: str) -> float:
         """
-        Get the value of the attribute.
+        Get the average amount per second added to the window counter during the last window.
 
         Args:
-            name (str): The name of the attribute.
+            name (str): The name of the window counter.
 
         Returns:
-            Union[str, int, float]: The value of the attribute.
+            float: The sum divided by the window in seconds.
 
         Raises:
-            NameNotExists: If the attribute does not exist.
+            NameNotExists: If the window counter does not exist.
         """
-        if name not in self._attributes:
-            raise NameNotExists(f"Attribute '{name}' does not exist.")
-        return self._attributes[name]['value']
+        return self.get_window_counter(name) / self._window(name).window
 
-    def set_attribute_value(self, name: str, value: Union[str, int, float]):
+    def get_window_counters(self) -> dict:
         """
-        Set the value of the attribute.
+        Get all window counters.
+
+        Returns:
+            dict: {name: {'value': sum, 'rate': per second, 'window': seconds, 'label': str}}
+        """
+        windows = {}
+        for name, item in self._windows.items():
+            value = self.get_window_counter(name)
+            window = item['window'].window
+            windows[name] = {'value': value, 'rate': value / window, 'window': window, 'label': item['label']}
+        return windows
+
+    def _topk(self, name: str) -> TopK:
+        if name not in self._topks:
+            raise NameNotExists(f"Top-K metric '{name}' does not exist.")
+        return self._topks[name]['topk']
+
+    def observe_key(self, name: str, key: Hashable, amount: int = 1):
+        """
+        Count an occurrence of a key in the top-K metric.
 
         Args:
-            name (str): The name of the attribute.
-            value (Union[str, int, float]): The new value.
+            name (str): The name of the top-K metric.
+            key (Hashable): The key, for example a tenant id or an endpoint.
+            amount (int): The number of occurrences, at least 1. Defaults to 1.
 
         Raises:
-            NameNotExists: If the attribute does not exist.
+            NameNotExists: If the top-K metric does not exist.
+            ValueError: If amount is less than 1.
         """
-        if name not in self._attributes:
-            raise NameNotExists(f"Attribute '{name}' does not exist.")
-        self._attributes[name]['value'] = value
+        topk = self._topk(name)
+        if self._lock is None:
+            topk.observe(key, amount)
+        else:
+            with self._lock:
+                topk.observe(key, amount)
 
-    def get_timers(self) -> dict:
+    def get_top_keys(self, name: str, k: int = 10) -> List[HeavyHitter]:
         """
-        Get all timers.
+        Get the keys observed most by the top-K metric.
+
+        Args:
+            name (str): The name of the top-K metric.
+            k (int): Number of keys. Defaults to 10.
 
         Returns:
-            dict: A copy of the timers dictionary.
+            list: HeavyHitter(key, count, error) tuples, by decreasing count. The true count
+            of each key is between count - error and count.
+
+        Raises:
+            NameNotExists: If the top-K metric does not exist.
         """
-        return self._timers.copy()
+        topk = self._topk(name)
+        if self._lock is None:
+            return topk.top(k)
+        with self._lock:
+            return topk.top(k)
 
-    def get_counters(self) -> dict:
+    def get_topk(self, name: str) -> TopK:
         """
-        Get all counters.
+        Get a copy of the top-K metric, for example to send it to the process that merges all workers.
+
+        Args:
+            name (str): The name of the top-K metric.
 
         Returns:
-            dict: A copy of the counters dictionary.
+            TopK: A copy of the summary.
+
+        Raises:
+            NameNotExists: If the top-K metric does not exist.
         """
-        return self._counters.copy()
+        return self._topk(name).copy()
 
-    def get_ratios(self) -> dict:
+    def merge_topk(self, name: str, topk: TopK):
         """
-        Get all ratios.
+        Merge the keys of another summary into the top-K metric.
 
-        Returns:
-            dict: A copy of the ratios dictionary.
+        Args:
+            name (str): The name of the top-K metric.
+            topk (TopK): The summary to merge, for example from get_topk on another instance.
+
+        Raises:
+            NameNotExists: If the top-K metric does not exist.
         """
-        return self._ratios.copy()
+        self._topk(name).merge(topk)
 
-    def get_attributes(self) -> dict:
+    def get_topks(self) -> dict:
         """
-        Get all attributes.
+        Get all top-K metrics.
 
         Returns:
-            dict: A copy of the attributes dictionary.
+            dict: {name: {'top': [HeavyHitter, ...], 'total': observations, 'capacity': int, 'label': str}},
+            with every key counted, by decreasing count.
         """
-        return self._attributes.copy()
+        return {name: {'top': item['topk'].top(), 'total': item['topk'].total,
+                       'capacity': item['topk'].capacity, 'label': item['label']}
+                for name, item in self._topks.items()}
 
-    def timer_names(self) -> list:
-        """
-        Get the list of timer names.
+    def _unique(self, name: str) -> HyperLogLog:
+        if name not in self._uniques:
+            raise NameNotExists(f"Distinct count '{name}' does not exist.")
+        return self._uniques[name]['hll']
 
-        Returns:
-            list: A list of timer names.
+    def add_unique(self, name: str, value):
         """
-        return list(self._timers.keys())
+        Add a value to the distinct count.
+
+        Args:
+            name (str): The name of the distinct count.
+            value: The value, for example a user id or an IP address. Values are compared by
+                their text, or as is for bytes, so 1 and "1" are the same value.
+
+        Raises:
+            NameNotExists: If the distinct count does not exist.
+        """
+        hll = self._unique(name)
+        if self._lock is None:
+            hll.add(value)
+        else:
+            with self._lock:
+                hll.add(value)
+
+    def get_unique(self, name: str) -> int:
+        """
+        Get the estimated number of distinct values added to the distinct count.
+
+        Args:
+            name (str): The name of the distinct count.
+
+        Returns:
+            int: The estimate, within about 1.04 / sqrt(2 ** precision) of the true count, relatively.
+
+        Raises:
+            NameNotExists: If the distinct count does not exist.
+        """
+        hll = self._unique(name)
+        if self._lock is None:
+            return hll.count()
+        with self._lock:
+            return hll.count()
+
+    def get_hyperloglog(self, name: str) -> HyperLogLog:
+        """
+        Get a copy of the HyperLogLog of the distinct count, for example to send it to the process that merges all workers.
+
+        Args:
+            name (str): The name of the distinct count.
+
+        Returns:
+            HyperLogLog: A copy. Its to_bytes() encodes it in 2 ** precision + 1 bytes.
+
+        Raises:
+            NameNotExists: If the distinct count does not exist.
+        """
+        return self._unique(name).copy()
+
+    def merge_hyperloglog(self, name: str, hll: HyperLogLog):
+        """
+        Merge the values of another HyperLogLog into the distinct count.
+
+        Args:
+            name (str): The name of the distinct count.
+            hll (HyperLogLog): The HyperLogLog to merge, for example from get_hyperloglog on another instance.
+
+        Raises:
+            NameNotExists: If the distinct count does not exist.
+            ValueError: If the HyperLogLogs have a different precision.
+
+        Examples:
+            >>> fleet = Stats()
+            >>> fleet.set_unique("users")
+            >>> for worker in workers:
+            ...     fleet.merge_hyperloglog("users", worker.get_hyperloglog("users"))
+            >>> fleet.get_users()  # Distinct users seen by any worker
+        """
+        self._unique(name).merge(hll)
+
+    def get_uniques(self) -> dict:
+        """
+        Get all distinct counts.
+
+        Returns:
+            dict: {name: {'value': estimate, 'error': relative standard error, 'precision': int, 'label': str}}
+        """
+        return {name: {'value': self.get_unique(name), 'error': item['hll'].error,
+                       'precision': item['hll'].precision, 'label': item['label']}
+                for name, item in self._uniques.items()}
+
+    def _sketch(self, name: str) -> DDSketch:
+        if name not in self._sketches:
+            raise NameNotExists(f"Sketch '{name}' does not exist.")
+        return self._sketches[name]['sketch']
+
+    def observe(self, name: str, value: float):
+        """
+        Add a value to the sketch.
+
+        Args:
+            name (str): The name of the sketch.
+            value (float): The value, for example a latency in seconds.
+
+        Raises:
+            NameNotExists: If the sketch does not exist.
+        """
+        self._sketch(name).add(value)
+
+    def get_sketch_quantile(self, name: str, q: float) -> float:
+        """
+        Get a quantile of the values observed by the sketch.
+
+        Args:
+            name (str): The name of the sketch.
+            q (float): The quantile, between 0 and 1. For example 0.99 for the p99.
+
+        Returns:
+            float: The quantile, within the relative accuracy of the sketch. Returns 0 if nothing was observed.
+
+        Raises:
+            NameNotExists: If the sketch does not exist.
+            ValueError: If q is not between 0 and 1.
+        """
+        return self._sketch(name).quantile(q)
+
+    def get_sketch(self, name: str) -> DDSketch:
+        """
+        Get a copy of the sketch, for example to send it to the process that merges all workers.
+
+        Args:
+            name (str): The name of the sketch.
+
+        Returns:
+            DDSketch: A copy of the sketch.
+
+        Raises:
+            NameNotExists: If the sketch does not exist.
+        """
+        return self._sketch(name).copy()
+
+    def get_sketch_totals(self) -> dict:
+        """
+        Get the number and sum of the values observed by each sketch, without copying them.
+
+        The totals change whenever a value is observed, so comparing them with those of a
+        previous call tells which sketches to copy again with get_sketch.
+
+        Returns:
+            dict: {name: (count, sum)}
+        """
+        return {name: (sketch['sketch'].count, sketch['sketch'].sum) for name, sketch in self._sketches.items()}
+
+    def merge_sketch(self, name: str, sketch: DDSketch):
+        """
+        Merge the values of another sketch into the sketch.
+
+        Args:
+            name (str): The name of the sketch.
+            sketch (DDSketch): The sketch to merge, for example from get_sketch on another instance.
+
+        Raises:
+            NameNotExists: If the sketch does not exist.
+            ValueError: If the sketches have a different relative accuracy.
+
+        Examples:
+            >>> fleet = Stats()
+            >>> fleet.set_sketch("latency")
+            >>> for worker in workers:
+            ...     fleet.merge_sketch("latency", worker.get_sketch("latency"))
+            >>> p99 = fleet.get_latency(0.99)
+        """
+        self._sketch(name).merge(sketch)
+
+    def get_timer(self, name: str) -> float:
+        """
+        Get the elapsed time in seconds for the timer.
+
+        Args:
+            name (str): The name of the timer.
+
+        Returns:
+            float: The elapsed time in seconds. Returns 0 if never started.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+        """
+        if name not in self._timers:
+            raise NameNotExists(f"Timer '{name}' does not exist.")
+        timer = self._timers[name]
+        start = timer['start']
+        if start is None:
+            return timer['elapsed_ns'] / 1e9
+        return (timer['elapsed_ns'] + self._clock() - start) / 1e9
+
+    def start_timer(self, name: str) -> TimerToken:
+        """
+        Start a segment of the timer.
+
+        If the timer is not running, this starts it as usual: its elapsed time grows until
+        it is stopped. If it is already running because another thread or asyncio task
+        started it, a concurrent segment is opened instead of losing this one: it is
+        measured on its own and added to the timer when it stops. Starting a timer again
+        from the thread that started it while its segment is open does nothing.
+
+        A timer that is not running is only started: its token is reused by its next primary
+        segment, so keep it only until the segment stops. Only a start that finds the timer
+        running looks up the current thread or asyncio task and remembers the concurrent
+        segment in it with contextvars, so stop_timer(name) from the same thread or task
+        stops it. Pass the returned token to stop_timer to stop a segment from anywhere else.
+        Since the asyncio task that started a primary segment is not looked up, a task
+        starting the timer again while its own primary segment runs opens a concurrent one.
+
+        In "lock" and "sharded" concurrency modes starting and stopping segments hold the lock.
+        Without a concurrency mode, threads starting and stopping the same timer at the same
+        time can lose updates of its elapsed time.
+
+        Args:
+            name (str): The name of the timer.
+
+        Returns:
+            TimerToken: The segment.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+
+        Examples:
+            >>> async def handle(request):
+            ...     stats.start_db_query()  # Each task gets its own segment
+            ...     await run_query(request)
+            ...     stats.stop_db_query()
+        """
+        lock = self._lock
+        if lock is not None:
+            lock.acquire()
+        try:
+            if self._samplers and name in self._samplers:
+                return self._start_sampled(name)
+            now = self._start_primary(name)
+            if now is None:
+                return self._start_concurrent(name)
+            return self._primary_started(name, now)
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def _primary_started(self, name: str, now: int) -> TimerToken:
+        """Open the token of the primary segment that just started, reusing the token of the previous one."""
+        token = self._primary_segments.get(name)
+        if token is None:
+            token = self._primary_segments[name] = TimerToken(name, now, True)
+        else:
+            token.start = now
+            token.closed = False
+        token._owner = get_ident()
+        return token
+
+    def _start_concurrent(self, name: str) -> TimerToken:
+        """
+        Open a concurrent segment of a running timer.
+
+        Returns the segment the current thread or task already has instead: its open concurrent
+        segment, or the primary segment if the thread started it outside of an event loop.
+        """
+        segments = _open_segments.get()
+        key = (self._context_key, name)
+        token = segments.get(key)
+        if token is not None and not token.closed:
+            return token
+        primary = self._primary_segments.get(name)
+        if primary is not None and not primary.closed and primary._owner == _current_owner():
+            return primary
+        token = TimerToken(name, self._clock(), False)
+        self._in_flight[name] = self._in_flight.get(name, 0) + 1
+        segments = dict(segments)
+        segments[key] = token
+        _open_segments.set(segments)
+        return token
+
+    def stop_timer(self, name: Union[str, TimerToken]):
+        """
+        Stop a segment of the timer and accumulate its elapsed time.
+
+        Given a name, this stops the segment started by the current thread or asyncio task,
+        or the primary segment of the timer if the current thread or task has none, which
+        is how timers started and stopped from different places always worked. Given a
+        token, this stops that segment. Stopping a segment twice does nothing.
+
+        Args:
+            name (Union[str, TimerToken]): The name of the timer, or a token returned by start_timer.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+        """
+        lock = self._lock
+        if lock is not None:
+            lock.acquire()
+        try:
+            if isinstance(name, TimerToken) or self._in_flight.get(name) or (
+                    self._samplers and name in self._samplers):
+                self._stop_segment(name)
+            else:
+                self._stop_primary(name)
+                primary = self._primary_segments.get(name)
+                if primary is not None:
+                    primary.closed = True
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def _stop_segment(self, name: Union[str, TimerToken]):
+        """Stop a segment given by token, a sampled segment or a concurrent segment of the current context."""
+        if isinstance(name, TimerToken):
+            if self._samplers and name.name in self._samplers:
+                return self._stop_sampled(name)
+            token, name = name, name.name
+        elif self._samplers and name in self._samplers:
+            return self._stop_sampled(name)
+        else:
+            token = _open_segments.get().get((self._context_key, name))
+            if token is not None and token.closed:
+                token = None
+        if token is None or token.primary:
+            if token is None or not token.closed:
+                self._stop_primary(name)
+                primary = self._primary_segments.get(name)
+                if primary is not None:
+                    primary.closed = True
+            return
+        if not token.closed:
+            token.closed = True
+            self._in_flight[name] -= 1
+            self._recorder(name)(token.start, self._clock())
+            segments = _open_segments.get()
+            key = (self._context_key, name)
+            if segments.get(key) is token:
+                segments = dict(segments)
+                del segments[key]
+                _open_segments.set(segments)
+
+    def _start_sampled(self, name: str) -> TimerToken:
+        """
+        Start a segment of a sampled timer, if the sampler keeps it.
+
+        Kept segments are concurrent segments: they are measured on their own and added,
+        scaled, when they stop. A skipped segment returns a shared closed token without
+        reading the clock, and stop_timer(name) then finds no segment to stop, without
+        looking in the contextvar unless kept segments are open.
+        """
+        if not self._samplers[name].sample():
+            return _SKIPPED_SEGMENT
+        token = TimerToken(name, self._clock(), False)
+        self._sampled_in_flight[name] = self._sampled_in_flight.get(name, 0) + 1
+        segments = dict(_open_segments.get())
+        segments[(self._context_key, name)] = token
+        _open_segments.set(segments)
+        return token
+
+    def _stop_sampled(self, name: Union[str, TimerToken]):
+        """Stop a kept segment of a sampled timer and add it, scaled. Does nothing for skipped segments."""
+        if isinstance(name, TimerToken):
+            token = name
+        elif self._sampled_in_flight.get(name):
+            token = _open_segments.get().get((self._context_key, name))
+        else:
+            return
+        if token is None or token.closed:
+            return
+        token.closed = True
+        self._sampled_in_flight[token.name] -= 1
+        self._recorder(token.name)(token.start, self._clock())
+        segments = _open_segments.get()
+        key = (self._context_key, token.name)
+        if segments.get(key) is token:
+            segments = dict(segments)
+            del segments[key]
+            _open_segments.set(segments)
+
+    def get_timer_in_flight(self, name: str) -> int:
+        """
+        Get the number of running segments of the timer: its primary segment and the open concurrent segments.
+
+        Args:
+            name (str): The name of the timer.
+
+        Returns:
+            int: The number of running segments.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+        """
+        return int(self._timer_running(name)) + self._in_flight.get(name, 0)
+
+    def _timer_running(self, name: str) -> bool:
+        """
+        Check whether the primary segment of the timer is running.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+        """
+        if name not in self._timers:
+            raise NameNotExists(f"Timer '{name}' does not exist.")
+        return self._timers[name]['start'] is not None
+
+    def _start_primary(self, name: str) -> Optional[int]:
+        """
+        Start the primary segment of the timer, if it is not running.
+
+        Returns:
+            int: The start time in nanoseconds, or None if the timer was already running.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+        """
+        if name not in self._timers:
+            raise NameNotExists(f"Timer '{name}' does not exist.")
+        timer = self._timers[name]
+        if timer['start'] is None:
+            now = timer['start'] = self._clock()
+            timer['segments'] += 1
+            return now
+        return None
+
+    def _stop_primary(self, name: str):
+        """
+        Stop the primary segment of the timer, if it is running.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+        """
+        if name not in self._timers:
+            raise NameNotExists(f"Timer '{name}' does not exist.")
+        timer = self._timers[name]
+        start = timer['start']
+        if start is not None:
+            now = self._clock()
+            timer['elapsed_ns'] += now - start
+            timer['stop'] = now
+            timer['start'] = None
+            histogram = timer.get('histogram')
+            if histogram is not None:
+                histogram.record(now - start)
+
+    def time(self, name: str, tags: Mapping = None) -> TimerContext:
+        """
+        Get a context manager that adds the time spent in its block to the timer, as one segment.
+
+        The timer is resolved once, when the context manager is created. The duration is added
+        even if the block raises, and blocks can nest or overlap, since they do not use the
+        start and stop state of the timer.
+
+        Args:
+            name (str): The name of the timer.
+            tags (Mapping[str, str], optional): Dimensions of the segments, such as {"table": "users"}.
+                The timer and its series for these tags are updated. See get_series.
+
+        Returns:
+            TimerContext: The context manager. It can be reused, also by several threads or asyncio tasks at once.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_timer("db_query")
+            >>> with stats.time("db_query"):
+            ...     run_query()
+        """
+        record = self._locked(self._recorder(name) if tags is None else self._tagged_recorder(name, tags))
+        sampler = self._samplers.get(name)
+        if sampler is not None:
+            return SampledTimerContext(name, record, self._clock, sampler)
+        return TimerContext(name, record, self._clock)
+
+    def timed(self, name: str, tags: Mapping = None) -> Callable:
+        """
+        Get a decorator that adds the duration of every call of the function to the timer, as one segment.
+
+        The timer is resolved once, when the function is decorated. Each call only reads the
+        clock twice and adds the duration, also when the function raises. Calls from several
+        threads and recursive calls are measured independently. Coroutine functions are
+        measured until the coroutine finishes.
+
+        Args:
+            name (str): The name of the timer.
+            tags (Mapping[str, str], optional): Dimensions of the calls. See time.
+
+        Returns:
+            Callable: The decorator.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_timer("handler")
+            >>> @stats.timed("handler")
+            ... def handle(request):
+            ...     ...
+        """
+        record = self._locked(self._recorder(name) if tags is None else self._tagged_recorder(name, tags))
+        clock = self._clock
+        sampler = self._samplers.get(name)
+        if sampler is not None:
+            return self._sampled_timed(record, sampler)
+
+        def decorator(function: Callable) -> Callable:
+            if inspect.iscoroutinefunction(function):
+                @wraps(function)
+                async def timed_coroutine(*args, **kwargs):
+                    start = clock()
+                    try:
+                        return await function(*args, **kwargs)
+                    finally:
+                        record(start, clock())
+                return timed_coroutine
+
+            @wraps(function)
+            def timed_function(*args, **kwargs):
+                start = clock()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    record(start, clock())
+            return timed_function
+        return decorator
+
+    def _sampled_timed(self, record: Callable[[int, int], None], sampler: Sampler) -> Callable:
+        """Get the decorator of timed() for a sampled timer: calls the sampler skips are not measured."""
+        clock = self._clock
+        sample = sampler.sample
+
+        def decorator(function: Callable) -> Callable:
+            if inspect.iscoroutinefunction(function):
+                @wraps(function)
+                async def timed_coroutine(*args, **kwargs):
+                    if not sample():
+                        return await function(*args, **kwargs)
+                    start = clock()
+                    try:
+                        return await function(*args, **kwargs)
+                    finally:
+                        record(start, clock())
+                return timed_coroutine
+
+            @wraps(function)
+            def timed_function(*args, **kwargs):
+                if not sample():
+                    return function(*args, **kwargs)
+                start = clock()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    record(start, clock())
+            return timed_function
+        return decorator
+
+    def get_timer_percentile(self, name: str, q: float) -> float:
+        """
+        Get a percentile of the segment durations of a timer created with histogram=True.
+
+        Args:
+            name (str): The name of the timer.
+            q (float): The percentile, between 0 and 100. For example 99 for the p99 latency.
+
+        Returns:
+            float: The percentile in seconds, within about 3%. Returns 0 if no segment was completed.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+            ValueError: If the timer has no histogram or q is not between 0 and 100.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_timer("db_query", histogram=True)
+            >>> # ... start and stop the timer many times ...
+            >>> p50 = stats.get_timer_percentile("db_query", 50)
+            >>> p99 = stats.get_timer_percentile("db_query", 99)
+        """
+        return self._timer_histogram(name).percentile(q) / 1e9
+
+    def _timer_histogram(self, name: str) -> Histogram:
+        """
+        Get the histogram of a timer.
+
+        Raises:
+            NameNotExists: If the timer does not exist.
+            ValueError: If the timer has no histogram.
+        """
+        if name not in self._timers:
+            raise NameNotExists(f"Timer '{name}' does not exist.")
+        histogram = self._timers[name].get('histogram')
+        if histogram is None:
+            raise ValueError(f"Timer '{name}' was not created with histogram=True.")
+        return histogram
+
+    def _timer_histograms(self) -> dict:
+        """
+        Get the histograms of the timers created with histogram=True.
+
+        Returns:
+            dict: {name: Histogram}
+        """
+        return {name: timer['histogram'] for name, timer in self._timers.items() if 'histogram' in timer}
+
+    def get_timer_histograms(self) -> dict:
+        """
+        Get the histograms of the timers created with histogram=True.
+
+        Returns:
+            dict: {name: Histogram}, with a copy of each histogram. Values are durations in nanoseconds.
+        """
+        return {name: histogram.copy() for name, histogram in self._timer_histograms().items()}
+
+    def get_timer_histogram(self, name: str) -> Histogram:
+        """
+        Get a copy of the histogram of a timer created with histogram=True.
+
+        Args:
+            name (str): The name of the timer.
+
+        Returns:
+            Histogram: A copy of the histogram. Values are durations in nanoseconds.
+
+        Raises:
+            NameNotExists: If there is no timer with a histogram with that name.
+        """
+        histogram = self._timer_histograms().get(name)
+        if histogram is None:
+            raise NameNotExists(f"Timer '{name}' with a histogram does not exist.")
+        return histogram.copy()
+
+    def get_timer_histogram_totals(self) -> dict:
+        """
+        Get the number and sum of the durations recorded by each timer histogram, without copying them.
+
+        The totals change whenever a duration is recorded, so comparing them with those of a
+        previous call tells which histograms to copy again with get_timer_histogram.
+
+        Returns:
+            dict: {name: (count, sum in nanoseconds)}
+        """
+        return {name: (histogram.count, histogram.sum) for name, histogram in self._timer_histograms().items()}
+
+    def get_counter(self, name: str) -> int:
+        """
+        Get the value of the counter.
+
+        Args:
+            name (str): The name of the counter.
+
+        Returns:
+            int: The value of the counter.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+        """
+        if name not in self._counters:
+            raise NameNotExists(f"Counter '{name}' does not exist.")
+        if not self._shards:
+            return self._counters[name]['value']
+        with self._lock:
+            # Shards of dead threads are folded into the base values under the lock, so they are read under it too
+            value = self._counters[name]['value']
+            for _, shard in self._shards:
+                value += shard.get(name, 0)
+        return value
+
+    def incr(self, name: str, amount: int = 1, tags: Mapping = None):
+        """
+        Increment the counter by the given amount.
+
+        Args:
+            name (str): The name of the counter.
+            amount (int): The amount to increment. Defaults to 1.
+            tags (Mapping[str, str], optional): Dimensions of the increment, such as {"status": "200"}.
+                The counter and its series for these tags are incremented. See get_series.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+            NameNotAllowed: If a tag name is not valid.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_counter("requests")
+            >>> stats.incr_requests(tags={"status": "200"})
+            >>> stats.incr_requests(tags={"status": "500"})
+            >>> stats.get_requests()
+            2
+        """
+        if tags is not None:
+            return self._add_tagged(name, amount, tags)
+        if self._samplers and name in self._samplers:
+            return self._add_sampled(name, amount)
+        if name not in self._counters:
+            raise NameNotExists(f"Counter '{name}' does not exist.")
+        if self._concurrency is None:
+            self._counters[name]['value'] += amount
+        else:
+            self._add_concurrent(name, amount)
+        ratios = self._ratio_index.get(name)
+        if ratios:
+            self._stale_ratios.update(ratios)
+
+    def decr(self, name: str, amount: int = 1, tags: Mapping = None):
+        """
+        Decrement the counter by the given amount.
+
+        Args:
+            name (str): The name of the counter.
+            amount (int): The amount to decrement. Defaults to 1.
+            tags (Mapping[str, str], optional): Dimensions of the decrement. See incr.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+            NameNotAllowed: If a tag name is not valid.
+        """
+        if tags is not None:
+            return self._add_tagged(name, -amount, tags)
+        if self._samplers and name in self._samplers:
+            return self._add_sampled(name, -amount)
+        if name not in self._counters:
+            raise NameNotExists(f"Counter '{name}' does not exist.")
+        if self._concurrency is None:
+            self._counters[name]['value'] -= amount
+        else:
+            self._add_concurrent(name, -amount)
+        ratios = self._ratio_index.get(name)
+        if ratios:
+            self._stale_ratios.update(ratios)
+
+    def reset_counter(self, name: str, value: int = 0):
+        """
+        Reset the counter to the given value.
+
+        Args:
+            name (str): The name of the counter.
+            value (int): The value to reset to. Defaults to 0.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+        """
+        if name not in self._counters:
+            raise NameNotExists(f"Counter '{name}' does not exist.")
+        if name in self._samplers:
+            self._samplers[name].reset()
+        if name in self._series:
+            self._series[name].reset()
+        if self._concurrency is None:
+            self._counters[name]['value'] = value
+        else:
+            with self._lock:
+                # Shards are only written by their own threads, so the reset is stored as an offset in the base value.
+                for _, shard in self._shards:
+                    value -= shard.get(name, 0)
+                self._counters[name]['value'] = value
+        self._counters_written((name,))
+
+    def _add_sampled(self, name: str, amount: int):
+        """Add an amount to a sampled counter if the sampler keeps it, scaled by the sample rate."""
+        amount = self._samplers[name].sample_amount(amount)
+        if amount:
+            self._add_many({name: amount})
+
+    def get_estimate(self, name: str, z: float = 1.96) -> Estimate:
+        """
+        Get the value of a timer or counter with its error bound due to sampling.
+
+        For a metric created with a sample_rate below 1, the value is the estimate that all
+        reads return: the elapsed time of the kept segments, or the sum of the kept amounts,
+        scaled by 1 / sample_rate. It is unbiased, and the error is z times its standard
+        error, estimated from the kept events. For other metrics the error is 0.
+
+        The error covers the events sampled since the metric was created or reset. Values
+        added without sampling, with incr_many, record_many or merge, are exact and add no error.
+
+        Args:
+            name (str): The name of the timer or counter.
+            z (float): Number of standard errors in the error bound. Defaults to 1.96, a 95%
+                confidence interval; 2.58 gives 99%.
+
+        Returns:
+            Estimate: The value (elapsed seconds for a timer), error, sample rate and number of kept events.
+
+        Raises:
+            NameNotExists: If there is no timer or counter with that name.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_counter("cache_hits", sample_rate=0.01)
+            >>> for _ in range(1_000_000):
+            ...     stats.incr_cache_hits()
+            >>> estimate = stats.get_estimate("cache_hits")
+            >>> estimate.low <= 1_000_000 <= estimate.high  # 95% of the time
+            True
+        """
+        kind = self._kinds.get(name)
+        if kind == 'counter':
+            value = self.get_counter(name)
+        elif kind == 'timer':
+            value = self.get_timer(name)
+        else:
+            raise NameNotExists(f"Timer or counter '{name}' does not exist.")
+        sampler = self._samplers.get(name)
+        if sampler is None:
+            return Estimate(value, 0.0, 1.0, 0)
+        return Estimate(value, z * sampler.stderr(), sampler.rate, sampler.samples)
+
+    def _tag_slot(self, series: Series, tags) -> int:
+        """
+        Get the slot of a tag set in a series, interning the tag set if it is new.
+
+        Tag sets are not interned once the series is full, so unbounded tag values cannot grow memory.
+
+        Raises:
+            NameNotAllowed: If a tag name is not valid.
+        """
+        key = tuple(sorted(tags.items() if isinstance(tags, Mapping) else tags))
+        interned = self._tag_sets.get(key)
+        if interned is None:
+            for tag, _ in key:
+                if not isinstance(tag, str) or not _TAG_NAME.match(tag) or tag in _RESERVED_TAGS:
+                    raise NameNotAllowed(f"Tag name '{tag}' is not allowed. Use lowercase letters, digits and "
+                                         f"underscores, not starting with a digit, except {', '.join(_RESERVED_TAGS)}.")
+            text = tuple((tag, str(value)) for tag, value in key)  # As stored in the series
+            if text not in series and series.full:
+                return series.slot(OVERFLOW)
+            interned = tuple((sys.intern(tag), sys.intern(value)) for tag, value in text)
+            interned = self._tag_sets[key] = self._tag_sets.setdefault(interned, interned)
+        return series.slot(interned)
+
+    def _series_of(self, name: str, kind: str) -> Series:
+        """
+        Get the series of a timer or counter, creating it on the first tagged update.
+
+        Raises:
+            NameNotExists: If there is no item of that kind with that name.
+        """
+        if self._kinds.get(name) != kind:
+            raise NameNotExists(f"{kind.capitalize()} '{name}' does not exist.")
+        series = self._series.get(name)
+        if series is None:
+            series = Series(self._max_series.get(name, self.MAX_SERIES), timer=kind == 'timer')
+            self._series[name] = series
+        return series
+
+    def _add_tagged(self, name: str, amount: int, tags):
+        """
+        Add an amount to a counter and to its series for the tags, sampling it if the counter is sampled.
+
+        Series are not sharded: in "lock" and "sharded" concurrency modes, tagged increments
+        of all threads are serialized on the lock of the instance.
+        """
+        series = self._series_of(name, 'counter')
+        slot = self._tag_slot(series, tags)
+        sampler = self._samplers.get(name)
+        if sampler is not None:
+            amount = sampler.sample_amount(amount)
+            if not amount:
+                return
+        if self._lock is None:
+            series.values[slot] += amount
+        else:
+            with self._lock:
+                series.values[slot] += amount
+        self._add_many({name: amount})
+
+    def _tagged_recorder(self, name: str, tags) -> Callable[[int, int], None]:
+        """Create a function that adds a segment to a timer and to its series for the tags."""
+        series = self._series_of(name, 'timer')
+        slot = self._tag_slot(series, tags)
+        segments, elapsed = series.values, series.elapsed_ns
+        sampler = self._samplers.get(name)
+        if sampler is None:
+            total = self._recorder(name)
+
+            def record(start: int, stop: int):
+                total(start, stop)
+                segments[slot] += 1
+                elapsed[slot] += stop - start
+            return record
+
+        add_timer = self._add_timer
+        scale = sampler.scale_segment
+        histogram = self._timer_histograms().get(name)
+
+        def record_sampled(start: int, stop: int):
+            count, seconds = scale(stop - start)
+            add_timer(name, count, seconds)
+            segments[slot] += count
+            elapsed[slot] += round(seconds * 1e9)
+            if histogram is not None:
+                histogram.record(stop - start)
+        return record_sampled
+
+    def bind_tags(self, name: str, tags: Mapping) -> Union[CounterHandle, TimerContext]:
+        """
+        Resolve a tag set of a counter or timer once, for use in hot code paths.
+
+        The tag set is normalized, interned and given its slot in the series of the metric
+        when bound, so each update skips that work. In "lock" and "sharded" concurrency modes,
+        updates of the series hold the lock of the instance, as series are not sharded.
+
+        Args:
+            name (str): The name of the counter or timer.
+            tags (Mapping[str, str]): The tags, such as {"status": "200"}.
+
+        Returns:
+            Union[CounterHandle, TimerContext]: For a counter, a handle whose incr and decr update the
+            counter and its series for the tags, and whose get returns the value of the series.
+            For a timer, the context manager that time(name, tags) returns.
+
+        Raises:
+            NameNotExists: If there is no counter or timer with that name.
+            NameNotAllowed: If a tag name is not valid.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_counter("requests")
+            >>> ok = stats.bind_tags("requests", {"status": "200"})
+            >>> ok.incr()
+            >>> stats.get_series("requests")
+            {(('status', '200'),): 1}
+        """
+        if self._kinds.get(name) == 'timer':
+            return self.time(name, tags)
+        series = self._series_of(name, 'counter')
+        slot = self._tag_slot(series, tags)
+        total = self._counter_handle(name)
+        if type(total) is CounterHandle:  # The generic handle goes through incr, which samples
+            total = partial(self._add_amount, name)
+        else:
+            total = total.incr
+        return TaggedCounterHandle(self, name, series.tags(slot), series, slot, total, self._samplers.get(name), self._lock)
+
+    def _add_amount(self, name: str, amount: int):
+        """Add an amount to a counter, without sampling."""
+        self._add_many({name: amount})
+
+    def get_series(self, name: str) -> dict:
+        """
+        Get the values of a counter or timer by tag set.
+
+        Tag sets are tuples of (name, value) pairs sorted by name, with values as strings.
+        Updates with tags beyond the limit of set_max_series are in the (("overflow", "true"),)
+        tag set. Updates without tags are only in the total of the metric.
+
+        Args:
+            name (str): The name of the counter or timer.
+
+        Returns:
+            dict: {tags: value} for a counter, {tags: {'elapsed': seconds, 'segments': count}} for a timer.
+
+        Raises:
+            NameNotExists: If there is no counter or timer with that name.
+
+        Examples:
+            >>> stats.incr_requests(tags={"method": "GET", "status": 200})
+            >>> stats.get_series("requests")
+            {(('method', 'GET'), ('status', '200')): 1}
+        """
+        series = self._series.get(name)
+        if series is not None:
+            return series.items()
+        if self._kinds.get(name) not in ('counter', 'timer'):
+            raise NameNotExists(f"Timer or counter '{name}' does not exist.")
+        return {}
+
+    def set_max_series(self, name: str, max_series: int):
+        """
+        Set the maximum number of tag sets of a counter or timer. Defaults to Stats.MAX_SERIES, 100.
+
+        Updates with new tag sets beyond the limit go to the (("overflow", "true"),) tag set, so
+        an unbounded tag value, such as a user id, cannot grow memory without limit. Tag sets
+        already in use are kept when the limit is lowered.
+
+        Args:
+            name (str): The name of the counter or timer.
+            max_series (int): The limit, at least 1.
+
+        Raises:
+            NameNotExists: If there is no counter or timer with that name.
+            ValueError: If max_series is less than 1.
+        """
+        if self._kinds.get(name) not in ('counter', 'timer'):
+            raise NameNotExists(f"Timer or counter '{name}' does not exist.")
+        if max_series < 1:
+            raise ValueError("A metric needs room for at least 1 tag set.")
+        self._max_series[name] = max_series
+        if name in self._series:
+            self._series[name].max_series = max_series
+
+    def get_sample_rates(self) -> dict:
+        """
+        Get the sample rates of the timers and counters created with a sample_rate below 1.
+
+        Returns:
+            dict: {name: sample rate}
+        """
+        return {name: sampler.rate for name, sampler in self._samplers.items()}
+
+    def incr_many(self, mapping: Union[Mapping, Iterable]):
+        """
+        Increment several counters at once.
+
+        The increments are summed per name first, so each counter is looked up and
+        updated once, whatever the number of events in the batch. No counter is
+        updated if a name does not exist.
+
+        Args:
+            mapping: The increments, as a mapping of names to amounts, an iterable of names
+                (each name counts 1, for example a list or NumPy array of event names), or an
+                iterable of (name, amount) pairs.
+
+        Raises:
+            NameNotExists: If a counter does not exist.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_counter("hits")
+            >>> stats.set_counter("misses")
+            >>> stats.incr_many({"hits": 10, "misses": 2})
+            >>> stats.incr_many(["hits", "hits", "misses"])
+            >>> stats.incr_many([("hits", 5)])
+            >>> stats.get_hits()
+            17
+        """
+        self._add_many(_aggregate(mapping))
+
+    def _add_many(self, amounts: dict):
+        """
+        Add the amounts to their counters. Storage engines override this with their own layout.
+
+        Args:
+            amounts (dict): {name: amount}
+
+        Raises:
+            NameNotExists: If a counter does not exist. Nothing is added then.
+        """
+        counters = self._counters
+        for name in amounts:
+            if name not in counters:
+                raise NameNotExists(f"Counter '{name}' does not exist.")
+        if self._concurrency is None:
+            for name, amount in amounts.items():
+                counters[name]['value'] += amount
+        elif self._local is None:
+            with self._lock:
+                for name, amount in amounts.items():
+                    counters[name]['value'] += amount
+        else:
+            for name, amount in amounts.items():
+                self._add_concurrent(name, amount)
+        self._counters_written(amounts)
+
+    def record_many(self, name: str, values: Iterable):
+        """
+        Record a batch of values into a timer, sketch, distinct count or counter in one call.
+
+        For a timer, each value is the duration of a completed segment in seconds: the
+        segments and elapsed time are increased, and every duration is recorded in the
+        histogram of the timer if it has one. Whether the timer is running is not changed.
+        For a sketch, every value is observed. For a distinct count, every value is added.
+        For a counter, the sum of the values is added.
+
+        Args:
+            name (str): The name of the timer, sketch, distinct count or counter.
+            values (Iterable): The values, for example a list or a NumPy array.
+
+        Raises:
+            NameNotExists: If the name does not exist.
+            ValueError: If the name is a ratio or an attribute.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_timer("db_query")
+            >>> stats.record_many("db_query", [0.012, 0.020, 0.009])
+            >>> stats.get_timers()["db_query"]["segments"]
+            3
+        """
+        kind = self._kinds.get(name)
+        if kind is None:
+            raise NameNotExists(f"Name '{name}' does not exist.")
+        if kind == 'sketch':
+            self._sketch(name).add_many(values)
+            return
+        if kind == 'unique':
+            if self._lock is None:
+                self._unique(name).add_many(values)
+            else:
+                with self._lock:
+                    self._unique(name).add_many(values)
+            return
+        if kind not in ('timer', 'counter'):
+            raise ValueError(f"Cannot record values into {kind} '{name}'.")
+        if not hasattr(values, '__len__'):
+            values = list(values)
+        if kind == 'timer':
+            self._add_segments(name, values)
+        else:
+            self._add_many({name: operator.index(_count_and_sum(values)[1])})
+
+    def _add_segments(self, name: str, durations):
+        """
+        Add completed segments to a timer. Storage engines override this with their own layout.
+
+        Args:
+            name (str): The name of an existing timer.
+            durations: A sized iterable of segment durations in seconds.
+        """
+        timer = self._timers[name]
+        count, total = _count_and_sum(durations)
+        timer['segments'] += count
+        timer['elapsed_ns'] += round(total * 1e9)
+        histogram = timer.get('histogram')
+        if histogram is not None:
+            record = histogram.record
+            for duration in durations:
+                record(int(duration * 1e9))
+
+    def _add_timer(self, name: str, segments: int, elapsed: float):
+        """
+        Add segments and elapsed time to a timer. Storage engines override this with their own layout.
+
+        Args:
+            name (str): The name of an existing timer.
+            segments (int): Number of segments to add.
+            elapsed (float): Elapsed time to add, in seconds.
+        """
+        timer = self._timers[name]
+        timer['segments'] += segments
+        timer['elapsed_ns'] += round(elapsed * 1e9)
+
+    def merge(self, other: 'Stats') -> 'Stats':
+        """
+        Add the items of another Stats instance to this one.
+
+        Counter values, timer elapsed times and segments are summed, and timer histograms,
+        series by tag set, sketches, window counters, top-K metrics and distinct counts are merged. Window counters must use
+        the same clock. The elapsed time of a running timer of the other instance is included
+        up to now. Items that only exist in the other instance are created with
+        its labels and units. Ratios and derived metrics are created if missing and must
+        otherwise have the same definition. Attributes keep their value in this instance.
+
+        Nothing is changed if a conflict is found.
+
+        Args:
+            other (Stats): The instance to add. It can be of any Stats class and is not modified.
+
+        Returns:
+            Stats: This instance.
+
+        Raises:
+            MergeConflict: If a name is a different kind of item in each instance or is not allowed in
+                this one, or a counter has a different unit, a ratio a different definition, a timer
+                a histogram in only one instance or with another layout, a sketch a different relative
+                accuracy, a window counter other settings, a distinct count a different precision, or
+                a new derived metric uses an attribute without a numeric value in this instance.
+
+        Examples:
+            >>> total = Stats()
+            >>> for worker_stats in workers:
+            ...     total.merge(worker_stats)
+            >>> total.get_requests()
+        """
+        snapshot = other.snapshot()
+        kinds = self._kinds
+        histograms = other._timer_histograms()
+        units = other.get_counter_units()
+        new = other._kinds.keys() - kinds.keys()
+        self._check_merge(other, units, histograms, new)
+        labels = other.get_labels() if new else {}
+
+        amounts = {}
+        for name, value in snapshot.counters.items():
+            if name in new:
+                self.set_counter(name, value, units[name], labels[name])
+            else:
+                amounts[name] = value
+        self._add_many(amounts)
+        for name, timer in snapshot.timers.items():
+            if name in new:
+                self.set_timer(name, labels[name], histogram=name in histograms)
+            self._add_timer(name, timer.segments, timer.elapsed)
+            if name in histograms:
+                self._timer_histogram(name).merge(histograms[name])
+        for name, series in other._series.items():
+            self._series_of(name, other._kinds[name]).merge(series)
+        for name in other.sketch_names():
+            sketch = other._sketch(name)
+            if name in new:
+                self.set_sketch(name, sketch.relative_accuracy, sketch.max_bins, labels[name])
+            self._sketch(name).merge(sketch)
+        for name in other.window_counter_names():
+            window = other._window(name)
+            if name in new:
+                self.set_window_counter(name, window.window, window.buckets, labels[name])
+            self._window(name).merge(window)
+        for name in other.topk_names():
+            topk = other._topk(name)
+            if name in new:
+                self.set_topk(name, topk.capacity, labels[name])
+            self._topk(name).merge(topk)
+        for name in other.unique_names():
+            hll = other._unique(name)
+            if name in new:
+                self.set_unique(name, hll.precision, labels[name])
+            self._unique(name).merge(hll)
+        for name, value in snapshot.attributes.items():
+            if name in new:
+                self.set_attribute(name, value, labels[name])
+        for name, ratio in other._ratios.items():
+            if name in new:
+                self.set_ratio(name, ratio['numerator'], ratio['denominator'], labels[name])
+        for name, expression in other.get_derived_expressions().items():
+            if name in new:
+                self.set_derived(name, expression, labels[name])
+        return self
+
+    def _check_merge(self, other: 'Stats', units: dict, histograms: dict, new: set):
+        """
+        Find the conflicts that prevent merging another instance into this one.
+
+        Every check that can fail is done here, before anything is changed.
+
+        Args:
+            other (Stats): The instance to merge.
+            units (dict): The units of the counters of the other instance.
+            histograms (dict): The timer histograms of the other instance.
+            new (set): The names of the items that only exist in the other instance.
+
+        Raises:
+            MergeConflict: Describing the first conflict found.
+        """
+        kinds = self._kinds
+        if not other._kinds.items() <= kinds.items():  # Fast path: same names and kinds
+            for name, kind in other._kinds.items():
+                mine = kinds.get(name)
+                if mine is not None and mine != kind:
+                    raise MergeConflict(f"Name '{name}' is a {mine} in this Stats and a {kind} in the other.")
+        for name in new:
+            try:
+                self._check_name_allowed(name, other._kinds[name])
+            except NameNotAllowed as error:
+                raise MergeConflict(str(error)) from error
+        my_units = self.get_counter_units()
+        if not units.items() <= my_units.items():
+            for name, unit in units.items():
+                if my_units.get(name, unit) != unit:
+                    raise MergeConflict(f"Counter '{name}' has unit '{my_units[name]}' in this Stats "
+                                        f"and '{unit}' in the other.")
+        my_histograms = self._timer_histograms()
+        mismatched = (my_histograms.keys() ^ histograms.keys()) & kinds.keys() & set(other.timer_names())
+        if mismatched:
+            raise MergeConflict(f"Timer '{mismatched.pop()}' has a histogram in only one of the Stats.")
+        for name, histogram in histograms.items():
+            mine = my_histograms.get(name)
+            if mine is not None and (mine.precision, mine.max_value) != (histogram.precision, histogram.max_value):
+                raise MergeConflict(f"Timer '{name}' has a histogram with a different precision or maximum in each Stats.")
+        for name in other.sketch_names():
+            if name in kinds and self._sketch(name).relative_accuracy != other._sketch(name).relative_accuracy:
+                raise MergeConflict(f"Sketch '{name}' has a different relative accuracy in each Stats.")
+        for name in other.window_counter_names():
+            if name in kinds:
+                mine, theirs = self._window(name), other._window(name)
+                if (mine.window, mine.buckets) != (theirs.window, theirs.buckets):
+                    raise MergeConflict(f"Window counter '{name}' has a different window or buckets in each Stats.")
+        for name in other.unique_names():
+            if name in kinds and self._unique(name).precision != other._unique(name).precision:
+                raise MergeConflict(f"Distinct count '{name}' has a different precision in each Stats.")
+        for name, ratio in other._ratios.items():
+            mine = self._ratios.get(name)
+            if mine is not None and (mine['numerator'], mine['denominator']) != (ratio['numerator'], ratio['denominator']):
+                raise MergeConflict(f"Ratio '{name}' has a different definition in each Stats.")
+        for name, expression in other.get_derived_expressions().items():
+            mine = self._derived.get(name)
+            if mine is not None:
+                if mine['expression'].text != expression:
+                    raise MergeConflict(f"Derived metric '{name}' has a different expression in each Stats.")
+                continue
+            for operand in Expression(expression).names:  # Attributes keep the value of this instance
+                attribute = self._attributes.get(operand)
+                if attribute is not None and not _numeric(attribute['value']):
+                    raise MergeConflict(f"Derived metric '{name}' uses attribute '{operand}', "
+                                        f"which has no numeric value in this Stats.")
+
+    @classmethod
+    def reduce(cls, instances: Iterable['Stats'], **kwargs) -> 'Stats':
+        """
+        Merge many Stats instances into a new one.
+
+        The instances are merged one at a time into a single accumulator, so the only
+        allocations are the accumulator and one snapshot of the instance being merged.
+        instances can be a generator, for example one that decodes each worker's to_bytes().
+
+        Args:
+            instances (Iterable[Stats]): The instances to merge.
+            **kwargs: Arguments for the constructor of the class, such as clock or concurrency.
+
+        Returns:
+            Stats: A new instance of the class reduce is called on, holding the sum of all instances.
+
+        Raises:
+            MergeConflict: If two instances have conflicting items. See merge().
+
+        Examples:
+            >>> fleet = Stats.reduce(Stats.from_bytes(data) for data in worker_payloads)
+            >>> fleet.get_requests()
+        """
+        result = cls(**kwargs)
+        for stats in instances:
+            result.merge(stats)
+        return result
+
+    def _counters_written(self, names: Iterable[str]):
+        """Mark the ratios of the counters as stale, after writing them."""
+        index = self._ratio_index
+        if index:
+            stale = self._stale_ratios
+            for name in names:
+                ratios = index.get(name)
+                if ratios:
+                    stale.update(ratios)
+
+    def _ratios_of(self, name: str) -> list:
+        """
+        Get the ratios of an operand, the list that writes mark stale.
+
+        Handles bound to the counter value keep the list, so that they also mark the ratios
+        created after them.
+        """
+        return self._ratio_index.setdefault(name, [])
+
+    def _add_concurrent(self, name: str, amount: int):
+        """
+        Add amount to a counter in "lock" or "sharded" concurrency mode.
+
+        Args:
+            name (str): The name of an existing counter.
+            amount (int): The amount to add. May be negative.
+        """
+        if self._local is None:
+            with self._lock:
+                self._counters[name]['value'] += amount
+            return
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[name] += amount
+
+    def _new_shard(self) -> dict:
+        """
+        Create and register the counter shard of the calling thread.
+
+        Shards of threads that are no longer alive are folded into the base counter values.
+
+        Returns:
+            dict: The new shard, a mapping of counter names to deltas.
+        """
+        shard = defaultdict(int)
+        with self._lock:
+            live, dead = [], []
+            for entry in self._shards:
+                (live if entry[0].is_alive() else dead).append(entry)
+            live.append((threading.current_thread(), shard))
+            # Replaced, never mutated, so readers can check whether there are shards without locking.
+            self._shards = tuple(live)
+            for _, other in dead:
+                for name, delta in other.items():
+                    self._counters[name]['value'] += delta
+        self._local.shard = shard
+        return shard
+
+    def set_counter_unit(self, name: str, unit: str):
+        """
+        Set the unit of the counter.
+
+        Args:
+            name (str): The name of the counter.
+            unit (str): The new unit.
+
+        Raises:
+            NameNotExists: If the counter does not exist.
+        """
+        if name not in self._counters:
+            raise NameNotExists(f"Counter '{name}' does not exist.")
+        self._counters[name]['unit'] = unit
+
+    def get_counter_units(self) -> dict:
+        """
+        Get the units of all counters.
+
+        Returns:
+            dict: A dictionary mapping counter names to their units.
+        """
+        return {name: counter['unit'] for name, counter in self._counters.items()}
+
+    def get_ratio(self, name: str) -> float:
+        """
+        Get the value of the ratio.
+
+        Args:
+            name (str): The name of the ratio.
+
+        Returns:
+            float: The ratio value. Returns 0 if denominator is 0.
+
+        Raises:
+            NameNotExists: If the ratio does not exist.
+        """
+        if name not in self._ratios:
+            raise NameNotExists(f"Ratio '{name}' does not exist.")
+        ratio = self._ratios[name]
+        if self._polled_operands:
+            self._poll_ratio_operands((ratio['numerator'], ratio['denominator']))
+        if name in self._stale_ratios:
+            # Discarded before reading the operands, so a write meanwhile marks it stale again
+            self._stale_ratios.discard(name)
+            denominator = self._ratio_operand(ratio['denominator'])
+            ratio['value'] = self._ratio_operand(ratio['numerator']) / denominator if denominator else 0.0
+        return ratio['value']
+
+    def get_ratio_values(self) -> dict:
+        """
+        Get the values of all ratios in one pass.
+
+        Ratio values are cached. Writing a counter marks its ratios stale, and only the stale
+        ratios are computed again, reading each of their operands once, so reading thousands
+        of ratios over a few counters costs little more than copying their values. Window
+        counters, which also change as time passes, are read on every call to find changes.
+
+        Returns:
+            dict: {name: value}, where a ratio with a denominator of 0 is 0.0.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_counter("errors", 5)
+            >>> stats.set_counter("requests", 100)
+            >>> stats.set_ratio("error_rate", "errors", "requests")
+            >>> stats.get_ratio_values()
+            {'error_rate': 0.05}
+        """
+        self._update_ratios()
+        return {name: ratio['value'] for name, ratio in self._ratios.items()}
+
+    def _update_ratios(self):
+        """Refresh the cached value of the stale ratios, reading each of their operands once."""
+        if self._polled_operands:
+            self._poll_ratio_operands(self._polled_operands)
+        stale = self._stale_ratios
+        if stale:
+            names = list(stale)
+            stale.difference_update(names)  # Before reading, so a write meanwhile marks them stale again
+            ratios = self._ratios
+            values = {}
+            operand_value = self._ratio_operand
+            for name in names:
+                ratio = ratios[name]
+                numerator, denominator = ratio['numerator'], ratio['denominator']
+                if numerator not in values:
+                    values[numerator] = operand_value(numerator)
+                if denominator not in values:
+                    values[denominator] = operand_value(denominator)
+                ratio['value'] = values[numerator] / values[denominator] if values[denominator] else 0.0
+
+    def _poll_ratio_operands(self, operands: Iterable[str]):
+        """Read the polled ratio operands among the operands, and mark the ratios of those that changed as stale."""
+        polled = self._polled_operands
+        inputs = self._ratio_inputs
+        for operand in operands:
+            if operand in polled:
+                value = self._ratio_operand(operand)
+                if inputs.get(operand, _UNSET) != value:
+                    inputs[operand] = value
+                    self._stale_ratios.update(self._ratio_index[operand])
+
+    def _ratio_operand_polled(self, name: str) -> bool:
+        """Whether a ratio operand can change without a write that marks its ratios stale."""
+        return name in self._windows
+
+    def _ratio_operand(self, name: str) -> int:
+        if name in self._windows:
+            return self.get_window_counter(name)
+        return self.get_counter(name)
+
+    def get_attribute(self, name: str) -> Union[str, int, float]:
+        """
+        Get the value of the attribute.
+
+        Args:
+            name (str): The name of the attribute.
+
+        Returns:
+            Union[str, int, float]: The value of the attribute.
+
+        Raises:
+            NameNotExists: If the attribute does not exist.
+        """
+        if name not in self._attributes:
+            raise NameNotExists(f"Attribute '{name}' does not exist.")
+        return self._attributes[name]['value']
+
+    def set_attribute_value(self, name: str, value: Union[str, int, float]):
+        """
+        Set the value of the attribute.
+
+        Args:
+            name (str): The name of the attribute.
+            value (Union[str, int, float]): The new value.
+
+        Raises:
+            NameNotExists: If the attribute does not exist.
+        """
+        if name not in self._attributes:
+            raise NameNotExists(f"Attribute '{name}' does not exist.")
+        self._attributes[name]['value'] = value
+
+    def get_timers(self) -> dict:
+        """
+        Get all timers.
+
+        Returns:
+            dict: A copy of the timers dictionary and of each timer. For timers with a histogram, 'histogram' holds the
+            non-empty buckets as [(upper bound in seconds, count), ...].
+        """
+        timers = {name: dict(timer) for name, timer in self._timers.items()}
+        for timer in timers.values():
+            timer['elapsed'] = timer.pop('elapsed_ns') / 1e9
+            if 'histogram' in timer:
+                timer['histogram'] = _buckets_in_seconds(timer['histogram'])
+        return timers
+
+    def get_counters(self) -> dict:
+        """
+        Get all counters.
+
+        Returns:
+            dict: A copy of the counters dictionary and of each counter.
+        """
+        if self._shards:
+            with self._lock:
+                values = self._snapshot_counters()
+            return {name: dict(counter, value=values[name]) for name, counter in self._counters.items()}
+        return {name: dict(counter) for name, counter in self._counters.items()}
+
+    def get_ratios(self) -> dict:
+        """
+        Get all ratios.
+
+        Returns:
+            dict: A copy of the ratios dictionary and of each ratio, with the current value.
+        """
+        self._update_ratios()
+        return {name: dict(ratio) for name, ratio in self._ratios.items()}
+
+    def get_attributes(self) -> dict:
+        """
+        Get all attributes.
+
+        Returns:
+            dict: A copy of the attributes dictionary and of each attribute.
+        """
+        return {name: dict(attribute) for name, attribute in self._attributes.items()}
+
+    def snapshot(self) -> Snapshot:
+        """
+        Take an immutable snapshot of the values of all timers, counters, ratios and attributes.
+
+        The clock is read once: running timers include their elapsed time up to that instant.
+        Ratios are computed from the counter values of the snapshot, so they are consistent
+        with them. In "lock" concurrency mode no counter update can happen while the counters
+        are read.
+
+        Returns:
+            Snapshot: The values, as read-only mappings of names to values.
+
+        Examples:
+            >>> stats = Stats()
+            >>> stats.set_counter("requests", 10)
+            >>> snapshot = stats.snapshot()
+            >>> stats.incr_requests()
+            >>> snapshot.counters["requests"]
+            10
+        """
+        now = self._clock()
+        if self._lock is not None:
+            with self._lock:
+                counters = self._snapshot_counters()
+        else:
+            counters = self._snapshot_counters()
+        timers = self._snapshot_timers(now)
+        ratios = {}
+        for name, ratio in self._ratios.items():
+            numerator = counters.get(ratio['numerator'])
+            denominator = counters.get(ratio['denominator'])
+            if numerator is None or denominator is None:
+                ratios[name] = self.get_ratio(name)
+            else:
+                ratios[name] = numerator / denominator if denominator else 0.0
+        attributes = {name: attribute['value'] for name, attribute in self._attributes.items()}
+        return Snapshot(now, MappingProxyType(timers), MappingProxyType(counters),
+                        MappingProxyType(ratios), MappingProxyType(attributes))
+
+    def to_bytes(self) -> bytes:
+        """
+        Encode all timers, counters, ratio definitions, attributes and sketches in a compact binary format.
+
+        Names, labels and units are stored once in a string table, and values in fixed-size
+        records. The format is versioned, see prostata.StatsCodec. Window counters, the
+        ratios that use them, top-K metrics, distinct counts and derived metrics are not encoded,
+        nor the series by tag set and the sample rates of counters and timers.
+
+        Returns:
+            bytes: The encoded instance, for from_bytes().
+
+        Raises:
+            OverflowError: If a counter, timer, attribute or sketch value does not fit in its field.
+
+        Examples:
+            >>> data = stats.to_bytes()
+            >>> restored = Stats.from_bytes(data)
+            >>> restored.get_requests() == stats.get_requests()
+            True
+        """
+        return StatsCodec.encode(self)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, **kwargs) -> 'Stats':
+        """
+        Create an instance from the output of to_bytes(), with the dynamic methods of all items.
+
+        Running timers keep their start time, which is only meaningful with the same clock.
+
+        Args:
+            data (bytes): The encoded instance.
+            **kwargs: Arguments for the constructor of the class, such as clock or concurrency.
+
+        Returns:
+            Stats: A new instance of the class from_bytes is called on.
+
+        Raises:
+            ValueError: If the data is not encoded Stats, has an unsupported version or is truncated.
+        """
+        return StatsCodec.decode(data, cls(**kwargs))
+
+    def _restore_timer(self, name: str, start: Optional[int], stop: Optional[int], segments: int, elapsed_ns: int):
+        """
+        Set the state of a new timer. Storage engines override this with their own layout.
+
+        Args:
+            name (str): The name of the timer.
+            start (int, optional): Clock reading when the running segment started, None if stopped.
+            stop (int, optional): Clock reading of the last stop, None if never stopped.
+            segments (int): Number of segments.
+            elapsed_ns (int): Elapsed time of the completed segments in nanoseconds.
+        """
+        self._timers[name].update(start=start, stop=stop, segments=segments, elapsed_ns=elapsed_ns)
+
+    def _timer_elapsed_ns(self, name: str) -> int:
+        """
+        Get the elapsed time of the completed segments of a timer. Storage engines override this with their own layout.
+
+        Args:
+            name (str): The name of an existing timer.
+
+        Returns:
+            int: The elapsed time in nanoseconds.
+        """
+        return self._timers[name]['elapsed_ns']
+
+    def _snapshot_timers(self, now: int) -> dict:
+        """
+        Read the values of all timers. Storage engines override this with their own layout.
+
+        Args:
+            now (int): The clock reading of the snapshot.
+
+        Returns:
+            dict: {name: TimerSnapshot}
+        """
+        timers = {}
+        for name, timer in self._timers.items():
+            start = timer['start']
+            if start is None:
+                timers[name] = TimerSnapshot(timer['elapsed_ns'] / 1e9, timer['segments'], False)
+            else:
+                timers[name] = TimerSnapshot((timer['elapsed_ns'] + now - start) / 1e9, timer['segments'], True)
+        return timers
+
+    def _snapshot_counters(self) -> dict:
+        """
+        Read the values of all counters. Storage engines override this with their own layout.
+
+        Returns:
+            dict: {name: value}
+        """
+        counters = {name: counter['value'] for name, counter in self._counters.items()}
+        for _, shard in self._shards:
+            # Shards are written by their threads without locking; copying a dict is atomic.
+            for name, delta in shard.copy().items():
+                counters[name] += delta
+        return counters
+
+    def get_sketches(self) -> dict:
+        """
+        Get all sketches.
+
+        Returns:
+            dict: {name: {'sketch': DDSketch, 'label': str}}, with a copy of each sketch.
+        """
+        return {name: dict(item, sketch=item['sketch'].copy()) for name, item in self._sketches.items()}
+
+    def timer_names(self) -> list:
+        """
+        Get the list of timer names.
+
+        Returns:
+            list: A list of timer names.
+        """
+        return list(self._timers.keys())
 
     def counter_names(self) -> list:
         """
@@ -495,6 +2822,60 @@ class Stats:
         """
         return list(self._attributes.keys())
 
+    def sketch_names(self) -> list:
+        """
+        Get the list of sketch names.
+
+        Returns:
+            list: A list of sketch names.
+        """
+        return list(self._sketches.keys())
+
+    def series_names(self) -> list:
+        """
+        Get the list of the counters and timers with values by tag set. See get_series.
+
+        Returns:
+            list: A list of counter and timer names.
+        """
+        return list(self._series.keys())
+
+    def window_counter_names(self) -> list:
+        """
+        Get the list of window counter names.
+
+        Returns:
+            list: A list of window counter names.
+        """
+        return list(self._windows.keys())
+
+    def unique_names(self) -> list:
+        """
+        Get the list of distinct count names.
+
+        Returns:
+            list: A list of distinct count names.
+        """
+        return list(self._uniques.keys())
+
+    def topk_names(self) -> list:
+        """
+        Get the list of top-K metric names.
+
+        Returns:
+            list: A list of top-K metric names.
+        """
+        return list(self._topks.keys())
+
+    def derived_names(self) -> list:
+        """
+        Get the list of derived metric names.
+
+        Returns:
+            list: A list of derived metric names.
+        """
+        return list(self._derived.keys())
+
     def used_names(self) -> list:
         """
         Get the list of all used names.
@@ -526,6 +2907,16 @@ class Stats:
             self._ratios[name]['label'] = new_label
         elif name in self._attributes:
             self._attributes[name]['label'] = new_label
+        elif name in self._sketches:
+            self._sketches[name]['label'] = new_label
+        elif name in self._windows:
+            self._windows[name]['label'] = new_label
+        elif name in self._topks:
+            self._topks[name]['label'] = new_label
+        elif name in self._uniques:
+            self._uniques[name]['label'] = new_label
+        elif name in self._derived:
+            self._derived[name]['label'] = new_label
 
     def get_labels(self) -> dict:
         """
@@ -543,6 +2934,16 @@ class Stats:
             labels[name] = ratio['label']
         for name, attr in self._attributes.items():
             labels[name] = attr['label']
+        for name, sketch in self._sketches.items():
+            labels[name] = sketch['label']
+        for name, window in self._windows.items():
+            labels[name] = window['label']
+        for name, topk in self._topks.items():
+            labels[name] = topk['label']
+        for name, unique in self._uniques.items():
+            labels[name] = unique['label']
+        for name, derived in self._derived.items():
+            labels[name] = derived['label']
         return labels
 
     def get_labels_for_timers(self) -> dict:
@@ -580,3 +2981,51 @@ class Stats:
             dict: A dictionary mapping attribute names to their labels.
         """
         return {name: attr['label'] for name, attr in self._attributes.items()}
+
+    def get_labels_for_sketches(self) -> dict:
+        """
+        Get all name/label pairs for sketches.
+
+        Returns:
+            dict: A dictionary mapping sketch names to their labels.
+        """
+        return {name: sketch['label'] for name, sketch in self._sketches.items()}
+
+    def get_labels_for_window_counters(self) -> dict:
+        """
+        Get all name/label pairs for window counters.
+
+        Returns:
+            dict: A dictionary mapping window counter names to their labels.
+        """
+        return {name: window['label'] for name, window in self._windows.items()}
+
+    def get_labels_for_topks(self) -> dict:
+        """
+        Get all name/label pairs for top-K metrics.
+
+        Returns:
+            dict: A dictionary mapping top-K metric names to their labels.
+        """
+        return {name: topk['label'] for name, topk in self._topks.items()}
+
+    def get_labels_for_uniques(self) -> dict:
+        """
+        Get all name/label pairs for distinct counts.
+
+        Returns:
+            dict: A dictionary mapping distinct count names to their labels.
+        """
+        return {name: unique['label'] for name, unique in self._uniques.items()}
+
+    def get_labels_for_derived(self) -> dict:
+        """
+        Get all name/label pairs for derived metrics.
+
+        Returns:
+            dict: A dictionary mapping derived metric names to their labels.
+        """
+        return {name: derived['label'] for name, derived in self._derived.items()}
+
+
+Stats._dispatch = _dispatch_table(Stats)
@@ -0,0 +1,251 @@
+"""
+Binary serialization of Stats instances, used by Stats.to_bytes() and Stats.from_bytes().
+
+All integers are little-endian. The layout of version 2 is:
+
+    header       magic "PRST", version (u16), reserved (u16), then the number of
+                 strings, timers, counters, ratios, attributes and sketches (u32 each)
+    strings      the byte length of each string (u32 each), then the UTF-8 bytes of all strings
+    timers       fixed-size TIMER records
+    counters     fixed-size COUNTER records
+    ratios       fixed-size RATIO records
+    attributes   fixed-size ATTRIBUTE records
+    histograms   one HISTOGRAM record and its (index, count) buckets per timer with a histogram
+    sketches     one SKETCH record and its (key, count) bins per sketch
+
+Names, labels, units and text attribute values are ids into the string table, so each
+distinct string is stored once. Version 1 differs only in its TIMER records, which stored
+the elapsed time as float seconds; it is still decoded.
+
+Window counters, which only make sense with the clock that fed them, are not encoded, nor
+the ratios that use them. Top-K metrics, distinct counts and derived metrics are not encoded
+either; HyperLogLog.to_bytes() encodes the registers of a distinct count.
+
+Tags and sample rates are not round-tripped: only the total of a tagged counter or timer is
+encoded, without its series by tag set, and a sampled counter or timer is restored unsampled,
+with its estimated total.
+"""
+from itertools import accumulate
+import math
+import struct
+
+from .Histogram import Histogram
+from .Sketch import DDSketch
+
+MAGIC = b"PRST"
+VERSION = 2
+NONE = -(2 ** 63)  # Stands for None in signed integer fields
+
+HEADER = struct.Struct('<4sHHIIIIII')
+TIMER = struct.Struct('<IIBqqqq')  # name, label, flags, start ns, stop ns, segments, elapsed ns
+TIMER_V1 = struct.Struct('<IIBqqqd')  # TIMER of version 1, with the elapsed time in seconds
+COUNTER = struct.Struct('<IIIq')  # name, label, unit, value
+RATIO = struct.Struct('<IIII')  # name, label, numerator, denominator
+ATTRIBUTE = struct.Struct('<IIB')  # name, label, type; followed by an 8-byte value
+ATTRIBUTE_INT = struct.Struct('<IIBq')
+ATTRIBUTE_FLOAT = struct.Struct('<IIBd')
+HISTOGRAM = struct.Struct('<BQQQqqI')  # precision, max value, count, sum, min, max, buckets
+BUCKET = struct.Struct('<IQ')
+SKETCH = struct.Struct('<IIdIQQdddqqII')  # name, label, accuracy, max bins, zeros, count, sum, min, max,
+                                          # positive floor, negative floor, positive bins, negative bins
+BIN = struct.Struct('<iQ')
+
+TIMER_HISTOGRAM = 1  # TIMER flag
+
+STRING, INT, FLOAT, BOOL = range(4)  # ATTRIBUTE types
+
+
+def _optional(value) -> int:
+    return NONE if value is None else value
+
+
+def _from_optional(value: int):
+    return None if value == NONE else value
+
+
+def encode(stats) -> bytes:
+    """
+    Encode the items of a Stats instance.
+
+    Args:
+        stats (Stats): The instance.
+
+    Returns:
+        bytes: The encoded instance.
+
+    Raises:
+        OverflowError: If a counter, timer, attribute or sketch value does not fit in its field.
+    """
+    strings = {}
+
+    def string_id(string: str) -> int:
+        found = strings.get(string)
+        if found is None:
+            found = strings[string] = len(strings)
+        return found
+
+    histograms = stats._timer_histograms()
+    timers, counters, ratios, attributes, sketches, variable = [], [], [], [], [], []
+    try:
+        for name, timer in stats.get_timers().items():
+            timers.append(TIMER.pack(string_id(name), string_id(timer['label']),
+                                     TIMER_HISTOGRAM if name in histograms else 0,
+                                     _optional(timer['start']), _optional(timer['stop']),
+                                     timer['segments'], stats._timer_elapsed_ns(name)))
+        for histogram in histograms.values():
+            buckets = [(index, count) for index, count in enumerate(histogram.counts) if count]
+            variable.append(HISTOGRAM.pack(histogram.precision, histogram.max_value, histogram.count,
+                                           histogram.sum, _optional(histogram.min), _optional(histogram.max),
+                                           len(buckets)))
+            variable.extend(BUCKET.pack(index, count) for index, count in buckets)
+        for name, counter in stats.get_counters().items():
+            counters.append(COUNTER.pack(string_id(name), string_id(counter['label']),
+                                         string_id(counter['unit']), counter['value']))
+        windows = stats._windows
+        for name, ratio in stats.get_ratios().items():
+            if ratio['numerator'] in windows or ratio['denominator'] in windows:
+                continue  # Window counters are not encoded
+            ratios.append(RATIO.pack(string_id(name), string_id(ratio['label']),
+                                     string_id(ratio['numerator']), string_id(ratio['denominator'])))
+        for name, attribute in stats.get_attributes().items():
+            value = attribute['value']
+            ids = (string_id(name), string_id(attribute['label']))
+            if isinstance(value, bool):
+                attributes.append(ATTRIBUTE_INT.pack(*ids, BOOL, value))
+            elif isinstance(value, int):
+                attributes.append(ATTRIBUTE_INT.pack(*ids, INT, value))
+            elif isinstance(value, float):
+                attributes.append(ATTRIBUTE_FLOAT.pack(*ids, FLOAT, value))
+            else:
+                attributes.append(ATTRIBUTE_INT.pack(*ids, STRING, string_id(str(value))))
+        labels = stats.get_labels_for_sketches()
+        for name in stats.sketch_names():
+            sketch = stats._sketch(name)
+            sketches.append(SKETCH.pack(
+                string_id(name), string_id(labels[name]), sketch.relative_accuracy, sketch.max_bins,
+                sketch.zero_count, sketch.count, sketch.sum,
+                math.nan if sketch.min is None else sketch.min, math.nan if sketch.max is None else sketch.max,
+                _optional(sketch._positive_floor), _optional(sketch._negative_floor),
+                len(sketch._positive), len(sketch._negative)))
+            sketches.extend(BIN.pack(key, count) for key, count in sketch._positive.items())
+            sketches.extend(BIN.pack(key, count) for key, count in sketch._negative.items())
+    except struct.error as error:
+        raise OverflowError(f"A value does not fit in the binary format: {error}") from error
+
+    encoded = [string.encode('utf-8') for string in strings]
+    header = HEADER.pack(MAGIC, VERSION, 0, len(encoded), len(timers), len(counters), len(ratios),
+                         len(attributes), len(stats.sketch_names()))
+    lengths = struct.pack(f'<{len(encoded)}I', *map(len, encoded))
+    return b"".join([header, lengths, *encoded, *timers, *counters, *ratios, *attributes,
+                     *variable, *sketches])
+
+
+def decode(data: bytes, stats):
+    """
+    Restore encoded items into an empty Stats instance.
+
+    Args:
+        data (bytes): The output of encode().
+        stats (Stats): An instance without items, of any Stats class.
+
+    Returns:
+        Stats: The instance, with the items and their dynamic methods.
+
+    Raises:
+        ValueError: If the data is not in this format, has an unsupported version or is truncated.
+    """
+    data = memoryview(data)
+    try:
+        magic, version, _, *counts = HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError("Data is too short to be encoded Stats.") from None
+    if magic != MAGIC:
+        raise ValueError("Data is not encoded Stats.")
+    if version not in (1, VERSION):
+        raise ValueError(f"Unsupported Stats format version {version}, expected {VERSION}.")
+    try:
+        return _decode_items(data, HEADER.size, counts, stats, TIMER if version == VERSION else TIMER_V1)
+    except (struct.error, IndexError, UnicodeDecodeError) as error:
+        raise ValueError(f"Encoded Stats are truncated or corrupt: {error}") from error
+
+
+def _records(record: struct.Struct, data: memoryview, offset: int, count: int):
+    end = offset + record.size * count
+    if end > len(data):
+        raise struct.error("record section goes past the end of the data")
+    return record.iter_unpack(data[offset:end]), end
+
+
+def _decode_items(data: memoryview, offset: int, counts: list, stats, timer_record: struct.Struct):
+    n_strings, n_timers, n_counters, n_ratios, n_attributes, n_sketches = counts
+    lengths = struct.unpack_from(f'<{n_strings}I', data, offset)
+    offset += 4 * n_strings
+    blob = bytes(data[offset:offset + sum(lengths)])
+    if len(blob) < sum(lengths):
+        raise struct.error("string table goes past the end of the data")
+    strings = []
+    start = 0
+    for end in accumulate(lengths):
+        strings.append(blob[start:end].decode('utf-8'))
+        start = end
+    offset += len(blob)
+
+    timers, offset = _records(timer_record, data, offset, n_timers)
+    timers = list(timers)
+    counters, offset = _records(COUNTER, data, offset, n_counters)
+    for name, label, unit, value in counters:
+        stats.set_counter(strings[name], value, strings[unit], strings[label])
+    ratios, offset = _records(RATIO, data, offset, n_ratios)
+    ratios = list(ratios)
+    for _ in range(n_attributes):
+        name, label, kind = ATTRIBUTE.unpack_from(data, offset)
+        if kind == FLOAT:
+            value = ATTRIBUTE_FLOAT.unpack_from(data, offset)[3]
+        else:
+            value = ATTRIBUTE_INT.unpack_from(data, offset)[3]
+            value = strings[value] if kind == STRING else bool(value) if kind == BOOL else value
+        stats.set_attribute(strings[name], value, strings[label])
+        offset += ATTRIBUTE_INT.size
+
+    for name, label, flags, start, stop, segments, elapsed in timers:
+        name = strings[name]
+        if isinstance(elapsed, float):  # Version 1
+            elapsed = round(elapsed * 1e9)
+        stats.set_timer(name, strings[label], histogram=bool(flags & TIMER_HISTOGRAM))
+        stats._restore_timer(name, _from_optional(start), _from_optional(stop), segments, elapsed)
+        if flags & TIMER_HISTOGRAM:
+            offset = _decode_histogram(data, offset, stats._timer_histograms()[name])
+
+    for _ in range(n_sketches):
+        (name, label, relative_accuracy, max_bins, zero_count, count, total, minimum, maximum,
+         positive_floor, negative_floor, n_positive, n_negative) = SKETCH.unpack_from(data, offset)
+        offset += SKETCH.size
+        sketch = DDSketch(relative_accuracy, max_bins)
+        sketch.zero_count, sketch.count, sketch.sum = zero_count, count, total
+        sketch.min = None if math.isnan(minimum) else minimum
+        sketch.max = None if math.isnan(maximum) else maximum
+        sketch._positive_floor = _from_optional(positive_floor)
+        sketch._negative_floor = _from_optional(negative_floor)
+        positive, offset = _records(BIN, data, offset, n_positive)
+        sketch._positive = dict(positive)
+        negative, offset = _records(BIN, data, offset, n_negative)
+        sketch._negative = dict(negative)
+        stats.set_sketch(strings[name], relative_accuracy, max_bins, strings[label])
+        stats.merge_sketch(strings[name], sketch)
+
+    for name, label, numerator, denominator in ratios:
+        stats.set_ratio(strings[name], strings[numerator], strings[denominator], strings[label])
+    return stats
+
+
+def _decode_histogram(data: memoryview, offset: int, histogram: Histogram) -> int:
+    precision, max_value, count, total, minimum, maximum, n_buckets = HISTOGRAM.unpack_from(data, offset)
+    offset += HISTOGRAM.size
+    if (precision, max_value) != (histogram.precision, histogram.max_value):
+        raise struct.error("histogram settings do not match the timer histogram")
+    buckets, offset = _records(BUCKET, data, offset, n_buckets)
+    for index, bucket_count in buckets:
+        histogram.counts[index] = bucket_count
+    histogram.count, histogram.sum = count, total
+    histogram.min, histogram.max = _from_optional(minimum), _from_optional(maximum)
+    return offset
@@ -0,0 +1,180 @@
+from concurrent.futures import Executor
+from typing import Callable, Iterable
+import asyncio
+import json
+
+from .Sink import Sink
+from .Snapshot import Snapshot
+
+
+def encode_snapshot(snapshot: Snapshot) -> bytes:
+    """
+    Encode a snapshot as one line of JSON, the default encoding of StatsFlusher.
+
+    Args:
+        snapshot (Snapshot): The snapshot.
+
+    Returns:
+        bytes: UTF-8 JSON ending with a newline, with the keys time_ns, timers
+        ({name: {'elapsed', 'segments', 'running'}}), counters, ratios and attributes.
+    """
+    return json.dumps({
+        'time_ns': snapshot.time_ns,
+        'timers': {name: timer._asdict() for name, timer in snapshot.timers.items()},
+        'counters': dict(snapshot.counters),
+        'ratios': dict(snapshot.ratios),
+        'attributes': dict(snapshot.attributes),
+    }, separators=(',', ':')).encode() + b"\n"
+
+
+class StatsFlusher:
+    """
+    Push snapshots of a Stats instance to sinks on an interval, from asyncio background tasks.
+
+    Every interval the flusher takes a snapshot on the event loop, which only copies the
+    values, and puts it in a bounded queue. Another task encodes the snapshots in a worker
+    thread, so request handlers never wait for the serialization, and writes each payload
+    to every sink in turn.
+
+    Sinks apply backpressure by waiting in write(). While they wait, new snapshots fill
+    the queue; when it is full the oldest snapshot is dropped, so memory stays bounded
+    and the newest values are the ones sent. Sink and encoder errors are counted and do
+    not stop the flusher.
+
+    Args:
+        stats (Stats): The instance to push, of any Stats class.
+        sinks (Iterable[Sink]): Where to write the payloads, such as FileSink, UDPSink or UnixSink.
+        interval (float): Seconds between snapshots. Defaults to 10.
+        encoder (Callable[[Snapshot], bytes], optional): Encodes a snapshot, in a worker thread.
+            Defaults to encode_snapshot, one line of JSON per snapshot.
+        queue_size (int): Maximum number of snapshots waiting to be written. Defaults to 4.
+        executor (Executor, optional): Runs the encoder. Defaults to the default executor of the loop.
+
+    Raises:
+        ValueError: If interval is not positive or queue_size is less than 1.
+
+    Attributes:
+        flushed (int): Number of snapshots encoded and written to the sinks.
+        dropped (int): Number of snapshots dropped because the queue was full.
+        errors (int): Number of encoder and sink errors.
+        last_error (Exception): The last of those errors, or None.
+
+    Examples:
+        >>> async def main():
+        ...     sinks = [UnixSink("/run/collector.sock"), FileSink("metrics.jsonl")]
+        ...     async with StatsFlusher(stats, sinks, interval=10):
+        ...         await serve_forever()
+    """
+
+    def __init__(self, stats, sinks: Iterable[Sink], interval: float = 10.0,
+                 encoder: Callable[[Snapshot], bytes] = None, queue_size: int = 4, executor: Executor = None):
+        if interval <= 0:
+            raise ValueError("The interval must be positive.")
+        if queue_size < 1:
+            raise ValueError("The queue needs room for at least 1 snapshot.")
+        self.stats = stats
+        self.sinks = list(sinks)
+        self.interval = interval
+        self.encoder = encoder if encoder is not None else encode_snapshot
+        self.queue_size = queue_size
+        self._executor = executor
+        self._queue = None
+        self._tasks = ()
+        self.flushed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the background tasks are running."""
+        return bool(self._tasks)
+
+    def start(self):
+        """
+        Start the background tasks on the running event loop.
+
+        Raises:
+            RuntimeError: If there is no running event loop, or the flusher is already running.
+        """
+        if self._tasks:
+            raise RuntimeError("The flusher is already running.")
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.queue_size)
+        self._tasks = (loop.create_task(self._tick()), loop.create_task(self._drain()))
+
+    async def stop(self, flush: bool = True):
+        """
+        Stop the background tasks and close the sinks.
+
+        Args:
+            flush (bool): If True, first push a last snapshot and wait for the queue to be written.
+                Defaults to True.
+        """
+        if not self._tasks:
+            return
+        if flush:
+            await self.flush()
+        tasks, self._tasks = self._tasks, ()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for sink in self.sinks:
+            await sink.close()
+
+    async def flush(self):
+        """
+        Take a snapshot now and wait until it and the snapshots before it are written.
+
+        Raises:
+            RuntimeError: If the flusher is not running.
+        """
+        if not self._tasks:
+            raise RuntimeError("The flusher is not running.")
+        self._enqueue(self.stats.snapshot())
+        await self._queue.join()
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    def _enqueue(self, snapshot: Snapshot):
+        queue = self._queue
+        if queue.full():
+            queue.get_nowait()  # Drop the oldest snapshot, the newest values matter most
+            queue.task_done()
+            self.dropped += 1
+        queue.put_nowait(snapshot)
+
+    async def _tick(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            deadline += self.interval  # Fixed schedule, so slow iterations do not make it drift
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+            self._enqueue(self.stats.snapshot())
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            snapshot = await queue.get()
+            try:
+                data = await loop.run_in_executor(self._executor, self.encoder, snapshot)
+                for sink in self.sinks:
+                    try:
+                        await sink.write(data)
+                    except OSError as error:
+                        self._error(error)
+                self.flushed += 1
+            except Exception as error:  # A broken encoder must not stop the flusher
+                self._error(error)
+            finally:
+                queue.task_done()
+
+    def _error(self, error: Exception):
+        self.errors += 1
+        self.last_error = error
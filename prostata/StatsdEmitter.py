@@ -0,0 +1,283 @@
+from typing import List, Optional, Tuple
+import socket
+import threading
+import time
+
+from .Snapshot import Snapshot
+
+_UNSET = object()  # Differs from any value
+
+
+class StatsdEmitter:
+    """
+    Send the changes of a Stats instance to a StatsD collector, aggregated, in packed datagrams.
+
+    The Stats instance already aggregates in memory: incr() and timer segments only update
+    its values, and nothing is sent from the hot path. On each flush the emitter takes a
+    snapshot and sends what changed since the previous flush:
+
+    - A counter sends its delta: "requests:42|c".
+    - A timer sends the mean of its new segments with a sample rate of 1 / segments:
+      "load_time:12.5|ms|@0.25" for 4 segments. The collector counts 4 events of 12.5 ms,
+      so the count and the sum are exact while one line replaces 4 packets. The time of a
+      segment running during a flush is sent with the segments started after that flush.
+    - If gauges is True, ratios and numeric attributes send their value: "error_rate:0.02|g".
+
+    The lines are packed into datagrams of at most max_packet bytes, the size that fits in
+    one Ethernet frame by default, so a flush of n metrics sends about n / 30 packets.
+    Flushes happen when flush() is called, or in a background thread after start(): every
+    interval seconds, and with flush_size, as soon as the changes waiting take that many bytes.
+
+    Send errors, such as a full socket buffer, are counted, and the changes in the datagrams
+    that could not be sent are sent again with the next flush. The background thread also
+    counts the other errors of a flush, such as a failing snapshot, and keeps running.
+
+    Args:
+        stats (Stats): The instance to send, of any Stats class.
+        host (str): The host of the collector. Defaults to "127.0.0.1".
+        port (int): The port of the collector. Defaults to 8125.
+        prefix (str): Prepended to every metric name, for example "myapp.". Defaults to "".
+        max_packet (int): Maximum size of a datagram in bytes. Defaults to 1432.
+        gauges (bool): Whether to send ratios and numeric attributes as gauges. Defaults to False.
+
+    Raises:
+        ValueError: If max_packet is less than 64 bytes.
+
+    Attributes:
+        packets (int): Number of datagrams sent.
+        errors (int): Number of datagrams that could not be sent, and of failed flushes of the background thread.
+        last_error (Exception): The last error, or None.
+
+    Examples:
+        >>> emitter = StatsdEmitter(stats, "127.0.0.1", 8125, prefix="myapp.")
+        >>> emitter.start(interval=10, flush_size=emitter.max_packet)  # Or once a datagram is full
+        >>> stats.incr_requests()
+        >>> emitter.stop()  # Flushes a last time
+    """
+
+    def __init__(self, stats, host: str = "127.0.0.1", port: int = 8125, prefix: str = "",
+                 max_packet: int = 1432, gauges: bool = False):
+        if max_packet < 64:
+            raise ValueError("A packet must have room for at least 64 bytes.")
+        self.stats = stats
+        self.address = (host, port)
+        self.prefix = prefix
+        self.max_packet = max_packet
+        self.gauges = gauges
+        self.packets = 0
+        self.errors = 0
+        self.last_error = None
+        self._counters = {}  # {name: value sent}
+        self._timers = {}  # {name: (elapsed, segments) sent}
+        self._checked = {}  # {(kind, name): value} Values when the size of the changes was last checked
+        self._pending = {}  # {(kind, name): size of the line} Lines waiting, as of the last check
+        self._pending_size = 0  # Bytes of the lines waiting, with their newlines
+        self._socket = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self, interval: float = 10.0, flush_size: int = None, check_interval: float = 1.0):
+        """
+        Flush every interval seconds in a daemon thread, and optionally when enough changes are waiting.
+
+        Checking the size takes a snapshot, and only encodes the lines of the metrics that
+        changed since the previous check.
+
+        Args:
+            interval (float): Seconds between flushes. Defaults to 10.
+            flush_size (int, optional): Flush before the interval ends once the changes waiting take at
+                least this many bytes, for example max_packet to send full datagrams. Defaults to None,
+                flushing on the interval only.
+            check_interval (float): Seconds between checks of the size of the changes. Defaults to 1.
+
+        Raises:
+            ValueError: If the interval, check_interval or flush_size is not positive.
+            RuntimeError: If the emitter is already started.
+        """
+        if interval <= 0 or check_interval <= 0:
+            raise ValueError("The interval must be positive.")
+        if flush_size is not None and flush_size <= 0:
+            raise ValueError("The flush size must be positive.")
+        if self._thread is not None:
+            raise RuntimeError("The emitter is already started.")
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval, flush_size, check_interval),
+                                        name="StatsdEmitter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread, flush a last time and close the socket."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+        if self._socket.fileno() != -1:
+            self.flush()
+            self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self, interval: float, flush_size: Optional[int], check_interval: float):
+        if flush_size is None:
+            check_interval = interval
+        deadline = time.monotonic() + interval
+        while not self._stopping.wait(max(0.0, min(check_interval, deadline - time.monotonic()))):
+            try:
+                if time.monotonic() >= deadline:
+                    self.flush()
+                elif not self.flush(min_size=flush_size):
+                    continue  # Not enough changes waiting yet
+            except Exception as error:
+                # The changes are only remembered as sent once sent, so the next flush retries them
+                self.errors += 1
+                self.last_error = error
+            deadline = time.monotonic() + interval
+
+    def flush(self, min_size: int = 0) -> int:
+        """
+        Send the changes since the previous flush.
+
+        Args:
+            min_size (int): Send nothing unless the changes take at least this many bytes. Defaults to 0.
+
+        Returns:
+            int: The number of datagrams sent.
+        """
+        with self._flush_lock:
+            snapshot = self.stats.snapshot()
+            if min_size and self._check_size(snapshot) < min_size:
+                return 0
+            entries = self.encode(snapshot)
+            count = 0
+            for packet, packed in self._pack(entries):
+                try:
+                    self._socket.sendto(packet, self.address)
+                except OSError as error:
+                    # The values of the packet are not remembered as sent, the next flush sends them
+                    self.errors += 1
+                    self.last_error = error
+                    continue
+                count += 1
+                for _, sent, name, value in packed:
+                    if sent is not None:
+                        sent[name] = value
+            self.packets += count
+            # The lines waiting are measured again from the values sent
+            self._checked.clear()
+            self._pending.clear()
+            self._pending_size = 0
+            return count
+
+    def _check_size(self, snapshot: Snapshot) -> int:
+        """
+        Get the size in bytes of the changes waiting to be sent, with their newlines.
+
+        Only the lines of the metrics whose value changed since the previous check are encoded
+        again; the sizes of the others are kept from that check.
+
+        Args:
+            snapshot (Snapshot): The current values.
+
+        Returns:
+            int: The size of the lines that a flush would send now.
+        """
+        checked, pending = self._checked, self._pending
+        size = self._pending_size
+        values = [(('c', name), value) for name, value in snapshot.counters.items()]
+        values += [(('ms', name), timer) for name, timer in snapshot.timers.items()]
+        if self.gauges:
+            values += [(('g', name), value) for name, value in self._gauges(snapshot)]
+        for key, value in values:
+            if checked.get(key, _UNSET) == value:
+                continue
+            checked[key] = value
+            kind, name = key
+            if kind == 'c':
+                line = self._counter_line(name, value)
+            elif kind == 'ms':
+                line = self._timer_line(name, value)
+            else:
+                line = self._gauge_line(name, value)
+            size += (len(line) + 1 if line else 0) - pending.pop(key, 0)
+            if line:
+                pending[key] = len(line) + 1
+        self._pending_size = size
+        return size
+
+    def encode(self, snapshot: Snapshot) -> List[Tuple[bytes, Optional[dict], str, object]]:
+        """
+        Encode the changes between the values sent last and a snapshot as StatsD lines.
+
+        Args:
+            snapshot (Snapshot): The snapshot.
+
+        Returns:
+            list: (line, sent, name, value) for each metric, where sent is the dictionary
+            that remembers the value once the line is sent, or None for gauges.
+        """
+        entries = []
+        for name, value in snapshot.counters.items():
+            line = self._counter_line(name, value)
+            if line:
+                entries.append((line, self._counters, name, value))
+        for name, timer in snapshot.timers.items():
+            line = self._timer_line(name, timer)
+            if line:
+                entries.append((line, self._timers, name, (timer.elapsed, timer.segments)))
+        if self.gauges:
+            for name, value in self._gauges(snapshot):
+                entries.append((self._gauge_line(name, value), None, name, value))
+        return entries
+
+    def _counter_line(self, name: str, value: int) -> Optional[bytes]:
+        """The line of the delta of a counter since it was sent, or None if it did not change."""
+        delta = value - self._counters.get(name, 0)
+        if delta:
+            return f"{self.prefix}{name}:{delta}|c".encode()
+        return None
+
+    def _timer_line(self, name: str, timer) -> Optional[bytes]:
+        """The line of the new segments of a timer since it was sent, or None if it has none."""
+        elapsed, segments = self._timers.get(name, (0.0, 0))
+        count = timer.segments - segments
+        if count <= 0:
+            return None  # Time added by a segment counted in a previous flush waits for a new segment
+        mean_ms = (timer.elapsed - elapsed) * 1e3 / count
+        sample = f"|@{1 / count:.6g}" if count > 1 else ""
+        return f"{self.prefix}{name}:{mean_ms:.6g}|ms{sample}".encode()
+
+    def _gauge_line(self, name: str, value) -> bytes:
+        line = f"{self.prefix}{name}:{value:.6g}|g"
+        if value < 0:  # A signed gauge is a change, so a negative value is set from 0
+            line = f"{self.prefix}{name}:0|g\n{line}"
+        return line.encode()
+
+    @staticmethod
+    def _gauges(snapshot: Snapshot) -> list:
+        """The ratios and numeric attributes of a snapshot, as (name, value) pairs."""
+        values = list(snapshot.ratios.items())
+        values += [(name, value) for name, value in snapshot.attributes.items()
+                   if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        return values
+
+    def _pack(self, entries: list) -> List[Tuple[bytes, list]]:
+        """Join the lines of the entries with newlines into datagrams of at most max_packet bytes."""
+        packets = []
+        packet = []
+        size = -1
+        for entry in entries:
+            length = len(entry[0]) + 1
+            if packet and size + length > self.max_packet:
+                packets.append((b"\n".join(e[0] for e in packet), packet))
+                packet, size = [], -1
+            packet.append(entry)
+            size += length
+        if packet:
+            packets.append((b"\n".join(e[0] for e in packet), packet))
+        return packets
@@ -0,0 +1,183 @@
+from heapq import heapify, heapreplace, heappush, nlargest
+from typing import Hashable, List, NamedTuple, Optional
+
+
+class HeavyHitter(NamedTuple):
+    """
+    One key of a top-K metric with its estimated count, returned by Stats.get_top_keys().
+
+    The true count of the key is between count - error and count.
+
+    Examples:
+        >>> for hitter in stats.get_top_keys("tenants", 3):
+        ...     print(f"{hitter.key}: {hitter.count} (at least {hitter.guaranteed})")
+    """
+
+    key: Hashable
+    """The key, as observed."""
+    count: int
+    """Upper bound of the true count of the key."""
+    error: int
+    """Maximum overestimation of the count: the count the key inherited when it replaced another key."""
+
+    @property
+    def guaranteed(self) -> int:
+        """Lower bound of the true count of the key."""
+        return self.count - self.error
+
+
+class TopK:
+    """
+    Space-Saving summary of the keys that occur most, in a fixed number of counters.
+
+    Up to capacity keys are counted exactly. When a new key arrives and all counters are
+    taken, it replaces the key with the smallest count and inherits that count as its
+    error. The counts of the heavy hitters are thus overestimated by at most their error,
+    and the error of any key is at most total / capacity:
+
+        count - error <= true count <= count
+        every key with a true count above total / capacity is in the summary
+
+    An observation of a key in the summary costs one dictionary update. The smallest count
+    is found with a min-heap whose entries are refreshed lazily when they reach the top,
+    so a new key costs O(log capacity) amortized over the observations.
+
+    Summaries can be merged: the counts and errors of each key are added, with the smallest
+    count of a full summary standing in for the keys it does not track, and the capacity
+    largest counts are kept. The errors of the merged summary are bounded by the sum of
+    the bounds of both, which is the merged total / capacity when the capacities are equal.
+
+    Args:
+        capacity (int): Number of keys counted, which bounds memory. Defaults to 100.
+
+    Raises:
+        ValueError: If capacity is less than 1.
+
+    Examples:
+        >>> top = TopK(capacity=2)
+        >>> for key in ["a", "b", "a", "c", "a"]:
+        ...     top.observe(key)
+        >>> top.top(1)
+        [HeavyHitter(key='a', count=3, error=0)]
+    """
+
+    __slots__ = ('capacity', 'total', '_counts', '_errors', '_heap', '_serial')
+
+    def __init__(self, capacity: int = 100):
+        if capacity < 1:
+            raise ValueError("A top-K metric needs room for at least 1 key.")
+        self.capacity = capacity
+        self.total = 0
+        self._counts = {}  # {key: count}
+        self._errors = {}  # {key: error}
+        self._heap = []  # [(count, serial, key)] one entry per key, whose count may be stale (lower)
+        self._serial = 0  # Breaks ties between equal counts, so keys are never compared
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._counts
+
+    def observe(self, key: Hashable, amount: int = 1):
+        """
+        Count an occurrence of a key.
+
+        Args:
+            key (Hashable): The key, for example a tenant or an endpoint.
+            amount (int): The number of occurrences, at least 1. Defaults to 1.
+
+        Raises:
+            ValueError: If amount is less than 1.
+        """
+        if amount < 1:
+            raise ValueError("Top-K metrics only count positive amounts.")
+        self.total += amount
+        counts = self._counts
+        if key in counts:
+            counts[key] += amount
+            return
+        self._serial += 1
+        if len(counts) < self.capacity:
+            counts[key] = amount
+            self._errors[key] = 0
+            heappush(self._heap, (amount, self._serial, key))
+            return
+        heap = self._heap
+        while True:
+            count, serial, victim = heap[0]
+            current = counts[victim]
+            if current == count:
+                break
+            heapreplace(heap, (current, serial, victim))  # Stale entry, move it to its count
+        del counts[victim]
+        del self._errors[victim]
+        counts[key] = count + amount
+        self._errors[key] = count
+        heapreplace(heap, (count + amount, self._serial, key))
+
+    def top(self, k: Optional[int] = None) -> List[HeavyHitter]:
+        """
+        Get the keys with the largest counts.
+
+        Args:
+            k (int, optional): Number of keys. Defaults to all the keys in the summary.
+
+        Returns:
+            list: HeavyHitter(key, count, error) tuples, by decreasing count.
+        """
+        errors = self._errors
+        if k is None:
+            k = len(self._counts)
+        return [HeavyHitter(key, count, errors[key])
+                for key, count in nlargest(k, self._counts.items(), key=lambda item: item[1])]
+
+    def floor(self) -> int:
+        """
+        Get the upper bound of the count of the keys not in the summary.
+
+        Returns:
+            int: The smallest count if all counters are taken, 0 otherwise.
+        """
+        if len(self._counts) < self.capacity:
+            return 0
+        return min(self._counts.values())
+
+    def merge(self, other: 'TopK'):
+        """
+        Add the keys of another summary to this one, keeping the capacity of this one.
+
+        Args:
+            other (TopK): The summary to add. It can have another capacity, but the errors
+                are only bounded by total / capacity when both have the same capacity.
+        """
+        mine, theirs = self.floor(), other.floor()
+        counts, errors = {}, {}
+        for key in self._counts.keys() | other._counts.keys():
+            counts[key] = self._counts.get(key, mine) + other._counts.get(key, theirs)
+            errors[key] = self._errors.get(key, mine) + other._errors.get(key, theirs)
+        kept = nlargest(self.capacity, counts.items(), key=lambda item: item[1])
+        self._counts = dict(kept)
+        self._errors = {key: errors[key] for key in self._counts}
+        self._rebuild()
+        self.total += other.total
+
+    def _rebuild(self):
+        self._heap = [(count, serial, key) for serial, (key, count) in enumerate(self._counts.items())]
+        heapify(self._heap)
+        self._serial = len(self._heap)
+
+    def copy(self) -> 'TopK':
+        """
+        Get an independent copy of the summary.
+
+        Returns:
+            TopK: The copy.
+        """
+        copy = TopK(self.capacity)
+        copy.total = self.total
+        copy._counts = self._counts.copy()
+        copy._errors = self._errors.copy()
+        copy._heap = self._heap.copy()
+        copy._serial = self._serial
+        return copy
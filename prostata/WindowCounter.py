@@ -0,0 +1,139 @@
+class WindowCounter:
+    """
+    Counter of the amounts added during the last window of time, in a ring of time buckets.
+
+    The window is divided in buckets of equal duration. Each amount is added to the
+    bucket of the current time, and buckets are cleared lazily when the time moves past
+    them, on the next increment or read. There is no background thread: an increment
+    costs O(1), plus clearing the buckets that expired since the previous call, which is
+    at most one pass over the ring.
+
+    The sum covers the current bucket and the buckets before it, so it spans between
+    window - window / buckets and window seconds. More buckets give a smoother window at
+    the cost of memory.
+
+    Times are integer nanoseconds from the clock of the Stats instance.
+
+    Args:
+        window (float): Duration of the window in seconds. Defaults to 60.
+        buckets (int): Number of buckets in the window. Defaults to 60.
+
+    Raises:
+        ValueError: If the window is not positive, or shorter than one nanosecond per bucket.
+
+    Examples:
+        >>> counter = WindowCounter(window=60, buckets=60)
+        >>> counter.incr(now_ns)
+        >>> counter.sum(now_ns + 30 * 10**9)
+        1
+        >>> counter.sum(now_ns + 61 * 10**9)
+        0
+    """
+
+    __slots__ = ('window', 'buckets', '_bucket_ns', '_counts', '_current', '_total')
+
+    def __init__(self, window: float = 60.0, buckets: int = 60):
+        if buckets < 1:
+            raise ValueError("A window needs at least 1 bucket.")
+        bucket_ns = round(window * 1e9) // buckets
+        if bucket_ns < 1:
+            raise ValueError("The window must be positive and at least 1 ns per bucket.")
+        self.window = window
+        self.buckets = buckets
+        self._bucket_ns = bucket_ns
+        self._counts = [0] * buckets
+        self._current = None  # Absolute index of the newest bucket, time // bucket duration
+        self._total = 0  # Sum of all buckets
+
+    def _advance(self, index: int):
+        """Make index the newest bucket, clearing the buckets that expired."""
+        current = self._current
+        if current is not None and index <= current:
+            return
+        counts = self._counts
+        n = self.buckets
+        if current is None or index - current >= n:
+            counts[:] = [0] * n
+            self._total = 0
+        else:
+            for i in range(current + 1, index + 1):
+                slot = i % n
+                self._total -= counts[slot]
+                counts[slot] = 0
+        self._current = index
+
+    def incr(self, now: int, amount: int = 1):
+        """
+        Add an amount at the given time.
+
+        Args:
+            now (int): The current time in nanoseconds.
+            amount (int): The amount. Defaults to 1.
+        """
+        index = now // self._bucket_ns
+        if index != self._current:
+            if self._current is not None and index <= self._current - self.buckets:
+                return  # Read from the clock before the bucket expired
+            self._advance(index)
+        self._counts[index % self.buckets] += amount
+        self._total += amount
+
+    def sum(self, now: int) -> int:
+        """
+        Get the sum of the amounts added during the window that ends at the given time.
+
+        Args:
+            now (int): The current time in nanoseconds.
+
+        Returns:
+            int: The sum.
+        """
+        self._advance(now // self._bucket_ns)
+        return self._total
+
+    def rate(self, now: int) -> float:
+        """
+        Get the average amount per second during the window that ends at the given time.
+
+        Args:
+            now (int): The current time in nanoseconds.
+
+        Returns:
+            float: The sum divided by the window in seconds.
+        """
+        return self.sum(now) / self.window
+
+    def merge(self, other: 'WindowCounter'):
+        """
+        Add the buckets of another window counter, fed by the same clock, to this one.
+
+        Args:
+            other (WindowCounter): A window counter with the same window and buckets.
+
+        Raises:
+            ValueError: If the window counters have different settings.
+        """
+        if (other._bucket_ns, other.buckets) != (self._bucket_ns, self.buckets):
+            raise ValueError("Window counters with a different window or buckets cannot be merged.")
+        if other._current is None:
+            return
+        self._advance(other._current)
+        n = self.buckets
+        # Buckets of the other counter that are still in the window of this one
+        for index in range(self._current - n + 1, other._current + 1):
+            amount = other._counts[index % n]
+            self._counts[index % n] += amount
+            self._total += amount
+
+    def copy(self) -> 'WindowCounter':
+        """
+        Get an independent copy of the window counter.
+
+        Returns:
+            WindowCounter: The copy.
+        """
+        copy = WindowCounter(self.window, self.buckets)
+        copy._counts = self._counts.copy()
+        copy._current = self._current
+        copy._total = self._total
+        return copy
@@ -1,3 +1,18 @@
 # prostata package
 
-from .Stats import Stats
\ No newline at end of file
+from .Stats import Stats
+from .Clock import FakeClock
+from .SharedStats import SharedStats
+from .CompactStats import CompactStats
+from .Handle import CounterHandle, TimerHandle
+from .Sketch import DDSketch
+from .Snapshot import Snapshot, TimerSnapshot
+from .PrometheusExporter import PrometheusExporter
+from .MappedStats import MappedStats, MappedStatsReader
+from .WindowCounter import WindowCounter
+from .Sink import Sink, FileSink, UDPSink, UnixSink
+from .StatsFlusher import StatsFlusher
+from .StatsdEmitter import StatsdEmitter
+from .Sampler import Estimate, Sampler
+from .TopK import HeavyHitter, TopK
+from .HyperLogLog import HyperLogLog
\ No newline at end of file
@@ -0,0 +1,91 @@
+import pytest
+from prostata import Stats, CompactStats, FakeClock
+from prostata.Stats import NameNotExists
+
+STORAGES = [
+    pytest.param(lambda: Stats(clock=FakeClock()), id="dict"),
+    pytest.param(lambda: Stats(clock=FakeClock(), concurrency="lock"), id="lock"),
+    pytest.param(lambda: Stats(clock=FakeClock(), concurrency="sharded"), id="sharded"),
+    pytest.param(lambda: CompactStats(clock=FakeClock()), id="compact"),
+]
+
+
+@pytest.fixture(params=STORAGES)
+def stats(request):
+    stats = request.param()
+    stats.set_counter("hits")
+    stats.set_counter("misses", 10)
+    return stats
+
+
+class TestIncrMany:
+
+    def test_mapping(self, stats):
+        stats.incr_many({"hits": 3, "misses": -2})
+        assert stats.get_hits() == 3
+        assert stats.get_misses() == 8
+
+    def test_iterable_of_names(self, stats):
+        stats.incr_many(["hits", "misses", "hits"])
+        stats.incr_many(name for name in ["hits"])
+        assert stats.get_hits() == 3
+        assert stats.get_misses() == 11
+
+    def test_pairs(self, stats):
+        stats.incr_many([("hits", 2), ("hits", 5), ("misses", 1)])
+        assert stats.get_hits() == 7
+        assert stats.get_misses() == 11
+
+    def test_empty(self, stats):
+        stats.incr_many([])
+        stats.incr_many({})
+        assert stats.get_hits() == 0
+
+    def test_unknown_name_updates_nothing(self, stats):
+        with pytest.raises(NameNotExists):
+            stats.incr_many({"hits": 1, "missing": 1})
+        assert stats.get_hits() == 0
+
+    def test_rejects_non_integer_amounts(self, stats):
+        with pytest.raises(TypeError):
+            stats.incr_many({"hits": 1.5})
+
+
+class TestRecordMany:
+
+    def test_timer_segments(self, stats):
+        stats.set_timer("db_query", histogram=True)
+        stats.record_many("db_query", [0.5, 0.25, 0.25])
+        stats.record_many("db_query", iter([1.0]))
+        timer = stats.get_timers()["db_query"]
+        assert timer["segments"] == 4
+        assert timer["start"] is None
+        assert stats.get_db_query() == pytest.approx(2.0)
+        assert stats.get_timer_percentile("db_query", 100) == pytest.approx(1.0)
+
+    def test_sketch(self, stats):
+        stats.set_sketch("latency")
+        stats.record_many("latency", [1.0, 2.0, 3.0])
+        assert stats.get_latency(1) == 3.0
+
+    def test_counter(self, stats):
+        stats.record_many("hits", [1, 2, 3])
+        assert stats.get_hits() == 6
+
+    def test_errors(self, stats):
+        stats.set_attribute("version", "1.0")
+        with pytest.raises(NameNotExists):
+            stats.record_many("missing", [1])
+        with pytest.raises(ValueError):
+            stats.record_many("version", [1])
+
+    def test_numpy_arrays(self, stats):
+        numpy = pytest.importorskip("numpy")
+        stats.set_timer("db_query")
+        stats.incr_many(numpy.array(["hits", "misses", "hits"]))
+        stats.incr_many({"hits": numpy.int64(2)})
+        stats.record_many("db_query", numpy.full(1000, 0.001))
+        assert stats.get_hits() == 4
+        assert stats.get_misses() == 11
+        assert stats.get_db_query() == pytest.approx(1.0)
+        assert type(stats.get_counters()["hits"]["value"]) is int
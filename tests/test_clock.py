@@ -0,0 +1,65 @@
+import pytest
+from prostata import Stats, FakeClock
+from prostata.Clock import default_clock
+
+
+class TestClock:
+
+    def test_default_clock_is_integer_nanoseconds(self):
+        stats = Stats()
+        assert stats._clock is default_clock
+        assert isinstance(default_clock(), int)
+
+    def test_fake_clock_advance(self):
+        clock = FakeClock(start_ns=10)
+        assert clock() == 10
+        clock.advance(1.5)
+        assert clock() == 1_500_000_010
+        clock.advance(ns=5)
+        assert clock() == 1_500_000_015
+
+    def test_fake_clock_cannot_go_backwards(self):
+        clock = FakeClock()
+        with pytest.raises(ValueError):
+            clock.advance(-1)
+
+    def test_timer_with_fake_clock(self):
+        clock = FakeClock()
+        stats = Stats(clock=clock)
+        stats.set_timer("my_timer")
+        stats.start_my_timer()
+        clock.advance(2)
+        assert stats.get_my_timer() == 2.0
+        stats.stop_my_timer()
+        assert stats._timers["my_timer"]["stop"] == 2_000_000_000
+        clock.advance(10)
+        assert stats.get_my_timer() == 2.0
+
+    def test_timer_segments_accumulate(self):
+        clock = FakeClock()
+        stats = Stats(clock=clock)
+        stats.set_timer("my_timer")
+        for seconds in (0.25, 0.5, 0.25):
+            stats.start_timer("my_timer")
+            clock.advance(seconds)
+            stats.stop_timer("my_timer")
+        assert stats.get_timer("my_timer") == 1.0
+        assert stats._timers["my_timer"]["segments"] == 3
+
+    def test_timer_start_stores_ticks(self):
+        clock = FakeClock(start_ns=42)
+        stats = Stats(clock=clock)
+        stats.set_timer("my_timer")
+        stats.start_timer("my_timer")
+        assert stats._timers["my_timer"]["start"] == 42
+
+    def test_timer_accumulates_integer_nanoseconds(self):
+        clock = FakeClock(start_ns=10 ** 18)
+        stats = Stats(clock=clock)
+        stats.set_timer("my_timer")
+        for _ in range(1000):
+            stats.start_timer("my_timer")
+            clock.advance(ns=1)
+            stats.stop_timer("my_timer")
+        assert stats._timers["my_timer"]["elapsed_ns"] == 1000
+        assert stats.get_timer("my_timer") == 1e-6
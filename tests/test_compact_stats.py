@@ -0,0 +1,85 @@
+import pytest
+from prostata import Stats, CompactStats, FakeClock
+from prostata.Stats import NameExists, NameNotExists
+
+
+def populate(stats):
+    stats.set_timer("load_time", "Load Time")
+    stats.set_counter("requests", 10, "requests", "Requests")
+    stats.set_counter("errors", unit="requests")
+    stats.set_ratio("error_rate", "errors", "requests", "Error Rate")
+    stats.set_attribute("version", "1.0.0")
+    stats.start_load_time()
+    stats.clock.advance(2)
+    stats.stop_load_time()
+    stats.incr_requests(5)
+    stats.incr_errors(3)
+    stats.decr_errors()
+
+
+class TestCompactStats:
+
+    def make_pair(self):
+        pair = []
+        for cls in (Stats, CompactStats):
+            clock = FakeClock()
+            stats = cls(clock=clock)
+            stats.clock = clock
+            populate(stats)
+            pair.append(stats)
+        return pair
+
+    def test_same_shapes_as_stats(self):
+        stats, compact = self.make_pair()
+        assert compact.get_counters() == stats.get_counters()
+        assert compact.get_timers() == stats.get_timers()
+        assert compact.get_labels() == stats.get_labels()
+        assert compact.get_error_rate() == stats.get_error_rate() == 2 / 15
+
+    def test_values_in_columns(self):
+        _, compact = self.make_pair()
+        slot = compact._counters["requests"]
+        assert compact._counter_values[slot] == 15
+        assert compact._timer_elapsed[compact._timers["load_time"]] == 2_000_000_000
+
+    def test_labels_and_units_are_interned(self):
+        compact = CompactStats()
+        for i in range(100):
+            compact.set_counter(f"c{i}", unit="bytes", label="Shared Label")
+        compact.set_counter("plain")
+        assert compact._strings.count("bytes") == 1
+        assert compact._strings.count("Shared Label") == 1
+        assert compact.get_labels_for_counters()["plain"] == "plain"
+
+    def test_set_label_and_unit(self):
+        compact = CompactStats()
+        compact.set_counter("requests")
+        compact.set_timer("load_time")
+        compact.set_label("requests", "Requests")
+        compact.set_label("load_time", "Load Time")
+        compact.set_counter_unit("requests", "requests")
+        assert compact.get_counters()["requests"] == {'value': 0, 'unit': 'requests', 'label': 'Requests'}
+        assert compact.get_labels_for_timers() == {'load_time': 'Load Time'}
+
+    def test_running_timer(self):
+        clock = FakeClock()
+        compact = CompactStats(clock=clock)
+        compact.set_timer("load_time")
+        compact.start_timer("load_time")
+        compact.start_timer("load_time")  # Ignored while running
+        clock.advance(1)
+        assert compact.get_timer("load_time") == 1.0
+        assert compact.get_timers()["load_time"]["start"] == 0
+        assert compact.get_timers()["load_time"]["segments"] == 1
+
+    def test_errors(self):
+        compact = CompactStats()
+        compact.set_counter("requests")
+        with pytest.raises(NameExists):
+            compact.set_timer("requests")
+        with pytest.raises(NameNotExists):
+            compact.incr("missing")
+        with pytest.raises(NameNotExists):
+            compact.get_timer("missing")
+        with pytest.raises(NameNotExists):
+            compact.set_label("missing", "Missing")
@@ -0,0 +1,93 @@
+import threading
+import pytest
+from prostata import Stats
+
+THREADS = 16
+INCREMENTS = 20_000
+
+
+def hammer(stats, threads=THREADS, increments=INCREMENTS):
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        for _ in range(increments):
+            stats.incr("hits")
+            stats.incr("bytes", 3)
+            stats.decr("bytes")
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+
+
+class TestConcurrency:
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            Stats(concurrency="optimistic")
+
+    @pytest.mark.parametrize("mode", ["lock", "sharded"])
+    def test_exact_totals_under_threads(self, mode):
+        stats = Stats(concurrency=mode)
+        stats.set_counter("hits")
+        stats.set_counter("bytes", 10)
+        hammer(stats)
+        assert stats.get_counter("hits") == THREADS * INCREMENTS
+        assert stats.get_bytes() == 10 + 2 * THREADS * INCREMENTS
+        assert stats.get_counters()["hits"]["value"] == THREADS * INCREMENTS
+
+    def test_sharded_ratio_sums_shards(self):
+        stats = Stats(concurrency="sharded")
+        stats.set_counter("hits")
+        stats.set_counter("bytes")
+        stats.set_ratio("bytes_per_hit", "bytes", "hits")
+        hammer(stats, threads=4, increments=1000)
+        assert stats.get_ratio("bytes_per_hit") == 2.0
+
+    def test_sharded_reset(self):
+        stats = Stats(concurrency="sharded")
+        stats.set_counter("hits")
+        stats.set_counter("bytes")
+        hammer(stats, threads=4, increments=100)
+        stats.reset_counter("hits", 7)
+        assert stats.get_counter("hits") == 7
+        stats.incr("hits")
+        assert stats.get_counter("hits") == 8
+
+    def test_sharded_folds_dead_threads(self):
+        stats = Stats(concurrency="sharded")
+        stats.set_counter("hits")
+        stats.set_counter("bytes")
+        hammer(stats, threads=4, increments=100)
+        assert 1 <= len(stats._shards) <= 4
+        stats.incr("hits")  # Registers this thread's shard and folds the finished ones
+        assert len(stats._shards) == 1
+        assert stats.get_counter("hits") == 401
+        assert stats._counters["hits"]["value"] == 400
+
+    def test_sharded_reads_never_miss_folded_shards(self):
+        stats = Stats(concurrency="sharded")
+        stats.set_counter("hits")
+        done = threading.Event()
+        seen = []
+
+        def reader():
+            while not done.is_set():
+                seen.append(stats.get_counter("hits"))
+
+        def writer():
+            stats.incr("hits", 10)  # Each new thread folds the shards of the finished ones
+
+        reading = threading.Thread(target=reader)
+        reading.start()
+        for _ in range(200):
+            writing = threading.Thread(target=writer)
+            writing.start()
+            writing.join()
+        done.set()
+        reading.join()
+        assert seen == sorted(seen)
+        assert stats.get_counter("hits") == 2000
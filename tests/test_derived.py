@@ -0,0 +1,91 @@
+import pytest
+from prostata import Stats, CompactStats, PrometheusExporter, FakeClock
+from prostata.Expression import Expression
+from prostata.Stats import NameExists, NameNotAllowed, NameNotExists, MergeConflict
+
+
+@pytest.fixture(params=[Stats, CompactStats])
+def stats(request):
+    clock = FakeClock()
+    stats = request.param(clock=clock)
+    stats.set_counter("errors", 2)
+    stats.set_counter("timeouts", 1)
+    stats.set_counter("requests", 100)
+    stats.set_counter("bytes", 3000, unit="bytes")
+    stats.set_timer("transfer")
+    stats.start_transfer()
+    clock.advance(2)
+    stats.stop_transfer()
+    stats.set_attribute("workers", 4)
+    stats.set_attribute("version", "1.0")
+    return stats
+
+
+class TestExpression:
+
+    def test_operators(self):
+        values = {'a': lambda: 7, 'b': lambda: 2}
+        for text, expected in [("a + b * 2", 11), ("(a - b) / b", 2.5), ("a // b", 3), ("a % b", 1),
+                               ("-a ** b", -49), ("+a - 0.5", 6.5)]:
+            assert Expression(text).bind(values)() == expected
+
+    def test_division_by_zero(self):
+        for text in ("a / 0", "a // 0", "a % 0"):
+            assert Expression(text).bind({'a': lambda: 1})() == 0.0
+
+    def test_names_in_order(self):
+        assert Expression("b / (a + b)").names == ('b', 'a')
+
+    @pytest.mark.parametrize("text", ["a +", "f(a)", "a.b", "a[0]", "a if b else c", "a < b",
+                                      "'text'", "True", "lambda: 1", "__import__('os')"])
+    def test_rejected(self, text):
+        with pytest.raises(ValueError):
+            Expression(text)
+
+
+class TestSetDerived:
+
+    def test_counters_timers_attributes(self, stats):
+        stats.set_derived("failure_rate", "(errors + timeouts) / requests")
+        stats.set_derived("throughput", "bytes / transfer", label="Bytes per second")
+        stats.set_derived("per_worker", "requests / workers")
+        assert stats.get_failure_rate() == 0.03
+        assert stats.get_derived("throughput") == 1500.0
+        assert stats.get_per_worker() == 25.0
+        stats.incr_errors(3)
+        stats.set_workers(5)
+        assert stats.get_derived_values() == {"failure_rate": 0.06, "throughput": 1500.0, "per_worker": 20.0}
+        assert stats.get_labels()["throughput"] == "Bytes per second"
+        assert stats.derived_names() == ["failure_rate", "throughput", "per_worker"]
+
+    def test_ratios_and_other_derived(self, stats):
+        stats.set_ratio("error_rate", "errors", "requests")
+        stats.set_derived("error_percent", "error_rate * 100")
+        stats.set_derived("success_percent", "100 - error_percent")
+        assert stats.get_success_percent() == 98.0
+
+    def test_invalid(self, stats):
+        with pytest.raises(NameNotExists):
+            stats.set_derived("bad", "errors / missing")
+        with pytest.raises(ValueError):
+            stats.set_derived("bad", "version * 2")
+        with pytest.raises(ValueError):
+            stats.set_derived("bad", "errors ^ 2")
+        with pytest.raises(NameExists):
+            stats.set_derived("errors", "timeouts")
+        with pytest.raises(NameNotAllowed):
+            stats.set_derived("derived", "timeouts")
+        with pytest.raises(NameNotExists):
+            stats.get_derived("bad")
+        assert not stats.is_used("bad")
+
+    def test_exported_and_merged(self, stats):
+        stats.set_derived("failure_rate", "(errors + timeouts) / requests")
+        assert "\nfailure_rate 0.03\n" in PrometheusExporter(stats).render()
+        total = Stats().merge(stats)
+        assert total.get_failure_rate() == 0.03
+        other = Stats()
+        other.set_counter("errors")
+        other.set_derived("failure_rate", "errors * 2")
+        with pytest.raises(MergeConflict):
+            total.merge(other)
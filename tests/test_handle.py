@@ -0,0 +1,71 @@
+import pytest
+from prostata import Stats, CompactStats, SharedStats, FakeClock, CounterHandle, TimerHandle
+from prostata.Handle import DictCounterHandle, DictTimerHandle, ArrayCounterHandle
+
+FACTORIES = [
+    Stats,
+    CompactStats,
+    lambda clock: Stats(clock=clock, concurrency="sharded"),
+]
+
+
+class TestHandle:
+
+    @pytest.mark.parametrize("factory", FACTORIES)
+    def test_counter_handle(self, factory):
+        stats = factory(clock=FakeClock())
+        requests = stats.set_counter("requests", 10, handle=True)
+        assert isinstance(requests, CounterHandle)
+        assert requests.name == "requests"
+        requests.incr()
+        requests.incr(4)
+        requests.decr(2)
+        assert requests.get() == 13
+        assert stats.get_counter("requests") == 13
+        stats.incr_requests()
+        assert requests.get() == 14
+        requests.reset(3)
+        assert stats.get_requests() == 3
+
+    @pytest.mark.parametrize("factory", FACTORIES)
+    def test_timer_handle(self, factory):
+        clock = FakeClock()
+        stats = factory(clock=clock)
+        load_time = stats.set_timer("load_time", handle=True)
+        assert isinstance(load_time, TimerHandle)
+        load_time.start()
+        clock.advance(1)
+        assert load_time.get() == 1.0
+        load_time.start()  # Ignored while running
+        clock.advance(1)
+        load_time.stop()
+        clock.advance(1)
+        assert load_time.get() == stats.get_timer("load_time") == 2.0
+        assert stats.get_timers()["load_time"]["segments"] == 1
+
+    def test_no_handle_by_default(self):
+        stats = Stats()
+        assert stats.set_counter("requests") is None
+        assert stats.set_timer("load_time") is None
+
+    def test_handles_are_bound_to_storage(self):
+        stats = Stats()
+        assert type(stats.set_counter("requests", handle=True)) is DictCounterHandle
+        assert type(stats.set_timer("load_time", handle=True)) is DictTimerHandle
+        compact = CompactStats()
+        assert type(compact.set_counter("requests", handle=True)) is ArrayCounterHandle
+        sharded = Stats(concurrency="sharded")
+        assert type(sharded.set_counter("requests", handle=True)) is CounterHandle
+        assert type(sharded.set_timer("load_time", handle=True)) is TimerHandle
+
+    def test_handles_use_slots(self):
+        handle = Stats().set_counter("requests", handle=True)
+        with pytest.raises(AttributeError):
+            handle.other = 1
+
+    def test_shared_stats_handle(self):
+        with SharedStats(max_metrics=2, max_workers=1) as stats:
+            requests = stats.set_counter("requests", handle=True)
+            requests.incr(2)
+            assert requests.get() == stats.get_requests() == 2
+        stats.unlink()
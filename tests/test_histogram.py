@@ -0,0 +1,108 @@
+import random
+import pytest
+from prostata import Stats, CompactStats, FakeClock
+from prostata.Histogram import Histogram
+from prostata.Stats import NameNotExists
+
+
+class TestHistogram:
+
+    @pytest.mark.parametrize("precision", [2, 3, 6, 8])
+    def test_buckets_are_contiguous(self, precision):
+        histogram = Histogram(precision, max_value=2 ** 24)
+        expected_low = 0
+        for index in range(len(histogram.counts)):
+            low, high = histogram.bounds(index)
+            assert low == expected_low
+            assert histogram._index(low) == histogram._index(high) == index
+            expected_low = high + 1
+
+    def test_percentiles_within_relative_error(self):
+        rng = random.Random(7)
+        values = sorted(int(rng.lognormvariate(14, 1.5)) for _ in range(20_000))
+        histogram = Histogram()
+        for value in values:
+            histogram.record(value)
+        for q in (1, 50, 90, 99, 99.9):
+            exact = values[max(0, int(-(-len(values) * q // 100)) - 1)]
+            assert abs(histogram.percentile(q) - exact) <= exact / 32 + 1
+        assert histogram.percentile(0) == values[0]
+        assert histogram.percentile(100) == values[-1]
+        assert histogram.count == len(values)
+        assert histogram.sum == sum(values)
+
+    def test_fixed_memory(self):
+        histogram = Histogram(max_value=2 ** 20)
+        size = len(histogram.counts)
+        histogram.record(2 ** 40)
+        histogram.record(-5)
+        assert len(histogram.counts) == size
+        assert histogram.counts[-1] == 1
+        assert histogram.counts[0] == 1
+        assert histogram.percentile(100) == 2 ** 40
+
+    def test_empty_and_invalid(self):
+        histogram = Histogram()
+        assert histogram.percentile(99) == 0
+        assert histogram.buckets() == []
+        with pytest.raises(ValueError):
+            histogram.percentile(101)
+        with pytest.raises(ValueError):
+            Histogram(precision=1)
+
+    def test_count_at_most(self):
+        histogram = Histogram(precision=3, max_value=2 ** 10)
+        for value in (1, 7, 8, 9, 100, 5000):
+            histogram.record(value)
+        low, high = histogram.bounds(histogram._index(100))
+        assert histogram.count_at_most([-1, 0, 7, 9, low - 1, high, 2 ** 10, 5000]) == [0, 0, 2, 4, 4, 5, 5, 6]
+        assert Histogram().count_at_most([1, 2]) == [0, 0]
+
+    def test_copy(self):
+        histogram = Histogram()
+        histogram.record(10)
+        copy = histogram.copy()
+        histogram.record(20)
+        assert (copy.count, copy.sum, copy.min, copy.max) == (1, 10, 10, 10)
+        assert copy.buckets() == [(10, 1)]
+
+
+class TestTimerHistogram:
+
+    @pytest.mark.parametrize("factory", [Stats, CompactStats])
+    def test_timer_percentiles(self, factory):
+        clock = FakeClock()
+        stats = factory(clock=clock)
+        stats.set_timer("db_query", histogram=True)
+        for ms in range(1, 101):
+            stats.start_db_query()
+            clock.advance(ms / 1000)
+            stats.stop_db_query()
+        assert stats.get_timer_percentile("db_query", 50) == pytest.approx(0.050, rel=1 / 32)
+        assert stats.get_timer_percentile("db_query", 99) == pytest.approx(0.099, rel=1 / 32)
+        assert stats.get_timer_percentile("db_query", 100) == 0.1
+        buckets = stats.get_timers()["db_query"]["histogram"]
+        assert sum(count for _, count in buckets) == 100
+        assert buckets == sorted(buckets)
+        histogram = stats.get_timer_histograms()["db_query"]
+        assert histogram.count == 100
+        histogram.record(1)  # A copy
+        assert stats.get_timer_histograms()["db_query"].count == 100
+
+    def test_handle_records_segments(self):
+        clock = FakeClock()
+        stats = Stats(clock=clock)
+        db_query = stats.set_timer("db_query", handle=True, histogram=True)
+        db_query.start()
+        clock.advance(0.25)
+        db_query.stop()
+        assert stats.get_timer_percentile("db_query", 50) == 0.25
+
+    def test_plain_timers_unchanged(self):
+        stats = Stats()
+        stats.set_timer("load_time")
+        assert "histogram" not in stats.get_timers()["load_time"]
+        with pytest.raises(ValueError):
+            stats.get_timer_percentile("load_time", 50)
+        with pytest.raises(NameNotExists):
+            stats.get_timer_percentile("missing", 50)
@@ -0,0 +1,173 @@
+import pytest
+from prostata import Stats, CompactStats, PrometheusExporter, HyperLogLog
+from prostata.Stats import NameNotAllowed, NameNotExists, MergeConflict
+
+
+def filled(precision, start, stop):
+    hll = HyperLogLog(precision)
+    hll.add_many(f"user{i}" for i in range(start, stop))
+    return hll
+
+
+class TestAccuracy:
+    """The hash does not depend on the process, so these estimates are deterministic."""
+
+    @pytest.mark.parametrize("cardinality", [0, 1, 10, 100, 1_000])
+    def test_small_cardinalities_are_exact_enough(self, cardinality):
+        hll = filled(14, 0, cardinality)
+        assert abs(hll.count() - cardinality) <= max(1, 0.005 * cardinality)
+
+    @pytest.mark.parametrize("precision", [8, 10, 12, 14])
+    @pytest.mark.parametrize("cardinality", [5_000, 50_000])
+    def test_within_four_standard_errors(self, precision, cardinality):
+        hll = filled(precision, 0, cardinality)
+        assert abs(hll.count() / cardinality - 1) < 4 * hll.error
+
+    def test_large_cardinality_from_registers(self):
+        # Registers of 2 ** 24 uniformly hashed values: rank r with probability 2 ** -r
+        hll = HyperLogLog.from_bytes(bytes([4, 21, 19, 20, 22, 20, 19, 21, 20, 23, 20, 19, 21, 20, 20, 22, 19]))
+        assert 0.5 < hll.count() / 2 ** 24 < 2
+
+    def test_full_registers(self):
+        hll = HyperLogLog.from_bytes(bytes([4]) + bytes([61]) * 16)
+        assert hll.count() == 2 ** 64
+
+    def test_duplicates_do_not_count(self):
+        hll = filled(12, 0, 1_000)
+        estimate = hll.count()
+        hll.add_many(f"user{i}" for i in range(1_000))
+        hll.add("user1")
+        assert hll.count() == estimate
+
+    def test_values_compared_by_text(self):
+        hll = HyperLogLog(10)
+        for value in (1, "1", b"1", bytearray(b"1")):
+            hll.add(value)
+        assert hll.count() == 1
+
+    @pytest.mark.parametrize("precision,error", [(10, 0.0325), (14, 0.0081)])
+    def test_error(self, precision, error):
+        assert HyperLogLog(precision).error == pytest.approx(error, abs=1e-4)
+        assert len(HyperLogLog(precision).registers) == 2 ** precision
+
+
+class TestHyperLogLog:
+
+    def test_merge_is_union(self):
+        first, second = filled(12, 0, 20_000), filled(12, 10_000, 30_000)
+        union = filled(12, 0, 30_000)
+        first.merge(second)
+        assert first.registers == union.registers
+        assert first.count() == union.count()
+        with pytest.raises(ValueError):
+            first.merge(HyperLogLog(10))
+
+    def test_copy_and_bytes(self):
+        hll = filled(10, 0, 500)
+        copy = hll.copy()
+        copy.add_many(f"other{i}" for i in range(500))
+        assert hll.registers == filled(10, 0, 500).registers
+        assert copy.count() > hll.count()
+        data = hll.to_bytes()
+        assert len(data) == 1 + 2 ** 10
+        decoded = HyperLogLog.from_bytes(data)
+        assert decoded.precision == 10
+        assert decoded.count() == hll.count()
+
+    def test_invalid(self):
+        for precision in (3, 19):
+            with pytest.raises(ValueError):
+                HyperLogLog(precision)
+        for data in (b"", bytes([10]) + bytes(10), bytes([3]) + bytes(8), bytes([4]) + bytes([62]) * 16):
+            with pytest.raises(ValueError):
+                HyperLogLog.from_bytes(data)
+
+
+@pytest.mark.parametrize("stats_class", [Stats, CompactStats])
+class TestStatsUniques:
+
+    def test_dynamic_methods(self, stats_class):
+        stats = stats_class()
+        stats.set_unique("users", precision=12, label="Unique users")
+        stats.add_users("ana")
+        stats.add_unique("users", "bo")
+        stats.add_users("ana")
+        stats.record_many("users", ["cy", "ana"])
+        assert stats.get_users() == 3
+        assert stats.get_unique("users") == 3
+        assert stats.get_uniques() == {"users": {
+            'value': 3, 'error': pytest.approx(0.01625), 'precision': 12, 'label': "Unique users"}}
+        assert stats.get_labels()["users"] == "Unique users"
+        assert stats.get_labels_for_uniques() == {"users": "Unique users"}
+        assert stats.unique_names() == ["users"]
+
+    def test_derived(self, stats_class):
+        stats = stats_class()
+        stats.set_unique("users")
+        stats.set_counter("requests", 10)
+        stats.set_derived("requests_per_user", "requests / users")
+        stats.add_users("ana")
+        stats.add_users("bo")
+        assert stats.get_requests_per_user() == 5.0
+
+    def test_get_hyperloglog_is_a_copy(self, stats_class):
+        stats = stats_class()
+        stats.set_unique("users", precision=10)
+        stats.get_hyperloglog("users").add("ana")
+        assert stats.get_users() == 0
+        stats.merge_hyperloglog("users", filled(10, 0, 100))
+        assert stats.get_users() == filled(10, 0, 100).count()
+
+
+class TestIntegration:
+
+    def test_reserved_and_missing(self):
+        stats = Stats()
+        for name in ("unique", "uniques"):
+            with pytest.raises(NameNotAllowed):
+                stats.set_unique(name)
+        with pytest.raises(NameNotExists):
+            stats.add_unique("missing", "a")
+        with pytest.raises(NameNotExists):
+            stats.get_unique("missing")
+        with pytest.raises(ValueError):
+            stats.set_unique("users", precision=20)
+
+    @pytest.mark.parametrize("concurrency", ["lock", "sharded"])
+    def test_concurrency_modes(self, concurrency):
+        stats = Stats(concurrency=concurrency)
+        stats.set_unique("users")
+        stats.add_users("ana")
+        stats.record_many("users", ["bo"])
+        assert stats.get_users() == 2
+
+    def test_merge(self):
+        total, first, second = Stats(), Stats(), CompactStats()
+        for stats, start in ((first, 0), (second, 5_000)):
+            stats.set_unique("users", precision=12, label="Users")
+            stats.record_many("users", [f"user{i}" for i in range(start, start + 10_000)])
+        total.merge(first).merge(second)
+        assert total.get_users() == filled(12, 0, 15_000).count()
+        assert total.get_labels()["users"] == "Users"
+        conflicting = Stats()
+        conflicting.set_unique("users", precision=10)
+        with pytest.raises(MergeConflict):
+            total.merge(conflicting)
+
+    def test_exported_as_gauge(self):
+        stats = Stats()
+        stats.set_unique("users")
+        stats.add_users("ana")
+        exporter = PrometheusExporter(stats)
+        text = exporter.render()
+        assert "# TYPE users gauge\n" in text
+        assert "\nusers 1\n" in text
+        stats.add_users("ana")
+        exporter.render()
+        assert exporter.rendered == 0
+
+    def test_not_encoded(self):
+        stats = Stats()
+        stats.set_counter("errors")
+        stats.set_unique("users")
+        assert Stats.from_bytes(stats.to_bytes()).used_names() == ["errors"]
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import pytest
+from prostata import MappedStats, MappedStatsReader, FakeClock
+from prostata.SharedStats import PID_BITS, _start_time
+from prostata.Stats import NameNotExists
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason="fork start method and record locks are POSIX only")
+
+
+def count_requests(stats):
+    for _ in range(1000):
+        stats.incr_requests()
+
+
+def run_worker(target, stats):
+    process = multiprocessing.get_context("fork").Process(target=target, args=(stats,))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "metrics.bin"
+
+
+class TestMappedStats:
+
+    def test_values_survive_restart(self, path):
+        clock = FakeClock()
+        with MappedStats(path, max_metrics=8, max_workers=2, clock=clock) as stats:
+            stats.set_counter("requests", 5)
+            stats.set_timer("load_time")
+            stats.incr_requests()
+            stats.start_load_time()
+            clock.advance(1.5)
+            stats.stop_load_time()
+        with MappedStats(path) as restarted:
+            restarted.set_counter("requests", 5)  # Initial value only applies to new counters
+            restarted.set_timer("load_time")
+            restarted.incr_requests()
+            assert restarted.get_requests() == 7
+            assert restarted.get_load_time() == 1.5
+            assert restarted.get_timers()["load_time"]["segments"] == 1
+
+    def test_forked_workers_share_the_file(self, path):
+        with MappedStats(path, max_workers=4) as stats:
+            stats.set_counter("requests")
+            ctx = multiprocessing.get_context("fork")
+            processes = [ctx.Process(target=count_requests, args=(stats,)) for _ in range(3)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+                assert process.exitcode == 0
+            assert stats.get_requests() == 3000
+
+    def test_restarts_reuse_rows_of_exited_processes(self, path):
+        with MappedStats(path, max_workers=4) as stats:
+            stats.set_counter("requests")
+            for _ in range(3):
+                run_worker(count_requests, stats)
+            assert stats.get_requests() == 3000
+            assert list(stats._layout.workers[1:]) == [0, 0, 0]  # One row was used by every worker
+
+    @pytest.mark.skipif(not os.path.exists('/proc/self/stat'), reason="process start times are read from /proc")
+    def test_reused_pid_does_not_keep_the_row(self, path):
+        with MappedStats(path, max_workers=2) as stats:
+            stats.set_counter("requests")
+            run_worker(count_requests, stats)
+            # As if this process got the pid of the exited worker
+            stats._layout.workers[0] = (_start_time(os.getpid()) - 1) << PID_BITS | os.getpid()
+            stats.incr_requests()
+            assert stats._row == 0
+            assert stats.get_requests() == 1001
+
+    def test_rejects_other_files(self, path):
+        path.write_bytes(b"not a metrics file" * 10)
+        with pytest.raises(ValueError):
+            MappedStats(path)
+        with pytest.raises(ValueError):
+            MappedStatsReader(path)
+
+
+class TestMappedStatsReader:
+
+    def test_reads_live_values(self, path):
+        clock = FakeClock()
+        with MappedStats(path, clock=clock) as stats:
+            stats.set_counter("requests", 3)
+            stats.set_timer("load_time")
+            with MappedStatsReader(path) as reader:
+                assert reader.get_counter("requests") == 3
+                stats.incr_requests()
+                stats.start_load_time()
+                clock.advance(2)
+                stats.stop_load_time()
+                stats.set_counter("errors", 1)
+                assert reader.get_counter("requests") == 4
+                assert reader.get_timer("load_time") == 2.0
+                assert reader.get_counters() == {"requests": 4, "errors": 1}
+                assert reader.get_timers() == {"load_time": {"elapsed": 2.0, "segments": 1}}
+                assert reader.counter_names() == ["requests", "errors"]
+                assert reader.timer_names() == ["load_time"]
+
+    def test_read_only(self, path):
+        with MappedStats(path) as stats:
+            stats.set_counter("requests")
+        with MappedStatsReader(path) as reader:
+            with pytest.raises(TypeError):
+                reader._layout.values[0] = 1
+            with pytest.raises(NameNotExists):
+                reader.get_counter("missing")
+            with pytest.raises(NameNotExists):
+                reader.get_timer("requests")
+
+    def test_missing_file(self, path):
+        with pytest.raises(FileNotFoundError):
+            MappedStatsReader(path)
@@ -0,0 +1,113 @@
+import pytest
+from prostata import Stats, CompactStats, FakeClock
+from prostata.Stats import MergeConflict
+
+CLASSES = [Stats, CompactStats]
+
+
+def worker(stats_class, clock, requests, load_time):
+    stats = stats_class(clock=clock)
+    stats.set_counter("requests", requests, unit="requests", label="Requests")
+    stats.set_counter("errors", 1)
+    stats.set_ratio("error_rate", "errors", "requests")
+    stats.set_timer("load_time", label="Load time", histogram=True)
+    stats.start_load_time()
+    clock.advance(load_time)
+    stats.stop_load_time()
+    stats.set_sketch("latency")
+    stats.observe_latency(load_time)
+    stats.set_attribute("version", "1.2.0")
+    return stats
+
+
+@pytest.mark.parametrize("source", CLASSES)
+@pytest.mark.parametrize("target", CLASSES)
+class TestMerge:
+
+    def test_sums_existing_items(self, source, target):
+        clock = FakeClock()
+        total = worker(target, clock, 10, 1.0)
+        assert total.merge(worker(source, clock, 5, 0.5)) is total
+        assert total.get_requests() == 15
+        assert total.get_errors() == 2
+        assert total.get_error_rate() == 2 / 15
+        assert total.get_load_time() == pytest.approx(1.5)
+        assert total.get_timers()["load_time"]["segments"] == 2
+        assert total._timer_histogram("load_time").count == 2
+        assert total.get_sketch("latency").count == 2
+
+    def test_creates_missing_items(self, source, target):
+        clock = FakeClock()
+        total = target(clock=clock)
+        total.set_attribute("version", "2.0.0")
+        total.merge(worker(source, clock, 5, 0.5))
+        assert total.get_requests() == 5
+        assert total.get_counter_units()["requests"] == "requests"
+        assert total.get_labels()["load_time"] == "Load time"
+        assert total.get_error_rate() == 1 / 5
+        assert total.get_timer_percentile("load_time", 50) == pytest.approx(0.5, rel=0.01)
+        assert total.get_latency(0.5) == pytest.approx(0.5, rel=0.01)
+        assert total.get_version() == "2.0.0"  # Attributes keep their value
+
+    def test_running_timer(self, source, target):
+        clock = FakeClock()
+        other = source(clock=clock)
+        other.set_timer("uptime")
+        other.start_uptime()
+        clock.advance(3)
+        total = target(clock=clock).merge(other)
+        assert total.get_uptime() == 3.0
+        assert other.get_uptime() == 3.0
+
+
+class TestConflicts:
+
+    @pytest.mark.parametrize("setup", [
+        lambda stats: stats.set_timer("requests"),
+        lambda stats: stats.set_counter("requests", unit="bytes"),
+        lambda stats: stats.set_ratio("error_rate", "errors", "errors"),
+        lambda stats: stats.set_timer("load_time"),
+        lambda stats: stats.set_sketch("latency", relative_accuracy=0.05),
+    ], ids=["kind", "unit", "ratio", "histogram", "sketch"])
+    def test_conflict_changes_nothing(self, setup):
+        total = Stats()
+        total.set_counter("errors", 7)
+        setup(total)
+        before = total.snapshot()
+        with pytest.raises(MergeConflict):
+            total.merge(worker(Stats, FakeClock(), 5, 0.5))
+        assert total.snapshot()._replace(time_ns=0) == before._replace(time_ns=0)
+
+    def test_derived_with_text_attribute_changes_nothing(self):
+        total = Stats()
+        total.set_counter("c", 1)
+        total.set_attribute("x", "text")
+        other = Stats()
+        other.set_counter("c", 5)
+        other.set_attribute("x", 2)
+        other.set_derived("d", "c * x")
+        with pytest.raises(MergeConflict):
+            total.merge(other)
+        assert total.get_c() == 1
+        assert not total.is_used("d")
+
+
+class TestReduce:
+
+    def test_reduce(self):
+        clock = FakeClock()
+        workers = (worker(CompactStats, clock, i, 0.25) for i in range(100))
+        total = CompactStats.reduce(workers, clock=clock)
+        assert type(total) is CompactStats
+        assert total.get_requests() == sum(range(100))
+        assert total.get_load_time() == 25.0
+        assert total.get_timers()["load_time"]["segments"] == 100
+
+    def test_reduce_nothing(self):
+        assert Stats.reduce([]).used_names() == []
+
+    def test_reduce_decoded(self):
+        payloads = [worker(Stats, FakeClock(), 2, 1.0).to_bytes() for _ in range(3)]
+        total = Stats.reduce(Stats.from_bytes(data) for data in payloads)
+        assert total.get_requests() == 6
+        assert total.get_load_time() == 3.0
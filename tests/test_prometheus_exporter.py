@@ -0,0 +1,139 @@
+import pytest
+from prostata import Stats, CompactStats, FakeClock, PrometheusExporter
+
+
+@pytest.fixture(params=[Stats, CompactStats])
+def clock_and_stats(request):
+    clock = FakeClock()
+    return clock, request.param(clock=clock)
+
+
+class TestPrometheusExporter:
+
+    def test_counters(self, clock_and_stats):
+        _, stats = clock_and_stats
+        stats.set_counter("requests", 3, unit="requests", label="Requests served")
+        stats.set_counter("sent", 10, unit="bytes")
+        stats.set_counter("errors")
+        text = PrometheusExporter(stats).render()
+        assert text == (
+            "# TYPE requests counter\n"
+            "# UNIT requests requests\n"
+            "# HELP requests Requests served\n"
+            "requests_total 3\n"
+            "# TYPE sent_bytes counter\n"
+            "# UNIT sent_bytes bytes\n"
+            "# HELP sent_bytes sent\n"
+            "sent_bytes_total 10\n"
+            "# TYPE errors counter\n"
+            "# HELP errors errors\n"
+            "errors_total 0\n"
+            "# EOF\n"
+        )
+
+    def test_timers(self, clock_and_stats):
+        clock, stats = clock_and_stats
+        stats.set_timer("load_time", label="Load time")
+        stats.set_timer("db_query", histogram=True)
+        for ms in (1, 1, 3):
+            stats.start_db_query()
+            clock.advance(ms / 1000)
+            stats.stop_db_query()
+        stats.start_load_time()
+        clock.advance(1.5)
+        text = PrometheusExporter(stats, namespace="app", buckets=(0.002, 0.004, 1)).render()
+        assert "# TYPE app_load_time_seconds summary\n# UNIT app_load_time_seconds seconds\n" in text
+        assert "# HELP app_load_time_seconds Load time\n" in text
+        assert "app_load_time_seconds_count 1\napp_load_time_seconds_sum 1.5\n" in text
+        lines = [line for line in text.splitlines() if line.startswith("app_db_query_seconds_bucket")]
+        assert lines == [
+            'app_db_query_seconds_bucket{le="0.002"} 2',
+            'app_db_query_seconds_bucket{le="0.004"} 3',
+            'app_db_query_seconds_bucket{le="1.0"} 3',
+            'app_db_query_seconds_bucket{le="+Inf"} 3',
+        ]
+        assert "app_db_query_seconds_count 3\napp_db_query_seconds_sum 0.005\n" in text
+
+    def test_histogram_buckets_are_stable(self, clock_and_stats):
+        clock, stats = clock_and_stats
+        stats.set_timer("db_query", histogram=True)
+        exporter = PrometheusExporter(stats)
+
+        def bounds():
+            return [line.split(" ")[0] for line in exporter.render().splitlines() if "_bucket" in line]
+
+        empty = bounds()
+        assert len(empty) == 12
+        assert empty[0] == 'db_query_seconds_bucket{le="0.005"}'
+        stats.start_db_query()
+        clock.advance(0.3)
+        stats.stop_db_query()
+        assert bounds() == empty
+        assert 'db_query_seconds_bucket{le="0.25"} 0\n' in exporter.render()
+        assert 'db_query_seconds_bucket{le="0.5"} 1\n' in exporter.render()
+
+    def test_ratios_attributes_and_sketches(self, clock_and_stats):
+        _, stats = clock_and_stats
+        stats.set_counter("errors", 1)
+        stats.set_counter("total", 4)
+        stats.set_ratio("error_rate", "errors", "total")
+        stats.set_attribute("version", 'v"1"\n', label="Version\\build")
+        stats.set_attribute("workers", 8)
+        stats.set_sketch("latency")
+        stats.observe_latency(2.0)
+        text = PrometheusExporter(stats, quantiles=(0.5,)).render()
+        assert "# TYPE error_rate gauge\n# HELP error_rate error_rate\nerror_rate 0.25\n" in text
+        assert '# HELP version Version\\\\build\nversion_info{value="v\\"1\\"\\n"} 1\n' in text
+        assert "# TYPE workers gauge\n# HELP workers workers\nworkers 8\n" in text
+        assert "# TYPE latency summary\n" in text
+        assert "latency_count 1\nlatency_sum 2.0\n" in text
+        assert text.endswith("# EOF\n")
+
+    def test_only_changed_metrics_are_rendered(self, clock_and_stats):
+        _, stats = clock_and_stats
+        for i in range(10):
+            stats.set_counter(f"requests_{i}")
+        exporter = PrometheusExporter(stats)
+        first = exporter.render()
+        assert exporter.rendered == 10
+        assert exporter.render() is first
+        assert exporter.rendered == 0
+        stats.incr_requests_3()
+        stats.set_label("requests_4", "Four")
+        text = exporter.render()
+        assert exporter.rendered == 2
+        assert "requests_3_total 1\n" in text
+        assert "# HELP requests_4 Four\n" in text
+        stats.set_counter("new_counter")
+        assert "new_counter_total 0\n" in exporter.render()
+        assert exporter.rendered == 1
+
+    def test_only_changed_histograms_and_sketches_are_copied(self, clock_and_stats, monkeypatch):
+        clock, stats = clock_and_stats
+        stats.set_timer("db_query", histogram=True)
+        stats.set_sketch("latency")
+        stats.set_sketch("size")
+        exporter = PrometheusExporter(stats)
+        exporter.render()
+        copied = []
+        for method in ("get_timer_histogram", "get_sketch"):
+            monkeypatch.setattr(stats, method, lambda name, copy=getattr(stats, method): copied.append(name) or copy(name))
+        exporter.render()
+        assert copied == []
+        stats.start_db_query()
+        clock.advance(0.3)
+        stats.stop_db_query()
+        stats.observe_size(10)
+        text = exporter.render()
+        assert copied == ["db_query", "size"]
+        assert "db_query_seconds_count 1\n" in text
+        assert "size_count 1\n" in text
+
+    def test_invalidate(self, clock_and_stats):
+        _, stats = clock_and_stats
+        stats.set_counter("requests")
+        exporter = PrometheusExporter(stats)
+        exporter.render()
+        exporter.invalidate()
+        exporter.render()
+        assert exporter.rendered == 1
@@ -1,4 +1,5 @@
 import pytest
+import inspect
 import time
 from prostata import Stats
 from prostata.Stats import NameNotAllowed, NameExists, NameNotExists
@@ -24,7 +25,7 @@ class TestStats:
         stats = Stats()
         stats.set_timer("my_timer")
         assert "my_timer" in stats._timers
-        assert stats._timers["my_timer"] == {'start': None, 'stop': None, 'segments': 0, 'elapsed': 0.0, 'label': 'my_timer'}
+        assert stats._timers["my_timer"] == {'start': None, 'stop': None, 'segments': 0, 'elapsed_ns': 0, 'label': 'my_timer'}
         assert "my_timer" in stats._names_used
 
     def test_set_timer_with_label(self):
@@ -493,4 +494,99 @@ class TestStats:
         labels = stats.get_labels()
         assert labels["timer1"] == "Same Label"
         assert labels["counter1"] == "Same Label"
-        assert labels["attr1"] == "Same Label"
\ No newline at end of file
+        assert labels["attr1"] == "Same Label"
+
+    def test_dynamic_methods_are_not_stored_on_instance(self):
+        stats = Stats()
+        stats.set_timer("timer1")
+        stats.set_counter("counter1")
+        stats.set_attribute("attr1", "value")
+        assert not any(key.endswith(("timer1", "counter1", "attr1")) for key in vars(stats))
+        assert "incr_counter1" in dir(stats)
+        assert "start_timer1" in dir(stats)
+
+    def test_dynamic_methods_behave_like_named_methods(self):
+        stats = Stats()
+        stats.set_counter("counter1", 10)
+        stats.incr_counter1()
+        stats.incr_counter1(4)
+        stats.decr_counter1(amount=2)
+        assert stats.get_counter1() == 13
+        stats.reset_counter1()
+        assert stats.get_counter1() == 0
+        stats.reset_counter1(value=5)
+        assert stats.get_counter1() == 5
+        stats.set_attribute("attr1", "a")
+        stats.set_attr1("b")
+        assert stats.get_attr1() == "b"
+
+    def test_dynamic_method_errors(self):
+        stats = Stats()
+        stats.set_counter("counter1")
+        stats.set_attribute("attr1", "value")
+        with pytest.raises(AttributeError):
+            stats.start_counter1
+        with pytest.raises(AttributeError):
+            stats.incr_attr1
+        with pytest.raises(AttributeError):
+            stats.get_nonexistent
+        assert not hasattr(stats, "_private_counter1")
+
+    def test_dynamic_methods_installed_on_class_per_instance(self):
+        class SubStats(Stats):
+            pass
+
+        counters = Stats()
+        counters.set_counter("item1")
+        timers = Stats()
+        timers.set_timer("item1")
+        empty = Stats()
+        sub = SubStats()
+        sub.set_counter("item1", 3)
+        for _ in range(2):
+            counters.incr_item1()
+            sub.incr_item1()
+            assert timers.get_item1() == 0
+            with pytest.raises(AttributeError):
+                timers.incr_item1
+            with pytest.raises(AttributeError):
+                empty.incr_item1
+        assert counters.get_counter("item1") == 2
+        assert sub.get_counter("item1") == 5
+        assert not hasattr(empty, "get_item1")
+        assert "incr_item1" not in dir(timers)
+        assert "incr_item1" not in vars(counters)
+
+    def test_dynamic_methods_of_a_single_kind_are_functions(self):
+        stats = Stats()
+        stats.set_counter("single_kind_item", 1)
+        assert inspect.isfunction(Stats.__dict__["incr_single_kind_item"])
+        stats.incr_single_kind_item(2)
+        assert stats.get_single_kind_item() == 3
+        with pytest.raises(NameNotExists):
+            Stats().incr_single_kind_item()  # Calls incr() of an instance without the counter
+
+        timers = Stats()
+        timers.set_timer("single_kind_item")  # Another kind falls back to resolving the kind
+        assert timers.get_single_kind_item() == 0
+        stats.incr_single_kind_item()
+        assert stats.get_single_kind_item() == 4
+        with pytest.raises(AttributeError):
+            timers.incr_single_kind_item
+        with pytest.raises(AttributeError):
+            Stats().get_single_kind_item
+
+    def test_names_shadowed_by_class_methods_not_allowed(self):
+        stats = Stats()
+        for name in ["many", "estimate", "series", "sample_rates", "counter_units", "ratio_values", "timer_in_flight"]:
+            with pytest.raises(NameNotAllowed):
+                stats.set_counter(name)
+        with pytest.raises(NameNotAllowed):
+            stats.set_counter("labels")
+        with pytest.raises(NameNotAllowed):
+            stats.set_timer("timer_percentile")
+        with pytest.raises(NameNotAllowed):
+            stats.set_sketch("key")
+        stats.set_timer("many")  # Timers have no incr_many
+        stats.set_counter("key")  # Counters have no observe_key
+        assert not stats.is_used("labels")
@@ -0,0 +1,86 @@
+import pytest
+from prostata import Stats, CompactStats, FakeClock
+
+STORAGES = [
+    pytest.param(lambda: Stats(clock=FakeClock()), id="dict"),
+    pytest.param(lambda: Stats(clock=FakeClock(), concurrency="sharded"), id="sharded"),
+    pytest.param(lambda: CompactStats(clock=FakeClock()), id="compact"),
+]
+
+
+@pytest.fixture(params=STORAGES)
+def stats(request):
+    stats = request.param()
+    stats.set_counter("errors", 1)
+    stats.set_counter("requests", 4)
+    stats.set_counter("empty")
+    stats.set_ratio("error_rate", "errors", "requests")
+    stats.set_ratio("success_rate", "requests", "requests")
+    stats.set_ratio("undefined", "errors", "empty")
+    return stats
+
+
+class TestRatioValues:
+
+    def test_values(self, stats):
+        assert stats.get_ratio_values() == {"error_rate": 0.25, "success_rate": 1.0, "undefined": 0.0}
+
+    def test_recomputed_when_an_operand_changes(self, stats):
+        stats.get_ratio_values()
+        stats.incr_errors()
+        stats.incr("requests", 4)
+        assert stats.get_ratio_values()["error_rate"] == 0.25
+        stats.set_counter("hits", 2, handle=True).incr()  # Writes through a handle are seen too
+        stats.set_ratio("hit_rate", "hits", "requests")
+        assert stats.get_ratio_values()["hit_rate"] == 3 / 8
+        handle = stats.set_counter("misses", handle=True)
+        stats.set_ratio("miss_rate", "misses", "requests")
+        stats.get_ratio_values()
+        handle.incr(2)
+        assert stats.get_ratio_values()["miss_rate"] == 2 / 8
+
+    def test_only_changed_ratios_are_computed(self, stats):
+        stats.get_ratio_values()
+        stats._ratios["error_rate"]["value"] = -1.0  # Marks whether the value is computed again
+        stats._ratios["undefined"]["value"] = -1.0
+        stats.incr_requests()
+        values = stats.get_ratio_values()
+        assert values["error_rate"] == 0.2
+        assert values["undefined"] == -1.0
+
+    def test_get_ratios_has_current_values(self, stats):
+        stats.incr_errors()
+        assert stats.get_ratios()["error_rate"]["value"] == 0.5
+        assert stats.get_ratios()["error_rate"]["value"] == stats.get_error_rate()
+
+    def test_window_operands(self, stats):
+        stats.set_window_counter("recent_errors", window=10)
+        stats.set_ratio("recent_error_rate", "recent_errors", "requests")
+        stats.incr_recent_errors(2)
+        assert stats.get_ratio_values()["recent_error_rate"] == 0.5
+        stats._clock.advance(10)
+        assert stats.get_ratio_values()["recent_error_rate"] == 0.0
+
+    def test_get_ratio_reads_the_cached_value(self, stats):
+        assert stats.get_ratio("error_rate") == 0.25
+        stats._ratios["error_rate"]["value"] = -1.0  # Marks whether the value is computed again
+        assert stats.get_ratio("error_rate") == -1.0
+        stats.incr_errors()
+        assert stats.get_error_rate() == 0.5
+        assert "error_rate" not in stats._stale_ratios
+
+    def test_operands_are_only_read_after_a_write(self, stats, monkeypatch):
+        stats.get_ratio_values()
+        reads = []
+        read = stats._ratio_operand
+        monkeypatch.setattr(stats, "_ratio_operand", lambda name: reads.append(name) or read(name))
+        stats.get_error_rate()
+        stats.get_ratio_values()
+        assert reads == []
+        handle = stats.set_counter("hits", handle=True)  # Handles created before the ratio mark it too
+        stats.set_ratio("hit_rate", "hits", "requests")
+        stats.get_ratio_values()
+        reads.clear()
+        handle.incr(2)
+        assert stats.get_hit_rate() == 0.5
+        assert sorted(reads) == ["hits", "requests"]
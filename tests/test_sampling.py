@@ -0,0 +1,187 @@
+import asyncio
+import random
+
+import pytest
+from prostata import Stats, CompactStats, FakeClock, Sampler, Estimate
+from prostata.Stats import NameNotExists
+
+STORAGES = [Stats, CompactStats, lambda **kwargs: Stats(concurrency="lock", **kwargs)]
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    state = random.getstate()
+    random.seed(1234)
+    yield
+    random.setstate(state)
+
+
+class TestSampler:
+
+    def test_invalid_rate(self):
+        for rate in (0, -0.5, 1.5):
+            with pytest.raises(ValueError):
+                Sampler(rate)
+
+    def test_rate_one_keeps_everything(self):
+        sampler = Sampler(1.0)
+        assert all(sampler.sample() for _ in range(100))
+        assert sampler.scale(3) == 3
+        assert sampler.stderr() == 0
+
+    def test_keeps_the_rate_of_events(self):
+        sampler = Sampler(0.1)
+        kept = sum(sampler.sample() for _ in range(100_000))
+        assert 9_500 < kept < 10_500
+
+    def test_scale_carries_remainder(self):
+        sampler = Sampler(0.3)
+        total = sum(sampler.scale(1) for _ in range(300))
+        assert abs(total - 1000) <= 1
+        assert sampler.samples == 300
+
+    def test_sample_amount(self):
+        sampler = Sampler(0.25)
+        amounts = [sampler.sample_amount(1) for _ in range(4_000)]
+        assert set(amounts) <= {0, 4}
+        assert abs(sum(amounts) - 4_000) < 600
+        assert sampler.samples == amounts.count(4)
+
+    def test_reset(self):
+        sampler = Sampler(0.5)
+        sampler.scale(10)
+        sampler.reset()
+        assert sampler.samples == 0
+        assert sampler.stderr() == 0
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+class TestSampledCounters:
+
+    def test_estimate_is_within_error(self, storage):
+        stats = storage()
+        stats.set_counter("hits", sample_rate=0.01)
+        for _ in range(200_000):
+            stats.incr_hits()
+        estimate = stats.get_estimate("hits")
+        assert estimate.value == stats.get_hits()
+        assert estimate.rate == 0.01
+        assert 1_500 < estimate.samples < 2_500
+        assert estimate.error == pytest.approx(1.96 * (estimate.samples * 0.99) ** 0.5 / 0.01)
+        assert estimate.low <= 200_000 <= estimate.high
+
+    def test_handle(self, storage):
+        stats = storage()
+        hits = stats.set_counter("hits", sample_rate=0.1, handle=True)
+        for _ in range(50_000):
+            hits.incr(2)
+        hits.decr(0)
+        assert stats.get_estimate("hits").low <= 100_000 <= stats.get_estimate("hits").high
+        hits.reset()
+        assert hits.get() == 0
+        assert stats.get_estimate("hits") == Estimate(0, 0.0, 0.1, 0)
+
+    def test_decr(self, storage):
+        stats = storage()
+        stats.set_counter("queue", value=100_000, sample_rate=0.5)
+        for _ in range(10_000):
+            stats.decr_queue(3)
+        estimate = stats.get_estimate("queue")
+        assert estimate.low <= 70_000 <= estimate.high
+
+    def test_invalid_rate_creates_nothing(self, storage):
+        stats = storage()
+        with pytest.raises(ValueError):
+            stats.set_counter("hits", sample_rate=2)
+        assert not stats.is_used("hits")
+        assert stats.get_sample_rates() == {}
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+class TestSampledTimers:
+
+    def test_start_stop(self, storage):
+        clock = FakeClock()
+        stats = storage(clock=clock)
+        stats.set_timer("parse", sample_rate=0.1)
+        for i in range(20_000):
+            stats.start_parse()
+            clock.advance(0.001 if i % 2 else 0.003)
+            stats.stop_parse()
+        estimate = stats.get_estimate("parse")
+        assert estimate.low <= 40.0 <= estimate.high
+        assert abs(stats.get_timers()["parse"]["segments"] - 20_000) < 1_000
+        assert stats.get_sample_rates() == {"parse": 0.1}
+
+    def test_time_and_timed(self, storage):
+        clock = FakeClock()
+        stats = storage(clock=clock)
+        stats.set_timer("handler", sample_rate=0.25)
+
+        @stats.timed("handler")
+        def handle():
+            clock.advance(0.002)
+            return "done"
+
+        assert all(handle() == "done" for _ in range(10_000))
+        block = stats.time("handler")
+        for _ in range(10_000):
+            with block:
+                clock.advance(0.002)
+        estimate = stats.get_estimate("handler")
+        assert estimate.low <= 40.0 <= estimate.high
+
+    def test_skipped_segments(self, storage):
+        clock = FakeClock()
+        stats = storage(clock=clock)
+        stats.set_timer("parse", sample_rate=0.001)
+        tokens = [stats.start_timer("parse") for _ in range(100)]
+        skipped = [token for token in tokens if token.closed]
+        assert len(skipped) >= 90
+        assert all(token is skipped[0] for token in skipped)  # One shared token, nothing allocated
+        clock.advance(1)
+        for token in skipped:
+            stats.stop_timer(token)  # Does nothing
+        stats.stop_parse()
+        assert stats.get_parse() <= 1000.0 * (100 - len(skipped))
+
+
+def test_sampled_coroutine():
+    clock = FakeClock()
+    stats = Stats(clock=clock)
+    stats.set_timer("request", sample_rate=0.5)
+
+    @stats.timed("request")
+    async def request():
+        clock.advance(0.01)
+
+    async def main():
+        for _ in range(2_000):
+            await request()
+
+    asyncio.run(main())
+    estimate = stats.get_estimate("request")
+    assert estimate.low <= 20.0 <= estimate.high
+
+
+def test_histogram_records_kept_durations():
+    clock = FakeClock()
+    stats = Stats(clock=clock)
+    stats.set_timer("query", histogram=True, sample_rate=0.5)
+    for _ in range(1_000):
+        with stats.time("query"):
+            clock.advance(0.01)
+    assert stats.get_timer_percentile("query", 50) == pytest.approx(0.01, rel=0.05)
+
+
+def test_unsampled_estimate():
+    stats = Stats()
+    stats.set_counter("requests", 5)
+    stats.set_timer("load")
+    stats.set_ratio("rate", "requests", "requests")
+    assert stats.get_estimate("requests") == Estimate(5, 0.0, 1.0, 0)
+    assert stats.get_estimate("load").error == 0.0
+    with pytest.raises(NameNotExists):
+        stats.get_estimate("rate")
+    with pytest.raises(NameNotExists):
+        stats.get_estimate("missing")
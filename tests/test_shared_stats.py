@@ -0,0 +1,279 @@
+import multiprocessing
+import os
+import threading
+import pytest
+from prostata import SharedStats, FakeClock, HyperLogLog
+from prostata.Stats import NameNotAllowed, NameExists, NameNotExists
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason="fork start method is POSIX only")
+
+WORKERS = 4
+INCREMENTS = 2000
+
+
+def count_requests(stats):
+    for _ in range(INCREMENTS):
+        stats.incr_requests()
+    stats.incr("bytes", 10)
+
+
+def record_batches(stats):
+    stats.incr_many(["requests", "requests", "requests"])
+    stats.incr_many({"bytes": 100})
+    stats.record_many("load_time", [0.5, 0.25])
+
+
+def check_window_counter(stats):
+    assert stats.get_recent() == 0  # Window counters are kept per process
+    assert stats.get_window_counters()["recent"]["window"] == 5
+    stats.incr_recent()
+    assert stats.rate_recent() == 0.2
+    assert stats.get_recent_rate() == 1.0
+
+
+def check_topk(stats):
+    assert stats.get_tenants() == []  # Top-K metrics are kept per process
+    assert stats.get_topk("tenants").capacity == 5
+    stats.observe_tenants("acme")
+    assert stats.get_labels()["tenants"] == "Tenants"
+
+
+def send_users(stats, queue):
+    assert stats.get_users() == 0  # Distinct counts are kept per process
+    stats.record_many("users", ["ana", "bo"])
+    queue.put(stats.get_hyperloglog("users").to_bytes())
+
+
+def sample_requests(stats):
+    assert stats.get_sample_rates() == {"requests": 0.5}
+    for _ in range(INCREMENTS):
+        stats.incr_requests()
+
+
+def tag_requests(stats):
+    for user in range(10):
+        stats.incr_requests(tags={"user": str(user)})
+    # Series are kept per process, with the limit set in the parent
+    assert stats.get_series("requests") == {(("user", "0"),): 1, (("user", "1"),): 1, (("overflow", "true"),): 8}
+
+
+def time_queries(stats):
+    for _ in range(10):
+        with stats.time("query"):
+            pass
+    stats.timed("query")(lambda: None)()
+
+
+def create_counter_in_worker(stats):
+    stats.set_counter("created_by_worker", 5)
+    stats.incr("created_by_worker")
+
+
+def create_counter_after(stats, event):
+    event.wait()
+    create_counter_in_worker(stats)
+
+
+@pytest.fixture
+def shared():
+    stats = SharedStats(max_metrics=16, max_workers=8)
+    yield stats
+    stats.close()
+    stats.unlink()
+
+
+def run_workers(stats, target, context="fork", workers=WORKERS):
+    ctx = multiprocessing.get_context(context)
+    processes = [ctx.Process(target=target, args=(stats,)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+
+class TestSharedStats:
+
+    def test_counters_in_one_process(self, shared):
+        shared.set_counter("requests", 10, "requests", "Requests")
+        shared.incr_requests(5)
+        shared.decr("requests", 2)
+        assert shared.get_requests() == 13
+        shared.reset_requests(1)
+        assert shared.get_counter("requests") == 1
+        assert shared.get_counters() == {'requests': {'value': 1, 'unit': 'requests', 'label': 'Requests'}}
+
+    def test_forked_workers_share_counters(self, shared):
+        shared.set_counter("requests")
+        shared.set_counter("bytes")
+        shared.incr_requests()
+        run_workers(shared, count_requests)
+        assert shared.get_requests() == WORKERS * INCREMENTS + 1
+        assert shared.get_counter("bytes") == WORKERS * 10
+
+    def test_time_context_in_forked_workers(self, shared):
+        shared.set_timer("query")
+        with shared.time("query"):
+            pass
+        run_workers(shared, time_queries)
+        assert shared.get_timers()["query"]["segments"] == WORKERS * 11 + 1
+
+    def test_concurrent_timer_segments(self, shared):
+        shared.set_timer("query")
+        first = shared.start_query()
+        second = shared.start_timer("query")
+        assert second is first
+        tokens = []
+        thread = threading.Thread(target=lambda: tokens.append(shared.start_query()))
+        thread.start()
+        thread.join()
+        assert shared.get_timer_in_flight("query") == 2
+        shared.stop_timer(tokens[0])
+        shared.stop_query()
+        assert shared.get_timers()["query"]["segments"] == 2
+        assert shared.get_timer_in_flight("query") == 0
+
+    def test_spawned_worker_gets_topk(self):
+        with SharedStats(max_metrics=4, max_workers=2, mp_context=multiprocessing.get_context("spawn")) as stats:
+            stats.set_topk("tenants", capacity=5, label="Tenants")
+            stats.observe_tenants("globex")
+            run_workers(stats, check_topk, context="spawn", workers=1)
+            assert [hitter.key for hitter in stats.get_tenants()] == ["globex"]
+        stats.unlink()
+
+    def test_spawned_worker_merges_distinct_counts(self):
+        context = multiprocessing.get_context("spawn")
+        with SharedStats(max_metrics=4, max_workers=2, mp_context=context) as stats:
+            stats.set_unique("users", precision=10)
+            stats.add_users("ana")
+            queue = context.Queue()
+            process = context.Process(target=send_users, args=(stats, queue))
+            process.start()
+            data = queue.get()
+            process.join()
+            assert process.exitcode == 0
+            stats.merge_hyperloglog("users", HyperLogLog.from_bytes(data))
+            assert stats.get_users() == 2
+        stats.unlink()
+
+    def test_spawned_worker_gets_window_counters(self):
+        with SharedStats(max_metrics=4, max_workers=2, mp_context=multiprocessing.get_context("spawn")) as stats:
+            stats.set_window_counter("recent", window=5)
+            stats.set_ratio("recent_rate", "recent", "recent")
+            stats.incr_recent(3)
+            run_workers(stats, check_window_counter, context="spawn", workers=1)
+            assert stats.get_recent() == 3
+        stats.unlink()
+
+    def test_spawned_worker_shares_counters(self):
+        with SharedStats(max_metrics=4, max_workers=2, mp_context=multiprocessing.get_context("spawn")) as stats:
+            stats.set_counter("requests", label="Requests")
+            stats.set_counter("bytes")
+            run_workers(stats, count_requests, context="spawn", workers=1)
+            assert stats.get_requests() == INCREMENTS
+        stats.unlink()
+
+    def test_spawned_worker_samples_counters(self):
+        with SharedStats(max_metrics=4, max_workers=2, mp_context=multiprocessing.get_context("spawn")) as stats:
+            stats.set_counter("requests", sample_rate=0.5)
+            run_workers(stats, sample_requests, context="spawn", workers=1)
+            # Standard error of the worker's estimate is about 45
+            assert abs(stats.get_requests() - INCREMENTS) < 450
+        stats.unlink()
+
+    def test_spawned_worker_tags_counters(self):
+        with SharedStats(max_metrics=4, max_workers=2, mp_context=multiprocessing.get_context("spawn")) as stats:
+            stats.set_counter("requests")
+            stats.set_max_series("requests", 2)
+            run_workers(stats, tag_requests, context="spawn", workers=1)
+            assert stats.get_requests() == 10
+            assert stats.get_series("requests") == {}
+        stats.unlink()
+
+    def test_metric_created_by_worker_is_visible(self, shared):
+        run_workers(shared, create_counter_in_worker, workers=1)
+        assert shared.get_created_by_worker() == 6
+        assert shared.get_counter("created_by_worker") == 6
+        assert "created_by_worker" in shared.get_counters()
+
+    @pytest.mark.parametrize("synced", [True, False])
+    def test_set_counter_attaches_to_worker_counter(self, shared, synced):
+        run_workers(shared, create_counter_in_worker, workers=1)
+        if synced:
+            shared.get_counters()
+        shared.set_counter("created_by_worker", value=10, label="Created")
+        assert shared.get_counter("created_by_worker") == 6  # The initial value only applies on creation
+        assert shared.get_labels_for_counters()["created_by_worker"] == "Created"
+        with pytest.raises(NameExists):
+            shared.set_counter("created_by_worker")
+
+    def test_set_sketch_sees_worker_counter(self, shared):
+        run_workers(shared, create_counter_in_worker, workers=1)
+        with pytest.raises(NameExists):
+            shared.set_sketch("created_by_worker")
+
+    def test_worker_counter_conflicts_with_local_sketch(self, shared):
+        sketch_set = multiprocessing.get_context("fork").Event()
+        worker = multiprocessing.get_context("fork").Process(target=create_counter_after, args=(shared, sketch_set))
+        worker.start()
+        shared.set_sketch("created_by_worker")
+        sketch_set.set()
+        worker.join()
+        assert worker.exitcode == 0
+        with pytest.raises(NameExists):
+            shared.get_counters()
+        assert "created_by_worker" not in shared.get_counters()  # Reported once
+        assert shared.get_sketch("created_by_worker").count == 0
+
+    def test_timers(self):
+        clock = FakeClock()
+        with SharedStats(max_metrics=4, max_workers=2, clock=clock) as stats:
+            stats.set_timer("load_time")
+            stats.start_load_time()
+            clock.advance(1.5)
+            assert stats.get_load_time() == 1.5
+            stats.stop_load_time()
+            clock.advance(1)
+            assert stats.get_timer("load_time") == 1.5
+            assert stats.get_timers()["load_time"]["segments"] == 1
+        stats.unlink()
+
+    def test_bulk_ingestion_from_workers(self, shared):
+        shared.set_counter("requests")
+        shared.set_counter("bytes")
+        shared.set_timer("load_time")
+        run_workers(shared, record_batches)
+        assert shared.get_requests() == WORKERS * 3
+        assert shared.get_bytes() == WORKERS * 100
+        assert shared.get_load_time() == pytest.approx(WORKERS * 0.75)
+        assert shared.get_timers()["load_time"]["segments"] == WORKERS * 2
+
+    def test_snapshot_includes_workers(self, shared):
+        shared.set_counter("requests")
+        shared.set_counter("bytes")
+        run_workers(shared, count_requests)
+        run_workers(shared, create_counter_in_worker, workers=1)
+        snapshot = shared.snapshot()
+        assert snapshot.counters == {"requests": WORKERS * INCREMENTS, "bytes": WORKERS * 10, "created_by_worker": 6}
+
+    def test_ratio_over_shared_counters(self, shared):
+        shared.set_counter("errors", 1)
+        shared.set_counter("requests", 4)
+        shared.set_ratio("error_rate", "errors", "requests")
+        assert shared.get_error_rate() == 0.25
+
+    def test_errors(self, shared):
+        with pytest.raises(NameNotExists):
+            shared.incr("missing")
+        with pytest.raises(NameNotAllowed):
+            shared.set_counter("a" * 63)
+        shared.set_counter("requests")
+        with pytest.raises(NameExists):
+            shared.set_timer("requests")
+
+    def test_full_block(self):
+        with SharedStats(max_metrics=1, max_workers=1) as stats:
+            stats.set_counter("one")
+            with pytest.raises(MemoryError):
+                stats.set_counter("two")
+        stats.unlink()
@@ -0,0 +1,125 @@
+import random
+import pytest
+from prostata import Stats, CompactStats, DDSketch
+from prostata.Stats import NameNotAllowed, NameNotExists
+
+
+def exact_quantile(values, q):
+    return sorted(values)[int(q * (len(values) - 1))]
+
+
+class TestDDSketch:
+
+    @pytest.mark.parametrize("relative_accuracy", [0.005, 0.01, 0.05])
+    def test_quantiles_within_relative_accuracy(self, relative_accuracy):
+        rng = random.Random(3)
+        values = [rng.lognormvariate(-4, 1.5) for _ in range(20_000)]
+        sketch = DDSketch(relative_accuracy)
+        sketch.add_many(values)
+        for q in (0.01, 0.5, 0.9, 0.99, 0.999):
+            exact = exact_quantile(values, q)
+            assert abs(sketch.quantile(q) - exact) <= relative_accuracy * exact * 1.0001
+        assert sketch.quantile(0) == min(values)
+        assert sketch.quantile(1) == max(values)
+        assert sketch.count == len(values)
+
+    def test_negative_and_zero_values(self):
+        values = [-10.0, -1.0, 0.0, 0.0, 1.0, 10.0, 100.0]
+        sketch = DDSketch(0.01)
+        sketch.add_many(values)
+        assert sketch.zero_count == 2
+        for q in (0.2, 0.5, 0.9):
+            exact = exact_quantile(values, q)
+            assert abs(sketch.quantile(q) - exact) <= 0.01 * abs(exact)
+
+    def test_bounded_memory_keeps_high_quantiles(self):
+        values = [10 ** (i / 1000) for i in range(-9000, 6000)]
+        sketch = DDSketch(0.01, max_bins=100)
+        sketch.add_many(values)
+        assert sketch.bins <= 100
+        exact = exact_quantile(values, 0.99)
+        assert abs(sketch.quantile(0.99) - exact) <= 0.01 * exact
+
+    def test_merge_is_associative(self):
+        rng = random.Random(5)
+        parts = [[rng.expovariate(100) for _ in range(1000)] for _ in range(3)]
+        a, b, c = (DDSketch(0.01, max_bins=64) for _ in range(3))
+        for sketch, values in zip((a, b, c), parts):
+            sketch.add_many(values)
+        left = a.copy()
+        left.merge(b)
+        left.merge(c)
+        right = b.copy()
+        right.merge(c)
+        right.merge(a)
+        assert left._positive == right._positive
+        assert left.count == right.count == 3000
+        assert left.min == right.min and left.max == right.max
+
+    def test_merge_equals_single_sketch(self):
+        rng = random.Random(9)
+        values = [rng.lognormvariate(0, 1) for _ in range(5000)]
+        whole = DDSketch()
+        whole.add_many(values)
+        merged = DDSketch()
+        for i in range(0, len(values), 500):
+            part = DDSketch()
+            part.add_many(values[i:i + 500])
+            merged.merge(part)
+        assert merged._positive == whole._positive
+        assert merged.quantile(0.99) == whole.quantile(0.99)
+
+    def test_merge_different_accuracy(self):
+        with pytest.raises(ValueError):
+            DDSketch(0.01).merge(DDSketch(0.02))
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            DDSketch(0)
+        with pytest.raises(ValueError):
+            DDSketch(0.01, max_bins=1)
+        with pytest.raises(ValueError):
+            DDSketch().quantile(1.5)
+        assert DDSketch().quantile(0.5) == 0
+
+
+@pytest.mark.parametrize("stats_class", [Stats, CompactStats])
+class TestStatsSketches:
+
+    def test_set_observe_and_quantile(self, stats_class):
+        stats = stats_class()
+        stats.set_sketch("latency", label="Latency")
+        for i in range(1, 101):
+            stats.observe_latency(i / 1000)
+        assert abs(stats.get_latency(0.5) - 0.050) <= 0.0005
+        assert stats.get_sketch_quantile("latency", 1) == 0.1
+        assert stats.sketch_names() == ["latency"]
+        assert stats.get_labels_for_sketches() == {"latency": "Latency"}
+        assert stats.get_labels()["latency"] == "Latency"
+
+    def test_merge_workers(self, stats_class):
+        workers = [stats_class() for _ in range(4)]
+        for i, worker in enumerate(workers):
+            worker.set_sketch("latency")
+            worker.observe("latency", i + 1)
+        fleet = stats_class()
+        fleet.set_sketch("latency")
+        for worker in workers:
+            fleet.merge_sketch("latency", worker.get_sketch("latency"))
+        assert fleet.get_sketches()["latency"]["sketch"].count == 4
+        assert fleet.get_latency(1) == 4
+
+    def test_get_sketch_is_a_copy(self, stats_class):
+        stats = stats_class()
+        stats.set_sketch("latency")
+        stats.get_sketch("latency").add(1.0)
+        assert stats.get_sketch("latency").count == 0
+
+    def test_errors(self, stats_class):
+        stats = stats_class()
+        with pytest.raises(NameNotAllowed):
+            stats.set_sketch("sketch")
+        with pytest.raises(NameNotExists):
+            stats.observe("missing", 1.0)
+        with pytest.raises(NameNotExists):
+            stats.get_sketch_quantile("missing", 0.5)
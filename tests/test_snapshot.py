@@ -0,0 +1,74 @@
+import threading
+import pytest
+from prostata import Stats, CompactStats, FakeClock, Snapshot, TimerSnapshot
+
+STORAGES = [
+    pytest.param(lambda clock: Stats(clock=clock), id="dict"),
+    pytest.param(lambda clock: Stats(clock=clock, concurrency="lock"), id="lock"),
+    pytest.param(lambda clock: Stats(clock=clock, concurrency="sharded"), id="sharded"),
+    pytest.param(lambda clock: CompactStats(clock=clock), id="compact"),
+]
+
+
+@pytest.fixture(params=STORAGES)
+def clock_and_stats(request):
+    clock = FakeClock()
+    stats = request.param(clock)
+    stats.set_counter("errors", 1)
+    stats.set_counter("requests", 4)
+    stats.set_ratio("error_rate", "errors", "requests")
+    stats.set_timer("load_time")
+    stats.set_timer("idle")
+    stats.set_attribute("version", "1.0")
+    return clock, stats
+
+
+class TestSnapshot:
+
+    def test_values(self, clock_and_stats):
+        clock, stats = clock_and_stats
+        stats.start_load_time()
+        clock.advance(2)
+        snapshot = stats.snapshot()
+        assert isinstance(snapshot, Snapshot)
+        assert snapshot.time_ns == 2_000_000_000
+        assert snapshot.counters == {"errors": 1, "requests": 4}
+        assert snapshot.ratios == {"error_rate": 0.25}
+        assert snapshot.attributes == {"version": "1.0"}
+        assert snapshot.timers["load_time"] == TimerSnapshot(2.0, 1, True)
+        assert snapshot.timers["idle"] == TimerSnapshot(0.0, 0, False)
+
+    def test_is_not_changed_by_updates(self, clock_and_stats):
+        clock, stats = clock_and_stats
+        snapshot = stats.snapshot()
+        stats.incr_errors()
+        stats.set_version("2.0")
+        stats.start_load_time()
+        clock.advance(1)
+        assert snapshot.counters["errors"] == 1
+        assert snapshot.attributes["version"] == "1.0"
+        assert snapshot.timers["load_time"].elapsed == 0
+
+    def test_is_immutable(self, clock_and_stats):
+        _, stats = clock_and_stats
+        snapshot = stats.snapshot()
+        with pytest.raises(TypeError):
+            snapshot.counters["errors"] = 5
+        with pytest.raises(AttributeError):
+            snapshot.counters = {}
+
+    def test_includes_other_threads(self, clock_and_stats):
+        _, stats = clock_and_stats
+        thread = threading.Thread(target=stats.incr_many, args=({"requests": 6},))
+        thread.start()
+        thread.join()
+        snapshot = stats.snapshot()
+        assert snapshot.counters["requests"] == 10
+        assert snapshot.ratios["error_rate"] == 0.1
+
+    def test_get_counters_does_not_share_inner_dicts(self, clock_and_stats):
+        _, stats = clock_and_stats
+        stats.get_counters()["errors"]["value"] = 100
+        stats.get_timers()["idle"]["segments"] = 100
+        assert stats.get_errors() == 1
+        assert stats.get_timers()["idle"]["segments"] == 0
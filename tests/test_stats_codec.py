@@ -0,0 +1,130 @@
+import struct
+import pytest
+from prostata import Stats, CompactStats, FakeClock
+from prostata import StatsCodec
+
+
+def build(stats_class, clock):
+    stats = stats_class(clock=clock)
+    stats.set_counter("requests", 42, unit="requests", label="Requests")
+    stats.set_counter("errors", -3)
+    stats.set_ratio("error_rate", "errors", "requests", label="Error rate")
+    stats.set_timer("load_time", label="Load time")
+    stats.set_timer("db_query", histogram=True)
+    stats.set_timer("idle")
+    for ms in (1, 2, 40):
+        stats.start_db_query()
+        clock.advance(ms / 1000)
+        stats.stop_db_query()
+    stats.start_load_time()
+    clock.advance(0.5)
+    stats.set_attribute("version", "1.2.0", label="Versión")
+    stats.set_attribute("workers", 8)
+    stats.set_attribute("load", 0.75)
+    stats.set_attribute("debug", True)
+    stats.set_sketch("latency", relative_accuracy=0.02, label="Latency")
+    for value in (0.1, 0.2, 0.0, -1.0):
+        stats.observe_latency(value)
+    stats.set_sketch("empty")
+    return stats
+
+
+@pytest.mark.parametrize("source", [Stats, CompactStats])
+@pytest.mark.parametrize("target", [Stats, CompactStats])
+class TestRoundTrip:
+
+    def test_round_trip(self, source, target):
+        clock = FakeClock()
+        stats = build(source, clock)
+        restored = target.from_bytes(stats.to_bytes(), clock=clock)
+        assert type(restored) is target
+        assert restored.get_counters() == stats.get_counters()
+        assert restored.get_ratios() == stats.get_ratios()
+        assert restored.get_attributes() == stats.get_attributes()
+        assert restored.get_timers() == stats.get_timers()  # Elapsed times are encoded in nanoseconds
+        assert restored.get_labels() == stats.get_labels()
+        for q in (0, 0.5, 1):
+            assert restored.get_latency(q) == stats.get_latency(q)
+        assert restored.get_timer_percentile("db_query", 99) == stats.get_timer_percentile("db_query", 99)
+
+    def test_dynamic_methods_and_running_timers(self, source, target):
+        clock = FakeClock()
+        restored = target.from_bytes(build(source, clock).to_bytes(), clock=clock)
+        restored.incr_requests()
+        assert restored.get_requests() == 43
+        assert restored.get_error_rate() == -3 / 43
+        clock.advance(0.5)
+        restored.stop_load_time()
+        assert restored.get_load_time() == pytest.approx(1.0)
+        assert type(restored.get_debug()) is bool
+
+
+class TestFormat:
+
+    def test_empty(self):
+        data = Stats().to_bytes()
+        assert len(data) == StatsCodec.HEADER.size
+        assert Stats.from_bytes(data).used_names() == []
+
+    def test_strings_are_stored_once(self):
+        stats = Stats()
+        for i in range(100):
+            stats.set_counter(f"requests_{i}", unit="requests", label="Requests")
+        data = stats.to_bytes()
+        assert data.count(b"Requests") == 1
+        assert data.count(b"requests") == 101
+
+    def test_rejects_other_data(self):
+        data = Stats().to_bytes()
+        with pytest.raises(ValueError, match="not encoded"):
+            Stats.from_bytes(b"JUNK" + data[4:])
+        with pytest.raises(ValueError, match="version"):
+            Stats.from_bytes(data[:4] + struct.pack('<H', 99) + data[6:])
+        with pytest.raises(ValueError):
+            Stats.from_bytes(b"PR")
+
+    def test_rejects_truncated_data(self):
+        data = build(Stats, FakeClock()).to_bytes()
+        for end in (len(data) - 1, len(data) // 2, StatsCodec.HEADER.size + 3):
+            with pytest.raises(ValueError):
+                Stats.from_bytes(data[:end])
+
+    def test_value_too_large(self):
+        stats = Stats()
+        stats.set_counter("huge", 2 ** 64)
+        with pytest.raises(OverflowError):
+            stats.to_bytes()
+        stats = Stats()
+        stats.set_sketch("latency")
+        stats._sketch("latency")._positive[2 ** 40] = 1
+        with pytest.raises(OverflowError):
+            stats.to_bytes()
+
+    def test_elapsed_nanoseconds_are_exact(self):
+        stats = Stats()
+        stats.set_timer("uptime")
+        stats._timers["uptime"]["elapsed_ns"] = 2 ** 62 + 1  # Not representable as float seconds
+        restored = Stats.from_bytes(stats.to_bytes())
+        assert restored._timers["uptime"]["elapsed_ns"] == 2 ** 62 + 1
+
+    def test_decodes_version_1(self):
+        clock = FakeClock()
+        stats = build(Stats, clock)
+        data = stats.to_bytes()
+        n_strings, n_timers = StatsCodec.HEADER.unpack_from(data)[3:5]
+        offset = StatsCodec.HEADER.size + 4 * n_strings
+        offset += sum(struct.unpack_from(f'<{n_strings}I', data, StatsCodec.HEADER.size))
+        timers = StatsCodec.TIMER.iter_unpack(data[offset:offset + StatsCodec.TIMER.size * n_timers])
+        old_timers = b"".join(StatsCodec.TIMER_V1.pack(*timer[:-1], timer[-1] / 1e9) for timer in timers)
+        old = (data[:4] + struct.pack('<H', 1) + data[6:offset] + old_timers
+               + data[offset + StatsCodec.TIMER.size * n_timers:])
+        restored = Stats.from_bytes(old, clock=clock)
+        assert restored.get_timers() == stats.get_timers()
+        assert restored.get_counters() == stats.get_counters()
+
+    def test_sharded_counters(self):
+        stats = Stats(concurrency="sharded")
+        stats.set_counter("requests")
+        stats.incr_requests(5)
+        restored = Stats.from_bytes(stats.to_bytes(), concurrency="lock")
+        assert restored.get_requests() == 5
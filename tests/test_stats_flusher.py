@@ -0,0 +1,258 @@
+import asyncio
+import json
+import socket
+import sys
+
+import pytest
+
+from prostata import Stats, StatsFlusher, FileSink, UDPSink, UnixSink, Sink
+from prostata.StatsFlusher import encode_snapshot
+
+
+class ListSink(Sink):
+    def __init__(self):
+        self.payloads = []
+        self.closed = False
+
+    async def write(self, data):
+        self.payloads.append(data)
+
+    async def close(self):
+        self.closed = True
+
+
+class BlockedSink(Sink):
+    """Sink whose writes wait until it is released, like a collector that stopped reading."""
+
+    def __init__(self):
+        self.released = asyncio.Event()
+        self.payloads = []
+
+    async def write(self, data):
+        await self.released.wait()
+        self.payloads.append(data)
+
+
+class FailingSink(Sink):
+    async def write(self, data):
+        raise ConnectionRefusedError("collector down")
+
+
+def make_stats():
+    stats = Stats()
+    stats.set_counter("requests", 3)
+    stats.set_counter("errors", 1)
+    stats.set_ratio("error_rate", "errors", "requests")
+    stats.set_timer("load")
+    stats.set_attribute("version", "1.0")
+    return stats
+
+
+def test_encode_snapshot():
+    payload = encode_snapshot(make_stats().snapshot())
+    assert payload.endswith(b"\n")
+    decoded = json.loads(payload)
+    assert decoded['counters'] == {'requests': 3, 'errors': 1}
+    assert decoded['ratios']['error_rate'] == pytest.approx(1 / 3)
+    assert decoded['timers']['load'] == {'elapsed': 0.0, 'segments': 0, 'running': False}
+    assert decoded['attributes'] == {'version': '1.0'}
+    assert isinstance(decoded['time_ns'], int)
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        StatsFlusher(Stats(), [], interval=0)
+    with pytest.raises(ValueError):
+        StatsFlusher(Stats(), [], queue_size=0)
+
+
+def test_start_requires_running_loop():
+    with pytest.raises(RuntimeError):
+        StatsFlusher(Stats(), []).start()
+
+
+def test_flushes_on_interval_and_on_stop():
+    stats = make_stats()
+    sink = ListSink()
+
+    async def main():
+        async with StatsFlusher(stats, [sink], interval=0.01) as flusher:
+            await asyncio.sleep(0.1)
+            stats.incr_requests()
+            assert flusher.running
+        return flusher
+
+    flusher = asyncio.run(main())
+    assert not flusher.running
+    assert sink.closed
+    assert len(sink.payloads) >= 3
+    assert flusher.flushed == len(sink.payloads)
+    # The last payload comes from the flush on stop, after the increment
+    assert json.loads(sink.payloads[-1])['counters']['requests'] == 4
+
+
+def test_flush_and_double_start():
+    sink = ListSink()
+
+    async def main():
+        flusher = StatsFlusher(make_stats(), [sink], interval=60)
+        with pytest.raises(RuntimeError):
+            await flusher.flush()
+        flusher.start()
+        with pytest.raises(RuntimeError):
+            flusher.start()
+        await flusher.flush()
+        assert len(sink.payloads) == 1
+        await flusher.stop(flush=False)
+        await flusher.stop()  # Stopping twice does nothing
+
+    asyncio.run(main())
+    assert len(sink.payloads) == 1
+
+
+def test_queue_is_bounded_when_sink_is_slow():
+    sink = BlockedSink()
+
+    async def main():
+        flusher = StatsFlusher(make_stats(), [sink], interval=0.005, queue_size=2)
+        flusher.start()
+        await asyncio.sleep(0.1)
+        # One snapshot is held by the blocked write, the queue holds at most 2 more
+        assert flusher._queue.qsize() <= 2
+        assert flusher.dropped > 0
+        assert flusher.flushed == 0
+        sink.released.set()
+        await flusher.stop()
+        return flusher
+
+    flusher = asyncio.run(main())
+    assert 2 <= flusher.flushed <= 4
+    assert len(sink.payloads) == flusher.flushed
+
+
+def test_errors_do_not_stop_flusher():
+    sink = ListSink()
+
+    def broken(snapshot):
+        raise TypeError("cannot encode")
+
+    async def main():
+        flusher = StatsFlusher(make_stats(), [FailingSink(), sink], interval=60)
+        async with flusher:
+            await flusher.flush()
+            await flusher.flush()
+        assert flusher.errors == 3  # Twice from the flushes and once from the flush on stop
+        assert isinstance(flusher.last_error, ConnectionRefusedError)
+        assert len(sink.payloads) == 3
+
+        flusher = StatsFlusher(make_stats(), [sink], interval=60, encoder=broken)
+        async with flusher:
+            await flusher.flush()
+        assert flusher.errors == 2
+        assert isinstance(flusher.last_error, TypeError)
+        assert flusher.flushed == 0
+
+    asyncio.run(main())
+
+
+def test_file_sink(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    stats = make_stats()
+
+    async def main():
+        async with StatsFlusher(stats, [FileSink(path)], interval=60) as flusher:
+            await flusher.flush()
+            stats.incr_errors()
+
+    asyncio.run(main())
+    lines = path.read_bytes().splitlines()
+    assert [json.loads(line)['counters']['errors'] for line in lines] == [1, 2]
+
+
+class Collector(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.datagrams = asyncio.Queue()
+
+    def datagram_received(self, data, addr):
+        self.datagrams.put_nowait(data)
+
+
+def test_udp_sink():
+    stats = make_stats()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        transport, collector = await loop.create_datagram_endpoint(
+            Collector, local_addr=('127.0.0.1', 0), family=socket.AF_INET)
+        port = transport.get_extra_info('sockname')[1]
+        try:
+            async with StatsFlusher(stats, [UDPSink('127.0.0.1', port)], interval=0.01):
+                first = await asyncio.wait_for(collector.datagrams.get(), 5)
+                second = await asyncio.wait_for(collector.datagrams.get(), 5)
+        finally:
+            transport.close()
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert json.loads(first)['counters']['requests'] == 3
+    assert json.loads(second)['time_ns'] >= json.loads(first)['time_ns']
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="Unix sockets")
+def test_unix_sink(tmp_path):
+    path = str(tmp_path / "collector.sock")
+    stats = make_stats()
+    received = []
+
+    async def handle(reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            received.append(json.loads(line))
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_unix_server(handle, path)
+        async with server:
+            async with StatsFlusher(stats, [UnixSink(path)], interval=60) as flusher:
+                await flusher.flush()
+                stats.incr_requests(10)
+            # Wait for the collector to read everything until the connection closes
+            for _ in range(100):
+                if len(received) == 2:
+                    break
+                await asyncio.sleep(0.01)
+        return flusher
+
+    flusher = asyncio.run(main())
+    assert flusher.errors == 0
+    assert [payload['counters']['requests'] for payload in received] == [3, 13]
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="Unix sockets")
+def test_unix_sink_reconnects(tmp_path):
+    path = str(tmp_path / "collector.sock")
+    received = []
+
+    async def handle(reader, writer):
+        received.append(await reader.readline())
+        writer.close()
+
+    async def main():
+        flusher = StatsFlusher(make_stats(), [UnixSink(path)], interval=60)
+        async with flusher:
+            await flusher.flush()  # No collector yet
+            assert flusher.errors == 1
+            assert isinstance(flusher.last_error, OSError)
+            server = await asyncio.start_unix_server(handle, path)
+            async with server:
+                await flusher.flush()
+                for _ in range(100):
+                    if received:
+                        break
+                    await asyncio.sleep(0.01)
+        return flusher
+
+    asyncio.run(main())
+    assert len(received) == 1
@@ -0,0 +1,229 @@
+import socket
+import time
+
+import pytest
+
+from prostata import Stats, CompactStats, FakeClock, StatsdEmitter
+
+
+@pytest.fixture
+def listener():
+    """Local UDP socket standing in for the StatsD collector."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(2)
+    yield sock
+    sock.close()
+
+
+def receive(sock, count):
+    return [sock.recv(65536) for _ in range(count)]
+
+
+def lines(packets):
+    return [line for packet in packets for line in packet.decode().split("\n")]
+
+
+@pytest.mark.parametrize("stats_class", [Stats, CompactStats])
+def test_sends_deltas(listener, stats_class):
+    clock = FakeClock()
+    stats = stats_class(clock=clock)
+    stats.set_counter("requests")
+    stats.set_counter("idle")
+    stats.set_timer("load")
+    emitter = StatsdEmitter(stats, *listener.getsockname(), prefix="app.")
+    for _ in range(1000):
+        stats.incr_requests()
+    for seconds in (0.01, 0.03):
+        stats.start_load()
+        clock.advance(seconds)
+        stats.stop_load()
+
+    assert emitter.flush() == 1
+    assert sorted(lines(receive(listener, 1))) == ["app.load:20|ms|@0.5", "app.requests:1000|c"]
+
+    stats.incr_requests(5)
+    stats.decr_requests(2)
+    stats.start_load()
+    clock.advance(0.004)
+    stats.stop_load()
+    emitter.flush()
+    assert sorted(lines(receive(listener, 1))) == ["app.load:4|ms", "app.requests:3|c"]
+
+    assert emitter.flush() == 0  # Nothing changed
+    assert emitter.packets == 2
+    emitter.stop()
+
+
+def test_time_of_running_segment_goes_with_next_segment(listener):
+    clock = FakeClock()
+    stats = Stats(clock=clock)
+    stats.set_timer("load")
+    emitter = StatsdEmitter(stats, *listener.getsockname())
+    stats.start_load()
+    clock.advance(1)
+    stats.stop_load()
+    stats.start_load()
+    clock.advance(2)
+    assert emitter.flush() == 1
+    # The running segment was started, its 2 seconds so far are included in the mean
+    assert lines(receive(listener, 1)) == ["load:1500|ms|@0.5"]
+    clock.advance(1)
+    stats.stop_load()
+    assert emitter.flush() == 0  # No new segment, the last second is kept for the next one
+    stats.start_load()
+    clock.advance(1)
+    stats.stop_load()
+    assert emitter.flush() == 1
+    assert lines(receive(listener, 1)) == ["load:2000|ms"]
+    emitter.stop()
+
+
+def test_packs_datagrams_by_size(listener):
+    stats = Stats()
+    for i in range(200):
+        stats.set_counter(f"requests_{i}", i + 1)
+    emitter = StatsdEmitter(stats, *listener.getsockname(), max_packet=512)
+    sent = emitter.flush()
+    packets = receive(listener, sent)
+    assert all(len(packet) <= 512 for packet in packets)
+    assert 4 <= sent <= 8
+    received = sorted(lines(packets))
+    assert received == sorted(f"requests_{i}:{i + 1}|c" for i in range(200))
+    emitter.stop()
+
+
+def test_gauges(listener):
+    stats = Stats()
+    stats.set_counter("errors", 1)
+    stats.set_counter("requests", 4)
+    stats.set_ratio("error_rate", "errors", "requests")
+    stats.set_attribute("temperature", -3)
+    stats.set_attribute("version", "1.0")
+    emitter = StatsdEmitter(stats, *listener.getsockname(), gauges=True)
+    emitter.flush()
+    received = lines(receive(listener, 1))
+    assert "error_rate:0.25|g" in received
+    assert received[-2:] == ["temperature:0|g", "temperature:-3|g"]
+    assert not any(line.startswith("version") for line in received)
+    # Gauges are sent on every flush
+    assert emitter.flush() == 1
+    emitter.stop()
+
+
+def test_failed_packets_are_sent_again(listener):
+    stats = Stats()
+    stats.set_counter("requests", 7)
+    emitter = StatsdEmitter(stats, *listener.getsockname())
+    address = emitter.address
+    emitter.address = ('127.0.0.1', 0)  # Every send fails
+    assert emitter.flush() == 0
+    assert emitter.errors == 1
+    assert isinstance(emitter.last_error, OSError)
+    emitter.address = address
+    stats.incr_requests()
+    assert emitter.flush() == 1
+    assert lines(receive(listener, 1)) == ["requests:8|c"]
+    emitter.stop()
+
+
+def test_background_thread(listener):
+    stats = Stats()
+    stats.set_counter("requests")
+    with StatsdEmitter(stats, *listener.getsockname()) as emitter:
+        emitter.start(interval=0.01)
+        with pytest.raises(RuntimeError):
+            emitter.start()
+        stats.incr_requests(3)
+        deadline = time.monotonic() + 2
+        while emitter.packets == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats.incr_requests(2)
+    # The last increments are sent by the flush on stop
+    received = lines(receive(listener, emitter.packets))
+    assert sum(int(line.split(":")[1].split("|")[0]) for line in received) == 5
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        StatsdEmitter(Stats(), max_packet=10)
+    emitter = StatsdEmitter(Stats())
+    with pytest.raises(ValueError):
+        emitter.start(interval=0)
+    with pytest.raises(ValueError):
+        emitter.start(flush_size=0)
+    with pytest.raises(ValueError):
+        emitter.start(check_interval=0)
+    emitter.stop()
+
+
+def test_flush_by_size(listener):
+    stats = Stats()
+    for i in range(100):
+        stats.set_counter(f"requests_{i}")
+    emitter = StatsdEmitter(stats, *listener.getsockname())
+    stats.incr_requests_0()
+    assert emitter.flush(min_size=100) == 0  # One line is not enough
+    for i in range(100):
+        stats.incr(f"requests_{i}")
+    assert emitter.flush(min_size=100) == 2
+    assert len(lines(receive(listener, 2))) == 100
+    emitter.stop()
+
+
+def test_background_thread_flushes_by_size(listener):
+    stats = Stats()
+    for i in range(100):
+        stats.set_counter(f"requests_{i}")
+    with StatsdEmitter(stats, *listener.getsockname()) as emitter:
+        emitter.start(interval=60, flush_size=emitter.max_packet, check_interval=0.01)
+        stats.incr_requests_0()
+        time.sleep(0.05)
+        assert emitter.packets == 0  # Waits for the interval
+        for i in range(100):
+            stats.incr(f"requests_{i}")
+        deadline = time.monotonic() + 2
+        while emitter.packets == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert emitter.packets == 2
+        assert sorted(lines(receive(listener, 2)))[:2] == ["requests_0:2|c", "requests_10:1|c"]
+
+
+def test_background_thread_survives_errors(listener):
+    stats = Stats()
+    stats.set_counter("requests")
+    with StatsdEmitter(stats, *listener.getsockname()) as emitter:
+        snapshot = stats.snapshot
+        failures = [RuntimeError("snapshot failed")]
+
+        def failing_snapshot():
+            if failures:
+                raise failures.pop()
+            return snapshot()
+
+        stats.snapshot = failing_snapshot
+        stats.incr_requests()
+        emitter.start(interval=0.01)
+        deadline = time.monotonic() + 2
+        while emitter.packets == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert emitter.errors == 1
+        assert isinstance(emitter.last_error, RuntimeError)
+        assert lines(receive(listener, 1)) == ["requests:1|c"]
+
+
+def test_size_check_only_encodes_changed_metrics(listener, monkeypatch):
+    stats = Stats()
+    for i in range(10):
+        stats.set_counter(f"requests_{i}")
+    emitter = StatsdEmitter(stats, *listener.getsockname())
+    stats.incr_requests_0()
+    assert emitter.flush(min_size=1000) == 0
+    encoded = []
+    line = emitter._counter_line
+    monkeypatch.setattr(emitter, "_counter_line", lambda name, value: encoded.append(name) or line(name, value))
+    stats.incr_requests_1(10)
+    assert emitter.flush(min_size=1000) == 0
+    assert encoded == ["requests_1"]
+    assert emitter._pending_size == len("requests_0:1|c\nrequests_1:10|c\n")
+    emitter.stop()
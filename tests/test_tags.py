@@ -0,0 +1,172 @@
+import pytest
+from prostata import Stats, CompactStats, FakeClock, PrometheusExporter
+from prostata.Stats import NameNotAllowed, NameNotExists
+
+STORAGES = [Stats, CompactStats, lambda **kwargs: Stats(concurrency="lock", **kwargs)]
+OK = (('status', '200'),)
+ERROR = (('status', '500'),)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+class TestTaggedCounters:
+
+    def test_incr_with_tags(self, storage):
+        stats = storage()
+        stats.set_counter("requests")
+        stats.incr("requests", tags={"status": "200"})
+        stats.incr_requests(2, tags={"status": 200})  # Values are strings
+        stats.incr_requests(tags={"status": "500"})
+        stats.decr_requests(tags=[("status", "500")])
+        stats.incr_requests()
+        assert stats.get_requests() == 4
+        assert stats.get_series("requests") == {OK: 3, ERROR: 0}
+        assert not stats.is_used("requests_200")
+        assert stats.series_names() == ["requests"]
+
+    def test_tag_sets_are_sorted_and_interned(self, storage):
+        stats = storage()
+        stats.set_counter("requests")
+        stats.set_counter("errors")
+        stats.incr_requests(tags={"status": "200", "method": "GET"})
+        stats.incr_requests(tags={"method": "GET", "status": "200"})
+        stats.incr_errors(tags={"method": "GET", "status": "200"})
+        (requests_tags,) = stats.get_series("requests")
+        (errors_tags,) = stats.get_series("errors")
+        assert requests_tags == (('method', 'GET'), ('status', '200'))
+        assert requests_tags is errors_tags
+
+    def test_bound_handle(self, storage):
+        stats = storage()
+        stats.set_counter("requests")
+        ok = stats.bind_tags("requests", {"status": "200"})
+        assert ok.tags == OK
+        for _ in range(10):
+            ok.incr()
+        ok.decr(3)
+        assert ok.get() == 7
+        assert stats.get_requests() == 7
+        ok.reset(2)
+        assert stats.get_requests() == 2
+        assert stats.get_series("requests") == {OK: 2}
+
+    def test_overflow(self, storage):
+        stats = storage()
+        stats.set_counter("requests")
+        stats.set_max_series("requests", 2)
+        for user in range(1000):
+            stats.incr_requests(tags={"user": str(user)})
+        series = stats.get_series("requests")
+        assert len(series) == 3
+        assert series[(('overflow', 'true'),)] == 998
+        assert len(stats._tag_sets) == 2  # Tag sets beyond the limit are not interned
+        assert stats.get_requests() == 1000
+        stats.incr_requests(tags={"user": "1"})  # Known tag sets are still counted
+        assert stats.get_series("requests")[(('user', '1'),)] == 2
+        with pytest.raises(NameNotAllowed):  # Tag names are checked even when the series is full
+            stats.incr_requests(tags={"User": "2000"})
+        stats.incr_requests(tags={"user": 1})  # Values are compared as strings
+        assert stats.get_series("requests")[(('user', '1'),)] == 3
+
+    def test_reset(self, storage):
+        stats = storage()
+        stats.set_counter("requests")
+        ok = stats.bind_tags("requests", {"status": "200"})
+        ok.incr(5)
+        stats.reset_requests()
+        assert stats.get_series("requests") == {OK: 0}
+        ok.incr()
+        assert stats.get_requests() == 1
+
+    def test_sampled(self, storage):
+        stats = storage()
+        stats.set_counter("requests", sample_rate=0.1)
+        ok = stats.bind_tags("requests", {"status": "200"})
+        for _ in range(10_000):
+            ok.incr()
+            stats.incr_requests(tags={"status": "500"})
+        series = stats.get_series("requests")
+        assert stats.get_requests() == series[OK] + series[ERROR]
+        assert 8_000 < series[OK] < 12_000
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_tagged_timers(storage):
+    clock = FakeClock()
+    stats = storage(clock=clock)
+    stats.set_timer("query")
+    with stats.time("query", tags={"table": "users"}):
+        clock.advance(1)
+    orders = stats.bind_tags("query", {"table": "orders"})
+    for _ in range(2):
+        with orders:
+            clock.advance(0.5)
+
+    @stats.timed("query", tags={"table": "users"})
+    def load():
+        clock.advance(2)
+
+    load()
+    with stats.time("query"):
+        clock.advance(4)
+    assert stats.get_query() == 8.0
+    assert stats.get_series("query") == {
+        (('table', 'users'),): {'elapsed': 3.0, 'segments': 2},
+        (('table', 'orders'),): {'elapsed': 1.0, 'segments': 2},
+    }
+
+
+def test_errors():
+    stats = Stats()
+    stats.set_counter("requests")
+    stats.set_ratio("rate", "requests", "requests")
+    for tags in ({"Status": "200"}, {"1st": "x"}, {"overflow": "true"}, {"le": "1"}):
+        with pytest.raises(NameNotAllowed):
+            stats.incr_requests(tags=tags)
+    with pytest.raises(NameNotExists):
+        stats.incr("missing", tags={"status": "200"})
+    with pytest.raises(NameNotExists):
+        stats.time("requests", tags={"status": "200"})
+    with pytest.raises(NameNotExists):
+        stats.get_series("rate")
+    with pytest.raises(NameNotExists):
+        stats.set_max_series("rate", 10)
+    with pytest.raises(ValueError):
+        stats.set_max_series("requests", 0)
+    assert stats.get_series("requests") == {}
+    assert stats.get_requests() == 0
+
+
+def test_merge():
+    first, second = Stats(), CompactStats()
+    for stats in (first, second):
+        stats.set_counter("requests")
+        stats.incr_requests(tags={"status": "200"})
+        stats.incr_requests()
+    second.incr_requests(tags={"status": "500"})
+    merged = Stats.reduce([first, second])
+    assert merged.get_requests() == 5
+    assert merged.get_series("requests") == {OK: 2, ERROR: 1}
+
+
+def test_prometheus_exporter():
+    clock = FakeClock()
+    stats = Stats(clock=clock)
+    stats.set_counter("requests")
+    stats.set_timer("query")
+    stats.incr_requests(3, tags={"status": "200", "method": "GET"})
+    stats.incr_requests(tags={"status": 'bad "quote"'})
+    stats.incr_requests(2)
+    with stats.time("query", tags={"table": "users"}):
+        clock.advance(0.5)
+    exporter = PrometheusExporter(stats)
+    text = exporter.render()
+    assert 'requests_total{method="GET",status="200"} 3\n' in text
+    assert 'requests_total{status="bad \\"quote\\""} 1\n' in text
+    assert 'requests_total 2\n' in text
+    assert 'query_seconds_count{table="users"} 1\n' in text
+    assert 'query_seconds_sum{table="users"} 0.5\n' in text
+    assert 'query_seconds_count 0' not in text
+    stats.incr_requests(tags={"status": "200", "method": "GET"})
+    text = exporter.render()
+    assert exporter.rendered == 1
+    assert 'requests_total{method="GET",status="200"} 4\n' in text
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import pytest
+from prostata import Stats, CompactStats, FakeClock
+from prostata.Stats import NameNotExists
+
+
+@pytest.fixture(params=[Stats, CompactStats])
+def stats(request):
+    stats = request.param(clock=FakeClock())
+    stats.set_timer("query", histogram=True)
+    return stats
+
+
+class TestTime:
+
+    def test_block_is_one_segment(self, stats):
+        with stats.time("query"):
+            stats._clock.advance(1.5)
+        assert stats.get_query() == 1.5
+        assert stats.get_timers()["query"]["segments"] == 1
+        assert stats.get_timer_percentile("query", 100) == pytest.approx(1.5, rel=0.01)
+
+    def test_nested_and_reused(self, stats):
+        query_time = stats.time("query")
+        with query_time:
+            stats._clock.advance(1)
+            with query_time:
+                stats._clock.advance(2)
+        with query_time:
+            stats._clock.advance(4)
+        assert stats.get_query() == 9.0  # 3 + 2 (nested) + 4
+        assert stats.get_timers()["query"]["segments"] == 3
+
+    def test_exception_is_recorded(self, stats):
+        with pytest.raises(KeyError):
+            with stats.time("query"):
+                stats._clock.advance(1)
+                raise KeyError("failed")
+        assert stats.get_query() == 1.0
+
+    def test_independent_of_start_and_stop(self, stats):
+        stats.start_query()
+        with stats.time("query"):
+            stats._clock.advance(1)
+        stats._clock.advance(1)
+        stats.stop_query()
+        assert stats.get_query() == 3.0
+
+    def test_shared_by_overlapping_tasks(self, stats):
+        query_time = stats.time("query")
+        first_entered = asyncio.Event()
+
+        async def first():
+            with query_time:
+                first_entered.set()
+                await asyncio.sleep(0.01)
+                stats._clock.advance(9)  # Leaves at 10, after second entered at 1
+
+        async def second():
+            await first_entered.wait()
+            stats._clock.advance(1)
+            with query_time:
+                await asyncio.sleep(0.02)
+                stats._clock.advance(1)  # Leaves at 11
+
+        async def main():
+            await asyncio.gather(first(), second())
+
+        asyncio.run(main())
+        assert stats.get_query() == 20.0  # 10 + 10, each stop paired with the start of its own block
+        assert stats.get_timer_percentile("query", 0) == pytest.approx(10, rel=0.01)
+        assert query_time._starts == {}
+
+    def test_shared_by_threads(self, stats):
+        query_time = stats.time("query")
+        entered, leave = threading.Barrier(2), threading.Event()
+
+        def run():
+            with query_time:
+                entered.wait()
+                leave.wait()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        with query_time:
+            entered.wait()
+            stats._clock.advance(2)
+            leave.set()
+            thread.join()
+        assert stats.get_query() == 4.0
+        assert stats.get_timers()["query"]["segments"] == 2
+
+    def test_missing_timer(self, stats):
+        with pytest.raises(NameNotExists):
+            stats.time("missing")
+        with pytest.raises(NameNotExists):
+            stats.timed("missing")
+
+
+class TestTimed:
+
+    def test_function(self, stats):
+        @stats.timed("query")
+        def run(seconds):
+            """Run a query."""
+            stats._clock.advance(seconds)
+            return seconds * 2
+
+        assert run(2) == 4
+        assert run(seconds=1) == 2
+        assert run.__name__ == "run"
+        assert run.__doc__ == "Run a query."
+        assert stats.get_query() == 3.0
+        assert stats.get_timers()["query"]["segments"] == 2
+
+    def test_exception_is_recorded(self, stats):
+        @stats.timed("query")
+        def fail():
+            stats._clock.advance(1)
+            raise ValueError("failed")
+
+        with pytest.raises(ValueError):
+            fail()
+        assert stats.get_query() == 1.0
+
+    def test_coroutine(self, stats):
+        @stats.timed("query")
+        async def run():
+            await asyncio.sleep(0)
+            stats._clock.advance(2)
+            return "done"
+
+        assert asyncio.run(run()) == "done"
+        assert stats.get_query() == 2.0
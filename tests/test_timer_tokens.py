@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import pytest
+from prostata import Stats, CompactStats, FakeClock
+from prostata.Handle import TimerToken
+from prostata.Stats import _open_segments
+
+
+@pytest.fixture(params=[Stats, CompactStats])
+def stats(request):
+    stats = request.param(clock=FakeClock())
+    stats.set_timer("query")
+    return stats
+
+
+class TestTokens:
+
+    def test_single_segment_as_before(self, stats):
+        token = stats.start_query()
+        assert isinstance(token, TimerToken) and token.primary
+        assert stats.start_query() is token  # Starting again from the same context does nothing
+        stats._clock.advance(1)
+        stats.stop_query()
+        assert token.closed
+        assert stats.get_query() == 1.0
+        assert stats.get_timers()["query"]["segments"] == 1
+        assert stats.get_timer_in_flight("query") == 0
+
+    def test_overlapping_tokens(self, stats):
+        first = stats.start_timer("query")
+        stats.stop_timer(first)
+        first = stats.start_timer("query")
+        second = TimerToken("query", 0, False)
+
+        def start_elsewhere():
+            nonlocal second
+            second = stats.start_timer("query")
+        thread = threading.Thread(target=start_elsewhere)
+        thread.start()
+        thread.join()
+        assert not second.primary
+        assert stats.get_timer_in_flight("query") == 2
+        stats._clock.advance(2)
+        stats.stop_timer(first)
+        stats._clock.advance(1)
+        assert stats.get_query() == 2.0  # Open concurrent segments are added when they stop
+        stats.stop_timer(second)
+        stats.stop_timer(second)  # Stopping twice does nothing
+        assert stats.get_query() == 5.0
+        assert stats.get_timers()["query"]["segments"] == 3
+        assert stats.get_timer_in_flight("query") == 0
+
+    def test_stop_by_name_from_another_context(self, stats):
+        stats.start_query()
+        thread = threading.Thread(target=stats.stop_query)
+        thread.start()
+        thread.join()
+        assert stats.get_timer_in_flight("query") == 0
+        stats.start_query()  # The stopped segment is not reused
+        assert stats.get_timer_in_flight("query") == 1
+
+    def test_uncontended_segments_skip_contextvar(self, stats):
+        token = stats.start_query()
+        assert stats.start_query() is token
+        stats.stop_query()
+        assert token.closed
+        assert _open_segments.get() == {}
+
+    def test_uncontended_primary_token_is_reused(self, stats):
+        token = stats.start_query()
+        stats.stop_query()
+        assert token.closed
+        assert stats.start_query() is token
+        assert not token.closed
+        stats.stop_timer(token)
+        assert stats.get_timers()["query"]["segments"] == 2
+
+    def test_primary_stopped_by_handle(self, stats):
+        stats.start_query()
+        stats._timer_handle("query").stop()
+        token = stats.start_query()
+        assert token.primary and not token.closed
+        assert stats.get_timer_in_flight("query") == 1
+        stats._timer_handle("query").stop()
+        assert token.closed
+
+    def test_handle_opens_concurrent_segments(self, stats):
+        handle = stats._timer_handle("query")
+        started, advanced = threading.Event(), threading.Event()
+
+        def time_elsewhere():
+            handle.start()
+            started.set()
+            advanced.wait()
+            handle.stop()
+        thread = threading.Thread(target=time_elsewhere)
+        handle.start()
+        thread.start()
+        started.wait()
+        assert stats.get_timer_in_flight("query") == 2
+        stats._clock.advance(1)
+        advanced.set()
+        thread.join()
+        assert stats.get_timer_in_flight("query") == 1  # The thread stopped its own segment
+        stats._clock.advance(1)
+        handle.stop()
+        assert stats.get_timer_in_flight("query") == 0
+        assert stats.get_query() == 3.0
+
+
+class TestAsyncio:
+
+    def test_tasks_time_their_own_segments(self, stats):
+        async def handle(delay):
+            stats.start_query()
+            await asyncio.sleep(delay)
+            stats._clock.advance(1)
+            stats.stop_query()
+
+        async def main():
+            await asyncio.gather(*(handle(i / 1000) for i in range(50)))
+
+        asyncio.run(main())
+        assert stats.get_timers()["query"]["segments"] == 50
+        assert stats.get_timer_in_flight("query") == 0
+        assert stats.get_query() > 0
+
+    def test_task_starting_again_opens_a_concurrent_segment(self, stats):
+        async def handle():
+            token = stats.start_query()
+            again = stats.start_query()  # The task that started the primary segment is not known
+            assert token.primary and not again.primary
+            assert stats.start_query() is again
+            stats.stop_query()
+            assert again.closed and not token.closed
+            stats.stop_query()
+
+        asyncio.run(handle())
+        assert stats.get_timers()["query"]["segments"] == 2
+        assert stats.get_timer_in_flight("query") == 0
+
+
+@pytest.mark.parametrize("mode", ["lock", "sharded"])
+def test_threads_under_lock(mode):
+    stats = Stats(concurrency=mode)
+    stats.set_timer("query")
+    query = stats.time("query")
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        for _ in range(500):
+            token = stats.start_query()
+            with query:
+                pass
+            stats.stop_timer(token)
+
+    workers = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    assert stats.get_timer_in_flight("query") == 0
+    assert stats.get_timers()["query"]["segments"] == 2 * 8 * 500
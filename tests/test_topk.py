@@ -0,0 +1,176 @@
+import random
+from collections import Counter
+
+import pytest
+from prostata import Stats, CompactStats, PrometheusExporter, TopK, HeavyHitter
+from prostata.Stats import NameNotAllowed, NameNotExists
+
+
+def zipf_stream(n, keys, seed):
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    return rng.choices([f"key{rank}" for rank in range(keys)], weights, k=n)
+
+
+def check_bounds(top, truth):
+    threshold = sum(truth.values()) / top.capacity
+    tracked = {hitter.key: hitter for hitter in top.top()}
+    for key, count in truth.items():
+        if count > threshold:
+            assert key in tracked
+    for key, hitter in tracked.items():
+        assert hitter.guaranteed <= truth[key] <= hitter.count
+        assert hitter.error <= threshold
+
+
+class TestTopK:
+
+    def test_exact_below_capacity(self):
+        top = TopK(capacity=3)
+        for key in ["a", "b", "a", "c", "a", "b"]:
+            top.observe(key)
+        top.observe("c", 5)
+        assert top.top() == [HeavyHitter("c", 6, 0), HeavyHitter("a", 3, 0), HeavyHitter("b", 2, 0)]
+        assert top.top(1)[0].guaranteed == 6
+        assert top.total == 11
+        assert top.floor() == 2
+
+    def test_replaces_smallest(self):
+        top = TopK(capacity=2)
+        for key in "aaabc":
+            top.observe(key)
+        # c replaced b, the smallest, and inherited its count as error
+        assert top.top() == [HeavyHitter("a", 3, 0), HeavyHitter("c", 2, 1)]
+        assert "b" not in top
+        assert len(top) == 2
+
+    def test_error_bounds(self):
+        stream = zipf_stream(50_000, 5_000, seed=1)
+        top = TopK(capacity=50)
+        for key in stream:
+            top.observe(key)
+        check_bounds(top, Counter(stream))
+        assert [hitter.key for hitter in top.top(3)] == ["key0", "key1", "key2"]
+
+    def test_mixed_key_types(self):
+        top = TopK(capacity=1)
+        top.observe("a")
+        top.observe(1)  # Equal counts never compare the keys
+        top.observe((2, "b"))
+        assert top.top() == [HeavyHitter((2, "b"), 3, 2)]
+
+    def test_merge(self):
+        first, second = zipf_stream(20_000, 2_000, seed=2), zipf_stream(20_000, 2_000, seed=3)
+        top, other = TopK(capacity=40), TopK(capacity=40)
+        for key in first:
+            top.observe(key)
+        for key in second:
+            other.observe(key)
+        top.merge(other)
+        assert len(top) == 40
+        assert top.total == 40_000
+        check_bounds(top, Counter(first) + Counter(second))
+        top.observe("new")  # The heap is rebuilt by merge
+        assert top.total == 40_001
+        small = TopK(capacity=5)
+        small.merge(top)
+        assert small.capacity == 5
+        assert [hitter.key for hitter in small.top()] == [hitter.key for hitter in top.top(5)]
+
+    def test_copy(self):
+        top = TopK(capacity=2)
+        top.observe("a")
+        copy = top.copy()
+        copy.observe("b")
+        copy.observe("c")
+        assert top.top() == [HeavyHitter("a", 1, 0)]
+        assert copy.total == 3
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            TopK(capacity=0)
+        with pytest.raises(ValueError):
+            TopK().observe("a", 0)
+
+
+@pytest.mark.parametrize("stats_class", [Stats, CompactStats])
+class TestStatsTopK:
+
+    def test_dynamic_methods(self, stats_class):
+        stats = stats_class()
+        stats.set_topk("tenants", capacity=10, label="Busiest tenants")
+        stats.observe_tenants("acme")
+        stats.observe_key("tenants", "globex", 3)
+        assert stats.get_tenants(1) == [HeavyHitter("globex", 3, 0)]
+        assert stats.get_top_keys("tenants") == [HeavyHitter("globex", 3, 0), HeavyHitter("acme", 1, 0)]
+        assert stats.get_topks() == {"tenants": {
+            'top': [HeavyHitter("globex", 3, 0), HeavyHitter("acme", 1, 0)],
+            'total': 4, 'capacity': 10, 'label': "Busiest tenants"}}
+        assert stats.get_labels()["tenants"] == "Busiest tenants"
+        assert stats.get_labels_for_topks() == {"tenants": "Busiest tenants"}
+        stats.set_label("tenants", "Tenants")
+        assert stats.get_labels()["tenants"] == "Tenants"
+        assert stats.topk_names() == ["tenants"]
+        assert "observe_tenants" in dir(stats)
+
+    def test_get_topk_is_a_copy(self, stats_class):
+        stats = stats_class()
+        stats.set_topk("tenants")
+        stats.get_topk("tenants").observe("acme")
+        assert stats.get_tenants() == []
+        worker = TopK()
+        worker.observe("acme", 2)
+        stats.merge_topk("tenants", worker)
+        assert stats.get_tenants() == [HeavyHitter("acme", 2, 0)]
+
+
+class TestIntegration:
+
+    def test_reserved_and_missing(self):
+        stats = Stats()
+        for name in ("topk", "topks"):
+            with pytest.raises(NameNotAllowed):
+                stats.set_topk(name)
+        with pytest.raises(NameNotExists):
+            stats.observe_key("missing", "a")
+        with pytest.raises(NameNotExists):
+            stats.get_top_keys("missing")
+        stats.set_topk("tenants")
+        with pytest.raises(ValueError):
+            stats.set_derived("bad", "tenants + 1")
+
+    @pytest.mark.parametrize("concurrency", ["lock", "sharded"])
+    def test_concurrency_modes(self, concurrency):
+        stats = Stats(concurrency=concurrency)
+        stats.set_topk("tenants")
+        stats.observe_tenants("acme", 2)
+        assert stats.get_tenants() == [HeavyHitter("acme", 2, 0)]
+
+    def test_merge(self):
+        total, other = Stats(), CompactStats()
+        other.set_topk("tenants", capacity=5, label="Tenants")
+        other.observe_tenants("acme", 3)
+        total.merge(other).merge(other)
+        assert total.get_tenants() == [HeavyHitter("acme", 6, 0)]
+        assert total.get_topk("tenants").capacity == 5
+        assert total.get_labels()["tenants"] == "Tenants"
+
+    def test_exported_as_gauge(self):
+        stats = Stats()
+        stats.set_topk("tenants")
+        for key in range(20):
+            stats.observe_tenants(f"tenant{key}", key + 1)
+        stats.observe_tenants('bad "key"', 100)
+        exporter = PrometheusExporter(stats, top_keys=3)
+        text = exporter.render()
+        assert "# TYPE tenants gauge\n" in text
+        assert 'tenants{key="bad \\"key\\""} 100\ntenants{key="tenant19"} 20\ntenants{key="tenant18"} 19\n' in text
+        assert "tenant17" not in text
+        exporter.render()
+        assert exporter.rendered == 0
+
+    def test_not_encoded(self):
+        stats = Stats()
+        stats.set_counter("errors")
+        stats.set_topk("tenants")
+        assert Stats.from_bytes(stats.to_bytes()).used_names() == ["errors"]
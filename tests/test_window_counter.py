@@ -0,0 +1,123 @@
+import pytest
+from prostata import Stats, CompactStats, PrometheusExporter, FakeClock, WindowCounter
+from prostata.Stats import NameNotAllowed, NameNotExists, MergeConflict
+
+SECOND = 10 ** 9
+
+
+class TestWindowCounter:
+
+    def test_expires_buckets(self):
+        counter = WindowCounter(window=10, buckets=10)
+        counter.incr(0, 3)
+        counter.incr(5 * SECOND, 2)
+        assert counter.sum(9 * SECOND) == 5
+        assert counter.sum(10 * SECOND) == 2  # First bucket expired
+        assert counter.sum(16 * SECOND) == 0
+        assert counter.rate(16 * SECOND) == 0.0
+
+    def test_long_gap_clears_everything(self):
+        counter = WindowCounter(window=1, buckets=4)
+        counter.incr(0, 7)
+        counter.incr(100 * SECOND)
+        assert counter.sum(100 * SECOND) == 1
+
+    def test_late_increment(self):
+        counter = WindowCounter(window=10, buckets=10)
+        counter.incr(20 * SECOND)
+        counter.incr(15 * SECOND)  # Still in the window
+        counter.incr(5 * SECOND)  # Already expired
+        assert counter.sum(20 * SECOND) == 2
+
+    def test_merge(self):
+        counter, other = WindowCounter(10, 10), WindowCounter(10, 10)
+        counter.incr(0, 1)
+        other.incr(5 * SECOND, 2)
+        other.incr(12 * SECOND, 4)
+        counter.merge(other)
+        assert counter.sum(12 * SECOND) == 6
+        with pytest.raises(ValueError):
+            counter.merge(WindowCounter(10, 5))
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            WindowCounter(window=0)
+        with pytest.raises(ValueError):
+            WindowCounter(buckets=0)
+
+
+@pytest.mark.parametrize("stats_class", [Stats, CompactStats])
+class TestStatsWindowCounters:
+
+    def test_dynamic_methods(self, stats_class):
+        clock = FakeClock()
+        stats = stats_class(clock=clock)
+        stats.set_window_counter("recent_requests", window=60, label="Recent requests")
+        stats.incr_recent_requests()
+        stats.incr_window("recent_requests", 5)
+        assert stats.get_recent_requests() == 6
+        assert stats.rate_recent_requests() == 0.1
+        clock.advance(61)
+        assert stats.get_window_counter("recent_requests") == 0
+        assert stats.get_window_counters() == {
+            "recent_requests": {'value': 0, 'rate': 0.0, 'window': 60, 'label': "Recent requests"}}
+        assert stats.get_labels()["recent_requests"] == "Recent requests"
+        assert stats.window_counter_names() == ["recent_requests"]
+
+    def test_windowed_ratio(self, stats_class):
+        clock = FakeClock()
+        stats = stats_class(clock=clock)
+        stats.set_window_counter("recent_requests", window=10)
+        stats.set_window_counter("recent_errors", window=10)
+        stats.set_ratio("recent_error_rate", "recent_errors", "recent_requests")
+        stats.incr_recent_requests(4)
+        stats.incr_recent_errors(1)
+        assert stats.get_recent_error_rate() == 0.25
+        assert stats.snapshot().ratios["recent_error_rate"] == 0.25
+        clock.advance(10)
+        stats.incr_recent_requests(10)
+        assert stats.get_recent_error_rate() == 0.0
+
+
+class TestIntegration:
+
+    def test_reserved_and_missing(self):
+        stats = Stats()
+        with pytest.raises(NameNotAllowed):
+            stats.set_window_counter("window")
+        with pytest.raises(NameNotExists):
+            stats.get_window_counter("missing")
+
+    @pytest.mark.parametrize("concurrency", ["lock", "sharded"])
+    def test_concurrency_modes(self, concurrency):
+        stats = Stats(clock=FakeClock(), concurrency=concurrency)
+        stats.set_window_counter("recent")
+        stats.incr_recent(2)
+        assert stats.get_recent() == 2
+
+    def test_merge(self):
+        clock = FakeClock()
+        total, other = Stats(clock=clock), Stats(clock=clock)
+        other.set_window_counter("recent", window=10)
+        other.incr_recent(3)
+        total.merge(other).merge(other)
+        assert total.get_recent() == 6
+        conflicting = Stats(clock=clock)
+        conflicting.set_window_counter("recent", window=20)
+        with pytest.raises(MergeConflict):
+            total.merge(conflicting)
+
+    def test_exported_as_gauge(self):
+        stats = Stats(clock=FakeClock())
+        stats.set_window_counter("recent")
+        stats.incr_recent(3)
+        text = PrometheusExporter(stats).render()
+        assert "# TYPE recent gauge\n" in text
+        assert "\nrecent 3\n" in text
+
+    def test_not_encoded(self):
+        stats = Stats(clock=FakeClock())
+        stats.set_counter("errors")
+        stats.set_window_counter("recent")
+        stats.set_ratio("rate", "errors", "recent")
+        assert Stats.from_bytes(stats.to_bytes()).used_names() == ["errors"]